@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ApiGatewayConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api_gateway'
+
+    def ready(self):
+        # Conecta os sinais que marcam a agenda materializada para atualização
+        from . import signals  # noqa: F401
@@ -0,0 +1,151 @@
+"""
+Benchmark de vazão do webhook por processo: WSGI (threads) x ASGI (event loop)
+
+Simula pacientes conversando ao mesmo tempo, com latências de rede
+controladas (Gemini e Graph API do WhatsApp substituídos por dublês que só
+esperam), e mede mensagens processadas por segundo em um processo:
+
+- WSGI: handle_webhook em um pool de N threads (como gunicorn --threads N);
+  cada turno faz 3 chamadas ao Gemini em sequência e o envio ao WhatsApp
+- ASGI: whatsapp_webhook_async no event loop; intenção e entidades em
+  paralelo, envio assíncrono (cada requisição com seu ThreadSensitiveContext,
+  como no ASGIHandler do Django)
+
+Sessões e histórico usam bancos SQLite temporários (catálogo e conversas).
+
+Uso:
+    python manage.py benchmark_async_webhook
+    python manage.py benchmark_async_webhook --patients 50 --threads 8 --gemini-ms 600
+"""
+
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from asgiref.sync import ThreadSensitiveContext
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.test.utils import override_settings
+
+from api_gateway import views
+from core import json_codec
+from core.benchmark import temporary_database
+
+GEMINI_REPLY = '{"intent": "buscar_info", "next_state": "answering_questions", "confidence": 0.9}'
+
+
+class FakeGeminiModel:
+    """Dublê do GenerativeModel: responde após a latência configurada"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def generate_content(self, prompt, generation_config=None):
+        time.sleep(self.latency)
+        return mock.Mock(text=GEMINI_REPLY)
+
+    async def generate_content_async(self, prompt, generation_config=None):
+        await asyncio.sleep(self.latency)
+        return mock.Mock(text=GEMINI_REPLY)
+
+
+class FakeWhatsAppService:
+    """Dublê do WhatsAppService: envio com a latência configurada"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def send_message(self, to, message):
+        time.sleep(self.latency)
+        return True
+
+    async def asend_message(self, to, message):
+        await asyncio.sleep(self.latency)
+        return True
+
+
+def webhook_body(phone_number: str, turn: int) -> bytes:
+    message = {'id': f'wamid.{phone_number}.{turn}', 'from': phone_number, 'timestamp': '1749416383',
+               'type': 'text', 'text': {'body': 'Quais especialidades vocês atendem?'}}
+    return json_codec.dumps({'object': 'whatsapp_business_account', 'entry': [{'id': '1', 'changes': [
+        {'field': 'messages', 'value': {'messaging_product': 'whatsapp', 'messages': [message]}}]}]})
+
+
+class Command(BaseCommand):
+    help = 'Compara a vazão do webhook por processo em WSGI (threads) e ASGI (event loop)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--patients', type=int, default=20, help='Pacientes conversando ao mesmo tempo')
+        parser.add_argument('--turns', type=int, default=3, help='Mensagens por paciente')
+        parser.add_argument('--threads', type=int, default=8, help='Threads por processo no cenário WSGI')
+        parser.add_argument('--gemini-ms', type=float, default=400, help='Latência de cada chamada ao Gemini')
+        parser.add_argument('--whatsapp-ms', type=float, default=150, help='Latência do envio ao WhatsApp')
+
+    def handle(self, *args, **options):
+        logging.disable(logging.CRITICAL)
+        try:
+            with temporary_database('catalog'), temporary_database('conversations'), \
+                    override_settings(GEMINI_API_KEY='benchmark', SERVICES_WARMUP=False):
+                self._run(options)
+        finally:
+            logging.disable(logging.NOTSET)
+
+    def _run(self, options):
+        from api_gateway.services.gemini import GeminiChatbotService
+        from api_gateway.services.session_persistence import session_write_behind
+        from rag_agent.models import ClinicaInfo, Especialidade
+
+        ClinicaInfo.objects.create(nome='Clínica Benchmark', objetivo_geral='Benchmark', whatsapp_contato='5511999999999',
+                                   endereco='Rua Benchmark, 1', referencia_localizacao='Centro')
+        Especialidade.objects.create(nome='Pneumologia')
+
+        chatbot = GeminiChatbotService()
+        gemini_latency = options['gemini_ms'] / 1000
+        for component in (chatbot.intent_detector, chatbot.entity_extractor, chatbot.response_generator):
+            component.model = FakeGeminiModel(gemini_latency)
+        whatsapp = FakeWhatsAppService(options['whatsapp_ms'] / 1000)
+
+        patients, turns = options['patients'], options['turns']
+        total = patients * turns
+        self.stdout.write(f"💬 {patients} pacientes x {turns} mensagens | Gemini {options['gemini_ms']:.0f}ms/chamada, "
+                          f"WhatsApp {options['whatsapp_ms']:.0f}ms")
+
+        factory = RequestFactory()
+
+        def request_for(prefix, patient, turn):
+            return factory.post('/api/webhook/whatsapp/', webhook_body(f'55{prefix}{patient:09d}', turn),
+                                content_type='application/json')
+
+        with mock.patch.object(views, 'gemini_chatbot_service', chatbot), \
+                mock.patch.object(views, 'whatsapp_service', whatsapp):
+            cache.clear()
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+                # Turnos do mesmo paciente em sequência; pacientes em paralelo
+                for turn in range(turns):
+                    list(pool.map(lambda patient: views.handle_webhook(request_for(1, patient, turn)),
+                                  range(patients)))
+            wsgi_elapsed = time.perf_counter() - start
+            session_write_behind.flush()
+
+            async def handle_async(request):
+                async with ThreadSensitiveContext():
+                    return await views.whatsapp_webhook_async(request)
+
+            async def run_asgi():
+                for turn in range(turns):
+                    await asyncio.gather(*(handle_async(request_for(2, patient, turn)) for patient in range(patients)))
+
+            cache.clear()
+            start = time.perf_counter()
+            asyncio.run(run_asgi())
+            asgi_elapsed = time.perf_counter() - start
+            session_write_behind.flush()
+
+        self.stdout.write(f"{'WSGI (' + str(options['threads']) + ' threads)':<28} {wsgi_elapsed:>7.2f}s "
+                          f"{total / wsgi_elapsed:>8.1f} msg/s")
+        self.stdout.write(f"{'ASGI (event loop)':<28} {asgi_elapsed:>7.2f}s {total / asgi_elapsed:>8.1f} msg/s"
+                          f"  ⚡ {wsgi_elapsed / asgi_elapsed:.1f}x")
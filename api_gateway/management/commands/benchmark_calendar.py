@@ -0,0 +1,144 @@
+"""
+Benchmark de disponibilidade com o calendário sintético (sem Google)
+
+Usa api_gateway.services.synthetic_calendar como backend do
+GoogleCalendarService e mede, para N médicos:
+- listagem paginada de todos os eventos do período (get_events_for_date_range)
+- separação dos eventos por médico e por dia (partition_events_by_doctor)
+- disponibilidade de um médico (get_doctor_availability)
+- consultas de horários (horário livre, alternativas mais próximas) na
+  estrutura tipada (DoctorAvailability) e nos dias com strings
+- agenda materializada (availability_store): atualização completa, atualização
+  incremental sem alterações e consulta pontual de um horário, em bancos
+  SQLite temporários
+
+Uso:
+    python manage.py benchmark_calendar
+    python manage.py benchmark_calendar --doctors 2000 --days 30 --density 0.8 --latency-ms 120
+"""
+
+import logging
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from core.benchmark import format_stats, measure, temporary_database
+
+
+class Command(BaseCommand):
+    help = 'Mede listagem de eventos e cálculo de disponibilidade com o calendário sintético'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctors', type=int, default=500, help='Médicos no calendário sintético')
+        parser.add_argument('--days', type=int, default=7, help='Dias consultados')
+        parser.add_argument('--density', type=float, default=0.6, help='Fração do expediente ocupada')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--latency-ms', type=float, default=0, help='Latência simulada por página da API')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--materialized-doctors', type=int, default=50,
+                            help='Médicos materializados no cenário da agenda materializada')
+
+    def handle(self, *args, **options):
+        logging.disable(logging.INFO)
+        try:
+            with override_settings(GOOGLE_CALENDAR_BACKEND='synthetic', SYNTHETIC_CALENDAR_DOCTORS=options['doctors'],
+                                   SYNTHETIC_CALENDAR_SEED=options['seed'],
+                                   SYNTHETIC_CALENDAR_DENSITY=options['density'],
+                                   SYNTHETIC_CALENDAR_LATENCY=options['latency_ms'] / 1000):
+                self._run(options)
+                with temporary_database('catalog'), temporary_database('conversations'):
+                    self._run_materialized(options)
+        finally:
+            logging.disable(logging.NOTSET)
+
+    def _run(self, options):
+        from api_gateway.services.google_calendar_service import GoogleCalendarService
+
+        calendar = GoogleCalendarService()
+        synthetic = calendar.service
+        days = options['days']
+        start = datetime.now()
+        start_date = start.strftime('%Y-%m-%d')
+        end_date = (start + timedelta(days=days)).strftime('%Y-%m-%d')
+        doctor = synthetic.doctors[len(synthetic.doctors) // 2]
+
+        generation_start = time.perf_counter()
+        events = calendar.get_events_for_date_range(start_date, end_date)
+        generation_ms = (time.perf_counter() - generation_start) * 1000
+        requests_before = synthetic.requests_count
+        calendar.get_events_for_date_range(start_date, end_date)
+        pages = synthetic.requests_count - requests_before
+
+        self.stdout.write(f"📅 {len(synthetic.doctors)} médicos, {days} dias: {len(events)} eventos em {pages} páginas "
+                          f"(geração da agenda: {generation_ms:.0f}ms)")
+
+        repeat = options['repeat']
+        self.stdout.write(format_stats(
+            'get_events_for_date_range',
+            measure(lambda: calendar.get_events_for_date_range(start_date, end_date), repeat=repeat, warmup=1),
+        ))
+        self.stdout.write(format_stats(
+            f'partition_events_by_doctor ({len(synthetic.doctors)} médicos)',
+            measure(lambda: calendar.partition_events_by_doctor(events, synthetic.doctors), repeat=repeat, warmup=1),
+        ))
+        self.stdout.write(format_stats(
+            'get_doctor_availability (1 médico)',
+            measure(lambda: calendar.get_doctor_availability(doctor, days), repeat=repeat, warmup=1),
+        ))
+        # Médico com mais horários livres (partição com todos os médicos)
+        events_by_doctor = calendar.partition_events_by_doctor(events, synthetic.doctors)
+        availability = max(
+            (calendar._compute_availability(name, events_by_doctor[name], start, days) for name in synthetic.doctors),
+            key=lambda item: item.total_slots,
+        )
+        self._run_queries(availability, repeat * 2000)
+
+    def _run_queries(self, availability, repeat):
+        from api_gateway.services.availability import to_minutes
+        from api_gateway.services.datetime_parser import parse_date, parse_time
+
+        days = availability.to_days()
+        if not days:
+            return
+        day = availability.days[-1]
+        requested = '12:15'
+        minutes = to_minutes(parse_time(requested))
+
+        def scan_strings():
+            # Como antes: procurar o dia reinterpretando as datas e comparar strings
+            target = next(item for item in days if parse_date(item['date']) == day)
+            times = target['available_times']
+            return requested in times, times[:8]
+
+        self.stdout.write(format_stats('horário + alternativas (strings)', measure(scan_strings, repeat=repeat)))
+        self.stdout.write(format_stats('horário + alternativas (tipado)', measure(
+            lambda: (availability.is_free(day, minutes), availability.nearest(day, minutes, 8)), repeat=repeat)))
+        self.stdout.write(format_stats('renderização (to_days)', measure(availability.to_days, repeat=repeat)))
+
+    def _run_materialized(self, options):
+        from api_gateway.services.availability_store import AvailabilityStore
+        from api_gateway.services.google_calendar_service import GoogleCalendarService
+
+        calendar = GoogleCalendarService()
+        store = AvailabilityStore(calendar)
+        doctors = calendar.service.doctors[:options['materialized_doctors']]
+        doctor = doctors[0]
+        day = next(datetime.now().date() + timedelta(days=offset) for offset in range(1, 8)
+                   if (datetime.now().date() + timedelta(days=offset)).weekday() < 5)
+
+        start = time.perf_counter()
+        stats = store.refresh(doctors, days_ahead=options['days'], full=True)
+        full_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        store.refresh(doctors, days_ahead=options['days'])
+        incremental_ms = (time.perf_counter() - start) * 1000
+
+        self.stdout.write(f"🗄️  agenda materializada ({len(doctors)} médicos): {stats['created']} horários, "
+                          f"completa {full_ms:.0f}ms, incremental sem alterações {incremental_ms:.0f}ms")
+        repeat = options['repeat'] * 20
+        self.stdout.write(format_stats('lookup (busca pontual)', measure(
+            lambda: store.lookup(doctor, day, '09:00'), repeat=repeat)))
+        self.stdout.write(format_stats('get_days (7 dias)', measure(
+            lambda: store.get_days(doctor, days_ahead=7), repeat=repeat)))
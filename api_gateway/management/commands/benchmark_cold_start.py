@@ -0,0 +1,90 @@
+"""
+Benchmark de cold start: import de api_gateway.views e primeiro uso dos serviços
+
+Cada medição roda em um interpretador novo (subprocesso), medindo:
+- django.setup()
+- import de api_gateway.views (antes construía Gemini, WhatsApp, Calendar e
+  TokenMonitor no import; agora só cria proxies do container)
+- primeiro uso dos serviços sem aquecimento (construção na primeira requisição)
+- primeiro uso após o aquecimento em segundo plano (services.warm_up)
+- construção completa de todos os serviços (custo que antes ficava no import)
+
+Uso:
+    python manage.py benchmark_cold_start
+    python manage.py benchmark_cold_start --runs 10
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Serviços medidos (o aquecimento do catálogo depende do banco e fica de fora)
+SERVICES = ('genai', 'token_monitor', 'whatsapp', 'google_calendar', 'gemini_chatbot')
+
+SCRIPT = r'''
+import json, os, sys, time
+mode = sys.argv[1]
+timings = {}
+
+start = time.perf_counter()
+import django
+django.setup()
+timings['setup'] = time.perf_counter() - start
+
+start = time.perf_counter()
+import api_gateway.views as views
+timings['import_views'] = time.perf_counter() - start
+
+from api_gateway.services.container import services
+services_to_build = json.loads(sys.argv[2])
+
+if mode == 'warm':
+    # Servidor ocioso entre a subida e a primeira requisição
+    services.warm_up(services_to_build).join()
+
+start = time.perf_counter()
+if mode == 'eager':
+    for name in services_to_build:
+        services.get(name)
+else:
+    views.gemini_chatbot_service.enabled
+    views.whatsapp_service.api_url
+timings['first_use'] = time.perf_counter() - start
+print(json.dumps({key: value * 1000 for key, value in timings.items()}))
+'''
+
+
+class Command(BaseCommand):
+    help = 'Mede o tempo de import de api_gateway.views e do primeiro uso dos serviços (interpretador novo)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help='Subprocessos por cenário')
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'core.settings'),
+                   SERVICES_WARMUP='False', LOG_ASYNC='False')
+        scenarios = [
+            ('sob demanda (primeira requisição constrói)', 'lazy'),
+            ('com aquecimento em segundo plano', 'warm'),
+            ('construção completa (custo antes no import)', 'eager'),
+        ]
+
+        self.stdout.write(f"🧊 {options['runs']} interpretadores novos por cenário (mediana, ms)")
+        self.stdout.write(f"{'cenário':<46} {'setup':>8} {'import views':>13} {'1º uso':>9}")
+        for label, mode in scenarios:
+            runs = [self._run(mode, env) for _ in range(options['runs'])]
+            median = {key: statistics.median(run[key] for run in runs) for key in ('setup', 'import_views', 'first_use')}
+            self.stdout.write(f"{label:<46} {median['setup']:>8.0f} {median['import_views']:>13.0f} "
+                              f"{median['first_use']:>9.0f}")
+
+    def _run(self, mode, env):
+        result = subprocess.run(
+            [sys.executable, '-c', SCRIPT, mode, json.dumps(SERVICES)],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=True,
+        )
+        return json.loads(result.stdout.strip().splitlines()[-1])
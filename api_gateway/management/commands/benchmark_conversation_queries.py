@@ -0,0 +1,162 @@
+"""
+Benchmark das consultas quentes das tabelas de conversa
+
+Popula um banco SQLite temporário (padrão: 100k sessões / 1M mensagens) e mede,
+sem e com os índices compostos, o plano (EXPLAIN) e a latência de:
+- histórico da sessão (últimas mensagens)
+- listagem do admin (sessões por atividade, com e sem filtro de estado)
+- varredura de sessões inativas (stale)
+
+Uso:
+    python manage.py benchmark_conversation_queries
+    python manage.py benchmark_conversation_queries --sessions 10000 --messages 100000
+"""
+
+import random
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+
+from api_gateway.models import ConversationMessage, ConversationSession
+from core.benchmark import format_stats, measure, temporary_database
+
+STATES = [choice for choice, _ in ConversationSession._meta.get_field('current_state').choices]
+
+
+class Command(BaseCommand):
+    help = 'Mede planos e latência das consultas de conversa sem e com índices compostos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sessions', type=int, default=100_000, help='Sessões a gerar')
+        parser.add_argument('--messages', type=int, default=1_000_000, help='Mensagens a gerar')
+        parser.add_argument('--repeat', type=int, default=200, help='Execuções por consulta')
+        parser.add_argument('--seed', type=int, default=42, help='Semente do gerador aleatório')
+        parser.add_argument('--path', default=None, help='Arquivo SQLite (temporário se omitido)')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.now = timezone.now()
+
+        with temporary_database('benchmark', path=options['path']) as alias:
+            self.stdout.write(f"🌱 Populando {options['sessions']:,} sessões / {options['messages']:,} mensagens...")
+            self._seed(alias, options['sessions'], options['messages'])
+
+            self._drop_indexes(alias)
+            self._run_phase(alias, 'SEM índices compostos', options['repeat'])
+
+            self._create_indexes(alias)
+            self._run_phase(alias, 'COM índices compostos', options['repeat'])
+
+    def _seed(self, alias, total_sessions, total_messages):
+        """Insere linhas via executemany (ordens de grandeza mais rápido que bulk_create)"""
+        connection = connections[alias]
+        ops = connection.ops
+        session_table = ConversationSession._meta.db_table
+        message_table = ConversationMessage._meta.db_table
+
+        with connection.cursor() as cursor:
+            rows = []
+            for index in range(total_sessions):
+                last_activity = self.now - timedelta(minutes=self.rng.randint(0, 60 * 24 * 30))
+                created_at = last_activity - timedelta(minutes=self.rng.randint(1, 120))
+                rows.append((
+                    f'55{index:011d}', f'Paciente {index}', False, self.rng.choice(STATES),
+                    ops.adapt_datetimefield_value(created_at),
+                    ops.adapt_datetimefield_value(last_activity),
+                    ops.adapt_datetimefield_value(last_activity),
+                ))
+            cursor.executemany(
+                f'INSERT INTO "{session_table}" (phone_number, patient_name, name_confirmed, current_state, '
+                f'created_at, updated_at, last_activity) VALUES (%s, %s, %s, %s, %s, %s, %s)',
+                rows
+            )
+
+            cursor.execute(f'SELECT id FROM "{session_table}"')
+            session_ids = [row[0] for row in cursor.fetchall()]
+
+            batch = []
+            for index in range(total_messages):
+                timestamp = self.now - timedelta(seconds=self.rng.randint(0, 60 * 60 * 24 * 30))
+                batch.append((
+                    self.rng.choice(session_ids), 'user' if index % 2 == 0 else 'bot',
+                    f'Mensagem {index}', 'saudacao', 1.0, '{}',
+                    ops.adapt_datetimefield_value(timestamp),
+                ))
+                if len(batch) >= 50_000:
+                    self._insert_messages(cursor, message_table, batch)
+                    batch = []
+            if batch:
+                self._insert_messages(cursor, message_table, batch)
+
+        self.session_ids = session_ids
+
+    def _insert_messages(self, cursor, table, rows):
+        cursor.executemany(
+            f'INSERT INTO "{table}" (session_id, message_type, content, intent, confidence, entities, timestamp) '
+            f'VALUES (%s, %s, %s, %s, %s, %s, %s)',
+            rows
+        )
+
+    def _composite_indexes(self):
+        return [
+            (model, index)
+            for model in (ConversationSession, ConversationMessage)
+            for index in model._meta.indexes
+        ]
+
+    def _drop_indexes(self, alias):
+        with connections[alias].schema_editor() as editor:
+            for model, index in self._composite_indexes():
+                editor.remove_index(model, index)
+        self._analyze(alias)
+
+    def _create_indexes(self, alias):
+        with connections[alias].schema_editor() as editor:
+            for model, index in self._composite_indexes():
+                editor.add_index(model, index)
+        self._analyze(alias)
+
+    def _analyze(self, alias):
+        with connections[alias].cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def _queries(self, alias):
+        """Consultas no mesmo formato usado pela aplicação e pelo sweeper"""
+        stale_cutoff = self.now - timedelta(hours=24)
+
+        def history():
+            session_id = self.rng.choice(self.session_ids)
+            return ConversationMessage.objects.using(alias).filter(
+                session_id=session_id
+            ).order_by('-timestamp')[:10]
+
+        def admin_listing():
+            return ConversationSession.objects.using(alias).order_by('-last_activity')[:100]
+
+        def admin_listing_by_state():
+            return ConversationSession.objects.using(alias).filter(
+                current_state=self.rng.choice(STATES)
+            ).order_by('-last_activity')[:100]
+
+        def stale_sessions():
+            return ConversationSession.objects.using(alias).filter(
+                last_activity__lt=stale_cutoff
+            ).order_by('last_activity').values_list('id', flat=True)[:500]
+
+        return [
+            ('histórico da sessão', history),
+            ('admin: listagem por atividade', admin_listing),
+            ('admin: filtro por estado', admin_listing_by_state),
+            ('sessões inativas (lote do sweeper)', stale_sessions),
+        ]
+
+    def _run_phase(self, alias, title, repeat):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\n=== {title} ==='))
+        for label, build_queryset in self._queries(alias):
+            plan = build_queryset().explain()
+            stats = measure(lambda: list(build_queryset()), repeat=repeat)
+            self.stdout.write(format_stats(label, stats))
+            for line in plan.splitlines():
+                self.stdout.write(f'    {line}')
@@ -0,0 +1,125 @@
+"""
+Benchmark: catálogo e conversas no mesmo banco x em bancos separados
+
+Threads escritoras gravam mensagens/sessões (como o webhook) enquanto threads
+leitoras consultam o catálogo (médicos + especialidades). Compara a latência
+das leituras e os erros de "database is locked" com um único arquivo SQLite e
+com o setup de dois arquivos (ver core/db_router.py).
+
+Uso:
+    python manage.py benchmark_database_split --seconds 5 --writers 4 --readers 4
+"""
+
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+from django.utils import timezone
+
+from api_gateway.models import ConversationMessage, ConversationSession
+from core.benchmark import temporary_database
+from rag_agent.models import Especialidade, Medico
+
+
+class Command(BaseCommand):
+    help = 'Compara leituras do catálogo sob escrita de conversas: um banco x dois bancos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=5.0, help='Duração de cada cenário')
+        parser.add_argument('--writers', type=int, default=4, help='Threads escritoras')
+        parser.add_argument('--readers', type=int, default=4, help='Threads leitoras')
+
+    def handle(self, *args, **options):
+        with temporary_database('bench_single', fast_io=False) as single:
+            self._seed(single, single)
+            self._report('UM arquivo (catálogo + conversas)', self._run(single, single, options))
+
+        with temporary_database('bench_catalog', fast_io=False) as catalog, \
+                temporary_database('bench_conversations', fast_io=False) as conversations:
+            self._seed(catalog, conversations)
+            self._report('DOIS arquivos (catálogo | conversas)', self._run(catalog, conversations, options))
+
+    def _seed(self, catalog_alias, conversations_alias):
+        especialidades = [
+            Especialidade.objects.using(catalog_alias).create(nome=f'Especialidade {index}')
+            for index in range(5)
+        ]
+        for index in range(20):
+            medico = Medico.objects.using(catalog_alias).create(nome=f'Dr. Médico {index}', crm=f'CRM{index}')
+            medico.especialidades.add(especialidades[index % len(especialidades)])
+        for index in range(100):
+            ConversationSession.objects.using(conversations_alias).create(phone_number=f'5511{index:07d}')
+
+    def _run(self, catalog_alias, conversations_alias, options):
+        stop_at = time.perf_counter() + options['seconds']
+        read_latencies, write_count, errors = [], [0], [0]
+        lock = threading.Lock()
+
+        def reader():
+            try:
+                while time.perf_counter() < stop_at:
+                    start = time.perf_counter()
+                    try:
+                        list(Medico.objects.using(catalog_alias).prefetch_related('especialidades'))
+                    except OperationalError:
+                        with lock:
+                            errors[0] += 1
+                        continue
+                    with lock:
+                        read_latencies.append((time.perf_counter() - start) * 1000)
+            finally:
+                connections.close_all()
+
+        def writer(worker):
+            try:
+                session_ids = list(
+                    ConversationSession.objects.using(conversations_alias).values_list('id', flat=True)
+                )
+                counter = 0
+                while time.perf_counter() < stop_at:
+                    session_id = session_ids[(worker + counter) % len(session_ids)]
+                    counter += 1
+                    try:
+                        with transaction.atomic(using=conversations_alias):
+                            ConversationMessage.objects.using(conversations_alias).create(
+                                session_id=session_id, message_type='user', content='Olá'
+                            )
+                            ConversationSession.objects.using(conversations_alias).filter(pk=session_id).update(
+                                last_activity=timezone.now()
+                            )
+                    except OperationalError:
+                        with lock:
+                            errors[0] += 1
+                        continue
+                    with lock:
+                        write_count[0] += 1
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=reader) for _ in range(options['readers'])]
+        threads += [threading.Thread(target=writer, args=(index,)) for index in range(options['writers'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        read_latencies.sort()
+        return {
+            'reads': len(read_latencies),
+            'writes': write_count[0],
+            'errors': errors[0],
+            'p50': statistics.median(read_latencies) if read_latencies else 0.0,
+            'p95': read_latencies[int(len(read_latencies) * 0.95)] if read_latencies else 0.0,
+            'seconds': options['seconds'],
+        }
+
+    def _report(self, title, result):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\n=== {title} ==='))
+        self.stdout.write(
+            f"Leituras do catálogo: {result['reads'] / result['seconds']:.0f}/s "
+            f"(p50={result['p50']:.2f}ms p95={result['p95']:.2f}ms)"
+        )
+        self.stdout.write(f"Escritas de conversa: {result['writes'] / result['seconds']:.0f}/s")
+        self.stdout.write(f"Erros 'database is locked': {result['errors']}")
@@ -0,0 +1,70 @@
+"""
+Benchmark do interpretador de datas e horários (api_gateway/services/datetime_parser.py)
+
+Mede a vazão de parse_date e parse_time com expressões típicas das conversas
+("amanhã", "sexta que vem", "25/10", "às 14h30") e com as datas DD/MM/YYYY da
+disponibilidade do calendário:
+- sem memória (cada chamada interpreta o texto)
+- com a memória LRU (texto, hoje), com a taxa de acertos
+- strptime('%d/%m/%Y'), usado antes nas listas de dias, como referência
+
+Uso:
+    python manage.py benchmark_datetime_parser
+    python manage.py benchmark_datetime_parser --calls 200000
+"""
+
+import random
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api_gateway.services import datetime_parser
+
+DATE_EXPRESSIONS = [
+    'hoje', 'amanhã', 'depois de amanhã', 'segunda', 'terça-feira', 'sexta que vem', 'próxima quarta',
+    '25/10', '25/10/2026', '2026-10-25', '25 de outubro', 'Sexta (10/10/2025)', 'dia 20', '20',
+]
+TIME_EXPRESSIONS = ['14:30', 'às 14h30', '14h', '14 horas', '2 da tarde', '9', 'as 9', '08:00:00', '2:30 PM']
+
+
+class Command(BaseCommand):
+    help = 'Mede a vazão do interpretador de datas e horários em português, com e sem memória'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--calls', type=int, default=100000, help='Chamadas por cenário')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        calls = options['calls']
+        today = timezone.localdate()
+        calendar_days = [(today + timedelta(days=offset)).strftime('%d/%m/%Y') for offset in range(14)]
+
+        dates = [rng.choice(DATE_EXPRESSIONS) for _ in range(calls)]
+        times = [rng.choice(TIME_EXPRESSIONS) for _ in range(calls)]
+        days = [rng.choice(calendar_days) for _ in range(calls)]
+
+        uncached_date = datetime_parser._parse_date_text.__wrapped__
+        uncached_time = datetime_parser._parse_time_text.__wrapped__
+        datetime_parser.clear_cache()
+
+        self._report('parse_date sem memória', lambda: [uncached_date(text, today) for text in dates], calls)
+        self._report('parse_date com memória', lambda: [datetime_parser.parse_date(text) for text in dates], calls)
+        self._report('parse_time sem memória', lambda: [uncached_time(text) for text in times], calls)
+        self._report('parse_time com memória', lambda: [datetime_parser.parse_time(text) for text in times], calls)
+        self._report("strptime('%d/%m/%Y') (dias)",
+                     lambda: [datetime.strptime(text, '%d/%m/%Y').date() for text in days], calls)
+        self._report('parse_date (dias)', lambda: [datetime_parser.parse_date(text, today) for text in days], calls)
+
+        for name, info in datetime_parser.cache_info().items():
+            total = info['hits'] + info['misses']
+            self.stdout.write(f"memória de {name:<5} {info['currsize']:>5} entradas, "
+                              f"{100 * info['hits'] / total if total else 0:.1f}% de acertos")
+
+    def _report(self, label, func, calls):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f"{label:<32} {elapsed * 1000:>8.1f}ms {calls / elapsed:>12,.0f} chamadas/s")
@@ -0,0 +1,164 @@
+"""
+Benchmark da codificação JSON: json padrão x orjson (core/json_codec.py)
+
+Mede, com payloads reais do WhatsApp Cloud API e respostas do catálogo:
+- parsing do webhook (mensagem de texto, status de entrega, lote com várias mensagens)
+- renderização das respostas da API (JSONRenderer do DRF x FastJSONRenderer)
+- serialização dos logs indentados (JSONFormatter)
+
+Também confere que o FastJSONRenderer produz o mesmo JSON que o renderer padrão.
+
+Uso:
+    python manage.py benchmark_json_codec
+    python manage.py benchmark_json_codec --doctors 1000 --repeat 500
+"""
+
+import datetime
+import decimal
+import json
+import random
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from core import json_codec
+from core.benchmark import format_stats, measure
+from core.drf_json import FastJSONRenderer
+
+
+def text_message_payload(index: int = 0, text: str = 'Olá, gostaria de agendar uma consulta com o Dr. Gustavo') -> dict:
+    """Webhook de mensagem de texto no formato do WhatsApp Cloud API"""
+    return {
+        'object': 'whatsapp_business_account',
+        'entry': [{
+            'id': '102290129340398',
+            'changes': [{
+                'value': {
+                    'messaging_product': 'whatsapp',
+                    'metadata': {'display_phone_number': '15550783881', 'phone_number_id': '106540352242922'},
+                    'contacts': [{'profile': {'name': 'Paciente Teste'}, 'wa_id': f'55119{index:08d}'}],
+                    'messages': [{
+                        'from': f'55119{index:08d}',
+                        'id': f'wamid.HBgLMTY1MDM4Nzk0MzkVAgASGBQzQTRBNjU5OUFFRTAzODEwMTQ0RgA{index}=',
+                        'timestamp': '1749416383',
+                        'type': 'text',
+                        'text': {'body': text},
+                    }],
+                },
+                'field': 'messages',
+            }],
+        }],
+    }
+
+
+def status_payload(index: int = 0) -> dict:
+    """Webhook de status de entrega"""
+    return {
+        'object': 'whatsapp_business_account',
+        'entry': [{
+            'id': '102290129340398',
+            'changes': [{
+                'value': {
+                    'messaging_product': 'whatsapp',
+                    'metadata': {'display_phone_number': '15550783881', 'phone_number_id': '106540352242922'},
+                    'statuses': [{
+                        'id': f'wamid.HBgLMTY1MDM4Nzk0MzkVAgARGBI4QzNGRjY2RkE0NjA3MUU0RUQA{index}',
+                        'status': 'delivered',
+                        'timestamp': '1749416390',
+                        'recipient_id': f'55119{index:08d}',
+                        'conversation': {'id': 'd8f4b8f7e6a3c2b1', 'origin': {'type': 'service'}},
+                        'pricing': {'billable': True, 'pricing_model': 'CBP', 'category': 'service'},
+                    }],
+                },
+                'field': 'messages',
+            }],
+        }],
+    }
+
+
+def batch_payload(size: int) -> dict:
+    """Lote com várias mensagens em um único webhook"""
+    payload = text_message_payload()
+    value = payload['entry'][0]['changes'][0]['value']
+    value['messages'] = [text_message_payload(index)['entry'][0]['changes'][0]['value']['messages'][0]
+                         for index in range(size)]
+    return payload
+
+
+class Command(BaseCommand):
+    help = 'Compara json padrão e orjson em webhooks do WhatsApp e respostas do catálogo'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctors', type=int, default=300, help='Médicos na resposta do catálogo')
+        parser.add_argument('--exams', type=int, default=200, help='Exames na resposta do catálogo')
+        parser.add_argument('--repeat', type=int, default=300, help='Execuções por medição')
+        parser.add_argument('--seed', type=int, default=42, help='Semente do gerador aleatório')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        repeat = options['repeat']
+        stdlib = json_codec.get_codec('stdlib')
+        fast = json_codec.get_codec('auto')
+        self.stdout.write(f"📦 Implementação rápida: {fast.name} (orjson instalado: {json_codec.ORJSON_AVAILABLE})")
+
+        self.stdout.write(self.style.MIGRATE_HEADING('\n=== Parsing do webhook ==='))
+        webhooks = {
+            'texto': text_message_payload(),
+            'status': status_payload(),
+            'lote (20 mensagens)': batch_payload(20),
+        }
+        for label, payload in webhooks.items():
+            body = json.dumps(payload).encode('utf-8')
+            self._compare(f'{label} ({len(body)} B)', repeat,
+                          lambda: json.loads(body.decode('utf-8')), lambda: fast.loads(body))
+
+        self.stdout.write(self.style.MIGRATE_HEADING('\n=== Renderização de respostas do catálogo ==='))
+        medicos, exames = self._catalog(rng, options['doctors'], options['exams'])
+        standard_renderer, fast_renderer = JSONRenderer(), FastJSONRenderer()
+        for label, data in (('/medicos/', medicos), ('/exames/', exames)):
+            expected = standard_renderer.render(data)
+            rendered = fast_renderer.render(data)
+            equal = json.loads(expected) == json.loads(rendered)
+            self._compare(f'{label} ({len(expected) / 1024:.0f} KB, igual={equal})', max(repeat // 5, 10),
+                          lambda: standard_renderer.render(data), lambda: fast_renderer.render(data))
+
+        self.stdout.write(self.style.MIGRATE_HEADING('\n=== Logs indentados (JSONFormatter) ==='))
+        payload = text_message_payload()
+        self._compare('webhook indentado', repeat,
+                      lambda: stdlib.dumps(payload, indent=True), lambda: fast.dumps(payload, indent=True))
+
+    def _compare(self, label, repeat, baseline, candidate):
+        before = measure(baseline, repeat=repeat)
+        after = measure(candidate, repeat=repeat)
+        self.stdout.write(f"{label}")
+        self.stdout.write('  ' + format_stats('json padrão', before))
+        self.stdout.write('  ' + format_stats('rápido', after))
+        self.stdout.write(f"  ⚡ {before['p50'] / after['p50']:.1f}x")
+
+    def _catalog(self, rng, total_doctors, total_exams):
+        """Estruturas no formato de MedicoResumoSerializer/ExameSerializer (com Decimal e datas)"""
+        medicos = [
+            {
+                'id': index,
+                'nome': f'Dr. Médico {index:04d}',
+                'crm': f'CRM{index}',
+                'especialidades_display': 'Pneumologia, Medicina do Sono',
+                'preco_particular': decimal.Decimal(rng.choice(['250.00', '350.00', '420.50'])),
+            }
+            for index in range(total_doctors)
+        ]
+        exames = [
+            {
+                'id': index,
+                'nome': f'Exame {index:04d}',
+                'o_que_e': 'Exame que avalia a respiração durante o sono. ' * 4,
+                'como_funciona': 'O paciente dorme monitorado por sensores. ' * 6,
+                'preparacao': 'Evitar cafeína e álcool no dia do exame. ' * 2,
+                'vantagem': None,
+                'preco': decimal.Decimal('480.00'),
+                'duracao_estimada': datetime.timedelta(hours=8),
+                'atualizado_em': datetime.datetime(2025, 1, 1, 10, 30, tzinfo=datetime.timezone.utc),
+            }
+            for index in range(total_exams)
+        ]
+        return medicos, exames
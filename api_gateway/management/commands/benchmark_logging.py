@@ -0,0 +1,138 @@
+"""
+Benchmark do custo de logging por turno de conversa (core/log_pipeline.py)
+
+Simula as linhas de log de um turno (sessão, intent, entidades, tokens do
+Gemini, conversa) e mede o tempo gasto na thread da requisição em:
+- síncrono + f-strings (comportamento anterior: 3 linhas por chamada ao Gemini)
+- fila (QueueLogHandler) + argumentos %-style, saída colorida e JSON
+- fila + amostragem dos loggers de alto volume
+
+A escrita vai para um arquivo temporário (como um log em disco).
+
+Uso:
+    python manage.py benchmark_logging
+    python manage.py benchmark_logging --turns 2000 --sample-rate 0.1
+"""
+
+import logging
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.benchmark import format_stats, measure
+from core.log_pipeline import JSONLogFormatter, QueueLogHandler, SamplingFilter
+
+LOGGER_PREFIX = 'benchmark_logging'
+HIGH_VOLUME = f'{LOGGER_PREFIX}.gemini'
+
+
+def _session():
+    return {
+        'phone_number': '5511999990000', 'current_state': 'choosing_schedule', 'previous_state': None,
+        'patient_name': 'Maria Souza', 'selected_doctor': 'Dr. Gustavo Magno',
+        'selected_specialty': 'Pneumologia', 'preferred_date': '2025-06-12', 'preferred_time': '14:30',
+        'suggested_doctors': ['Dr. Gustavo Magno', 'Dra. Ana Lima', 'Dr. Paulo Reis'],
+    }
+
+
+def eager_turn(loggers, session, entities):
+    """Linhas de um turno como eram antes (f-strings, 3 linhas de tokens por chamada)"""
+    views, core, manager, tokens, conversation = loggers
+    views.info(f"🔄 Processando mensagem wamid.123 de {session['phone_number']}")
+    views.info(f"👤 USUÁRIO ({session['phone_number']}): Quero marcar às 14:30")
+    core.info(f"📊 Estado atual da sessão: {session.get('current_state')}")
+    core.info(f"🔍 Intent detectado: agendar_consulta, Confiança: {0.92}")
+    core.info(f"📦 Entidades extraídas: {entities}")
+    manager.info(f"🔍 Entidades extraídas: {entities}")
+    manager.info(f"📋 Status das informações: { {key: bool(value) for key, value in session.items()} }")
+    manager.info(f"📋 Sessão atualizada - Estado: {session['current_state']}, Nome: {session.get('patient_name')}, "
+                 f"Médico: {session.get('selected_doctor')}")
+    for operation in ('intent', 'entities', 'response'):
+        tokens.info(f"📊 TOKENS - {operation}: Input={1834:,}, Output={212:,}, Total={2046:,}")
+        tokens.info(f"📊 SESSÃO {session['phone_number']}: Total={2046:,}, Acumulado={9120:,}")
+        tokens.info(f"📊 DIA: Total={120400:,}, Limite={1500000:,}, Uso={8.0:.1f}%")
+    views.info(f"🤖 [AGENDAR_CONSULTA] State: {session['current_state']} | Conf: {0.92:.2f} | Agent: gemini")
+    conversation.info(f"💬 {session['phone_number']} → Quero marcar às 14:30")
+    conversation.info(f"🤖 GEMINI → Perfeito, {session['patient_name']}! Confirmo 12/06 às 14:30.")
+
+
+def lazy_turn(loggers, session, entities):
+    """Mesmo turno com argumentos %-style e uma linha de tokens por chamada"""
+    views, core, manager, tokens, conversation = loggers
+    views.info("🔄 Processando mensagem %s de %s", 'wamid.123', session['phone_number'])
+    views.info("👤 USUÁRIO (%s): %s", session['phone_number'], 'Quero marcar às 14:30')
+    core.info("📊 Estado atual da sessão: %s", session.get('current_state'))
+    core.info("🔍 Intent detectado: %s, Confiança: %s", 'agendar_consulta', 0.92)
+    core.info("📦 Entidades extraídas: %s", entities)
+    manager.info("🔍 Entidades extraídas: %s", entities)
+    manager.info("📋 Status das informações: %s", session)
+    manager.info("📋 Sessão atualizada - Estado: %s, Nome: %s, Médico: %s",
+                 session['current_state'], session.get('patient_name'), session.get('selected_doctor'))
+    for operation in ('intent', 'entities', 'response'):
+        tokens.info("📊 TOKENS - %s: Input=%d, Output=%d, Total=%d | Sessão %s: %s | Dia: %d/%d (%.1f%%)",
+                    operation, 1834, 212, 2046, session['phone_number'], 9120, 120400, 1500000, 8.0,
+                    extra={'operation': operation, 'input_tokens': 1834, 'output_tokens': 212})
+    views.info("🤖 [%s] State: %s | Conf: %.2f | Agent: %s", 'AGENDAR_CONSULTA', session['current_state'], 0.92, 'gemini')
+    conversation.info("💬 %s → %s", session['phone_number'], 'Quero marcar às 14:30')
+    conversation.info("🤖 GEMINI → %s", f"Perfeito, {session['patient_name']}! Confirmo 12/06 às 14:30.")
+
+
+class Command(BaseCommand):
+    help = 'Mede o custo de logging por turno: síncrono x fila, colorido x JSON, com e sem amostragem'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--turns', type=int, default=1000, help='Turnos simulados por cenário')
+        parser.add_argument('--sample-rate', type=float, default=0.1,
+                            help='Fração mantida dos loggers de alto volume no cenário com amostragem')
+
+    def handle(self, *args, **options):
+        turns = options['turns']
+        session = _session()
+        entities = {'medico': 'Dr. Gustavo Magno', 'data': '12/06', 'horario': '14:30', 'especialidade': None}
+        colored = settings.LOGGING['formatters']['colored']
+        colored_formatter = colored['()'](colored['format'], colored['datefmt'])
+
+        scenarios = [
+            ('síncrono + f-strings (anterior)', False, colored_formatter, None, eager_turn),
+            ('síncrono + %-style', False, colored_formatter, None, lazy_turn),
+            ('fila + %-style (colorido)', True, colored_formatter, None, lazy_turn),
+            ('fila + %-style (JSON)', True, JSONLogFormatter(), None, lazy_turn),
+            (f'fila + amostragem {options["sample_rate"]:.0%}', True, JSONLogFormatter(),
+             {HIGH_VOLUME: options['sample_rate']}, lazy_turn),
+        ]
+
+        self.stdout.write(f"📝 {turns} turnos por cenário (tempo na thread da requisição, por turno)")
+        baseline = None
+        for label, use_queue, formatter, rates, turn in scenarios:
+            with tempfile.TemporaryFile('w+', encoding='utf-8') as output:
+                handler = QueueLogHandler(output) if use_queue else logging.StreamHandler(output)
+                handler.setFormatter(formatter)
+                if rates:
+                    handler.addFilter(SamplingFilter(rates))
+                loggers = self._loggers(handler)
+
+                stats = measure(lambda: turn(loggers, session, entities), repeat=turns)
+                drain_start = time.perf_counter()
+                handler.close()
+                drain_ms = (time.perf_counter() - drain_start) * 1000
+                output.seek(0)
+                lines = sum(1 for _ in output)
+
+            baseline = baseline or stats
+            drained = f" | fila drenada em {drain_ms:.0f}ms" if use_queue else ''
+            self.stdout.write(format_stats(label, stats) + f" | {lines} linhas{drained} | "
+                              f"⚡ {baseline['p50'] / stats['p50']:.1f}x")
+
+    def _loggers(self, handler):
+        """Loggers isolados (sem propagação) com o handler do cenário"""
+        names = ('views', 'gemini.core_service', 'gemini.session_manager', 'gemini.token_monitor', 'conversation')
+        loggers = []
+        for name in names:
+            logger = logging.getLogger(f'{LOGGER_PREFIX}.{name}')
+            logger.handlers = [handler]
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            loggers.append(logger)
+        return loggers
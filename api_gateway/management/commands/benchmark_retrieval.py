@@ -0,0 +1,218 @@
+"""
+Benchmark da recuperação de trechos do catálogo para os prompts
+
+Popula um banco SQLite temporário com um catálogo sintético e compara, para
+mensagens com alvo conhecido (um médico ou uma especialidade citada por sinônimo):
+- catálogo completo: todos os médicos e especialidades no prompt
+- recorte fixo: primeiros 5 itens de cada lista (comportamento anterior)
+- recuperação: top-k trechos BM25 + listas priorizadas por relevância
+
+Mede tokens estimados do contexto (token_monitor.estimate_tokens), taxa de acerto
+(o alvo aparece no contexto), latência da recuperação e o tamanho dos prompts reais
+de resposta e de extração de entidades.
+
+Uso:
+    python manage.py benchmark_retrieval
+    python manage.py benchmark_retrieval --doctors 1000 --specialties 60 --queries 200
+"""
+
+import random
+import statistics
+
+from django.core.management.base import BaseCommand
+
+from api_gateway.services.gemini.entity_extractor import EntityExtractor
+from api_gateway.services.gemini.response_generator import ResponseGenerator
+from api_gateway.services.retrieval_service import retrieval_service
+from api_gateway.services.token_monitor import token_monitor
+from core.benchmark import format_stats, measure, temporary_database
+from rag_agent import retrieval
+from rag_agent.models import Especialidade, Exame, Medico
+from rag_agent.serializers import EspecialidadeSerializer, MedicoResumoSerializer
+
+FIRST_NAMES = ['Gustavo', 'Renata', 'João', 'Maria', 'Paulo', 'Ana', 'Carlos', 'Beatriz', 'Felipe', 'Larissa']
+SURNAMES = ['Magno', 'Alves', 'Souza', 'Pereira', 'Lima', 'Costa', 'Ribeiro', 'Carvalho', 'Gomes', 'Martins',
+            'Rocha', 'Barbosa', 'Teixeira', 'Moreira', 'Cardoso', 'Mendes', 'Freitas', 'Nunes', 'Vieira', 'Dias']
+SYMPTOMS = ['falta de ar', 'ronco', 'tosse crônica', 'dor no peito', 'coceira', 'tontura', 'dor de cabeça',
+            'insônia', 'azia', 'dor nas costas', 'manchas na pele', 'pressão alta', 'rinite', 'cansaço',
+            'palpitação', 'zumbido', 'refluxo', 'enxaqueca', 'dor no joelho', 'queda de cabelo']
+FILLER = ('atendimento humanizado experiência anos formação residência hospital universidade '
+          'acompanhamento pacientes adultos crianças diagnóstico tratamento prevenção').split()
+
+
+class Command(BaseCommand):
+    help = 'Compara tokens, acerto e latência: catálogo completo x recorte fixo x recuperação top-k'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctors', type=int, default=300, help='Médicos a gerar')
+        parser.add_argument('--specialties', type=int, default=40, help='Especialidades a gerar')
+        parser.add_argument('--exams', type=int, default=200, help='Exames a gerar')
+        parser.add_argument('--queries', type=int, default=100, help='Mensagens de teste')
+        parser.add_argument('--top-k', type=int, default=None, help='Trechos por prompt (padrão: RETRIEVAL_TOP_K)')
+        parser.add_argument('--repeat', type=int, default=20, help='Execuções por medição de latência')
+        parser.add_argument('--seed', type=int, default=42, help='Semente do gerador aleatório')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        top_k = options['top_k'] or retrieval_service.top_k
+
+        with temporary_database('bench_retrieval') as alias:
+            self.stdout.write(
+                f"🌱 Populando {options['specialties']} especialidades / {options['doctors']} médicos / "
+                f"{options['exams']} exames..."
+            )
+            self._seed(alias, options['specialties'], options['doctors'], options['exams'])
+            clinic_data = {
+                'clinica_info': {'nome': 'Clínica Benchmark'},
+                'especialidades': list(EspecialidadeSerializer(
+                    Especialidade.objects.using(alias).filter(ativa=True), many=True).data),
+                'medicos': list(MedicoResumoSerializer(
+                    Medico.objects.using(alias).prefetch_related('especialidades'), many=True).data),
+            }
+            queries = self._queries(alias, options['queries'])
+
+            # O índice global passa a ler o banco temporário durante o benchmark
+            index = retrieval.retrieval_index
+            original_alias = index.alias
+            index.alias = alias
+            index.invalidate()
+            try:
+                stats = measure(lambda: index.build(retrieval.collect_documents(alias)), repeat=1, warmup=0)
+                self.stdout.write(format_stats(f'construção ({index.backend_name}, {index.chunk_count()} trechos)', stats))
+                self._compare_contexts(clinic_data, queries, top_k)
+                self._measure_latency(index, queries, top_k, options['repeat'])
+                self._measure_prompts(clinic_data, queries[:20])
+            finally:
+                index.alias = original_alias
+                index.invalidate()
+
+    # ── Medições ───────────────────────────────────────────────────────────
+
+    def _compare_contexts(self, clinic_data, queries, top_k):
+        especialidades = clinic_data['especialidades']
+        medicos = clinic_data['medicos']
+
+        def doctor_lines(items):
+            return '\n'.join(f"{item['nome']} ({item['especialidades_display']})" for item in items)
+
+        def specialty_line(items):
+            return ', '.join(item['nome'] for item in items)
+
+        full_context = specialty_line(especialidades) + '\n' + doctor_lines(medicos)
+        sliced_context = specialty_line(especialidades[:5]) + '\n' + doctor_lines(medicos[:5])
+        sliced_ids = {('medico', item['id']) for item in medicos[:5]} | {('especialidade', item['id']) for item in especialidades[:5]}
+
+        retrieved_tokens, retrieved_hits, sliced_hits = [], 0, 0
+        for message, target in queries:
+            context = retrieval_service.get_context(message, k=top_k)
+            ranked_specialties = retrieval_service.prioritize(especialidades, context['especialidade_ids'])
+            ranked_doctors = retrieval_service.prioritize(medicos, context['medico_ids'])
+            text = '\n'.join([context['text'], specialty_line(ranked_specialties), doctor_lines(ranked_doctors)])
+            retrieved_tokens.append(token_monitor.estimate_tokens(text))
+
+            kind, target_id = target
+            retrieved_ids = context['medico_ids'] if kind == 'medico' else context['especialidade_ids']
+            retrieved_hits += target_id in retrieved_ids
+            sliced_hits += target in sliced_ids
+
+        total = len(queries)
+        self.stdout.write(self.style.MIGRATE_HEADING('\n=== Contexto do catálogo por prompt ==='))
+        self.stdout.write(f"{'catálogo completo':<28} tokens={token_monitor.estimate_tokens(full_context):>7,}  acerto=100.0%")
+        self.stdout.write(f"{'recorte fixo (5+5)':<28} tokens={token_monitor.estimate_tokens(sliced_context):>7,}  "
+                          f"acerto={100 * sliced_hits / total:.1f}%")
+        self.stdout.write(f"{f'recuperação (top-{top_k})':<28} tokens={statistics.fmean(retrieved_tokens):>7,.0f}  "
+                          f"acerto={100 * retrieved_hits / total:.1f}%  (média; máx. {max(retrieved_tokens):,})")
+
+    def _measure_latency(self, index, queries, top_k, repeat):
+        self.stdout.write(self.style.MIGRATE_HEADING('\n=== Latência da recuperação ==='))
+        messages = [message for message, _ in queries]
+
+        def run_all():
+            for message in messages:
+                index.search(message, k=top_k)
+
+        stats = measure(run_all, repeat=repeat)
+        per_query = {key: value / len(messages) for key, value in stats.items()}
+        self.stdout.write(format_stats(f'search ({index.backend_name}) por consulta', per_query))
+
+        if retrieval.NUMPY_AVAILABLE:
+            # Mesmo índice em Python puro para comparação
+            retrieval.NUMPY_AVAILABLE = False
+            try:
+                index.build(retrieval.collect_documents(index.alias))
+                stats = measure(run_all, repeat=repeat)
+                per_query = {key: value / len(messages) for key, value in stats.items()}
+                self.stdout.write(format_stats('search (python) por consulta', per_query))
+            finally:
+                retrieval.NUMPY_AVAILABLE = True
+                index.build(retrieval.collect_documents(index.alias))
+
+    def _measure_prompts(self, clinic_data, queries):
+        """Tamanho dos prompts reais (sem chamar o Gemini)"""
+        generator = ResponseGenerator()
+        extractor = EntityExtractor()
+        session = {'current_state': 'selecting_specialty', 'patient_name': 'Paciente Teste', 'has_greeted': True}
+        analysis = {'intent': 'buscar_info', 'confidence': 0.9, 'entities': {}}
+
+        response_tokens, extraction_tokens = [], []
+        for message, _ in queries:
+            prompt, _ = generator._build_response_prompt(message, analysis, session, [], clinic_data)
+            response_tokens.append(token_monitor.estimate_tokens(prompt))
+            prompt = extractor._build_entity_extraction_prompt(message, session, [], clinic_data)
+            extraction_tokens.append(token_monitor.estimate_tokens(prompt))
+
+        self.stdout.write(self.style.MIGRATE_HEADING('\n=== Prompts completos (tokens estimados, média) ==='))
+        self.stdout.write(f"{'resposta':<28} {statistics.fmean(response_tokens):,.0f}")
+        self.stdout.write(f"{'extração de entidades':<28} {statistics.fmean(extraction_tokens):,.0f}")
+
+    # ── Dados sintéticos ───────────────────────────────────────────────────
+
+    def _text(self, words):
+        return ' '.join(self.rng.choice(FILLER) for _ in range(words)).capitalize() + '.'
+
+    def _seed(self, alias, total_specialties, total_doctors, total_exams):
+        """Insere via bulk_create (não dispara os sinais dos índices globais)"""
+        especialidades = Especialidade.objects.using(alias).bulk_create([
+            Especialidade(
+                nome=f'Especialidade {index:03d}',
+                descricao=self._text(20),
+                sinonimos=', '.join(self.rng.sample(SYMPTOMS, 2)) + f', termo{index:03d}',
+                ativa=True,
+            )
+            for index in range(total_specialties)
+        ])
+        medicos = Medico.objects.using(alias).bulk_create([
+            Medico(
+                nome=f'Dr. {self.rng.choice(FIRST_NAMES)} {SURNAMES[index % len(SURNAMES)]}{index:04d}',
+                crm=f'CRM{index}',
+                bio=self._text(80),
+                formas_pagamento='Pix, cartão',
+                retorno_info='Retorno em 30 dias',
+            )
+            for index in range(total_doctors)
+        ])
+        Through = Medico.especialidades.through
+        Through.objects.using(alias).bulk_create([
+            Through(medico_id=medico.id, especialidade_id=self.rng.choice(especialidades).id)
+            for medico in medicos
+        ])
+        Exame.objects.using(alias).bulk_create([
+            Exame(nome=f'Exame {index:04d}', o_que_e=self._text(30), como_funciona=self._text(40),
+                  preparacao=self._text(20), preco=100)
+            for index in range(total_exams)
+        ])
+
+    def _queries(self, alias, total):
+        """Mensagens com alvo conhecido: metade cita um médico, metade um termo de especialidade"""
+        medicos = list(Medico.objects.using(alias).values_list('id', 'nome'))
+        especialidades = list(Especialidade.objects.using(alias).values_list('id', 'sinonimos'))
+        queries = []
+        for index in range(total):
+            if index % 2 == 0:
+                medico_id, nome = self.rng.choice(medicos)
+                queries.append((f"quero marcar com o {nome.split()[-1]}, ele atende quando?", ('medico', medico_id)))
+            else:
+                especialidade_id, sinonimos = self.rng.choice(especialidades)
+                termo = sinonimos.split(', ')[-1]
+                queries.append((f"preciso de um médico para {termo}, quem atende?", ('especialidade', especialidade_id)))
+        return queries
@@ -0,0 +1,113 @@
+"""
+Benchmark: serialização da sessão (dict + pickle/JSON x SessionState binário)
+
+Mede bytes por sessão e tempo de serialização/desserialização para sessões em
+diferentes pontos do fluxo (nova, no meio do agendamento, confirmando com
+lista de médicos sugeridos e snapshot do banco).
+
+Uso:
+    python manage.py benchmark_session_codec --repeat 2000
+"""
+
+import json
+import pickle
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api_gateway.services.session_persistence import SNAPSHOT_KEY
+from api_gateway.services.session_state import SessionState
+from core.benchmark import format_stats, measure
+
+
+def _sample_sessions():
+    """Sessões representativas (formato dict legado)"""
+    now = timezone.now()
+    new = {
+        'phone_number': '5511999990001',
+        'current_state': 'idle',
+        'previous_state': None,
+        'patient_name': None,
+        'pending_name': None,
+        'name_confirmed': False,
+        'selected_doctor': None,
+        'selected_specialty': None,
+        'preferred_date': None,
+        'preferred_time': None,
+        'insurance_type': None,
+        'created_at': now.isoformat(),
+        'last_activity': now.isoformat(),
+        'has_greeted': False,
+    }
+    mid_flow = {
+        **new,
+        'current_state': 'selecting_doctor',
+        'patient_name': 'Maria Aparecida da Silva',
+        'name_confirmed': True,
+        'has_greeted': True,
+        'selected_specialty': 'Pneumologia',
+        'last_activity': (now + timedelta(minutes=3)).isoformat(),
+        'last_response': 'Temos os seguintes médicos de Pneumologia: Dr. Gustavo e Dra. Renata. ' * 3,
+        'last_intent': 'buscar_medico',
+        'last_confidence': 0.92,
+        'last_suggested_doctors': ['Dr. Gustavo Magno', 'Dra. Renata Alves'],
+        'last_suggested_doctor': 'Dr. Gustavo Magno',
+        '_db_id': 1532,
+    }
+    confirming = {
+        **mid_flow,
+        'current_state': 'confirming',
+        'previous_state': 'choosing_schedule',
+        'selected_doctor': 'Dr. Gustavo Magno',
+        'preferred_date': '2025-11-18',
+        'preferred_time': '14:30:00',
+        'handoff_link': 'https://wa.me/5573988221003?text=' + 'Agendamento%20' * 20,
+        SNAPSHOT_KEY: {
+            'current_state': 'choosing_schedule',
+            'previous_state': None,
+            'patient_name': 'Maria Aparecida da Silva',
+            'pending_name': None,
+            'name_confirmed': True,
+            'insurance_type': None,
+            'selected_doctor': 'Dr. Gustavo Magno',
+            'selected_specialty': 'Pneumologia',
+            'preferred_date': '2025-11-18',
+            'preferred_time': None,
+            'additional_notes': None,
+        },
+    }
+    return [('nova', new), ('meio do fluxo', mid_flow), ('confirmando', confirming)]
+
+
+class Command(BaseCommand):
+    help = 'Compara tamanho e tempo de serialização da sessão: pickle, JSON e SessionState'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=2000, help='Execuções medidas por caso')
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+
+        for label, session in _sample_sessions():
+            state = SessionState(session)
+            codecs = [
+                ('dict + pickle',
+                 lambda: pickle.dumps(session, protocol=pickle.HIGHEST_PROTOCOL), pickle.loads),
+                ('dict + JSON',
+                 lambda: json.dumps(session, separators=(',', ':')).encode('utf-8'), json.loads),
+                ('SessionState binário', state.encode, SessionState.decode),
+            ]
+
+            self.stdout.write(self.style.MIGRATE_HEADING(f'\n=== Sessão: {label} ==='))
+            for name, encode, decode in codecs:
+                payload = encode()
+                self.stdout.write(f"{name:<24} {len(payload):>5} bytes")
+                self.stdout.write('  ' + format_stats('serializar', measure(encode, repeat=repeat)))
+                self.stdout.write('  ' + format_stats('desserializar', measure(lambda: decode(payload), repeat=repeat)))
+
+            # Leitura típica de um turno: desserializar e acessar os campos de data
+            self.stdout.write('  ' + format_stats(
+                'turno (decode + data como date)',
+                measure(lambda: SessionState.decode(state.encode()).preferred_date, repeat=repeat),
+            ))
@@ -0,0 +1,140 @@
+"""
+Benchmark multi-processo do store de sessões (L1 + L2)
+
+Simula W workers atendendo mensagens de P pacientes. A cada rodada cada paciente
+envia uma mensagem, atendida pelo mesmo worker da rodada anterior com
+probabilidade --stickiness (caso contrário por outro worker). Cada worker lê a
+sessão, incrementa um contador e grava de volta.
+
+Cenários:
+- LocMem por processo (comportamento original sem CACHES): leituras desatualizadas
+- Apenas L2 compartilhado (L1 desligado)
+- L1 + L2 compartilhado (invalidação por versão)
+
+O L2 compartilhado é um Redis (--redis-url) ou o fake em memória servido por um
+multiprocessing.Manager (cada operação atravessa IPC, como um round-trip de rede).
+
+Uso:
+    python manage.py benchmark_session_store --workers 4 --patients 200 --rounds 30
+"""
+
+import multiprocessing
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from api_gateway.services.session_store import (DjangoCacheSessionBackend,
+                                                InMemorySessionBackend,
+                                                RedisSessionBackend,
+                                                SessionStore)
+
+
+def _assignment(seed, round_index, patients, workers, stickiness, previous):
+    """Atribuição determinística paciente -> worker (igual em todos os processos)"""
+    rng = random.Random(seed * 100_003 + round_index)
+    assignment = []
+    for patient in range(patients):
+        if previous is not None and rng.random() < stickiness:
+            assignment.append(previous[patient])
+        else:
+            assignment.append(rng.randrange(workers))
+    return assignment
+
+
+def _worker(worker_id, scenario, shared, barrier, options, results):
+    """Processo worker: atende os pacientes atribuídos a ele em cada rodada"""
+    if scenario == 'locmem':
+        backend = DjangoCacheSessionBackend()
+    elif options['redis_url']:
+        backend = RedisSessionBackend(options['redis_url'])
+    else:
+        backend = InMemorySessionBackend(data=shared['data'], lock=shared['lock'])
+
+    l1_entries = 1024 if scenario == 'l1_l2' else 0
+    store = SessionStore(backend, l1_max_entries=l1_entries, key_prefix=f'bench_{scenario}_', timeout=600)
+
+    latencies, stale_reads = [], 0
+    assignment = None
+    for round_index in range(options['rounds']):
+        assignment = _assignment(
+            options['seed'], round_index, options['patients'], options['workers'], options['stickiness'], assignment
+        )
+        for patient, owner in enumerate(assignment):
+            if owner != worker_id:
+                continue
+            phone = f'5511{patient:07d}'
+            start = time.perf_counter()
+            session = store.get(phone) or {'phone_number': phone, 'turns': 0, 'current_state': 'idle'}
+            latencies.append((time.perf_counter() - start) * 1000)
+
+            # Cada paciente recebe exatamente uma mensagem por rodada
+            if session['turns'] != round_index:
+                stale_reads += 1
+            session['turns'] = round_index + 1
+            session['last_response'] = 'x' * 200
+            store.set(phone, session)
+        barrier.wait()
+
+    results.put({
+        'latencies': latencies,
+        'stale_reads': stale_reads,
+        'stats': dict(store.stats),
+    })
+
+
+class Command(BaseCommand):
+    help = 'Benchmark multi-processo do store de sessões (L1 versionado + L2 compartilhado)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--patients', type=int, default=200)
+        parser.add_argument('--rounds', type=int, default=30)
+        parser.add_argument('--stickiness', type=float, default=0.8,
+                            help='Probabilidade de o paciente cair no mesmo worker da rodada anterior')
+        parser.add_argument('--seed', type=int, default=7)
+        parser.add_argument('--redis-url', default=None, help='Usa Redis como L2 (requer pacote redis)')
+
+    def handle(self, *args, **options):
+        context = multiprocessing.get_context('fork')
+        scenarios = [
+            ('locmem', 'LocMem por processo (original)'),
+            ('l2_only', 'Apenas L2 compartilhado'),
+            ('l1_l2', 'L1 versionado + L2 compartilhado'),
+        ]
+        with context.Manager() as manager:
+            for scenario, title in scenarios:
+                shared = {'data': manager.dict(), 'lock': manager.Lock()}
+                barrier = context.Barrier(options['workers'])
+                results = context.Queue()
+                processes = [
+                    context.Process(target=_worker, args=(index, scenario, shared, barrier, options, results))
+                    for index in range(options['workers'])
+                ]
+                started = time.perf_counter()
+                for process in processes:
+                    process.start()
+                collected = [results.get() for _ in processes]
+                for process in processes:
+                    process.join()
+                elapsed = time.perf_counter() - started
+                self._report(title, collected, elapsed)
+
+    def _report(self, title, collected, elapsed):
+        latencies = sorted(latency for result in collected for latency in result['latencies'])
+        stale = sum(result['stale_reads'] for result in collected)
+        stats = {key: sum(result['stats'][key] for result in collected) for key in ('l1_hits', 'l2_hits', 'misses')}
+        lookups = sum(stats.values()) or 1
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\n=== {title} ==='))
+        self.stdout.write(
+            f"Leituras: {len(latencies)} em {elapsed:.2f}s | p50={statistics.median(latencies):.3f}ms "
+            f"p95={latencies[int(len(latencies) * 0.95)]:.3f}ms"
+        )
+        self.stdout.write(
+            f"L1 hits: {stats['l1_hits'] / lookups:.0%} | L2 hits: {stats['l2_hits'] / lookups:.0%} | "
+            f"misses: {stats['misses'] / lookups:.0%}"
+        )
+        style = self.style.ERROR if stale else self.style.SUCCESS
+        self.stdout.write(style(f"Leituras desatualizadas/vazias: {stale}"))
@@ -0,0 +1,88 @@
+"""
+Benchmark de reservas provisórias de horário sob concorrência
+
+Dispara N pacientes (threads) ao mesmo tempo, liberados juntos por uma
+barreira, disputando poucos horários do mesmo médico com
+slot_hold_service.acquire, em um banco SQLite temporário de conversas.
+Mede latência e vazão das reservas e confere que cada horário terminou com
+um único dono (nenhuma reserva em dobro).
+
+Uso:
+    python manage.py benchmark_slot_holds
+    python manage.py benchmark_slot_holds --patients 500 --slots 10
+"""
+
+import logging
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+
+from core.benchmark import format_stats, summarize, temporary_database
+
+DOCTOR = 'Dr. Benchmark Reservas'
+
+
+class Command(BaseCommand):
+    help = 'Mede reservas provisórias de horário concorrentes e confere que não há reserva em dobro'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--patients', type=int, default=200, help='Pacientes disputando ao mesmo tempo')
+        parser.add_argument('--slots', type=int, default=8, help='Horários disputados')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        logging.disable(logging.CRITICAL)
+        try:
+            with temporary_database('catalog'), temporary_database('conversations', fast_io=False):
+                self._run(options)
+        finally:
+            logging.disable(logging.NOTSET)
+
+    def _run(self, options):
+        from api_gateway.models import SlotHold
+        from api_gateway.services.slot_hold_service import slot_hold_service
+
+        patients = options['patients']
+        rng = random.Random(options['seed'])
+        day = timezone.localdate() + timedelta(days=1)
+        times = [f'{9 + index // 2:02d}:{30 * (index % 2):02d}' for index in range(options['slots'])]
+        choices = [rng.choice(times) for _ in range(patients)]
+        barrier = threading.Barrier(patients)
+
+        def book(index):
+            try:
+                barrier.wait()
+                start = time.perf_counter()
+                acquired = slot_hold_service.acquire(DOCTOR, day, choices[index], f'55119{index:08d}')
+                return acquired, (time.perf_counter() - start) * 1000
+            finally:
+                connections.close_all()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=patients) as pool:
+            results = list(pool.map(book, range(patients)))
+        elapsed = time.perf_counter() - start
+
+        winners = defaultdict(int)
+        for index, (acquired, _) in enumerate(results):
+            if acquired:
+                winners[choices[index]] += 1
+        double_booked = sum(1 for count in winners.values() if count > 1)
+        holds = SlotHold.objects.count()
+        latencies = [latency for _, latency in results]
+
+        self.stdout.write(f"🔒 {patients} pacientes x {len(times)} horários: {sum(winners.values())} reservas, "
+                          f"{patients - sum(winners.values())} recusadas, {holds} no banco")
+        self.stdout.write(format_stats('acquire (concorrente)', summarize(latencies)))
+        self.stdout.write(f"{'vazão':<28} {patients / elapsed:>8.0f} reservas/s")
+        if double_booked or holds != len(winners):
+            self.stdout.write(self.style.ERROR(f"❌ {double_booked} horário(s) com mais de um dono"))
+        else:
+            self.stdout.write(self.style.SUCCESS('✅ Nenhuma reserva em dobro: um dono por horário'))
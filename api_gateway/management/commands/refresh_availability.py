@@ -0,0 +1,62 @@
+"""
+Atualização da agenda materializada (AvailabilitySlot)
+
+Recalcula os horários dos próximos N dias a partir do Google Calendar e do
+HorarioTrabalho dos médicos. É incremental: só recalcula dias com eventos
+alterados desde a última execução, dias que entraram na janela e médicos com
+expediente alterado; e só grava as linhas que mudaram. Também remove as
+reservas provisórias de horário (SlotHold) expiradas.
+
+Pode ser agendado (cron) ou rodar continuamente com --loop.
+
+Uso:
+    python manage.py refresh_availability
+    python manage.py refresh_availability --full --days 30
+    python manage.py refresh_availability --loop --interval 300
+    python manage.py refresh_availability --doctor "Dr. João Carvalho"
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api_gateway.services.availability_store import availability_store
+from api_gateway.services.slot_hold_service import slot_hold_service
+
+
+class Command(BaseCommand):
+    help = 'Atualiza (de forma incremental) a agenda materializada dos médicos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help='Dias materializados (padrão: AVAILABILITY_DAYS_AHEAD)')
+        parser.add_argument('--doctor', action='append', dest='doctors', help='Médico (repetível; padrão: todos)')
+        parser.add_argument('--full', action='store_true', help='Recalcula a janela inteira de todos os médicos')
+        parser.add_argument('--loop', action='store_true', help='Executa continuamente')
+        parser.add_argument('--interval', type=float, default=300, help='Segundos entre execuções com --loop')
+
+    def handle(self, *args, **options):
+        full = options['full']
+        while True:
+            start = time.perf_counter()
+            try:
+                stats = availability_store.refresh(options['doctors'], days_ahead=options['days'], full=full)
+            except RuntimeError as e:
+                raise CommandError(str(e))
+            expired_holds = slot_hold_service.purge_expired()
+            elapsed = (time.perf_counter() - start) * 1000
+
+            self.stdout.write(self.style.SUCCESS(
+                f"📅 {stats['doctors']} médicos, {stats['doctor_days']} dias recalculados, {stats['events']} eventos "
+                f"| +{stats['created']} ~{stats['updated']} -{stats['deleted']} horários, "
+                f"{stats['pruned']} antigos removidos, {expired_holds} reservas expiradas ({elapsed:.0f}ms)"
+            ))
+            metrics = availability_store.staleness()
+            self.stdout.write(
+                f"   atualidade: {metrics['doctors']} médicos, {metrics['stale']} desatualizados, "
+                f"{metrics['dirty']} com expediente alterado, idade máxima {metrics['max_age_seconds']}s"
+            )
+
+            if not options['loop']:
+                break
+            full = False
+            time.sleep(options['interval'])
@@ -0,0 +1,165 @@
+"""
+Varredura de sessões inativas
+
+Para cada sessão sem atividade há mais de ConversationSession.ACTIVE_WINDOW_HOURS:
+1. Move as mensagens para ConversationArchive (JSON Lines comprimido), em lotes
+   com transações curtas (uma por lote), sem bloquear as tabelas por muito tempo
+2. Reseta o fluxo de agendamento da sessão (ou remove a sessão com --delete-sessions)
+3. Remove a sessão do cache
+
+É incremental: sessões já varridas não têm mensagens e estão ociosas, então não são
+reprocessadas. Pode ser agendado (cron) com --max-sessions para limitar cada execução.
+
+Uso:
+    python manage.py sweep_stale_sessions
+    python manage.py sweep_stale_sessions --hours 48 --max-sessions 5000 --pause 0.05
+    python manage.py sweep_stale_sessions --dry-run
+"""
+
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import router, transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from api_gateway.models import (ConversationArchive, ConversationMessage,
+                                ConversationSession)
+from api_gateway.services.session_store import session_store
+
+# Campos do fluxo de agendamento limpos quando a sessão expira (nome é mantido)
+RESET_FIELDS = {
+    'current_state': 'idle',
+    'previous_state': None,
+    'pending_name': None,
+    'selected_doctor': None,
+    'selected_specialty': None,
+    'preferred_date': None,
+    'preferred_time': None,
+    'additional_notes': None,
+}
+
+
+class Command(BaseCommand):
+    help = 'Arquiva mensagens de sessões inativas, reseta as sessões e limpa o cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=float, default=ConversationSession.ACTIVE_WINDOW_HOURS,
+                            help='Horas sem atividade para considerar a sessão inativa')
+        parser.add_argument('--batch-size', type=int, default=200,
+                            help='Sessões selecionadas por consulta')
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Mensagens arquivadas/removidas por transação')
+        parser.add_argument('--max-sessions', type=int, default=None,
+                            help='Limite de sessões por execução (execução incremental)')
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help='Pausa (s) entre transações para ceder o banco às requisições')
+        parser.add_argument('--delete-sessions', action='store_true',
+                            help='Remove as sessões inativas em vez de resetá-las')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Apenas conta o que seria varrido')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.cutoff = timezone.now() - timedelta(hours=options['hours'])
+        self.db_alias = router.db_for_write(ConversationMessage)
+
+        totals = {'sessions': 0, 'messages': 0, 'archives': 0}
+        last_seen = None
+
+        while True:
+            remaining = None
+            if options['max_sessions'] is not None:
+                remaining = options['max_sessions'] - totals['sessions']
+                if remaining <= 0:
+                    break
+
+            batch = self._next_batch(last_seen, min(options['batch_size'], remaining or options['batch_size']))
+            if not batch:
+                break
+
+            for session in batch:
+                if options['dry_run']:
+                    totals['messages'] += ConversationMessage.objects.filter(session_id=session['id']).count()
+                else:
+                    archived_messages, archives = self._sweep_session(session)
+                    totals['messages'] += archived_messages
+                    totals['archives'] += archives
+                totals['sessions'] += 1
+
+            last = batch[-1]
+            last_seen = (last['last_activity'], last['id'])
+
+        prefix = '🔎 [dry-run] ' if options['dry_run'] else '🧹 '
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}Sessões inativas: {totals['sessions']}, mensagens arquivadas: {totals['messages']}, "
+            f"lotes de arquivo: {totals['archives']}"
+        ))
+
+    def _next_batch(self, last_seen, size):
+        """
+        Próximo lote de sessões inativas com algo a varrer (paginação por chave)
+
+        Usa o índice de last_activity; a chave (last_activity, id) evita reler lotes anteriores.
+        """
+        has_messages = Exists(ConversationMessage.objects.filter(session_id=OuterRef('pk')))
+        queryset = ConversationSession.objects.filter(last_activity__lt=self.cutoff).filter(
+            Q(has_messages) | ~Q(current_state='idle') | Q(pending_name__isnull=False)
+        )
+        if last_seen:
+            last_activity, last_id = last_seen
+            queryset = queryset.filter(
+                Q(last_activity__gt=last_activity) | Q(last_activity=last_activity, id__gt=last_id)
+            )
+        return list(
+            queryset.order_by('last_activity', 'id').values('id', 'phone_number', 'patient_name', 'last_activity')[:size]
+        )
+
+    def _sweep_session(self, session):
+        """Arquiva as mensagens da sessão em lotes e reseta/remove a sessão"""
+        archived_messages = 0
+        archives = 0
+
+        while True:
+            with transaction.atomic(using=self.db_alias):
+                # Sessão voltou a ficar ativa durante a varredura: não mexer
+                if not ConversationSession.objects.filter(
+                    pk=session['id'], last_activity__lt=self.cutoff
+                ).exists():
+                    return archived_messages, archives
+
+                messages = list(
+                    ConversationMessage.objects.filter(session_id=session['id'])
+                    .order_by('timestamp', 'id')
+                    .values('id', 'message_type', 'content', 'intent', 'confidence', 'entities', 'timestamp')
+                    [:self.options['chunk_size']]
+                )
+                if not messages:
+                    break
+
+                ConversationArchive.objects.create(
+                    phone_number=session['phone_number'],
+                    patient_name=session['patient_name'],
+                    message_count=len(messages),
+                    first_message_at=messages[0]['timestamp'],
+                    last_message_at=messages[-1]['timestamp'],
+                    payload=ConversationArchive.compress_messages(messages),
+                )
+                ConversationMessage.objects.filter(id__in=[message['id'] for message in messages]).delete()
+
+            archived_messages += len(messages)
+            archives += 1
+            if self.options['pause']:
+                time.sleep(self.options['pause'])
+
+        with transaction.atomic(using=self.db_alias):
+            stale_session = ConversationSession.objects.filter(pk=session['id'], last_activity__lt=self.cutoff)
+            if self.options['delete_sessions']:
+                stale_session.delete()
+            else:
+                # update() não altera last_activity (auto_now só é aplicado em save())
+                stale_session.update(**RESET_FIELDS)
+
+        session_store.delete(session['phone_number'])
+        return archived_messages, archives
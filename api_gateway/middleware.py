@@ -1,7 +1,6 @@
 """
 Middleware customizado para API Gateway
 """
-import json
 import logging
 from datetime import datetime
 
@@ -9,6 +8,10 @@ from django.urls import resolve
 from django.utils.deprecation import MiddlewareMixin
 from django.views.decorators.csrf import csrf_exempt
 
+from core import json_codec
+
+from .webhook import get_envelope
+
 logger = logging.getLogger(__name__)
 
 
@@ -21,7 +24,7 @@ class JSONFormatter(logging.Formatter):
         if hasattr(record, 'json_data') and record.json_data:
             # Formatar JSON de forma mais limpa
             try:
-                formatted_json = json.dumps(record.json_data, indent=2, ensure_ascii=False)
+                formatted_json = json_codec.dumps_str(record.json_data, indent=True)
                 record.json_data = formatted_json
             except:
                 pass
@@ -58,24 +61,14 @@ class RequestLoggingMiddleware(MiddlewareMixin):
         if request.path.startswith('/api/'):
             #logger.info(f"📡 API Request: {request.method} {request.path}")
 
-            # Log mais detalhado para webhooks
-            if request.path.startswith('/api/webhook/') and request.body:
-                try:
-                    body_data = json.loads(request.body.decode('utf-8'))
-                    #logger.info(f"📱 WhatsApp Webhook - {len(body_data.get('entry', []))} entries")
-
-                    # Log resumido das mensagens
-                    for entry in body_data.get('entry', []):
-                        for change in entry.get('changes', []):
-                            if change.get('field') == 'messages':
-                                messages = change.get('value', {}).get('messages', [])
-                                for msg in messages:
-                                    msg_type = msg.get('type', 'unknown')
-                                    from_number = msg.get('from', 'unknown')
-                                    #logger.info(f"💬 Mensagem recebida: {msg_type} de {from_number}")
-
-                except Exception as e:
-                    logger.debug(f"Erro ao parsear webhook: {e}")
+            # Webhook: decodificado uma única vez e reaproveitado pela view
+            if request.path.startswith('/api/webhook/') and request.method == 'POST' and request.body:
+                envelope = get_envelope(request)
+                if envelope.valid:
+                    logger.debug(f"📱 WhatsApp Webhook - {len(envelope.messages)} mensagens, "
+                                 f"{len(envelope.statuses)} status")
+                else:
+                    logger.debug(f"Erro ao parsear webhook: {envelope.error}")
 
         return None
 
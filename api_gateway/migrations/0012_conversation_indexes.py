@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_gateway', '0011_alter_conversationsession_current_state'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='conversationmessage',
+            index=models.Index(fields=['session', 'timestamp'], name='conv_msg_session_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='conversationsession',
+            index=models.Index(fields=['-last_activity'], name='conv_session_activity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='conversationsession',
+            index=models.Index(fields=['current_state', '-last_activity'], name='conv_session_state_act_idx'),
+        ),
+    ]
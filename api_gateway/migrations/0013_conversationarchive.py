@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_gateway', '0012_conversation_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConversationArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phone_number', models.CharField(db_index=True, max_length=20)),
+                ('patient_name', models.CharField(blank=True, max_length=100, null=True)),
+                ('message_count', models.PositiveIntegerField()),
+                ('first_message_at', models.DateTimeField()),
+                ('last_message_at', models.DateTimeField()),
+                ('payload', models.BinaryField(help_text='Mensagens em JSON Lines comprimido (zlib)')),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Arquivo de Conversa',
+                'verbose_name_plural': 'Arquivos de Conversa',
+                'ordering': ['-archived_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.6 on 2026-10-19 02:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_gateway', '0013_conversationarchive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AvailabilitySync',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('doctor_key', models.CharField(max_length=100, unique=True)),
+                ('doctor_name', models.CharField(max_length=100)),
+                ('window_start', models.DateField()),
+                ('window_end', models.DateField(help_text='Último dia materializado')),
+                ('synced_at', models.DateTimeField()),
+                ('dirty', models.BooleanField(default=False, help_text='HorarioTrabalho alterado desde a última atualização')),
+            ],
+            options={
+                'verbose_name': 'Sincronização de Agenda',
+                'verbose_name_plural': 'Sincronizações de Agenda',
+            },
+        ),
+        migrations.CreateModel(
+            name='AvailabilitySlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('doctor_key', models.CharField(help_text='Nome normalizado (rag_agent.text.normalize_name)', max_length=100)),
+                ('doctor_name', models.CharField(max_length=100)),
+                ('date', models.DateField()),
+                ('start', models.TimeField()),
+                ('duration', models.PositiveSmallIntegerField(default=30, help_text='Duração em minutos')),
+                ('status', models.CharField(choices=[('free', 'Livre'), ('busy', 'Ocupado')], default='free', max_length=10)),
+                ('event_id', models.CharField(blank=True, default='', help_text='Evento que ocupa o horário', max_length=255)),
+            ],
+            options={
+                'verbose_name': 'Horário Materializado',
+                'verbose_name_plural': 'Horários Materializados',
+                'ordering': ['doctor_key', 'date', 'start'],
+                'indexes': [models.Index(fields=['date'], name='availability_slot_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('doctor_key', 'date', 'start'), name='unique_availability_slot')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-19 02:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_gateway', '0014_availability_slot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlotHold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('doctor_key', models.CharField(help_text='Nome normalizado (rag_agent.text.normalize_name)', max_length=100)),
+                ('doctor_name', models.CharField(max_length=100)),
+                ('start', models.DateTimeField()),
+                ('phone_number', models.CharField(db_index=True, max_length=20)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Reserva de Horário',
+                'verbose_name_plural': 'Reservas de Horário',
+                'constraints': [models.UniqueConstraint(fields=('doctor_key', 'start'), name='unique_slot_hold')],
+            },
+        ),
+    ]
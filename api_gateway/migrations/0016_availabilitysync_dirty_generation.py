@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 02:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_gateway', '0015_slot_hold'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='availabilitysync',
+            name='dirty_generation',
+            field=models.PositiveIntegerField(default=0, help_text='Incrementado a cada marcação (dirty); a atualização só limpa a marcação que leu'),
+        ),
+    ]
@@ -1,9 +1,13 @@
 """
 Modelos para armazenar dados de conversas e agendamentos
 """
+import zlib
+
 from django.db import models
 from django.utils import timezone
 
+from core import json_codec
+
 
 class ConversationSession(models.Model):
     """
@@ -46,15 +50,24 @@ class ConversationSession(models.Model):
     
     class Meta:
         ordering = ['-last_activity']
+        indexes = [
+            # Listagem do admin e varredura de sessões inativas
+            models.Index(fields=['-last_activity'], name='conv_session_activity_idx'),
+            # Listagem filtrada por estado, ordenada por atividade
+            models.Index(fields=['current_state', '-last_activity'], name='conv_session_state_act_idx'),
+        ]
         verbose_name = 'Sessão de Conversa'
         verbose_name_plural = 'Sessões de Conversa'
     
     def __str__(self):
         return f"{self.phone_number} - {self.patient_name or 'Paciente'} ({self.current_state})"
     
+    # Janela de atividade da sessão (usada também pelo sweep_stale_sessions)
+    ACTIVE_WINDOW_HOURS = 24
+    
     def is_active(self):
         """Verifica se a sessão está ativa (última atividade há menos de 24h)"""
-        return (timezone.now() - self.last_activity).total_seconds() < 86400  # 24 horas
+        return (timezone.now() - self.last_activity).total_seconds() < self.ACTIVE_WINDOW_HOURS * 3600
     
     def update_activity(self):
         """Atualiza timestamp da última atividade"""
@@ -82,9 +95,134 @@ class ConversationMessage(models.Model):
     
     class Meta:
         ordering = ['timestamp']
+        indexes = [
+            # Histórico da sessão (filtro por sessão + ordenação por horário)
+            models.Index(fields=['session', 'timestamp'], name='conv_msg_session_ts_idx'),
+        ]
         verbose_name = 'Mensagem da Conversa'
         verbose_name_plural = 'Mensagens da Conversa'
     
     def __str__(self):
         return f"{self.get_message_type_display()}: {self.content[:50]}..."
 
+
+
+class ConversationArchive(models.Model):
+    """
+    Lote de mensagens arquivadas de uma sessão inativa (armazenamento frio)
+    
+    As mensagens são gravadas como JSON Lines comprimido com zlib.
+    """
+    phone_number = models.CharField(max_length=20, db_index=True)
+    patient_name = models.CharField(max_length=100, blank=True, null=True)
+    message_count = models.PositiveIntegerField()
+    first_message_at = models.DateTimeField()
+    last_message_at = models.DateTimeField()
+    payload = models.BinaryField(help_text="Mensagens em JSON Lines comprimido (zlib)")
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-archived_at']
+        verbose_name = 'Arquivo de Conversa'
+        verbose_name_plural = 'Arquivos de Conversa'
+    
+    def __str__(self):
+        return f"{self.phone_number} - {self.message_count} mensagens ({self.first_message_at:%d/%m/%Y})"
+    
+    @staticmethod
+    def compress_messages(messages):
+        """Serializa mensagens (lista de dicts) em JSON Lines comprimido"""
+        lines = b'\n'.join(json_codec.dumps(message, default=str) for message in messages)
+        return zlib.compress(lines, 6)
+    
+    def get_messages(self):
+        """Descomprime e retorna as mensagens arquivadas"""
+        data = zlib.decompress(bytes(self.payload))
+        return [json_codec.loads(line) for line in data.split(b'\n') if line]
+
+
+class AvailabilitySlot(models.Model):
+    """
+    Horário materializado da agenda de um médico (próximos N dias)
+    
+    Calculado a partir dos eventos do Google Calendar e do HorarioTrabalho do
+    médico por api_gateway.services.availability_store; consultas de horário
+    viram buscas pontuais pelo índice (doctor_key, date, start).
+    """
+    STATUS_FREE = 'free'
+    STATUS_BUSY = 'busy'
+    STATUS_CHOICES = [
+        (STATUS_FREE, 'Livre'),
+        (STATUS_BUSY, 'Ocupado'),
+    ]
+    
+    doctor_key = models.CharField(max_length=100, help_text="Nome normalizado (rag_agent.text.normalize_name)")
+    doctor_name = models.CharField(max_length=100)
+    date = models.DateField()
+    start = models.TimeField()
+    duration = models.PositiveSmallIntegerField(default=30, help_text="Duração em minutos")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_FREE)
+    event_id = models.CharField(max_length=255, blank=True, default='', help_text="Evento que ocupa o horário")
+    
+    class Meta:
+        ordering = ['doctor_key', 'date', 'start']
+        constraints = [
+            models.UniqueConstraint(fields=['doctor_key', 'date', 'start'], name='unique_availability_slot')
+        ]
+        indexes = [
+            # Limpeza dos dias que saíram da janela
+            models.Index(fields=['date'], name='availability_slot_date_idx'),
+        ]
+        verbose_name = 'Horário Materializado'
+        verbose_name_plural = 'Horários Materializados'
+    
+    def __str__(self):
+        return f"{self.doctor_name} - {self.date:%d/%m/%Y} {self.start:%H:%M} ({self.get_status_display()})"
+
+
+class AvailabilitySync(models.Model):
+    """
+    Estado da materialização da agenda de um médico (atualidade e janela coberta)
+    """
+    doctor_key = models.CharField(max_length=100, unique=True)
+    doctor_name = models.CharField(max_length=100)
+    window_start = models.DateField()
+    window_end = models.DateField(help_text="Último dia materializado")
+    synced_at = models.DateTimeField()
+    dirty = models.BooleanField(default=False, help_text="HorarioTrabalho alterado desde a última atualização")
+    dirty_generation = models.PositiveIntegerField(
+        default=0,
+        help_text="Incrementado a cada marcação (dirty); a atualização só limpa a marcação que leu"
+    )
+    
+    class Meta:
+        verbose_name = 'Sincronização de Agenda'
+        verbose_name_plural = 'Sincronizações de Agenda'
+    
+    def __str__(self):
+        return f"{self.doctor_name} até {self.window_end:%d/%m/%Y} ({self.synced_at:%d/%m/%Y %H:%M})"
+
+
+class SlotHold(models.Model):
+    """
+    Reserva provisória de um horário enquanto o paciente confirma e a secretária agenda
+    
+    A restrição única (doctor_key, start) garante um único dono por horário; a
+    reserva expira em expires_at (ver api_gateway.services.slot_hold_service).
+    """
+    doctor_key = models.CharField(max_length=100, help_text="Nome normalizado (rag_agent.text.normalize_name)")
+    doctor_name = models.CharField(max_length=100)
+    start = models.DateTimeField()
+    phone_number = models.CharField(max_length=20, db_index=True)
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['doctor_key', 'start'], name='unique_slot_hold')
+        ]
+        verbose_name = 'Reserva de Horário'
+        verbose_name_plural = 'Reservas de Horário'
+    
+    def __str__(self):
+        return f"{self.doctor_name} - {timezone.localtime(self.start):%d/%m/%Y %H:%M} ({self.phone_number})"
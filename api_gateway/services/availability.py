@@ -0,0 +1,224 @@
+"""
+Disponibilidade de um médico em estrutura tipada
+
+Responsável por:
+- Guardar os horários livres como dias ordenados -> array ordenado de minutos
+  desde a meia-noite (540 = 09:00), sem strings 'DD/MM/YYYY' / 'HH:MM'
+- Responder com busca binária: horários do dia, se um horário está livre,
+  próximos N horários a partir de um instante e alternativas mais próximas
+  de um horário pedido
+- Derivar novas disponibilidades (um dia, primeiros N dias, dias depois de
+  uma data, sem horários reservados) sem reinterpretar texto
+- Converter para o formato de dias com strings ({'date', 'weekday',
+  'available_times'}) só na borda: mensagens do WhatsApp e respostas da API
+
+Uso:
+    from .availability import DoctorAvailability
+
+    availability = DoctorAvailability('Dr. João Carvalho', {date(2026, 3, 2): [540, 570, 600]})
+    availability.is_free(date(2026, 3, 2), 570)      # True
+    availability.nearest(date(2026, 3, 2), 585, 2)   # [570, 600]
+    availability.to_days()                           # [{'date': '02/03/2026', ...}]
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date, time
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple
+
+from .datetime_parser import parse_date, parse_time
+
+WEEKDAY_NAMES = ('Segunda', 'Terça', 'Quarta', 'Quinta', 'Sexta', 'Sábado', 'Domingo')
+
+# (dia, minutos desde a meia-noite)
+Slot = Tuple[date, int]
+
+
+def to_minutes(value: time) -> int:
+    """Minutos desde a meia-noite de um time"""
+    return value.hour * 60 + value.minute
+
+
+def format_minutes(minutes: int) -> str:
+    """Minutos desde a meia-noite em 'HH:MM'"""
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def format_day(day: date) -> str:
+    """Data em 'DD/MM/YYYY'"""
+    return f"{day.day:02d}/{day.month:02d}/{day.year}"
+
+
+class DoctorAvailability:
+    """Horários livres de um médico: dias ordenados -> minutos ordenados"""
+
+    __slots__ = ('doctor_name', '_days', '_slots')
+
+    def __init__(self, doctor_name: str, slots_by_day: Optional[Mapping[date, Iterable[int]]] = None):
+        self.doctor_name = doctor_name
+        self._slots: Dict[date, array] = {}
+        for day, minutes in (slots_by_day or {}).items():
+            ordered = array('H', sorted(set(minutes)))
+            if ordered:
+                self._slots[day] = ordered
+        self._days: List[date] = sorted(self._slots)
+
+    @classmethod
+    def from_days(cls, doctor_name: str, days: Iterable[Dict[str, Any]]) -> 'DoctorAvailability':
+        """
+        Converte dias no formato com strings (calendário simulado, API antiga)
+
+        Args:
+            doctor_name: Nome do médico
+            days: Lista de {'date': 'DD/MM/YYYY', 'available_times': ['HH:MM', ...]}
+
+        Returns:
+            DoctorAvailability (dias ou horários inválidos são ignorados)
+        """
+        slots_by_day: Dict[date, List[int]] = {}
+        for day in days:
+            day_date = parse_date(day.get('date'))
+            if not day_date:
+                continue
+            moments = (parse_time(value) for value in day.get('available_times', []))
+            slots_by_day.setdefault(day_date, []).extend(to_minutes(moment) for moment in moments if moment)
+        return cls(doctor_name, slots_by_day)
+
+    # ── Consultas ──────────────────────────────────────────────────────────
+
+    def __bool__(self) -> bool:
+        return bool(self._days)
+
+    def __len__(self) -> int:
+        """Quantidade de dias com horários livres"""
+        return len(self._days)
+
+    @property
+    def days(self) -> Sequence[date]:
+        """Dias com horários livres, em ordem"""
+        return self._days
+
+    @property
+    def total_slots(self) -> int:
+        return sum(len(minutes) for minutes in self._slots.values())
+
+    def slots_on(self, day: date) -> Sequence[int]:
+        """Horários livres do dia (minutos, em ordem)"""
+        return self._slots.get(day, ())
+
+    def is_free(self, day: date, minutes: int) -> bool:
+        """Se o horário está livre (busca binária no dia)"""
+        slots = self._slots.get(day)
+        if not slots:
+            return False
+        index = bisect_left(slots, minutes)
+        return index < len(slots) and slots[index] == minutes
+
+    def next_slots(self, day: date, minutes: int = -1, limit: int = 1) -> List[Slot]:
+        """
+        Próximos horários livres depois de (dia, minutos)
+
+        Args:
+            day: Dia de referência
+            minutes: Minutos de referência (-1: o dia inteiro conta)
+            limit: Máximo de horários
+
+        Returns:
+            Lista de (dia, minutos) em ordem
+        """
+        found: List[Slot] = []
+        for index in range(bisect_left(self._days, day), len(self._days)):
+            current = self._days[index]
+            slots = self._slots[current]
+            start = bisect_right(slots, minutes) if current == day else 0
+            for value in slots[start:start + limit - len(found)]:
+                found.append((current, value))
+            if len(found) >= limit:
+                break
+        return found
+
+    def nearest(self, day: date, minutes: int, limit: int = 8) -> List[int]:
+        """
+        Horários livres do dia mais próximos do horário pedido
+
+        Args:
+            day: Dia
+            minutes: Horário pedido (minutos)
+            limit: Máximo de alternativas
+
+        Returns:
+            Minutos das alternativas, em ordem cronológica
+        """
+        slots = self._slots.get(day)
+        if not slots:
+            return []
+        right = bisect_left(slots, minutes)
+        left = right - 1
+        chosen: List[int] = []
+        while len(chosen) < limit and (left >= 0 or right < len(slots)):
+            if right >= len(slots) or (left >= 0 and minutes - slots[left] <= slots[right] - minutes):
+                chosen.append(slots[left])
+                left -= 1
+            else:
+                chosen.append(slots[right])
+                right += 1
+        return sorted(chosen)
+
+    # ── Derivações ─────────────────────────────────────────────────────────
+
+    def _derive(self, days: Iterable[date]) -> 'DoctorAvailability':
+        derived = DoctorAvailability.__new__(DoctorAvailability)
+        derived.doctor_name = self.doctor_name
+        derived._slots = {day: self._slots[day] for day in days}
+        derived._days = sorted(derived._slots)
+        return derived
+
+    def on(self, day: date) -> 'DoctorAvailability':
+        """Somente o dia informado"""
+        return self._derive([day] if day in self._slots else [])
+
+    def first_days(self, count: int) -> 'DoctorAvailability':
+        """Somente os primeiros dias com horários livres"""
+        return self._derive(self._days[:count])
+
+    def after(self, day: date) -> 'DoctorAvailability':
+        """Somente os dias depois da data informada"""
+        return self._derive(self._days[bisect_right(self._days, day):])
+
+    def without(self, slots: Set[Slot]) -> 'DoctorAvailability':
+        """
+        Sem os horários informados (ex.: reservados por outros pacientes)
+
+        Args:
+            slots: Conjunto de (dia, minutos)
+
+        Returns:
+            Nova DoctorAvailability (dias sem horários são removidos)
+        """
+        if not slots:
+            return self
+        return DoctorAvailability(self.doctor_name, {
+            day: [value for value in minutes if (day, value) not in slots]
+            for day, minutes in self._slots.items()
+        })
+
+    # ── Borda: strings para mensagens e API ────────────────────────────────
+
+    def to_days(self) -> List[Dict[str, Any]]:
+        """
+        Dias no formato com strings (mensagens do WhatsApp, API)
+
+        Returns:
+            Lista de {'date': 'DD/MM/YYYY', 'weekday': 'Segunda', 'available_times': ['HH:MM', ...]}
+        """
+        return [
+            {
+                'date': format_day(day),
+                'weekday': WEEKDAY_NAMES[day.weekday()],
+                'available_times': [format_minutes(value) for value in self._slots[day]],
+            }
+            for day in self._days
+        ]
+
+    def __repr__(self):
+        return f"DoctorAvailability({self.doctor_name!r}, {len(self._days)} dias, {self.total_slots} horários)"
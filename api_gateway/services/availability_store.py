@@ -0,0 +1,449 @@
+"""
+Agenda materializada dos médicos (AvailabilitySlot)
+
+Responsável por:
+- Materializar os horários (livre/ocupado) dos próximos N dias a partir dos
+  eventos do Google Calendar e do HorarioTrabalho de cada médico
+- Atualizar de forma incremental: só recalcula os dias com eventos alterados
+  (updatedMin), os dias que entraram na janela e os médicos com expediente
+  alterado (marcados por sinal), e só grava as linhas que mudaram
+- Responder consultas de horário com buscas pelo índice (doctor_key, date, start)
+  quando a materialização do médico está atualizada (senão retorna None e
+  quem chamou consulta o calendário)
+- Expor métricas de atualidade (idade das sincronizações, acertos e falhas)
+
+A atualização roda fora das requisições (manage.py refresh_availability).
+
+Uso:
+    from .availability_store import availability_store
+
+    availability_store.refresh()                                   # job em segundo plano
+    availability_store.get_availability('Dr. João Carvalho', days_ahead=7)  # DoctorAvailability ou None
+    availability_store.lookup('Dr. João Carvalho', date(2026, 3, 2), '09:00')  # 'free', 'busy' ou None
+"""
+
+import logging
+import threading
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+
+from rag_agent.text import normalize_name
+
+from ..models import AvailabilitySlot, AvailabilitySync
+from .availability import WEEKDAY_NAMES, DoctorAvailability, to_minutes
+from .calendar_events import EventsByDay
+from .datetime_parser import parse_time
+
+logger = logging.getLogger(__name__)
+
+# Expediente padrão para médicos sem HorarioTrabalho (igual ao de GoogleCalendarService)
+DEFAULT_WORKING_PERIODS = ((time(8, 0), time(12, 0)), (time(14, 0), time(18, 0)))
+DEFAULT_WORKING_WEEKDAYS = range(5)  # segunda a sexta
+SLOT_MINUTES = 30
+
+DEFAULT_DAYS_AHEAD = 14
+DEFAULT_MAX_STALENESS = 900  # segundos
+
+# Margem para diferença de relógio entre o servidor e o Google em updatedMin
+CLOCK_SKEW = timedelta(minutes=1)
+
+# Chave do slot desejado: (data, início) -> (duração, status, id do evento)
+SlotMap = Dict[Tuple[date, time], Tuple[int, str, str]]
+
+
+def _slot_starts(periods: Iterable[Tuple[time, time]]) -> List[time]:
+    """Inícios dos horários (SLOT_MINUTES) dentro dos períodos de atendimento"""
+    starts = []
+    for period_start, period_end in periods:
+        cursor = datetime.combine(date.min, period_start)
+        limit = datetime.combine(date.min, period_end)
+        while cursor + timedelta(minutes=SLOT_MINUTES) <= limit:
+            starts.append(cursor.time())
+            cursor += timedelta(minutes=SLOT_MINUTES)
+    return starts
+
+
+def load_working_hours() -> Dict[str, Dict[int, List[time]]]:
+    """
+    Inícios de horário por dia da semana (0 = segunda) de cada médico com HorarioTrabalho
+
+    Returns:
+        Dict doctor_key -> {dia da semana: [inícios]}; médicos ausentes usam o expediente padrão
+    """
+    from rag_agent.models import HorarioTrabalho
+
+    periods = defaultdict(lambda: defaultdict(list))
+    rows = HorarioTrabalho.objects.values_list('medico__nome', 'dia_da_semana', 'hora_inicio', 'hora_fim')
+    for nome, dia_da_semana, hora_inicio, hora_fim in rows:
+        periods[normalize_name(nome)][dia_da_semana - 1].append((hora_inicio, hora_fim))
+
+    return {
+        doctor_key: {weekday: _slot_starts(sorted(day_periods)) for weekday, day_periods in by_weekday.items()}
+        for doctor_key, by_weekday in periods.items()
+    }
+
+
+DEFAULT_SCHEDULE = {weekday: _slot_starts(DEFAULT_WORKING_PERIODS) for weekday in DEFAULT_WORKING_WEEKDAYS}
+
+
+def build_slots(days: Iterable[date], schedule: Dict[int, List[time]], events_by_day: EventsByDay) -> SlotMap:
+    """
+    Horários desejados de um médico nos dias informados
+
+    Um horário fica ocupado se algum evento se sobrepõe a ele (não só eventos
+    que começam nele: um exame de 60 minutos ocupa dois horários).
+
+    Args:
+        days: Dias a calcular
+        schedule: Inícios por dia da semana
+        events_by_day: Eventos do médico por dia (ver calendar_events.partition_events)
+
+    Returns:
+        Dict (data, início) -> (duração, status, id do evento)
+    """
+    slots = {}
+    for day in days:
+        day_events = [event for event in events_by_day.get(day, ()) if not event.cancelled]
+        for start in schedule.get(day.weekday(), ()):
+            slot_start = start.hour * 60 + start.minute
+            slot_end = slot_start + SLOT_MINUTES
+            event_id = next((event.id for event in day_events if event.overlaps(slot_start, slot_end)), None)
+            if event_id is None:
+                slots[(day, start)] = (SLOT_MINUTES, AvailabilitySlot.STATUS_FREE, '')
+            else:
+                slots[(day, start)] = (SLOT_MINUTES, AvailabilitySlot.STATUS_BUSY, event_id)
+    return slots
+
+
+class AvailabilityStore:
+    """Materialização da agenda e consultas pontuais de horário"""
+
+    def __init__(self, calendar_service=None):
+        self._calendar_service = calendar_service
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def calendar_service(self):
+        if self._calendar_service is None:
+            from .google_calendar_service import google_calendar_service
+            self._calendar_service = google_calendar_service
+        return self._calendar_service
+
+    @property
+    def max_staleness(self) -> timedelta:
+        return timedelta(seconds=getattr(settings, 'AVAILABILITY_MAX_STALENESS', DEFAULT_MAX_STALENESS))
+
+    # ── Consultas ──────────────────────────────────────────────────────────
+
+    def get_availability(self, doctor_name: str, days_ahead: int = 7) -> Optional[DoctorAvailability]:
+        """
+        Horários livres do médico a partir de hoje
+
+        Args:
+            doctor_name: Nome do médico
+            days_ahead: Dias a partir de hoje
+
+        Returns:
+            DoctorAvailability (sem os horários que já passaram hoje) ou None se
+            a materialização do médico não cobre o período ou está desatualizada
+        """
+        today = timezone.localdate()
+        return self._free_slots(doctor_name, today, today + timedelta(days=days_ahead - 1))
+
+    def get_day(self, doctor_name: str, day: date) -> Optional[DoctorAvailability]:
+        """
+        Horários livres de um único dia (sem montar a janela inteira)
+
+        Returns:
+            DoctorAvailability só com o dia ou None (ver get_availability)
+        """
+        return self._free_slots(doctor_name, day, day)
+
+    def _free_slots(self, doctor_name: str, first_day: date, last_day: date) -> Optional[DoctorAvailability]:
+        """Horários livres materializados no período (None se não está atualizado)"""
+        doctor_key = normalize_name(doctor_name)
+        if not self._is_fresh(doctor_key, first_day, last_day):
+            return None
+
+        now = timezone.localtime()
+        today = now.date()
+        current_minutes = to_minutes(now.time())
+        rows = AvailabilitySlot.objects.filter(
+            doctor_key=doctor_key, date__range=(first_day, last_day), status=AvailabilitySlot.STATUS_FREE,
+        ).values_list('date', 'start')
+
+        slots_by_day = defaultdict(list)
+        for day, start in rows:
+            minutes = to_minutes(start)
+            # Horários que já passaram hoje
+            if day == today and minutes <= current_minutes:
+                continue
+            slots_by_day[day].append(minutes)
+        return DoctorAvailability(doctor_name, slots_by_day)
+
+    def get_days(self, doctor_name: str, days_ahead: int = 7) -> Optional[List[Dict[str, Any]]]:
+        """
+        Dias com horários livres no formato com strings (ver DoctorAvailability.to_days)
+
+        Returns:
+            Lista de dias ({'date', 'weekday', 'available_times'}) ou None (ver get_availability)
+        """
+        availability = self.get_availability(doctor_name, days_ahead)
+        return availability.to_days() if availability is not None else None
+
+    def lookup(self, doctor_name: str, day: date, start: Union[str, time]) -> Optional[str]:
+        """
+        Status de um horário (busca pontual pelo índice)
+
+        Args:
+            doctor_name: Nome do médico
+            day: Data
+            start: Horário ('HH:MM' ou time)
+
+        Returns:
+            'free', 'busy' (inclui horários fora do expediente e que já passaram)
+            ou None se a materialização do médico não está atualizada para o dia
+        """
+        start = parse_time(start)
+        if not start:
+            return None
+        now = timezone.localtime()
+        if (day, start) <= (now.date(), now.time()):
+            return AvailabilitySlot.STATUS_BUSY
+
+        doctor_key = normalize_name(doctor_name)
+        if not self._is_fresh(doctor_key, day, day):
+            return None
+        status = AvailabilitySlot.objects.filter(doctor_key=doctor_key, date=day, start=start).values_list(
+            'status', flat=True
+        ).first()
+        return status or AvailabilitySlot.STATUS_BUSY
+
+    def _is_fresh(self, doctor_key: str, first_day: date, last_day: date) -> bool:
+        """Materialização atualizada e cobrindo o período (conta acertos e falhas)"""
+        fresh = AvailabilitySync.objects.filter(
+            doctor_key=doctor_key,
+            dirty=False,
+            synced_at__gte=timezone.now() - self.max_staleness,
+            window_start__lte=first_day,
+            window_end__gte=last_day,
+        ).exists()
+        with self._lock:
+            if fresh:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return fresh
+
+    # ── Atualização ────────────────────────────────────────────────────────
+
+    def mark_dirty(self, doctor_name: str) -> int:
+        """Expediente do médico alterado: próxima atualização recalcula a janela inteira"""
+        # A geração muda a cada marcação: uma atualização em andamento não limpa esta marcação
+        return AvailabilitySync.objects.filter(doctor_key=normalize_name(doctor_name)).update(
+            dirty=True, dirty_generation=F('dirty_generation') + 1
+        )
+
+    def refresh(self, doctor_names: Optional[List[str]] = None, days_ahead: Optional[int] = None,
+                full: bool = False) -> Dict[str, int]:
+        """
+        Atualiza a agenda materializada
+
+        Recalcula, por médico: a janela inteira se for a primeira vez, se o
+        expediente mudou (dirty) ou se full=True; senão só os dias que entraram
+        na janela e os dias com eventos alterados desde a última atualização
+        (onde o evento está agora e onde ele ocupava horários antes).
+
+        Args:
+            doctor_names: Médicos (padrão: todos do catálogo)
+            days_ahead: Tamanho da janela (padrão: AVAILABILITY_DAYS_AHEAD)
+            full: Recalcula a janela inteira de todos os médicos
+
+        Returns:
+            Estatísticas (doctors, doctor_days, events, created, updated, deleted, pruned)
+
+        Raises:
+            RuntimeError: Calendário indisponível (nada é alterado)
+        """
+        calendar = self.calendar_service
+        if not calendar.enabled or not calendar.service:
+            raise RuntimeError("Google Calendar não está habilitado: agenda não materializada")
+
+        days_ahead = days_ahead or getattr(settings, 'AVAILABILITY_DAYS_AHEAD', DEFAULT_DAYS_AHEAD)
+        tz = timezone.get_current_timezone()
+        # Marcado antes de consultar o calendário: alterações durante a atualização entram na próxima
+        synced_at = timezone.now()
+        today = timezone.localdate()
+        window = [today + timedelta(days=offset) for offset in range(days_ahead)]
+        window_end = window[-1]
+
+        if doctor_names is None:
+            from rag_agent.models import Medico
+            doctor_names = list(Medico.objects.order_by('nome').values_list('nome', flat=True))
+        names = {normalize_name(name): name for name in doctor_names}
+        syncs = {sync.doctor_key: sync for sync in AvailabilitySync.objects.filter(doctor_key__in=list(names))}
+
+        affected: Dict[str, Set[date]] = {}
+        incremental = []
+        for doctor_key in names:
+            sync = syncs.get(doctor_key)
+            if full or sync is None or sync.dirty:
+                affected[doctor_key] = set(window)
+            else:
+                incremental.append(doctor_key)
+                affected[doctor_key] = {day for day in window if day > sync.window_end}
+
+        stats = {'doctors': len(names), 'doctor_days': 0, 'events': 0,
+                 'created': 0, 'updated': 0, 'deleted': 0, 'pruned': 0}
+        window_min = datetime.combine(today, time.min, tzinfo=tz)
+        window_max = datetime.combine(window_end + timedelta(days=1), time.min, tzinfo=tz)
+
+        # Deltas do calendário (inclui cancelados) para quem já está materializado
+        if incremental:
+            since = min(syncs[doctor_key].synced_at for doctor_key in incremental) - CLOCK_SKEW
+            changed = calendar.list_events(window_min, window_max, updatedMin=since.isoformat(), showDeleted=True)
+            changed_by_doctor = calendar.partition_events_by_doctor(changed, [names[key] for key in incremental])
+            for doctor_key in incremental:
+                affected[doctor_key].update(day for day in changed_by_doctor[names[doctor_key]] if window[0] <= day <= window_end)
+            # O delta traz o evento só no início novo: os dias em que ele ocupava horários
+            # (remarcado para outro dia/horário ou outro médico) também são recalculados
+            changed_ids = {event['id'] for event in changed if event.get('id')}
+            if changed_ids:
+                previous_days = AvailabilitySlot.objects.filter(
+                    doctor_key__in=incremental, event_id__in=changed_ids, date__range=(window[0], window_end),
+                ).values_list('doctor_key', 'date').distinct()
+                for doctor_key, day in previous_days:
+                    affected[doctor_key].add(day)
+
+        days_to_fetch = set().union(*affected.values()) if affected else set()
+        if days_to_fetch:
+            fetch_min = datetime.combine(min(days_to_fetch), time.min, tzinfo=tz)
+            fetch_max = datetime.combine(max(days_to_fetch) + timedelta(days=1), time.min, tzinfo=tz)
+            events = calendar.list_events(fetch_min, fetch_max)
+            stats['events'] = len(events)
+            to_rebuild = [doctor_key for doctor_key in names if affected[doctor_key]]
+            events_by_doctor = calendar.partition_events_by_doctor(events, [names[key] for key in to_rebuild])
+            working_hours = load_working_hours()
+
+            for doctor_key in to_rebuild:
+                days = sorted(affected[doctor_key])
+                slots = build_slots(days, working_hours.get(doctor_key, DEFAULT_SCHEDULE), events_by_doctor[names[doctor_key]])
+                created, updated, deleted = self._write_slots(doctor_key, names[doctor_key], days, slots)
+                stats['doctor_days'] += len(days)
+                stats['created'] += created
+                stats['updated'] += updated
+                stats['deleted'] += deleted
+
+        self._save_syncs(names, syncs, today, window_end, synced_at)
+        stats['pruned'] = AvailabilitySlot.objects.filter(date__lt=today).delete()[0]
+        logger.info("📅 Agenda materializada: %s", stats)
+        return stats
+
+    def _write_slots(self, doctor_key: str, doctor_name: str, days: List[date], slots: SlotMap) -> Tuple[int, int, int]:
+        """Grava só as diferenças entre os horários desejados e os materializados"""
+        existing = {
+            (slot.date, slot.start): slot
+            for slot in AvailabilitySlot.objects.filter(doctor_key=doctor_key, date__in=days)
+        }
+        to_create = []
+        to_update = []
+        for (day, start), (duration, status, event_id) in slots.items():
+            slot = existing.pop((day, start), None)
+            if slot is None:
+                to_create.append(AvailabilitySlot(doctor_key=doctor_key, doctor_name=doctor_name, date=day, start=start,
+                                                  duration=duration, status=status, event_id=event_id))
+            elif (slot.duration, slot.status, slot.event_id, slot.doctor_name) != (duration, status, event_id, doctor_name):
+                slot.duration, slot.status, slot.event_id, slot.doctor_name = duration, status, event_id, doctor_name
+                to_update.append(slot)
+        to_delete = [slot.pk for slot in existing.values()]
+
+        with transaction.atomic(using=router.db_for_write(AvailabilitySlot)):
+            AvailabilitySlot.objects.bulk_create(to_create, batch_size=500)
+            AvailabilitySlot.objects.bulk_update(to_update, ['duration', 'status', 'event_id', 'doctor_name'],
+                                                 batch_size=500)
+            if to_delete:
+                AvailabilitySlot.objects.filter(pk__in=to_delete).delete()
+        return len(to_create), len(to_update), len(to_delete)
+
+    def _save_syncs(self, names: Dict[str, str], syncs: Dict[str, AvailabilitySync], window_start: date,
+                    window_end: date, synced_at: datetime):
+        """Registra a atualização de cada médico (janela coberta e horário)"""
+        to_create = []
+        to_update = []
+        for doctor_key, doctor_name in names.items():
+            sync = syncs.get(doctor_key)
+            if sync is None:
+                to_create.append(AvailabilitySync(doctor_key=doctor_key, doctor_name=doctor_name,
+                                                  window_start=window_start, window_end=window_end,
+                                                  synced_at=synced_at))
+            else:
+                sync.doctor_name, sync.window_start, sync.window_end = doctor_name, window_start, window_end
+                sync.synced_at = synced_at
+                to_update.append(sync)
+
+        # Marcações lidas no início da atualização, por geração
+        to_clear = defaultdict(list)
+        for sync in to_update:
+            if sync.dirty:
+                to_clear[sync.dirty_generation].append(sync.pk)
+
+        with transaction.atomic(using=router.db_for_write(AvailabilitySync)):
+            AvailabilitySync.objects.bulk_create(to_create, batch_size=500)
+            AvailabilitySync.objects.bulk_update(
+                to_update, ['doctor_name', 'window_start', 'window_end', 'synced_at'], batch_size=500
+            )
+            # Só limpa se ninguém marcou de novo durante a atualização (mark_dirty incrementa a geração);
+            # senão o médico continua desatualizado e a próxima atualização refaz a janela
+            for generation, pks in to_clear.items():
+                AvailabilitySync.objects.filter(pk__in=pks, dirty_generation=generation).update(dirty=False)
+
+    # ── Métricas ───────────────────────────────────────────────────────────
+
+    def staleness(self) -> Dict[str, Any]:
+        """
+        Métricas de atualidade da agenda materializada
+
+        Returns:
+            Dict com médicos materializados, desatualizados, marcados (dirty),
+            idade máxima/média das sincronizações (s) e acertos/falhas das consultas
+        """
+        now = timezone.now()
+        stale_before = now - self.max_staleness
+        summary = AvailabilitySync.objects.aggregate(
+            doctors=Count('id'),
+            dirty=Count('id', filter=Q(dirty=True)),
+            stale=Count('id', filter=Q(synced_at__lt=stale_before)),
+            oldest=Min('synced_at'),
+            window_end=Min('window_end'),
+        )
+        ages = [(now - synced_at).total_seconds()
+                for synced_at in AvailabilitySync.objects.values_list('synced_at', flat=True)]
+
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            'doctors': summary['doctors'],
+            'dirty': summary['dirty'],
+            'stale': summary['stale'],
+            'max_age_seconds': round((now - summary['oldest']).total_seconds(), 1) if summary['oldest'] else None,
+            'avg_age_seconds': round(sum(ages) / len(ages), 1) if ages else None,
+            'window_end': summary['window_end'].isoformat() if summary['window_end'] else None,
+            'slots': AvailabilitySlot.objects.count(),
+            'max_staleness_seconds': self.max_staleness.total_seconds(),
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / lookups, 3) if lookups else None,
+        }
+
+
+# Instância global do serviço
+availability_store = AvailabilityStore()
@@ -0,0 +1,223 @@
+"""
+Eventos do calendário único da clínica separados por médico e por dia
+
+Responsável por:
+- Converter cada evento do Google Calendar, uma única vez, em registros
+  compactos (médico, dia, início e fim em minutos do dia, no fuso local);
+  eventos que atravessam a meia-noite viram um registro por dia
+- Identificar o médico do evento com um índice token -> médicos montado a
+  partir dos nomes (sem acentos nem títulos, ver rag_agent.text): vence o
+  médico com mais tokens do nome no título ("Dr. João Carvalho - Consulta");
+  a descrição só é usada quando o título não cita nenhum médico
+- Agrupar em uma passada: médico -> dia -> eventos, de forma que calcular a
+  disponibilidade seja linear no número de eventos
+
+Uso:
+    from .calendar_events import partition_events
+
+    by_doctor = partition_events(events, ['Dr. João Carvalho', 'Dra. Maria Santos'])
+    for event in by_doctor['Dr. João Carvalho'].get(date(2026, 3, 2), []):
+        event.overlaps(9 * 60, 9 * 60 + 30)
+"""
+
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.utils import timezone
+
+from rag_agent.text import tokenize_name
+
+logger = logging.getLogger(__name__)
+
+MINUTES_PER_DAY = 24 * 60
+MIN_EVENT_MINUTES = 30  # eventos sem fim ocupam um horário
+
+# médico -> dia -> eventos do dia
+EventsByDay = Dict[date, List['CalendarEvent']]
+
+
+class CalendarEvent:
+    """Trecho de um evento em um dia (minutos desde a meia-noite local)"""
+
+    __slots__ = ('id', 'day', 'start', 'end', 'cancelled')
+
+    def __init__(self, event_id: str, day: date, start: int, end: int, cancelled: bool = False):
+        self.id = event_id
+        self.day = day
+        self.start = start
+        self.end = end
+        self.cancelled = cancelled
+
+    def overlaps(self, start: int, end: int) -> bool:
+        """Se o evento ocupa algum minuto de [start, end)"""
+        return self.start < end and self.end > start
+
+    def __repr__(self):
+        return f"CalendarEvent({self.id!r}, {self.day}, {self.start}-{self.end})"
+
+
+def _parse_datetime(value: str, tz) -> datetime:
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).astimezone(tz)
+
+
+def event_interval(event: Dict, tz) -> Optional[Tuple[datetime, datetime]]:
+    """
+    Início e fim do evento no fuso local (eventos de dia inteiro ocupam o dia todo)
+
+    Args:
+        event: Evento do Google Calendar
+        tz: Fuso local
+
+    Returns:
+        (início, fim) ou None se o evento não tem data válida
+    """
+    start = event.get('start') or {}
+    end = event.get('end') or {}
+    try:
+        if start.get('dateTime'):
+            start_dt = _parse_datetime(start['dateTime'], tz)
+            end_dt = _parse_datetime(end['dateTime'], tz) if end.get('dateTime') else start_dt
+            return start_dt, max(end_dt, start_dt + timedelta(minutes=MIN_EVENT_MINUTES))
+        if start.get('date'):
+            start_day = date.fromisoformat(start['date'])
+            end_day = date.fromisoformat(end['date']) if end.get('date') else start_day + timedelta(days=1)
+            return (datetime.combine(start_day, datetime.min.time(), tzinfo=tz),
+                    datetime.combine(end_day, datetime.min.time(), tzinfo=tz))
+    except ValueError as e:
+        logger.warning(f"⚠️ Evento com data inválida ignorado ({event.get('id')}): {e}")
+    return None
+
+
+def split_by_day(event: Dict, tz) -> List[CalendarEvent]:
+    """
+    Registros compactos do evento, um por dia que ele ocupa
+
+    Args:
+        event: Evento do Google Calendar
+        tz: Fuso local
+
+    Returns:
+        Lista de CalendarEvent (vazia se o evento não tem data válida)
+    """
+    interval = event_interval(event, tz)
+    if not interval:
+        return []
+
+    start_dt, end_dt = interval
+    event_id = event.get('id', '')
+    cancelled = event.get('status') == 'cancelled'
+    records = []
+    day = start_dt.date()
+    start = start_dt.hour * 60 + start_dt.minute
+    while True:
+        next_midnight = datetime.combine(day + timedelta(days=1), datetime.min.time(), tzinfo=tz)
+        if end_dt <= next_midnight:
+            end = end_dt.hour * 60 + end_dt.minute + (MINUTES_PER_DAY if end_dt.date() > day else 0)
+            if end > start:
+                records.append(CalendarEvent(event_id, day, start, end, cancelled))
+            return records
+        records.append(CalendarEvent(event_id, day, start, MINUTES_PER_DAY, cancelled))
+        day += timedelta(days=1)
+        start = 0
+
+
+class DoctorMatcher:
+    """Índice token -> médicos para atribuir eventos a médicos"""
+
+    MAX_CACHED_TEXTS = 20000
+
+    def __init__(self, doctor_names: Iterable[str]):
+        self.names: List[str] = []
+        self._tokens: List[frozenset] = []
+        self._by_key: Dict[str, List[int]] = defaultdict(list)
+        # Títulos se repetem muito ("Dr. João Carvalho - Consulta"): resultado memorizado por texto
+        self._cache: Dict[str, Tuple[int, ...]] = {}
+        for doctor_name in doctor_names:
+            tokens = tokenize_name(doctor_name)
+            if not tokens:
+                continue
+            doctor_id = len(self.names)
+            self.names.append(doctor_name)
+            self._tokens.append(frozenset(tokens))
+            # Primeiro ou último nome identificam o médico sozinhos ("Dr. Gustavo", "Dra. Magno")
+            for token in {tokens[0], tokens[-1]}:
+                self._by_key[token].append(doctor_id)
+
+    def match(self, event: Dict) -> Tuple[int, ...]:
+        """
+        Médicos do evento (ids de self.names)
+
+        Args:
+            event: Evento do Google Calendar
+
+        Returns:
+            Ids dos médicos que melhor casam com o título (ou com a descrição,
+            se o título não cita ninguém); empates ficam com todos
+        """
+        for text in (event.get('summary'), event.get('description')):
+            if text:
+                doctor_ids = self._match_text(text)
+                if doctor_ids:
+                    return doctor_ids
+        return ()
+
+    def _match_text(self, text: str) -> Tuple[int, ...]:
+        cached = self._cache.get(text)
+        if cached is not None:
+            return cached
+
+        tokens = frozenset(tokenize_name(text))
+        best_score, best_ids = None, []
+        for doctor_id in {doctor_id for token in tokens for doctor_id in self._by_key.get(token, ())}:
+            name_tokens = self._tokens[doctor_id]
+            # Mais tokens do nome citados; no empate, menos tokens do nome ausentes
+            score = (len(name_tokens & tokens), -len(name_tokens - tokens))
+            if best_score is None or score > best_score:
+                best_score, best_ids = score, [doctor_id]
+            elif score == best_score:
+                best_ids.append(doctor_id)
+
+        doctor_ids = tuple(best_ids)
+        if len(self._cache) >= self.MAX_CACHED_TEXTS:
+            self._cache.clear()
+        self._cache[text] = doctor_ids
+        return doctor_ids
+
+
+@lru_cache(maxsize=32)
+def _matcher_for(doctor_names: Tuple[str, ...]) -> DoctorMatcher:
+    return DoctorMatcher(doctor_names)
+
+
+def partition_events(events: Iterable[Dict], doctor_names: Iterable[str], tz=None) -> Dict[str, EventsByDay]:
+    """
+    Separa os eventos por médico e por dia em uma passada
+
+    Cada evento é convertido uma vez; eventos sem médico identificado são ignorados.
+
+    Args:
+        events: Eventos do calendário único
+        doctor_names: Nomes dos médicos
+        tz: Fuso local (padrão: o fuso atual do Django)
+
+    Returns:
+        Dict nome do médico -> {dia: [CalendarEvent]} (todos os médicos informados presentes)
+    """
+    tz = tz or timezone.get_current_timezone()
+    matcher = _matcher_for(tuple(doctor_names))
+    buckets: List[EventsByDay] = [defaultdict(list) for _ in matcher.names]
+
+    for event in events:
+        doctor_ids = matcher.match(event)
+        if not doctor_ids:
+            continue
+        for record in split_by_day(event, tz):
+            for doctor_id in doctor_ids:
+                buckets[doctor_id][record.day].append(record)
+
+    partitioned = {doctor_name: {} for doctor_name in doctor_names}
+    partitioned.update((doctor_name, dict(by_day)) for doctor_name, by_day in zip(matcher.names, buckets))
+    return partitioned
@@ -0,0 +1,171 @@
+"""
+Container de serviços com construção sob demanda
+
+Responsável por:
+- Construir os serviços pesados (Gemini, WhatsApp, Google Calendar, TokenMonitor)
+  apenas no primeiro uso, uma única vez por processo, de forma thread-safe
+- Adiar imports pesados (google.generativeai, googleapiclient) para fora do
+  import de api_gateway.views
+- Aquecer serviços e índices do catálogo em segundo plano na subida do
+  servidor (warm_up, chamado por core/wsgi.py e core/asgi.py)
+
+Uso:
+    from .services.container import lazy_service, services
+
+    gemini_chatbot_service = lazy_service('gemini_chatbot')   # proxy, construído no primeiro acesso
+    services.get('whatsapp').send_message(...)
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional, Union
+
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+def configure_genai():
+    """Importa e configura o SDK do Gemini uma única vez (antes: genai.configure em cada módulo)"""
+    import google.generativeai as genai
+
+    api_key = getattr(settings, 'GEMINI_API_KEY', '')
+    if api_key:
+        genai.configure(api_key=api_key)
+    return genai
+
+
+def warm_catalog():
+    """Constrói os índices em memória do catálogo (médicos, especialidades, trechos)"""
+    from rag_agent.doctor_index import doctor_index
+    from rag_agent.retrieval import retrieval_index
+    from rag_agent.specialty_index import specialty_index
+
+    for index in (doctor_index, specialty_index, retrieval_index):
+        index.warm()
+
+
+# Serviços registrados: nome -> caminho da classe/função (importada só na construção)
+DEFAULT_SERVICES = {
+    'genai': 'api_gateway.services.container.configure_genai',
+    'token_monitor': 'api_gateway.services.token_monitor.TokenMonitor',
+    'whatsapp': 'api_gateway.services.whatsapp_service.WhatsAppService',
+    'google_calendar': 'api_gateway.services.google_calendar_service.GoogleCalendarService',
+    'gemini_chatbot': 'api_gateway.services.gemini.GeminiChatbotService',
+}
+
+# Ordem do aquecimento ('catalog' não é um serviço: só constrói os índices)
+DEFAULT_WARMUP = ('catalog', 'genai', 'token_monitor', 'whatsapp', 'google_calendar', 'gemini_chatbot')
+
+
+class ServiceContainer:
+    """Registro de fábricas com instâncias únicas construídas sob demanda"""
+
+    def __init__(self, factories: Optional[Dict[str, Union[str, Callable[[], Any]]]] = None):
+        self._factories: Dict[str, Union[str, Callable[[], Any]]] = dict(factories or {})
+        self._instances: Dict[str, Any] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._registry_lock = threading.Lock()
+        self.build_times: Dict[str, float] = {}
+        self._warmup_thread: Optional[threading.Thread] = None
+
+    def register(self, name: str, factory: Union[str, Callable[[], Any]]):
+        """
+        Registra (ou substitui) uma fábrica
+
+        Args:
+            name: Nome do serviço
+            factory: Callable sem argumentos ou caminho 'modulo.Classe'
+        """
+        with self._registry_lock:
+            self._factories[name] = factory
+            self._instances.pop(name, None)
+
+    def get(self, name: str) -> Any:
+        """
+        Instância do serviço (construída no primeiro acesso)
+
+        Raises:
+            KeyError: Serviço não registrado
+        """
+        try:
+            return self._instances[name]
+        except KeyError:
+            pass
+
+        with self._registry_lock:
+            factory = self._factories[name]
+            lock = self._locks.setdefault(name, threading.Lock())
+
+        with lock:
+            # Outra thread pode ter construído enquanto esperávamos
+            if name not in self._instances:
+                if isinstance(factory, str):
+                    factory = import_string(factory)
+                start = time.perf_counter()
+                self._instances[name] = factory()
+                self.build_times[name] = (time.perf_counter() - start) * 1000
+                logger.debug("🧩 Serviço %s construído em %.0fms", name, self.build_times[name])
+        return self._instances[name]
+
+    def is_built(self, name: str) -> bool:
+        return name in self._instances
+
+    def reset(self, name: Optional[str] = None):
+        """Descarta instâncias (uma ou todas); a próxima chamada a get() reconstrói"""
+        with self._registry_lock:
+            if name is None:
+                self._instances.clear()
+            else:
+                self._instances.pop(name, None)
+
+    def warm_up(self, names: Iterable[str] = DEFAULT_WARMUP, background: bool = True) -> Optional[threading.Thread]:
+        """
+        Constrói serviços e índices antes da primeira requisição
+
+        Args:
+            names: Serviços a construir ('catalog' constrói os índices do catálogo)
+            background: Se True, roda em uma thread daemon e retorna imediatamente
+
+        Returns:
+            Thread do aquecimento (None se síncrono)
+        """
+        names = tuple(names)
+
+        def run():
+            start = time.perf_counter()
+            for name in names:
+                try:
+                    if name == 'catalog':
+                        warm_catalog()
+                    else:
+                        self.get(name)
+                except Exception as e:
+                    logger.error(f"❌ Erro ao aquecer {name}: {e}")
+            logger.info("🔥 Serviços aquecidos em %.0fms: %s", (time.perf_counter() - start) * 1000, ', '.join(names))
+
+        if not background:
+            run()
+            return None
+        if self._warmup_thread is None or not self._warmup_thread.is_alive():
+            self._warmup_thread = threading.Thread(target=run, name='services-warmup', daemon=True)
+            self._warmup_thread.start()
+        return self._warmup_thread
+
+
+def lazy_service(name: str) -> SimpleLazyObject:
+    """Proxy que resolve services.get(name) no primeiro acesso a um atributo"""
+    return SimpleLazyObject(lambda: services.get(name))
+
+
+def warm_up_on_startup():
+    """Aquecimento na subida do servidor (core/wsgi.py, core/asgi.py), controlado por SERVICES_WARMUP"""
+    if getattr(settings, 'SERVICES_WARMUP', True):
+        services.warm_up(background=True)
+
+
+# Instância global do container
+services = ServiceContainer(DEFAULT_SERVICES)
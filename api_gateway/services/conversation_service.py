@@ -5,13 +5,13 @@ Gerencia conversas de agendamento de forma persistente
 import json
 import logging
 import re
-from datetime import datetime, timedelta
 from typing import Any, Dict, List, Optional, Tuple
 
 from django.core.cache import cache
 from django.utils import timezone
 
 from ..models import ConversationMessage, ConversationSession
+from .datetime_parser import parse_date
 
 ''
 logger = logging.getLogger(__name__)
@@ -31,6 +31,10 @@ class ConversationService:
         Obtém ou cria uma sessão de conversa
         """
         try:
+            # Gravar alterações pendentes do write-behind antes de ler o banco
+            from .session_persistence import session_write_behind
+            session_write_behind.flush(phone_number)
+            
             session, created = ConversationSession.objects.get_or_create(
                 phone_number=phone_number,
                 defaults={
@@ -53,17 +57,53 @@ class ConversationService:
                 current_state='idle'
             )
     
+    def _get_cached_session(self, phone_number: str, session: Optional[Dict] = None) -> Dict[str, Any]:
+        """
+        Retorna a sessão autoritativa do turno (dict em cache do SessionManager)
+        
+        Args:
+            phone_number: Número do telefone
+            session: Sessão já carregada no turno (evita nova leitura)
+            
+        Returns:
+            Dict com dados da sessão
+        """
+        if session is not None:
+            return session
+        from .gemini.session_manager import SessionManager
+        return SessionManager().get_or_create_session(phone_number)
+    
+    def _save_cached_session(self, phone_number: str, session: Dict):
+        """Salva a sessão em cache e agenda a persistência dos campos alterados"""
+        from .gemini.session_manager import SessionManager
+        SessionManager().save_session(phone_number, session)
+    
     def add_message(self, 
                    phone_number: str, 
                    content: str, 
                    message_type: str = 'user',
                    intent: str = None,
                    confidence: float = None,
-                   entities: Dict = None) -> ConversationMessage:
+                   entities: Dict = None,
+                   session: Optional[Dict] = None) -> ConversationMessage:
         """
         Adiciona uma mensagem à conversa
+        
+        Quando a sessão do turno (dict em cache) é informada, o estado já foi
+        decidido pelo SessionManager: a mensagem é gravada direto pelo ID da
+        sessão, sem reler nem reescrever a linha de ConversationSession.
         """
         try:
+            if session is not None:
+                return ConversationMessage.objects.create(
+                    session_id=self.get_session_id(phone_number, session, create=True),
+                    message_type=message_type,
+                    content=content,
+                    intent=intent,
+                    confidence=confidence,
+                    entities=entities or {}
+                )
+            
             session = self.get_or_create_session(phone_number)
             
             message = ConversationMessage.objects.create(
@@ -84,17 +124,62 @@ class ConversationService:
             logger.error(f"Erro ao adicionar mensagem: {e}")
             raise
     
-    def get_conversation_history(self, phone_number: str, limit: int = 10) -> List[Dict]:
+    def get_session_id(self, phone_number: str, session: Dict, create: bool = False) -> Optional[int]:
+        """
+        Obtém o ID de ConversationSession da sessão em cache (memorizado no dict)
+        
+        Args:
+            phone_number: Número do telefone
+            session: Sessão do turno
+            create: Se True, garante que a linha exista no banco
+            
+        Returns:
+            ID da sessão no banco ou None se ainda não existir
+        """
+        session_id = session.get('_db_id')
+        if session_id:
+            return session_id
+        
+        if create:
+            # Gravar pendências (inclusive criação da linha) antes de obter o ID
+            from .session_persistence import session_write_behind
+            session_write_behind.persist(phone_number, session, force=True)
+            session_write_behind.flush(phone_number)
+        
+        session_id = ConversationSession.objects.filter(
+            phone_number=phone_number
+        ).values_list('id', flat=True).first()
+        
+        if session_id is None and create:
+            session_id = self.get_or_create_session(phone_number).id
+        if session_id:
+            session['_db_id'] = session_id
+        return session_id
+    
+    def get_conversation_history(self, phone_number: str, limit: int = 10,
+                                 session: Optional[Dict] = None) -> List[Dict]:
         """
         Obtém histórico da conversa
+        
+        Args:
+            phone_number: Número do telefone
+            limit: Limite de mensagens
+            session: Sessão do turno (evita ler/atualizar a linha da sessão)
         """
         try:
-            session = self.get_or_create_session(phone_number)
-            messages = session.messages.all()[:limit]
-            # O Django automaticamente:
-            # 1. Busca todas as ConversationMessage onde session_id = session.id
-            # 2. Aplica o limite especificado
-            # 3. Retorna um QuerySet das mensagens
+            if session is not None:
+                session_id = self.get_session_id(phone_number, session)
+                if not session_id:
+                    # Sessão ainda não persistida: não há histórico
+                    return []
+            else:
+                session_id = self.get_or_create_session(phone_number).id
+            
+            # Últimas N mensagens (índice session+timestamp), devolvidas em ordem cronológica
+            messages = list(
+                ConversationMessage.objects.filter(session_id=session_id).order_by('-timestamp')[:limit]
+            )
+            messages.reverse()
             
             # Cria um dicionário para cada mensagem
             return [
@@ -210,56 +295,63 @@ class ConversationService:
                 session.save()
     
     
-    def get_missing_appointment_info(self, phone_number: str) -> Dict[str, Any]:
+    def get_missing_appointment_info(self, phone_number: str, session: Optional[Dict] = None) -> Dict[str, Any]:
         """
         Verifica quais informações faltam para completar o agendamento
         VALIDA se especialidade e médico salvos são válidos no banco
         
         Args:
             phone_number: Número do telefone
+            session: Sessão do turno (carregada do cache se não informada)
             
         Returns:
             Dict com informações faltantes e próxima ação sugerida
         """
         try:
-            session = self.get_or_create_session(phone_number)
+            session = self._get_cached_session(phone_number, session)
             
             missing_info = []
+            session_changed = False
             
             # Verificar informações obrigatórias
-            if not session.patient_name:
+            if not session.get('patient_name'):
                 missing_info.append('patient_name')
             
             # VALIDAR especialidade salva (pode estar inválida)
-            if not session.selected_specialty:
+            selected_specialty = session.get('selected_specialty')
+            if not selected_specialty:
                 missing_info.append('selected_specialty')
             else:
                 # Validar se especialidade salva existe no banco
-                if not self._validate_specialty_in_db(session.selected_specialty):
-                    logger.warning(f"⚠️ Especialidade salva '{session.selected_specialty}' é inválida. Considerando como faltante.")
+                if not self._validate_specialty_in_db(selected_specialty):
+                    logger.warning(f"⚠️ Especialidade salva '{selected_specialty}' é inválida. Considerando como faltante.")
                     missing_info.append('selected_specialty')
                     # Limpar especialidade inválida
-                    session.selected_specialty = None
-                    session.save()
+                    session['selected_specialty'] = None
+                    session_changed = True
             
             # VALIDAR médico salvo (pode estar inválido)
-            if not session.selected_doctor:
+            selected_doctor = session.get('selected_doctor')
+            if not selected_doctor:
                 missing_info.append('selected_doctor')
             else:
                 # Validar se médico salvo existe no banco
-                if not self._validate_doctor_in_db(session.selected_doctor, session.selected_specialty):
-                    logger.warning(f"⚠️ Médico salvo '{session.selected_doctor}' é inválido. Considerando como faltante.")
+                if not self._validate_doctor_in_db(selected_doctor, session.get('selected_specialty')):
+                    logger.warning(f"⚠️ Médico salvo '{selected_doctor}' é inválido. Considerando como faltante.")
                     missing_info.append('selected_doctor')
                     # Limpar médico inválido
-                    session.selected_doctor = None
-                    session.save()
+                    session['selected_doctor'] = None
+                    session_changed = True
             
-            if not session.preferred_date:
+            if not session.get('preferred_date'):
                 missing_info.append('preferred_date')
             
-            if not session.preferred_time:
+            if not session.get('preferred_time'):
                 missing_info.append('preferred_time')
             
+            if session_changed:
+                self._save_cached_session(phone_number, session)
+            
             # Determinar próxima ação
             next_action = self._get_next_action(missing_info)
             
@@ -267,7 +359,7 @@ class ConversationService:
                 'missing_info': missing_info,
                 'next_action': next_action,
                 'is_complete': len(missing_info) == 0,
-                'current_state': session.current_state
+                'current_state': session.get('current_state', 'idle')
             }
             
         except Exception as e:
@@ -279,27 +371,28 @@ class ConversationService:
                 'current_state': 'idle'
             }
     
-    def pause_for_question(self, phone_number: str) -> bool:
+    def pause_for_question(self, phone_number: str, session: Optional[Dict] = None) -> bool:
         """
         Pausa o fluxo de agendamento para responder dúvidas
         Salva o estado atual para retornar depois
         
         Args:
             phone_number: Número do telefone
+            session: Sessão do turno (carregada do cache se não informada)
             
         Returns:
             True se pausou com sucesso
         """
         try:
-            session = self.get_or_create_session(phone_number)
+            session = self._get_cached_session(phone_number, session)
             
             # Salvar estado atual antes de pausar
-            if session.current_state != 'answering_questions':
-                session.previous_state = session.current_state
-                session.current_state = 'answering_questions'
-                session.save()
+            if session.get('current_state') != 'answering_questions':
+                session['previous_state'] = session.get('current_state')
+                session['current_state'] = 'answering_questions'
+                self._save_cached_session(phone_number, session)
                 
-                logger.info(f"⏸️ Agendamento pausado para dúvidas. Estado anterior: {session.previous_state}")
+                logger.info(f"⏸️ Agendamento pausado para dúvidas. Estado anterior: {session['previous_state']}")
                 return True
             
             return False
@@ -308,30 +401,31 @@ class ConversationService:
             logger.error(f"Erro ao pausar para dúvidas: {e}")
             return False
     
-    def resume_appointment(self, phone_number: str) -> Dict[str, Any]:
+    def resume_appointment(self, phone_number: str, session: Optional[Dict] = None) -> Dict[str, Any]:
         """
         Retoma o fluxo de agendamento após responder dúvidas
         
         Args:
             phone_number: Número do telefone
+            session: Sessão do turno (carregada do cache se não informada)
             
         Returns:
             Dict com informações sobre o retorno
         """
         try:
-            session = self.get_or_create_session(phone_number)
+            session = self._get_cached_session(phone_number, session)
             
-            if session.current_state == 'answering_questions' and session.previous_state:
+            if session.get('current_state') == 'answering_questions' and session.get('previous_state'):
                 # Restaurar estado anterior
-                restored_state = session.previous_state
-                session.current_state = restored_state
-                session.previous_state = None
-                session.save()
+                restored_state = session['previous_state']
+                session['current_state'] = restored_state
+                session['previous_state'] = None
+                self._save_cached_session(phone_number, session)
                 
                 logger.info(f"▶️ Agendamento retomado. Estado restaurado: {restored_state}")
                 
                 # Obter próxima pergunta do fluxo
-                next_question = self.get_next_question(phone_number)
+                next_question = self.get_next_question(phone_number, session)
                 
                 return {
                     'resumed': True,
@@ -352,49 +446,50 @@ class ConversationService:
                 'message': 'Ocorreu um erro ao retomar o agendamento.'
             }
 
-    def has_paused_appointment(self, phone_number: str) -> bool:
+    def has_paused_appointment(self, phone_number: str, session: Optional[Dict] = None) -> bool:
         """
         Verifica se há um agendamento pausado
         
         Args:
             phone_number: Número do telefone
+            session: Sessão do turno (carregada do cache se não informada)
             
         Returns:
             True se há agendamento pausado
         """
         try:
-            session = self.get_or_create_session(phone_number)
-            return session.current_state == 'answering_questions' and session.previous_state is not None
+            session = self._get_cached_session(phone_number, session)
+            return session.get('current_state') == 'answering_questions' and session.get('previous_state') is not None
         except:
             return False
     
-    def get_next_question(self, phone_number: str) -> Optional[str]:
+    def get_next_question(self, phone_number: str, session: Optional[Dict] = None) -> Optional[str]:
         """
         Gera a próxima pergunta apropriada baseada nas informações faltantes
         
         Args:
             phone_number: Número do telefone
+            session: Sessão do turno (carregada do cache se não informada)
             
         Returns:
             Próxima pergunta sugerida ou None
         """
         try:
-            missing_info_result = self.get_missing_appointment_info(phone_number)
+            session = self._get_cached_session(phone_number, session)
+            missing_info_result = self.get_missing_appointment_info(phone_number, session)
             
             if missing_info_result['is_complete']:
                 return None
             
             action = missing_info_result['next_action']
-            session = self.get_or_create_session(phone_number)
-            patient_name = session.patient_name or 'paciente'
-            current_state = session.current_state
+            patient_name = session.get('patient_name') or 'paciente'
             
             # Mensagens baseadas na próxima ação, considerando o estado atual
             # Se já temos nome, não perguntar novamente
             if action == 'ask_name' and patient_name:
                 # Se já tem nome, pular para próxima ação
-                if session.selected_specialty:
-                    action = 'ask_doctor' if not session.selected_doctor else 'ask_date'
+                if session.get('selected_specialty'):
+                    action = 'ask_doctor' if not session.get('selected_doctor') else 'ask_date'
                 else:
                     action = 'ask_specialty'
             
@@ -423,29 +518,12 @@ class ConversationService:
             True se especialidade é válida, False caso contrário
         """
         try:
-            from rag_agent.models import Especialidade
+            from rag_agent.specialty_index import specialty_index
             
             if not specialty_name:
                 return False
             
-            specialty_name_lower = specialty_name.lower().strip()
-            
-            # Busca exata (case-insensitive)
-            especialidade = Especialidade.objects.filter(
-                nome__iexact=specialty_name_lower,
-                ativa=True
-            ).first()
-            
-            if especialidade:
-                return True
-            
-            # Busca parcial (contém)
-            especialidade = Especialidade.objects.filter(
-                nome__icontains=specialty_name_lower,
-                ativa=True
-            ).first()
-            
-            return especialidade is not None
+            return specialty_index.resolve(specialty_name) is not None
             
         except Exception as e:
             logger.error(f"Erro ao validar especialidade '{specialty_name}': {e}")
@@ -463,38 +541,12 @@ class ConversationService:
             True se médico é válido, False caso contrário
         """
         try:
-            from rag_agent.models import Medico
+            from rag_agent.doctor_index import doctor_index
             
             if not doctor_name:
                 return False
             
-            doctor_name_lower = doctor_name.lower().strip()
-            
-            # Buscar médico diretamente no banco (mais confiável que via serializer)
-            medicos = Medico.objects.prefetch_related('especialidades').all()
-            
-            # Buscar médico por nome (busca flexível)
-            for medico in medicos:
-                medico_name = medico.nome
-                medico_name_lower = medico_name.lower()
-                
-                # Busca exata ou parcial
-                if (doctor_name_lower in medico_name_lower or 
-                    medico_name_lower in doctor_name_lower):
-                    
-                    # Se especialidade foi fornecida, validar se médico tem essa especialidade
-                    if specialty:
-                        # Buscar especialidades do médico diretamente do banco
-                        especialidades_medico = medico.especialidades.filter(ativa=True)
-                        especialidades_nomes = [esp.nome.lower() for esp in especialidades_medico]
-                        specialty_lower = specialty.lower()
-                        
-                        if specialty_lower not in especialidades_nomes:
-                            continue
-                    
-                    return True
-            
-            return False
+            return doctor_index.resolve(doctor_name, specialty=specialty) is not None
             
         except Exception as e:
             logger.error(f"Erro ao validar médico '{doctor_name}': {e}")
@@ -539,15 +591,21 @@ class ConversationService:
             return 'ask_general'
     
 
-    def confirm_patient_name(self, phone_number: str, confirmation: str) -> Dict[str, Any]:
+    def confirm_patient_name(self, phone_number: str, confirmation: str,
+                             session: Optional[Dict] = None) -> Dict[str, Any]:
         """
         Confirma ou rejeita o nome do paciente
+        
+        Args:
+            phone_number: Número do telefone
+            confirmation: Mensagem de confirmação do usuário
+            session: Sessão do turno (carregada do cache se não informada)
         """
         try:
-            session = self.get_or_create_session(phone_number)
+            session = self._get_cached_session(phone_number, session)
             
             # Verificar se há nome pendente
-            if not session.pending_name:
+            if not session.get('pending_name'):
                 return {
                     'status': 'no_pending_name',
                     'message': 'Não há nome pendente de confirmação.'
@@ -557,20 +615,20 @@ class ConversationService:
             confirmation_lower = confirmation.lower()
             if any(word in confirmation_lower for word in ['sim', 's', 'yes', 'confirmo', 'correto', 'certo', 'isso']):
                 # Confirmar nome
-                session.patient_name = session.pending_name
-                session.name_confirmed = True
-                session.pending_name = None
-                session.save()
+                session['patient_name'] = session['pending_name']
+                session['name_confirmed'] = True
+                session['pending_name'] = None
+                self._save_cached_session(phone_number, session)
                 
                 return {
                     'status': 'confirmed',
-                    'message': f'Perfeito, {session.patient_name}! Como posso ajudá-lo hoje?',
-                    'patient_name': session.patient_name
+                    'message': f'Perfeito, {session["patient_name"]}! Como posso ajudá-lo hoje?',
+                    'patient_name': session['patient_name']
                 }
             else:
                 # Rejeitar nome
-                session.pending_name = None
-                session.save()
+                session['pending_name'] = None
+                self._save_cached_session(phone_number, session)
                 
                 return {
                     'status': 'rejected',
@@ -597,61 +655,14 @@ class ConversationService:
         """
         if not date_str:
             return None
-            
-        try:
-            from datetime import datetime, timedelta
-
-            from django.utils import timezone
-
-            date_lower = date_str.lower().strip()
-            
-            # Tratar palavras especiais primeiro
-            today = timezone.now().date()
-            
-            if 'hoje' in date_lower:
-                return today.strftime('%Y-%m-%d')
-            elif 'amanhã' in date_lower or 'amanha' in date_lower:
-                tomorrow = today + timedelta(days=1)
-                return tomorrow.strftime('%Y-%m-%d')
-            elif 'depois de amanhã' in date_lower or 'depois de amanha' in date_lower:
-                day_after = today + timedelta(days=2)
-                return day_after.strftime('%Y-%m-%d')
-            elif any(day in date_lower for day in ['segunda', 'terça', 'quarta', 'quinta', 'sexta', 'sábado', 'domingo']):
-                # Para dias da semana, usar a lógica do smart_scheduling_service
-                from .smart_scheduling_service import SmartSchedulingService
-                smart_service = SmartSchedulingService()
-                parsed_date = smart_service._parse_date(date_str)
-                if parsed_date:
-                    return parsed_date.strftime('%Y-%m-%d')
-
-            # Tentar diferentes formatos de data
-            date_formats = [
-                '%d/%m/%Y',  # 15/09/2024
-                '%d/%m/%y',  # 15/09/24
-                '%d-%m-%Y',  # 15-09-2024
-                '%Y-%m-%d',  # 2024-09-15
-                '%d/%m',     # 15/09 (assumir ano atual)
-            ]
-            
-            for fmt in date_formats:
-                try:
-                    parsed_date = datetime.strptime(date_str, fmt)
-                    
-                    # Se não tem ano, assumir ano atual
-                    if fmt == '%d/%m':
-                        parsed_date = parsed_date.replace(year=datetime.now().year)
-                    
-                    return parsed_date.strftime('%Y-%m-%d')
-                except ValueError:
-                    continue
-            
-            # Se não conseguiu fazer parse, retornar string original
-            logger.warning(f"Data não pôde ser normalizada: {date_str}")
-            return date_str
-            
-        except Exception as e:
-            logger.error(f"Erro ao normalizar data '{date_str}': {e}")
-            return date_str
+        
+        parsed_date = parse_date(date_str)
+        if parsed_date:
+            return parsed_date.strftime('%Y-%m-%d')
+        
+        # Se não conseguiu fazer parse, retornar string original
+        logger.warning(f"Data não pôde ser normalizada: {date_str}")
+        return date_str
 
 # Instância global do serviço
 conversation_service = ConversationService()
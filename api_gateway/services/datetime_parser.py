@@ -0,0 +1,230 @@
+"""
+Interpretação de datas e horários em português (PT-BR)
+
+Responsável por:
+- Converter expressões absolutas e relativas de data ("25/10", "25/10/2025",
+  "2025-10-25", "25 de outubro", "Sexta (10/10/2025)", "hoje", "amanhã",
+  "depois de amanhã", "sexta", "sexta que vem", "dia 20", "dia 20 às 14h") em date
+- Converter expressões de horário ("14:30", "às 14h30", "14h", "14 horas",
+  "2 da tarde", "2:30 PM", "8") em time
+- Memorizar os resultados (LRU): datas pela chave (texto, hoje), para que
+  expressões relativas mudem com o dia; horários pelo texto
+
+Datas em DD/MM sem ano usam o ano atual. Dias da semana ("sexta", "sexta que
+vem", "próxima sexta") são a próxima ocorrência depois de hoje. Um número
+isolado é o dia do mês (deste mês, ou do próximo se já passou). Hora sem
+minutos nem período ("às 2", "3") entre 1 e 6 é da tarde: a clínica não
+atende de madrugada ("2 da manhã" continua 02:00).
+
+Uso:
+    from .datetime_parser import parse_date, parse_time
+
+    parse_date('sexta que vem')  # date ou None
+    parse_time('às 14h30')       # time(14, 30) ou None
+"""
+
+import re
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from time import monotonic
+from typing import Any, Dict, Optional
+
+from django.utils import timezone
+
+from rag_agent.text import fold_accents
+
+CACHE_SIZE = 4096
+
+WEEKDAYS = {'segunda': 0, 'terca': 1, 'quarta': 2, 'quinta': 3, 'sexta': 4, 'sabado': 5, 'domingo': 6}
+MONTHS = {
+    'janeiro': 1, 'fevereiro': 2, 'marco': 3, 'abril': 4, 'maio': 5, 'junho': 6,
+    'julho': 7, 'agosto': 8, 'setembro': 9, 'outubro': 10, 'novembro': 11, 'dezembro': 12,
+}
+
+_ISO_DATE_RE = re.compile(r'^(\d{4})-(\d{1,2})-(\d{1,2})')
+_NUMERIC_DATE_RE = re.compile(r'(?<!\d)(\d{1,2})[/.-](\d{1,2})(?:[/.-](\d{4}|\d{2}))?(?!\d)')
+_MONTH_NAME_DATE_RE = re.compile(r'(?<!\d)(\d{1,2})\s+de\s+(' + '|'.join(MONTHS) + r')(?:\s+de\s+(\d{4}))?')
+_WEEKDAY_RE = re.compile(r'\b(' + '|'.join(WEEKDAYS) + r')\b')
+_DAY_OF_MONTH_RE = re.compile(r'^(?:dia\s+)?(\d{1,2})$')
+
+_CLOCK_TIME_RE = re.compile(r'(?<!\d)(\d{1,2}):(\d{2})(?::\d{2})?(?!\d)')
+_HOUR_TIME_RE = re.compile(r'(?<!\d)(\d{1,2})\s*(?:horas|hora|hrs|hr|hs|h)\s*(\d{2})?(?!\d)')
+_AT_HOUR_RE = re.compile(r'\bas\s+(\d{1,2})(?!\d)')
+_BARE_HOUR_RE = re.compile(r'^(\d{1,2})(?:\s+(?:da|de)\s+(?:manha|tarde|noite))?$')
+_PERIOD_RE = re.compile(r'\b(pm|am|tarde|noite)\b')
+# Horário junto da data ("dia 20 às 14h"): removido antes de ler o dia do mês
+_TIME_PART_RE = re.compile(
+    r'(?:\bas\s+)?(?<!\d)\d{1,2}(?::\d{2}(?::\d{2})?|\s*(?:horas|hora|hrs|hr|hs|h)(?:\s*\d{2})?)(?!\d)'
+    r'|\bas\s+\d{1,2}(?!\d)'
+    r'|\b(?:da|de)\s+(?:manha|tarde|noite)\b|\b(?:pm|am)\b'
+)
+_MORNING_RE = re.compile(r'\bmanha\b')
+# "às 2" / "2": horas fora do expediente que só fazem sentido à tarde (13h às 18h)
+AFTERNOON_BARE_HOURS = range(1, 7)
+
+
+# Hoje no fuso padrão: (data, válida até em monotonic()); recalculada na virada do dia
+_today = (None, 0.0)
+
+
+def local_today() -> date:
+    """
+    Data de hoje no fuso padrão do projeto (TIME_ZONE)
+
+    timezone.localdate() custa ~10µs por chamada (fuso da thread atual); aqui a
+    data é recalculada só depois da meia-noite local.
+    """
+    global _today
+    today, valid_until = _today
+    if today is None or monotonic() >= valid_until:
+        now = timezone.localtime(timezone=timezone.get_default_timezone())
+        midnight = datetime.combine(now.date() + timedelta(days=1), time.min, tzinfo=now.tzinfo)
+        today = now.date()
+        _today = (today, monotonic() + (midnight - now).total_seconds())
+    return today
+
+
+def _safe_date(year: int, month: int, day: int) -> Optional[date]:
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+def _full_year(year: Optional[str], today: date) -> int:
+    if not year:
+        return today.year
+    return int(year) + 2000 if len(year) == 2 else int(year)
+
+
+def _day_of_month(day: int, today: date) -> Optional[date]:
+    """Dia do mês atual, ou do mês seguinte se já passou"""
+    result = _safe_date(today.year, today.month, day)
+    if result and result >= today:
+        return result
+    year, month = (today.year + 1, 1) if today.month == 12 else (today.year, today.month + 1)
+    return _safe_date(year, month, day)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse_date_text(text: str, today: date) -> Optional[date]:
+    folded = fold_accents(text).strip()
+    if not folded:
+        return None
+
+    match = _ISO_DATE_RE.match(folded)
+    if match:
+        return _safe_date(*(int(part) for part in match.groups()))
+
+    # Datas explícitas têm prioridade sobre palavras ("Sexta (10/10/2025)")
+    match = _NUMERIC_DATE_RE.search(folded)
+    if match:
+        day, month, year = match.groups()
+        return _safe_date(_full_year(year, today), int(month), int(day))
+
+    match = _MONTH_NAME_DATE_RE.search(folded)
+    if match:
+        day, month_name, year = match.groups()
+        return _safe_date(_full_year(year, today), MONTHS[month_name], int(day))
+
+    if 'depois de amanha' in folded:
+        return today + timedelta(days=2)
+    if 'amanha' in folded:
+        return today + timedelta(days=1)
+    if 'hoje' in folded:
+        return today
+
+    match = _WEEKDAY_RE.search(folded)
+    if match:
+        days_ahead = (WEEKDAYS[match.group(1)] - today.weekday()) % 7 or 7
+        return today + timedelta(days=days_ahead)
+
+    match = _DAY_OF_MONTH_RE.match(_TIME_PART_RE.sub(' ', folded).strip(' ,.;-'))
+    if match:
+        return _day_of_month(int(match.group(1)), today)
+
+    return None
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse_time_text(text: str) -> Optional[time]:
+    folded = fold_accents(text).strip()
+
+    minute = 0
+    match = _CLOCK_TIME_RE.search(folded)
+    if match:
+        hour, minute = int(match.group(1)), int(match.group(2))
+    else:
+        match = (_HOUR_TIME_RE.search(folded) or _AT_HOUR_RE.search(folded)
+                 or _BARE_HOUR_RE.match(folded))
+        if not match:
+            return None
+        hour = int(match.group(1))
+        if match.re is _HOUR_TIME_RE and match.group(2):
+            minute = int(match.group(2))
+
+    period = _PERIOD_RE.search(folded)
+    if period:
+        if period.group(1) == 'am':
+            hour = 0 if hour == 12 else hour
+        elif hour < 12:
+            hour += 12
+    elif (match.re in (_AT_HOUR_RE, _BARE_HOUR_RE) and hour in AFTERNOON_BARE_HOURS
+          and not _MORNING_RE.search(folded)):
+        hour += 12
+
+    if hour > 23 or minute > 59:
+        return None
+    return time(hour, minute)
+
+
+def parse_date(value: Any, today: Optional[date] = None) -> Optional[date]:
+    """
+    Converte uma expressão de data em date
+
+    Args:
+        value: Texto (absoluto ou relativo), date ou datetime
+        today: Data de referência para expressões relativas (padrão: local_today())
+
+    Returns:
+        date ou None se não foi possível interpretar
+    """
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if not isinstance(value, str):
+        return None
+    return _parse_date_text(value, today or local_today())
+
+
+def parse_time(value: Any) -> Optional[time]:
+    """
+    Converte uma expressão de horário em time (sem segundos)
+
+    Args:
+        value: Texto, time ou datetime
+
+    Returns:
+        time ou None se não foi possível interpretar
+    """
+    if isinstance(value, datetime):
+        return value.time().replace(second=0, microsecond=0)
+    if isinstance(value, time):
+        return value.replace(second=0, microsecond=0)
+    if not isinstance(value, str):
+        return None
+    return _parse_time_text(value)
+
+
+def cache_info() -> Dict[str, Any]:
+    """Estatísticas das memórias de datas e horários"""
+    return {'date': _parse_date_text.cache_info()._asdict(), 'time': _parse_time_text.cache_info()._asdict()}
+
+
+def clear_cache():
+    """Esvazia as memórias (benchmarks e testes)"""
+    global _today
+    _today = (None, 0.0)
+    _parse_date_text.cache_clear()
+    _parse_time_text.cache_clear()
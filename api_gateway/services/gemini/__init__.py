@@ -9,11 +9,17 @@ Este módulo contém os componentes especializados do chatbot:
 - GeminiChatbotService: Orquestrador principal
 """
 
-from .core_service import GeminiChatbotService
-from .entity_extractor import EntityExtractor
-from .intent_detector import IntentDetector
-from .response_generator import ResponseGenerator
-from .session_manager import SessionManager
+import importlib
+
+# Exportações carregadas sob demanda (PEP 562): importar um submódulo, como
+# gemini.session_manager, não carrega os demais nem o SDK do Gemini
+_EXPORTS = {
+    'GeminiChatbotService': '.core_service',
+    'IntentDetector': '.intent_detector',
+    'EntityExtractor': '.entity_extractor',
+    'ResponseGenerator': '.response_generator',
+    'SessionManager': '.session_manager',
+}
 
 __all__ = [
     'GeminiChatbotService',
@@ -23,3 +29,10 @@ __all__ = [
     'SessionManager',
 ]
 
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -7,14 +7,18 @@ Responsável por:
 - Coordenar fluxo de conversação
 """
 
+import asyncio
 import logging
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
 
 from ..conversation_service import conversation_service
+from ..datetime_parser import parse_date
 from ..handoff_service import handoff_service
 from ..rag_service import RAGService
+from ..slot_hold_service import slot_hold_service
 from ..smart_scheduling_service import smart_scheduling_service
 from .entity_extractor import EntityExtractor
 from .intent_detector import IntentDetector
@@ -73,365 +77,601 @@ class GeminiChatbotService:
         try:
             if not self.enabled:
                 return self._get_fallback_response(message)
-            # Django controla o fluxo:
-            # 1. Obter sessão
-            session = self.session_manager.get_or_create_session(phone_number)
-            logger.info(f"📊 Estado atual da sessão: {session.get('current_state')}")
             
-            # 2. Verificar se há agendamento pausado (sistema de dúvidas)
-            if conversation_service.has_paused_appointment(phone_number):
-                # Detectar palavras-chave para retomar
-                if any(keyword in message.lower() for keyword in ['continuar', 'retomar', 'voltar']):
-                    resume_result = conversation_service.resume_appointment(phone_number)
-                    
-                    # Atualizar sessão em memória para refletir o estado restaurado
-                    if resume_result.get('resumed'):
-                        session['current_state'] = resume_result.get('restored_state')
-                        session['previous_state'] = None
-                        logger.info(f"▶️ Sessão em memória atualizada após RETOMADA: current_state={session['current_state']}")
-                    
-                    return {
-                        'response': resume_result.get('message', '✅ Vamos continuar!'),
-                        'intent': 'retomar_agendamento',  #impotante para debbung
-                        'confidence': 1.0
-                    }
-            
-            # 3. Obter histórico e dados da clínica
-            conversation_history = self.session_manager.get_conversation_history(phone_number)
-            clinic_data = self._get_clinic_data_optimized()
+            # 1-3. Sessão, retomada de agendamento pausado, histórico e dados da clínica
+            session, conversation_history, clinic_data, early_response = self._start_turn(phone_number, message)
+            if early_response:
+                return early_response
             
             # 4. Detectar intenção (sem entidades)
             intent_result = self.intent_detector.analyze_message(
                 message, session, conversation_history, clinic_data
             )
             
-            logger.info(f"🔍 Intent detectado: {intent_result['intent']}, Confiança: {intent_result['confidence']}")
-            
             # 5. Extrair entidades (usando apenas Gemini - sem fallback)
             entities_result = self.entity_extractor.extract_entities(
                 message, session, conversation_history, clinic_data
             )
             
-            logger.info(f"📦 Entidades extraídas: {entities_result}")
+            # 6-11. Fluxo da conversa, resposta e histórico
+            return self._finish_turn(
+                phone_number, message, session, conversation_history, clinic_data, intent_result, entities_result
+            )
             
-            # 6. Combinar resultados
-            analysis_result = {
-                'intent': intent_result['intent'],
-                'next_state': intent_result['next_state'],
-                'confidence': intent_result['confidence'],
-                'entities': entities_result,
-                'reasoning': intent_result.get('reasoning', ''),
-                'raw_message': message  # 🔍 Guarda mensagem original para análises posteriores (pronome etc.)
-            }
-
-            # 6.1 Fluxo dedicado para confirmação precoce do nome do paciente
-            manual_name_response = self._handle_patient_name_flow(
-                phone_number=phone_number,
-                session=session,
-                message=message,
-                analysis_result=analysis_result
+        except Exception as e:
+            logger.error(f"❌ Erro ao processar mensagem: {e}")
+            import traceback
+            traceback.print_exc()
+            return self._get_fallback_response(message)
+    
+    async def aprocess_message(self, phone_number: str, message: str) -> Dict[str, Any]:
+        """
+        Versão assíncrona de process_message (webhook ASGI)
+        
+        Intenção e entidades são chamadas independentes ao Gemini e rodam em
+        paralelo (asyncio.gather com generate_content_async); a geração da resposta
+        também é aguardada no event loop. Sessão, banco, agenda e o restante do
+        fluxo continuam síncronos, em thread (sync_to_async).
+        
+        Args:
+            phone_number: Número do telefone do usuário
+            message: Mensagem do usuário
+            
+        Returns:
+            Dict com resposta e informações do processamento
+        """
+        try:
+            if not self.enabled:
+                return await sync_to_async(self._get_fallback_response)(message)
+            
+            session, conversation_history, clinic_data, early_response = await sync_to_async(self._start_turn)(
+                phone_number, message
             )
-            if manual_name_response:
-                response_result = manual_name_response
-
-                # Atualizar sessão com base no fluxo manual de nome
-                self.session_manager.update_session(
-                    phone_number, session, analysis_result, response_result
+            if early_response:
+                return early_response
+            
+            intent_result, entities_result = await asyncio.gather(
+                self.intent_detector.aanalyze_message(message, session, conversation_history, clinic_data),
+                self.entity_extractor.aextract_entities(message, session, conversation_history, clinic_data),
+            )
+            
+            analysis_result, response_result, final = await sync_to_async(self._prepare_turn)(
+                phone_number, message, session, conversation_history, clinic_data, intent_result, entities_result
+            )
+            if final:
+                return response_result
+            
+            generated = not response_result.get('response')
+            if generated:
+                response_result = await self.response_generator.agenerate_response(
+                    message, analysis_result, session, conversation_history, clinic_data
                 )
+            
+            return await sync_to_async(self._complete_turn)(
+                phone_number, message, session, clinic_data, analysis_result, response_result, generated
+            )
+            
+        except Exception as e:
+            logger.exception(f"❌ Erro ao processar mensagem: {e}")
+            return await sync_to_async(self._get_fallback_response)(message)
+    
+    def _start_turn(self, phone_number: str, message: str) -> Tuple[Dict, Optional[List], Optional[Dict], Optional[Dict]]:
+        """
+        Início do turno: sessão, agendamento pausado, histórico e dados da clínica
+        
+        Returns:
+            Tupla (session, conversation_history, clinic_data, resposta antecipada ou None)
+        """
+        # Django controla o fluxo:
+        # 1. Obter sessão
+        session = self.session_manager.get_or_create_session(phone_number)
+        logger.info("📊 Estado atual da sessão: %s", session.get('current_state'))
+        
+        # 2. Verificar se há agendamento pausado (sistema de dúvidas)
+        if conversation_service.has_paused_appointment(phone_number, session):
+            # Detectar palavras-chave para retomar
+            if any(keyword in message.lower() for keyword in ['continuar', 'retomar', 'voltar']):
+                # Retoma sobre a própria sessão do turno (cache e banco ficam consistentes)
+                resume_result = conversation_service.resume_appointment(phone_number, session)
+                
+                if resume_result.get('resumed'):
+                    logger.info("▶️ Sessão atualizada após RETOMADA: current_state=%s", session['current_state'])
+                
+                return session, None, None, {
+                    'response': resume_result.get('message', '✅ Vamos continuar!'),
+                    'intent': 'retomar_agendamento',  #impotante para debbung
+                    'confidence': 1.0
+                }
+        
+        # 3. Obter histórico e dados da clínica
+        conversation_history = self.session_manager.get_conversation_history(phone_number, session=session)
+        clinic_data = self._get_clinic_data_optimized()
+        
+        return session, conversation_history, clinic_data, None
+    
+    def _finish_turn(self, phone_number: str, message: str, session: Dict, conversation_history: List,
+                     clinic_data: Dict, intent_result: Dict, entities_result: Dict) -> Dict[str, Any]:
+        """
+        Restante do turno a partir da intenção e das entidades: fluxo da conversa,
+        geração da resposta, atualização da sessão e histórico
+        """
+        analysis_result, response_result, final = self._prepare_turn(
+            phone_number, message, session, conversation_history, clinic_data, intent_result, entities_result
+        )
+        if final:
+            return response_result
+        
+        # 10. Gerar resposta se ainda não foi gerada
+        generated = not response_result.get('response')
+        if generated:
+            response_result = self.response_generator.generate_response(
+                message, analysis_result, session, conversation_history, clinic_data
+            )
+        
+        return self._complete_turn(
+            phone_number, message, session, clinic_data, analysis_result, response_result, generated
+        )
+    
+    def _prepare_turn(self, phone_number: str, message: str, session: Dict, conversation_history: List,
+                      clinic_data: Dict, intent_result: Dict, entities_result: Dict) -> Tuple[Dict, Dict, bool]:
+        """
+        Fluxo da conversa até a geração da resposta (passos 6 a 9.5)
+        
+        Returns:
+            Tupla (analysis_result, response_result, final): final=True quando o fluxo
+            já produziu a resposta do turno (sessão e histórico já salvos); senão,
+            response_result vazio indica que a resposta deve ser gerada pelo Gemini
+        """
+        logger.info("🔍 Intent detectado: %s, Confiança: %s", intent_result['intent'], intent_result['confidence'])
+        logger.info("📦 Entidades extraídas: %s", entities_result)
+        
+        # 6. Combinar resultados
+        analysis_result = {
+            'intent': intent_result['intent'],
+            'next_state': intent_result['next_state'],
+            'confidence': intent_result['confidence'],
+            'entities': entities_result,
+            'reasoning': intent_result.get('reasoning', ''),
+            'raw_message': message  # 🔍 Guarda mensagem original para análises posteriores (pronome etc.)
+        }
 
-                # Salvar histórico e retornar imediatamente
-                self.session_manager.save_messages(
-                    phone_number, message, response_result['response'], analysis_result
-                )
+        # 6.1 Fluxo dedicado para confirmação precoce do nome do paciente
+        manual_name_response = self._handle_patient_name_flow(
+            phone_number=phone_number,
+            session=session,
+            message=message,
+            analysis_result=analysis_result
+        )
+        if manual_name_response:
+            response_result = manual_name_response
 
-                return response_result
+            # Atualizar sessão com base no fluxo manual de nome
+            self.session_manager.update_session(
+                phone_number, session, analysis_result, response_result
+            )
 
-            # 7. Detectar se usuário quer tirar dúvidas durante agendamento
-            # NÃO pausar se estiver confirmando (última etapa) ou em estados iniciais
-            if analysis_result['intent'] in ['buscar_info', 'duvida']:
-                # Só pausa se estiver no MEIO do agendamento (não no início nem no fim)
-                pausable_states = ['collecting_patient_info', 'selecting_specialty', 'selecting_doctor', 'choosing_schedule', 'confirming_name']
-                if session['current_state'] in pausable_states:
-                    # IMPORTANTE: Salvar o estado anterior ANTES de pausar
-                    # (porque pause_for_question já muda o current_state no banco)
-                    previous_state_before_pause = session['current_state']
-                    
-                    # Pausar agendamento (salva no banco)
-                    paused = conversation_service.pause_for_question(phone_number)
-                    if paused:
-                        # Atualizar variável session em memória para refletir a mudança
-                        session['previous_state'] = previous_state_before_pause
-                        session['current_state'] = 'answering_questions'
-                        logger.info(f"⏸️ Sessão em memória atualizada: current_state={session['current_state']}, previous_state={session['previous_state']}")
+            # Salvar histórico e retornar imediatamente
+            self.session_manager.save_messages(
+                phone_number, message, response_result['response'], analysis_result, session=session
+            )
+
+            return analysis_result, response_result, True
 
-            # 7.5. Verificar se usuário está perguntando explicitamente sobre disponibilidade
+        # 7. Detectar se usuário quer tirar dúvidas durante agendamento
+        # NÃO pausar se estiver confirmando (última etapa) ou em estados iniciais
+        if analysis_result['intent'] in ['buscar_info', 'duvida']:
+            # Só pausa se estiver no MEIO do agendamento (não no início nem no fim)
+            pausable_states = ['collecting_patient_info', 'selecting_specialty', 'selecting_doctor', 'choosing_schedule', 'confirming_name']
+            if session['current_state'] in pausable_states:
+                # Pausar agendamento (atualiza a sessão do turno e agenda persistência)
+                paused = conversation_service.pause_for_question(phone_number, session)
+                if paused:
+                    logger.info("⏸️ Sessão atualizada: current_state=%s, previous_state=%s", session['current_state'], session['previous_state'])
+
+        # 7.5. Verificar se usuário está perguntando explicitamente sobre disponibilidade
+        message_lower = message.lower()
+        asking_availability = any(word in message_lower for word in [
+            'quais horario', 'que horario', 'horario disponivel', 'horário disponível',
+            'quais os horario', 'quais sao os horario', 'quais são os horário',
+            'quais horarios', 'quais horários', 'que horarios', 'que horários',
+            'tem disponivel', 'tem disponível', 'está disponivel', 'está disponível',
+            'horarios disponiveis', 'horários disponíveis', 'livre', 'vago',
+            'datas disponiveis', 'datas disponíveis', 'quais datas', 'quais são as datas'
+        ])
+        
+        # Se está em choosing_schedule e tem médico, responder diretamente com horários disponíveis
+        if asking_availability and session.get('selected_doctor') and session.get('current_state') == 'choosing_schedule':
+            logger.info("🔍 DETECTADO: Usuário perguntando sobre disponibilidade no estado choosing_schedule")
+            doctor_name = session.get('selected_doctor')
+            date_filter = session.get('preferred_date')  # Pode ser None se não tiver data ainda
+            
+            # Consultar horários disponíveis
+            availability = smart_scheduling_service.get_doctor_availability(
+                doctor_name=doctor_name,
+                days_ahead=7,
+                date_filter=date_filter
+            )
+            
+            if availability.get('has_availability'):
+                days_info = availability.get('days_info', availability.get('days', []))
+                if days_info:
+                    if date_filter:
+                        # Se tem data específica, mostrar apenas esse dia
+                        day_info = days_info[0] if days_info else None
+                        if day_info:
+                            available_times = day_info.get('available_times', [])
+                            date_str = day_info.get('date')
+                            weekday = day_info.get('weekday')
+                            
+                            if available_times:
+                                response_text = f"📅 **Horários disponíveis para {weekday}, {date_str}:**\n\n"
+                                response_text += "✅ " + ", ".join(available_times[:10])
+                                
+                                if len(available_times) > 10:
+                                    response_text += f" (+{len(available_times) - 10} outros)"
+                                
+                                response_text += "\n\nQual desses horários você prefere?"
+                                
+                                response_result = {
+                                    'response': response_text,
+                                    'intent': 'buscar_info',
+                                    'confidence': 1.0
+                                }
+                                
+                                self.session_manager.update_session(
+                                    phone_number, session, analysis_result, response_result
+                                )
+                                self.session_manager.save_messages(
+                                    phone_number, message, response_result['response'], analysis_result, session=session
+                                )
+                                
+                                return analysis_result, response_result, True
+                    else:
+                        # Se não tem data específica, mostrar todos os dias disponíveis
+                        response_text = f"📅 *Horários disponíveis para o Dr. {doctor_name.split()[-1] if ' ' in doctor_name else doctor_name}:*\n\n"
+                        
+                        for day in days_info[:5]:  # Mostrar até 5 dias
+                            date_str = day.get('date', '')
+                            weekday = day.get('weekday', '')
+                            available_times = day.get('available_times', [])
+                            
+                            if available_times:
+                                times_display = ", ".join(available_times[:6])  # Até 6 horários por dia
+                                if len(available_times) > 6:
+                                    times_display += f" (+{len(available_times) - 6} outros)"
+                                response_text += f"**{weekday} ({date_str}):** {times_display}\n"
+                        
+                        if len(days_info) > 5:
+                            response_text += f"\n*E mais {len(days_info) - 5} dias com horários disponíveis*\n"
+                        
+                        response_text += "\nQual data e horário você prefere?"
+                        
+                        response_result = {
+                            'response': response_text,
+                            'intent': 'buscar_info',
+                            'confidence': 1.0
+                        }
+                        
+                        self.session_manager.update_session(
+                            phone_number, session, analysis_result, response_result
+                        )
+                        self.session_manager.save_messages(
+                            phone_number, message, response_result['response'], analysis_result, session=session
+                        )
+                        
+                        return analysis_result, response_result, True
+        
+        # 7.6. Verificar disponibilidade real se for solicitação de agendamento
+        # OU se estiver no estado choosing_schedule (precisa mostrar horários disponíveis)
+        current_state = session.get('current_state', 'idle')
+        doctor_name = session.get('selected_doctor')
+        
+        # Se está no estado choosing_schedule e tem médico, SEMPRE consultar disponibilidade
+        if (current_state == 'choosing_schedule' and doctor_name) or analysis_result['intent'] == 'agendar_consulta':
+            # Verificar se usuário está perguntando explicitamente sobre horários disponíveis
             message_lower = message.lower()
             asking_availability = any(word in message_lower for word in [
-                'quais horario', 'que horario', 'horario disponivel', 'horário disponível',
-                'quais os horario', 'quais sao os horario', 'quais são os horário',
-                'quais horarios', 'quais horários', 'que horarios', 'que horários',
-                'tem disponivel', 'tem disponível', 'está disponivel', 'está disponível',
-                'horarios disponiveis', 'horários disponíveis', 'livre', 'vago',
-                'datas disponiveis', 'datas disponíveis', 'quais datas', 'quais são as datas'
+                'quais horarios', 'que horarios', 'horarios disponiveis', 'horários disponíveis',
+                'quais horários', 'tem disponivel', 'tem disponível', 'está disponivel', 'está disponível',
+                'livre', 'vago', 'datas disponiveis', 'datas disponíveis', 'quais datas'
             ])
             
-            # Se está em choosing_schedule e tem médico, responder diretamente com horários disponíveis
-            if asking_availability and session.get('selected_doctor') and session.get('current_state') == 'choosing_schedule':
-                logger.info(f"🔍 DETECTADO: Usuário perguntando sobre disponibilidade no estado choosing_schedule")
-                doctor_name = session.get('selected_doctor')
-                date_filter = session.get('preferred_date')  # Pode ser None se não tiver data ainda
+            # Se está em choosing_schedule OU usuário pergunta sobre disponibilidade, consultar
+            if current_state == 'choosing_schedule' or asking_availability:
+                logger.info("📅 Consultando disponibilidade para %s (estado: %s, perguntando: %s)", doctor_name, current_state, asking_availability)
                 
-                # Consultar horários disponíveis
+                # Consultar disponibilidade diretamente
                 availability = smart_scheduling_service.get_doctor_availability(
                     doctor_name=doctor_name,
-                    days_ahead=7,
-                    date_filter=date_filter
+                    days_ahead=7
                 )
                 
                 if availability.get('has_availability'):
-                    days_info = availability.get('days_info', availability.get('days', []))
-                    if days_info:
-                        if date_filter:
-                            # Se tem data específica, mostrar apenas esse dia
-                            day_info = days_info[0] if days_info else None
-                            if day_info:
-                                available_times = day_info.get('available_times', [])
-                                date_str = day_info.get('date')
-                                weekday = day_info.get('weekday')
-                                
-                                if available_times:
-                                    response_text = f"📅 **Horários disponíveis para {weekday}, {date_str}:**\n\n"
-                                    response_text += "✅ " + ", ".join(available_times[:10])
-                                    
-                                    if len(available_times) > 10:
-                                        response_text += f" (+{len(available_times) - 10} outros)"
-                                    
-                                    response_text += "\n\nQual desses horários você prefere?"
-                                    
-                                    response_result = {
-                                        'response': response_text,
-                                        'intent': 'buscar_info',
-                                        'confidence': 1.0
-                                    }
-                                    
-                                    self.session_manager.update_session(
-                                        phone_number, session, analysis_result, response_result
-                                    )
-                                    self.session_manager.save_messages(
-                                        phone_number, message, response_result['response'], analysis_result
-                                    )
-                                    
-                                    return response_result
-                        else:
-                            # Se não tem data específica, mostrar todos os dias disponíveis
-                            response_text = f"📅 *Horários disponíveis para o Dr. {doctor_name.split()[-1] if ' ' in doctor_name else doctor_name}:*\n\n"
-                            
-                            for day in days_info[:5]:  # Mostrar até 5 dias
-                                date_str = day.get('date', '')
-                                weekday = day.get('weekday', '')
-                                available_times = day.get('available_times', [])
-                                
-                                if available_times:
-                                    times_display = ", ".join(available_times[:6])  # Até 6 horários por dia
-                                    if len(available_times) > 6:
-                                        times_display += f" (+{len(available_times) - 6} outros)"
-                                    response_text += f"**{weekday} ({date_str}):** {times_display}\n"
-                            
-                            if len(days_info) > 5:
-                                response_text += f"\n*E mais {len(days_info) - 5} dias com horários disponíveis*\n"
-                            
-                            response_text += "\nQual data e horário você prefere?"
-                            
-                            response_result = {
-                                'response': response_text,
-                                'intent': 'buscar_info',
-                                'confidence': 1.0
-                            }
-                            
-                            self.session_manager.update_session(
-                                phone_number, session, analysis_result, response_result
-                            )
-                            self.session_manager.save_messages(
-                                phone_number, message, response_result['response'], analysis_result
-                            )
-                            
-                            return response_result
-            
-            # 7.6. Verificar disponibilidade real se for solicitação de agendamento
-            # OU se estiver no estado choosing_schedule (precisa mostrar horários disponíveis)
-            current_state = session.get('current_state', 'idle')
-            doctor_name = session.get('selected_doctor')
-            
-            # Se está no estado choosing_schedule e tem médico, SEMPRE consultar disponibilidade
-            if (current_state == 'choosing_schedule' and doctor_name) or analysis_result['intent'] == 'agendar_consulta':
-                # Verificar se usuário está perguntando explicitamente sobre horários disponíveis
-                message_lower = message.lower()
-                asking_availability = any(word in message_lower for word in [
-                    'quais horarios', 'que horarios', 'horarios disponiveis', 'horários disponíveis',
-                    'quais horários', 'tem disponivel', 'tem disponível', 'está disponivel', 'está disponível',
-                    'livre', 'vago', 'datas disponiveis', 'datas disponíveis', 'quais datas'
-                ])
-                
-                # Se está em choosing_schedule OU usuário pergunta sobre disponibilidade, consultar
-                if current_state == 'choosing_schedule' or asking_availability:
-                    logger.info(f"📅 Consultando disponibilidade para {doctor_name} (estado: {current_state}, perguntando: {asking_availability})")
-                    
-                    # Consultar disponibilidade diretamente
-                    availability = smart_scheduling_service.get_doctor_availability(
-                        doctor_name=doctor_name,
-                        days_ahead=7
-                    )
-                    
-                    if availability.get('has_availability'):
-                        # Adicionar informações de disponibilidade ao analysis_result
-                        analysis_result['scheduling_info'] = {
-                            'has_availability_info': True,
-                            'calendar_availability': {
-                                'has_availability': True,
-                                'doctor_name': doctor_name,
-                                'available_slots': availability.get('available_slots', 0),
-                                'days_info': availability.get('days_info', [])
-                            }
-                        }
-                        logger.info(f"✅ Disponibilidade consultada: {availability.get('available_slots', 0)} horários disponíveis")
-                    else:
-                        analysis_result['scheduling_info'] = {
-                            'has_availability_info': True,
-                            'calendar_availability': {
-                                'has_availability': False,
-                                'doctor_name': doctor_name
-                            }
+                    # Adicionar informações de disponibilidade ao analysis_result
+                    analysis_result['scheduling_info'] = {
+                        'has_availability_info': True,
+                        'calendar_availability': {
+                            'has_availability': True,
+                            'doctor_name': doctor_name,
+                            'available_slots': availability.get('available_slots', 0),
+                            'days_info': availability.get('days_info', []),
+                            'availability': availability.get('availability')
                         }
+                    }
+                    logger.info("✅ Disponibilidade consultada: %s horários disponíveis", availability.get('available_slots', 0))
                 else:
-                    # Para outros casos, usar o método normal
-                    scheduling_analysis = self._handle_scheduling_request(
-                        message, session, analysis_result
-                    )
-                    if scheduling_analysis.get('has_availability_info'):
-                        # Se temos informações de disponibilidade, usar na resposta
-                        analysis_result['scheduling_info'] = scheduling_analysis
+                    analysis_result['scheduling_info'] = {
+                        'has_availability_info': True,
+                        'calendar_availability': {
+                            'has_availability': False,
+                            'doctor_name': doctor_name
+                        }
+                    }
+            else:
+                # Para outros casos, usar o método normal
+                scheduling_analysis = self._handle_scheduling_request(
+                    message, session, analysis_result
+                )
+                if scheduling_analysis.get('has_availability_info'):
+                    # Se temos informações de disponibilidade, usar na resposta
+                    analysis_result['scheduling_info'] = scheduling_analysis
+        
+        # 7.7. NÃO retomar aqui - será feito DEPOIS da geração da resposta
+        # A retomada automática foi movida para depois da geração da resposta (linha ~860)
+        # para garantir que dúvidas sejam respondidas antes de retomar o agendamento
+        
+        # 7.8. Validar se usuário está tentando fornecer data/horário sem ter médico e especialidade
+        entities = analysis_result.get('entities', {})
+        if (entities.get('data') or entities.get('horario')) and not (session.get('selected_specialty') and session.get('selected_doctor')):
+            logger.warning("⚠️ Usuário tentou fornecer data/horário sem ter especialidade E médico selecionados")
             
-            # 7.7. NÃO retomar aqui - será feito DEPOIS da geração da resposta
-            # A retomada automática foi movida para depois da geração da resposta (linha ~860)
-            # para garantir que dúvidas sejam respondidas antes de retomar o agendamento
+            # Determinar o que falta
+            missing_parts = []
+            if not session.get('selected_specialty'):
+                missing_parts.append('especialidade')
+            if not session.get('selected_doctor'):
+                missing_parts.append('médico')
             
-            # 7.8. Validar se usuário está tentando fornecer data/horário sem ter médico e especialidade
-            entities = analysis_result.get('entities', {})
-            if (entities.get('data') or entities.get('horario')) and not (session.get('selected_specialty') and session.get('selected_doctor')):
-                logger.warning("⚠️ Usuário tentou fornecer data/horário sem ter especialidade E médico selecionados")
-                
-                # Determinar o que falta
-                missing_parts = []
-                if not session.get('selected_specialty'):
-                    missing_parts.append('especialidade')
-                if not session.get('selected_doctor'):
-                    missing_parts.append('médico')
-                
-                # Gerar resposta informando que precisa selecionar especialidade/médico primeiro
-                missing_text = ' e '.join(missing_parts)
-                response_text = f"Para escolher data e horário, primeiro preciso saber a {missing_text} que você deseja. "
-                
-                if not session.get('selected_specialty'):
-                    response_text += "Qual especialidade médica você procura?"
-                elif not session.get('selected_doctor'):
-                    response_text += "Qual médico você prefere?"
-                
-                # Retornar resposta diretamente sem gerar com Gemini
-                return {
-                    'response': response_text,
-                    'intent': analysis_result['intent'],
-                    'confidence': 1.0
-                }
+            # Gerar resposta informando que precisa selecionar especialidade/médico primeiro
+            missing_text = ' e '.join(missing_parts)
+            response_text = f"Para escolher data e horário, primeiro preciso saber a {missing_text} que você deseja. "
+            
+            if not session.get('selected_specialty'):
+                response_text += "Qual especialidade médica você procura?"
+            elif not session.get('selected_doctor'):
+                response_text += "Qual médico você prefere?"
+            
+            # Retornar resposta diretamente sem gerar com Gemini
+            return analysis_result, {
+                'response': response_text,
+                'intent': analysis_result['intent'],
+                'confidence': 1.0
+            }, True
+        
+        # 8. Atualizar sessão ANTES de verificar informações faltantes
+        self.session_manager.update_session(
+            phone_number, session, analysis_result, {'response': ''}
+        )
+        
+        # 8.1. Verificar se a data fornecida não pôde ser normalizada
+        if session.get('invalid_date_provided'):
+            invalid_date = session.get('invalid_date_provided')
+            # Limpar o flag
+            session['invalid_date_provided'] = None
+            
+            response_text = f"Desculpe, não consegui entender a data '{invalid_date}'. 😊\n\n"
+            response_text += "Por favor, informe a data no formato numérico, por exemplo:\n"
+            response_text += "• **21/11** (dia e mês)\n"
+            response_text += "• **21/11/2025** (dia, mês e ano)\n"
+            response_text += "• **21 de novembro**\n\n"
+            response_text += "Qual data você prefere para a consulta?"
+            
+            response_result = {
+                'response': response_text,
+                'intent': 'solicitar_data_numerica',
+                'confidence': 1.0
+            }
             
-            # 8. Atualizar sessão ANTES de verificar informações faltantes
             self.session_manager.update_session(
-                phone_number, session, analysis_result, {'response': ''}
+                phone_number, session, analysis_result, response_result
+            )
+            self.session_manager.save_messages(
+                phone_number, message, response_result['response'], analysis_result, session=session
             )
             
-            # 8.1. Verificar se a data fornecida não pôde ser normalizada
-            if session.get('invalid_date_provided'):
-                invalid_date = session.get('invalid_date_provided')
-                # Limpar o flag
-                session['invalid_date_provided'] = None
-                
-                response_text = f"Desculpe, não consegui entender a data '{invalid_date}'. 😊\n\n"
-                response_text += "Por favor, informe a data no formato numérico, por exemplo:\n"
-                response_text += "• **21/11** (dia e mês)\n"
-                response_text += "• **21/11/2025** (dia, mês e ano)\n"
-                response_text += "• **21 de novembro**\n\n"
-                response_text += "Qual data você prefere para a consulta?"
-                
-                response_result = {
-                    'response': response_text,
-                    'intent': 'solicitar_data_numerica',
-                    'confidence': 1.0
-                }
+            return analysis_result, response_result, True
+
+        # ═══════════════════════════════════════════════════════════════════════════════
+        # 8.5. VALIDAR HORÁRIO ASSIM QUE FOR FORNECIDO (não esperar confirmação)
+        # ═══════════════════════════════════════════════════════════════════════════════
+        # Se o usuário acabou de fornecer data E horário, validar imediatamente
+        # Isso evita perguntar "gostaria de confirmar?" para então descobrir que está indisponível
+        # ═══════════════════════════════════════════════════════════════════════════════
+        entities = analysis_result.get('entities', {})
+        if (entities.get('data') or entities.get('horario')) and analysis_result['intent'] == 'agendar_consulta':
+            doctor_name = session.get('selected_doctor')
+            # IMPORTANTE: Usar a data extraída nas entidades (mais recente) ou a da sessão
+            # Se há data nas entidades, usar essa (foi extraída agora)
+            # Se não há, usar a da sessão (foi extraída anteriormente)
+            requested_date = entities.get('data') or session.get('preferred_date')
+            # IMPORTANTE: Usar o horário extraído nas entidades (mais recente) ou o da sessão
+            requested_time = entities.get('horario') or session.get('preferred_time')
+            
+            # Log para debug
+            logger.debug(
+                "🔍 Validação de horário - data: entidades=%s, sessão=%s, escolhida=%s | "
+                "horário: entidades=%s, sessão=%s, escolhido=%s",
+                entities.get('data'), session.get('preferred_date'), requested_date,
+                entities.get('horario'), session.get('preferred_time'), requested_time,
+            )
+            
+            # Se agora temos médico, data E horário, validar disponibilidade
+            if doctor_name and requested_date and requested_time:
+                logger.info("🔍 Validando horário fornecido: %s em %s para %s", requested_time, requested_date, doctor_name)
                 
-                self.session_manager.update_session(
-                    phone_number, session, analysis_result, response_result
+                time_slot_check = smart_scheduling_service.is_time_slot_available(
+                    doctor_name=doctor_name,
+                    requested_date=requested_date,
+                    requested_time=requested_time,
+                    phone_number=phone_number
                 )
-                self.session_manager.save_messages(
-                    phone_number, message, response_result['response'], analysis_result
+                # Reservar o horário até a confirmação (evita dois pacientes no mesmo horário)
+                time_slot_check = self._hold_time_slot(
+                    phone_number, doctor_name, requested_date, requested_time, time_slot_check
                 )
                 
-                return response_result
+                logger.info("📊 DEBUG - Resultado da validação: available=%s, alternative_times=%d horários", time_slot_check.get('available'), len(time_slot_check.get('alternative_times', [])))
+                
+                if not time_slot_check.get('available'):
+                    # ❌ HORÁRIO NÃO DISPONÍVEL
+                    logger.warning(f"⚠️ Horário {requested_time} em {requested_date} não está disponível para {doctor_name}")
+                    
+                    # IMPORTANTE: Limpar o horário das entidades também para que update_session não o salve novamente
+                    if 'horario' in entities:
+                        del entities['horario']
+                    if 'data' in entities and not session.get('preferred_date'):
+                        # Se a data ainda não estava salva, não salvar agora também
+                        del entities['data']
+                    analysis_result['entities'] = entities
+                    
+                    # Limpar APENAS O HORÁRIO da sessão (manter a data!)
+                    # A persistência no banco é feita pelo update_session (campo alterado)
+                    session['preferred_time'] = None
+                    
+                    # Construir mensagem informativa
+                    date_formatted = time_slot_check.get('date_formatted', requested_date)
+                    time_formatted = time_slot_check.get('time_formatted', requested_time)
+                    weekday = time_slot_check.get('weekday', '')
+                    
+                    # Formatar mensagem inicial
+                    if weekday:
+                        response_text = f"❌ O horário {time_formatted} não está disponível para {weekday}, {date_formatted}.\n\n"
+                    else:
+                        response_text = f"❌ O horário {time_formatted} não está disponível para {date_formatted}.\n\n"
+                    
+                    # Sugerir horários alternativos
+                    alternative_times = time_slot_check.get('alternative_times', [])
+                    if alternative_times:
+                        weekday_display = weekday if weekday else date_formatted
+                        response_text += f"📅 **Horários disponíveis para {weekday_display}:**\n"
+                        response_text += "✅ " + ", ".join(alternative_times[:8])  # Mostrar até 8 horários
+                        
+                        total_alternatives = time_slot_check.get('total_alternatives', len(alternative_times))
+                        if total_alternatives > 8:
+                            response_text += f" (+{total_alternatives - 8} outros)"
+                        
+                        response_text += "\n\nQual desses horários você prefere?"
+                    else:
+                        # Se não há horários neste dia, sugerir outros dias
+                        alternative_days = time_slot_check.get('alternative_days', [])
+                        if alternative_days:
+                            response_text += "📅 **Horários disponíveis em outros dias:**\n\n"
+                            for alt_day in alternative_days[:3]:
+                                day_date = alt_day.get('date')
+                                day_weekday = alt_day.get('weekday')
+                                day_times = alt_day.get('times', [])
+                                response_text += f"**{day_weekday} ({day_date}):** {', '.join(day_times[:5])}\n"
+                            response_text += "\nQual data e horário você prefere?"
+                        else:
+                            # Evitar "Dr. Dr." - verificar se já tem "Dr." no nome
+                            doctor_display = doctor_name if doctor_name.startswith('Dr') else f"Dr. {doctor_name}"
+                            response_text += f"Por favor, consulte os horários disponíveis para {doctor_display}."
+                    
+                    # Retornar resposta sem gerar handoff
+                    response_result = {
+                        'response': response_text,
+                        'intent': 'informar_horario_indisponivel',
+                        'confidence': 1.0
+                    }
+                    
+                    # Atualizar sessão (agora sem o horário nas entidades)
+                    self.session_manager.update_session(
+                        phone_number, session, analysis_result, response_result
+                    )
+                    
+                    # Salvar mensagens no histórico
+                    self.session_manager.save_messages(
+                        phone_number, message, response_result['response'], analysis_result, session=session
+                    )
+                    
+                    return analysis_result, response_result, True
 
-            # ═══════════════════════════════════════════════════════════════════════════════
-            # 8.5. VALIDAR HORÁRIO ASSIM QUE FOR FORNECIDO (não esperar confirmação)
-            # ═══════════════════════════════════════════════════════════════════════════════
-            # Se o usuário acabou de fornecer data E horário, validar imediatamente
-            # Isso evita perguntar "gostaria de confirmar?" para então descobrir que está indisponível
-            # ═══════════════════════════════════════════════════════════════════════════════
-            entities = analysis_result.get('entities', {})
-            if (entities.get('data') or entities.get('horario')) and analysis_result['intent'] == 'agendar_consulta':
-                doctor_name = session.get('selected_doctor')
-                # IMPORTANTE: Usar a data extraída nas entidades (mais recente) ou a da sessão
-                # Se há data nas entidades, usar essa (foi extraída agora)
-                # Se não há, usar a da sessão (foi extraída anteriormente)
-                requested_date = entities.get('data') or session.get('preferred_date')
-                # IMPORTANTE: Usar o horário extraído nas entidades (mais recente) ou o da sessão
-                requested_time = entities.get('horario') or session.get('preferred_time')
+        # ═══════════════════════════════════════════════════════════════════════════════
+        # 9. VERIFICAR SE É CONFIRMAÇÃO DE AGENDAMENTO E GERAR HANDOFF
+        # ═══════════════════════════════════════════════════════════════════════════════
+        # Este bloco é responsável por:
+        # 1. Detectar quando o usuário quer confirmar o agendamento
+        # 2. Verificar se todas as informações necessárias foram coletadas
+        # 3. Gerar o link de handoff para a secretaria (primeira confirmação)
+        # 4. Evitar gerar handoff duplicado se já foi confirmado
+        # ═══════════════════════════════════════════════════════════════════════════════
+        
+        response_result = {}
+        if analysis_result['intent'] == 'confirmar_agendamento':
+            # Verificar quais informações ainda faltam para o agendamento completo
+            # (nome, médico, especialidade, data, horário)
+            missing_info_result = conversation_service.get_missing_appointment_info(phone_number, session)
+            
+            # ═══════════════════════════════════════════════════════════════════
+            # VERIFICAÇÃO ADICIONAL: Se horário ainda não está salvo, não confirmar
+            # ═══════════════════════════════════════════════════════════════════
+            # Mesmo que missing_info diga que está completo, se preferred_time
+            # for None, significa que foi rejeitado e o usuário precisa escolher outro
+            # ═══════════════════════════════════════════════════════════════════
+            if not session.get('preferred_time'):
+                logger.info("⚠️ Tentativa de confirmar sem horário válido - solicitando escolha de horário")
+                missing_info_result['is_complete'] = False
+                if 'preferred_time' not in missing_info_result['missing_info']:
+                    missing_info_result['missing_info'].append('preferred_time')
+            
+            # Se todas as informações estão completas, podemos prosseguir
+            if missing_info_result['is_complete']:
                 
-                # Log para debug
-                logger.info(f"🔍 DEBUG - Validação de horário:")
-                logger.info(f"  - Data nas entidades: {entities.get('data')}")
-                logger.info(f"  - Data na sessão: {session.get('preferred_date')}")
-                logger.info(f"  - Data escolhida para validação: {requested_date}")
-                logger.info(f"  - Horário nas entidades: {entities.get('horario')}")
-                logger.info(f"  - Horário na sessão: {session.get('preferred_time')}")
-                logger.info(f"  - Horário escolhido para validação: {requested_time}")
+                # ═══════════════════════════════════════════════════════════════════
+                # VALIDAR DISPONIBILIDADE DO HORÁRIO ESPECÍFICO
+                # ═══════════════════════════════════════════════════════════════════
+                # Antes de gerar o handoff, precisamos verificar se o horário
+                # específico solicitado pelo usuário está realmente disponível
+                # no calendário do médico
+                # ═══════════════════════════════════════════════════════════════════
+                doctor_name = session.get('selected_doctor')
+                requested_date = session.get('preferred_date')
+                requested_time = session.get('preferred_time')
                 
-                # Se agora temos médico, data E horário, validar disponibilidade
                 if doctor_name and requested_date and requested_time:
-                    logger.info(f"🔍 Validando horário fornecido: {requested_time} em {requested_date} para {doctor_name}")
-                    
+                    # Verificar disponibilidade do horário específico
+                    logger.info("🔍 Validando horário na confirmação: %s em %s para %s", requested_time, requested_date, doctor_name)
                     time_slot_check = smart_scheduling_service.is_time_slot_available(
                         doctor_name=doctor_name,
                         requested_date=requested_date,
-                        requested_time=requested_time
+                        requested_time=requested_time,
+                        phone_number=phone_number
+                    )
+                    # Renovar a reserva pelo tempo que a secretária leva para confirmar
+                    time_slot_check = self._hold_time_slot(
+                        phone_number, doctor_name, requested_date, requested_time, time_slot_check,
+                        ttl=slot_hold_service.handoff_ttl
                     )
                     
-                    logger.info(f"📊 DEBUG - Resultado da validação: available={time_slot_check.get('available')}, alternative_times={len(time_slot_check.get('alternative_times', []))} horários")
+                    logger.info("📊 DEBUG - Resultado na confirmação: available=%s, alternative_times=%d horários", time_slot_check.get('available'), len(time_slot_check.get('alternative_times', [])))
                     
                     if not time_slot_check.get('available'):
                         # ❌ HORÁRIO NÃO DISPONÍVEL
                         logger.warning(f"⚠️ Horário {requested_time} em {requested_date} não está disponível para {doctor_name}")
                         
                         # IMPORTANTE: Limpar o horário das entidades também para que update_session não o salve novamente
-                        if 'horario' in entities:
-                            del entities['horario']
-                        if 'data' in entities and not session.get('preferred_date'):
+                        entities_to_update = analysis_result.get('entities', {}).copy()
+                        if 'horario' in entities_to_update:
+                            del entities_to_update['horario']
+                        if 'data' in entities_to_update and not session.get('preferred_date'):
                             # Se a data ainda não estava salva, não salvar agora também
-                            del entities['data']
-                        analysis_result['entities'] = entities
+                            del entities_to_update['data']
+                        analysis_result['entities'] = entities_to_update
                         
                         # Limpar APENAS O HORÁRIO da sessão (manter a data!)
+                        # A persistência no banco é feita pelo update_session (campo alterado)
                         session['preferred_time'] = None
-                        
-                        # Atualizar no banco também - APENAS O HORÁRIO
-                        db_session = conversation_service.get_or_create_session(phone_number)
-                        db_session.preferred_time = None
-                        db_session.save()
+                        # NÃO limpar a data: session['preferred_date'] continua com o valor
                         
                         # Construir mensagem informativa
                         date_formatted = time_slot_check.get('date_formatted', requested_date)
@@ -486,255 +726,121 @@ class GeminiChatbotService:
                         
                         # Salvar mensagens no histórico
                         self.session_manager.save_messages(
-                            phone_number, message, response_result['response'], analysis_result
+                            phone_number, message, response_result['response'], analysis_result, session=session
                         )
                         
-                        return response_result
-
-            # ═══════════════════════════════════════════════════════════════════════════════
-            # 9. VERIFICAR SE É CONFIRMAÇÃO DE AGENDAMENTO E GERAR HANDOFF
-            # ═══════════════════════════════════════════════════════════════════════════════
-            # Este bloco é responsável por:
-            # 1. Detectar quando o usuário quer confirmar o agendamento
-            # 2. Verificar se todas as informações necessárias foram coletadas
-            # 3. Gerar o link de handoff para a secretaria (primeira confirmação)
-            # 4. Evitar gerar handoff duplicado se já foi confirmado
-            # ═══════════════════════════════════════════════════════════════════════════════
-            
-            response_result = {}
-            if analysis_result['intent'] == 'confirmar_agendamento':
-                # Verificar quais informações ainda faltam para o agendamento completo
-                # (nome, médico, especialidade, data, horário)
-                missing_info_result = conversation_service.get_missing_appointment_info(phone_number)
+                        return analysis_result, response_result, True
                 
                 # ═══════════════════════════════════════════════════════════════════
-                # VERIFICAÇÃO ADICIONAL: Se horário ainda não está salvo, não confirmar
-                # ═══════════════════════════════════════════════════════════════════
-                # Mesmo que missing_info diga que está completo, se preferred_time
-                # for None, significa que foi rejeitado e o usuário precisa escolher outro
+                # HORÁRIO DISPONÍVEL - CONTINUAR COM O HANDOFF
                 # ═══════════════════════════════════════════════════════════════════
-                if not session.get('preferred_time'):
-                    logger.info("⚠️ Tentativa de confirmar sem horário válido - solicitando escolha de horário")
-                    missing_info_result['is_complete'] = False
-                    if 'preferred_time' not in missing_info_result['missing_info']:
-                        missing_info_result['missing_info'].append('preferred_time')
                 
-                # Se todas as informações estão completas, podemos prosseguir
-                if missing_info_result['is_complete']:
+                # ─────────────────────────────────────────────────────────────────
+                # VERIFICAR SE JÁ FOI CONFIRMADO ANTERIORMENTE
+                # ─────────────────────────────────────────────────────────────────
+                # O estado 'confirming' indica que o handoff já foi gerado
+                # Se não estiver neste estado, é a PRIMEIRA confirmação
+                # Se já estiver, é uma CONFIRMAÇÃO DUPLICADA (usuário repetiu)
+                # ─────────────────────────────────────────────────────────────────
+                
+                if session.get('current_state') != 'confirming':
+                    # ✅ PRIMEIRA CONFIRMAÇÃO - Processar normalmente
+                    logger.info("✅ Primeira confirmação detectada - gerando handoff para %s", phone_number)
                     
-                    # ═══════════════════════════════════════════════════════════════════
-                    # VALIDAR DISPONIBILIDADE DO HORÁRIO ESPECÍFICO
-                    # ═══════════════════════════════════════════════════════════════════
-                    # Antes de gerar o handoff, precisamos verificar se o horário
-                    # específico solicitado pelo usuário está realmente disponível
-                    # no calendário do médico
-                    # ═══════════════════════════════════════════════════════════════════
-                    doctor_name = session.get('selected_doctor')
-                    requested_date = session.get('preferred_date')
-                    requested_time = session.get('preferred_time')
+                    # Gerar link de handoff para a secretaria
+                    handoff_result = self._handle_appointment_confirmation(
+                        phone_number, session, analysis_result
+                    )
                     
-                    if doctor_name and requested_date and requested_time:
-                        # Verificar disponibilidade do horário específico
-                        logger.info(f"🔍 Validando horário na confirmação: {requested_time} em {requested_date} para {doctor_name}")
-                        time_slot_check = smart_scheduling_service.is_time_slot_available(
-                            doctor_name=doctor_name,
-                            requested_date=requested_date,
-                            requested_time=requested_time
-                        )
+                    if handoff_result:
+                        # Armazenar a mensagem de confirmação e o link do handoff
+                        response_result['response'] = handoff_result['message']
+                        response_result['handoff_link'] = handoff_result['handoff_link']
                         
-                        logger.info(f"📊 DEBUG - Resultado na confirmação: available={time_slot_check.get('available')}, alternative_times={len(time_slot_check.get('alternative_times', []))} horários")
+                        # Mudar o estado para 'confirming' para indicar que já foi confirmado
+                        session['current_state'] = 'confirming'
+                        analysis_result['next_state'] = 'confirming'
                         
-                        if not time_slot_check.get('available'):
-                            # ❌ HORÁRIO NÃO DISPONÍVEL
-                            logger.warning(f"⚠️ Horário {requested_time} em {requested_date} não está disponível para {doctor_name}")
-                            
-                            # IMPORTANTE: Limpar o horário das entidades também para que update_session não o salve novamente
-                            entities_to_update = analysis_result.get('entities', {}).copy()
-                            if 'horario' in entities_to_update:
-                                del entities_to_update['horario']
-                            if 'data' in entities_to_update and not session.get('preferred_date'):
-                                # Se a data ainda não estava salva, não salvar agora também
-                                del entities_to_update['data']
-                            analysis_result['entities'] = entities_to_update
-                            
-                            # Limpar APENAS O HORÁRIO da sessão (manter a data!)
-                            session['preferred_time'] = None
-                            # NÃO limpar a data: session['preferred_date'] continua com o valor
-                            
-                            # Atualizar no banco também - APENAS O HORÁRIO
-                            db_session = conversation_service.get_or_create_session(phone_number)
-                            db_session.preferred_time = None
-                            # NÃO limpar a data no banco: db_session.preferred_date continua com o valor
-                            db_session.save()
-                            
-                            # Construir mensagem informativa
-                            date_formatted = time_slot_check.get('date_formatted', requested_date)
-                            time_formatted = time_slot_check.get('time_formatted', requested_time)
-                            weekday = time_slot_check.get('weekday', '')
-                            
-                            # Formatar mensagem inicial
-                            if weekday:
-                                response_text = f"❌ O horário {time_formatted} não está disponível para {weekday}, {date_formatted}.\n\n"
-                            else:
-                                response_text = f"❌ O horário {time_formatted} não está disponível para {date_formatted}.\n\n"
-                            
-                            # Sugerir horários alternativos
-                            alternative_times = time_slot_check.get('alternative_times', [])
-                            if alternative_times:
-                                weekday_display = weekday if weekday else date_formatted
-                                response_text += f"📅 **Horários disponíveis para {weekday_display}:**\n"
-                                response_text += "✅ " + ", ".join(alternative_times[:8])  # Mostrar até 8 horários
-                                
-                                total_alternatives = time_slot_check.get('total_alternatives', len(alternative_times))
-                                if total_alternatives > 8:
-                                    response_text += f" (+{total_alternatives - 8} outros)"
-                                
-                                response_text += "\n\nQual desses horários você prefere?"
-                            else:
-                                # Se não há horários neste dia, sugerir outros dias
-                                alternative_days = time_slot_check.get('alternative_days', [])
-                                if alternative_days:
-                                    response_text += "📅 **Horários disponíveis em outros dias:**\n\n"
-                                    for alt_day in alternative_days[:3]:
-                                        day_date = alt_day.get('date')
-                                        day_weekday = alt_day.get('weekday')
-                                        day_times = alt_day.get('times', [])
-                                        response_text += f"**{day_weekday} ({day_date}):** {', '.join(day_times[:5])}\n"
-                                    response_text += "\nQual data e horário você prefere?"
-                                else:
-                                    # Evitar "Dr. Dr." - verificar se já tem "Dr." no nome
-                                    doctor_display = doctor_name if doctor_name.startswith('Dr') else f"Dr. {doctor_name}"
-                                    response_text += f"Por favor, consulte os horários disponíveis para {doctor_display}."
-                            
-                            # Retornar resposta sem gerar handoff
-                            response_result = {
-                                'response': response_text,
-                                'intent': 'informar_horario_indisponivel',
-                                'confidence': 1.0
-                            }
-                            
-                            # Atualizar sessão (agora sem o horário nas entidades)
-                            self.session_manager.update_session(
-                                phone_number, session, analysis_result, response_result
-                            )
-                            
-                            # Salvar mensagens no histórico
-                            self.session_manager.save_messages(
-                                phone_number, message, response_result['response'], analysis_result
-                            )
-                            
-                            return response_result
+                        # Atualizar a sessão no banco de dados com o novo estado
+                        self.session_manager.update_session(
+                            phone_number, session, analysis_result, response_result
+                        )
+                
+                else:
+                    # ⚠️ CONFIRMAÇÃO DUPLICADA - Usuário já confirmou anteriormente
+                    # Não devemos gerar outro handoff, apenas informar que já foi confirmado
+                    
+                    # ─────────────────────────────────────────────────────────────────
+                    # BUSCAR DADOS DA SESSÃO PARA MOSTRAR RESUMO
+                    # ─────────────────────────────────────────────────────────────────
+                    # Como já foi confirmado, vamos buscar os dados confirmados
+                    # e mostrar um resumo amigável ao usuário
+                    # ─────────────────────────────────────────────────────────────────
                     
-                    # ═══════════════════════════════════════════════════════════════════
-                    # HORÁRIO DISPONÍVEL - CONTINUAR COM O HANDOFF
-                    # ═══════════════════════════════════════════════════════════════════
+                    patient_name = session.get('patient_name', 'Paciente')
+                    doctor = session.get('selected_doctor', 'médico')
+                    specialty = session.get('selected_specialty', 'especialidade')
+                    date = session.get('preferred_date')
+                    time = session.get('preferred_time')
                     
                     # ─────────────────────────────────────────────────────────────────
-                    # VERIFICAR SE JÁ FOI CONFIRMADO ANTERIORMENTE
+                    # FORMATAR DATA E HORA PARA EXIBIÇÃO AMIGÁVEL
                     # ─────────────────────────────────────────────────────────────────
-                    # O estado 'confirming' indica que o handoff já foi gerado
-                    # Se não estiver neste estado, é a PRIMEIRA confirmação
-                    # Se já estiver, é uma CONFIRMAÇÃO DUPLICADA (usuário repetiu)
+                    # Os dados podem estar em formatos diferentes (string ou objeto)
+                    # Precisamos normalizar para mostrar ao usuário
                     # ─────────────────────────────────────────────────────────────────
                     
-                    if session.get('current_state') != 'confirming':
-                        # ✅ PRIMEIRA CONFIRMAÇÃO - Processar normalmente
-                        logger.info(f"✅ Primeira confirmação detectada - gerando handoff para {phone_number}")
-                        
-                        # Gerar link de handoff para a secretaria
-                        handoff_result = self._handle_appointment_confirmation(
-                            phone_number, session, analysis_result
-                        )
-                        
-                        if handoff_result:
-                            # Armazenar a mensagem de confirmação e o link do handoff
-                            response_result['response'] = handoff_result['message']
-                            response_result['handoff_link'] = handoff_result['handoff_link']
-                            
-                            # Mudar o estado para 'confirming' para indicar que já foi confirmado
-                            session['current_state'] = 'confirming'
-                            analysis_result['next_state'] = 'confirming'
-                            
-                            # Atualizar a sessão no banco de dados com o novo estado
-                            self.session_manager.update_session(
-                                phone_number, session, analysis_result, response_result
-                            )
+                    if date:
+                        try:
+                            from datetime import datetime
+
+                            # Se for string, converter para datetime
+                            if isinstance(date, str):
+                                date_obj = datetime.fromisoformat(date)
+                                date_str = date_obj.strftime('%d/%m/%Y')
+                            else:
+                                # Se já for objeto datetime
+                                date_str = date.strftime('%d/%m/%Y')
+                        except Exception as e:
+                            logger.warning(f"Erro ao formatar data: {e}")
+                            date_str = str(date)
+                    else:
+                        date_str = 'data a definir'
                     
+                    if time:
+                        try:
+                            # Extrair apenas HH:MM do horário
+                            if isinstance(time, str):
+                                time_str = time[:5]  # Pega apenas "HH:MM"
+                            else:
+                                time_str = time.strftime('%H:%M')
+                        except Exception as e:
+                            logger.warning(f"Erro ao formatar horário: {e}")
+                            time_str = str(time)
                     else:
-                        # ⚠️ CONFIRMAÇÃO DUPLICADA - Usuário já confirmou anteriormente
-                        # Não devemos gerar outro handoff, apenas informar que já foi confirmado
-                        
-                        # ─────────────────────────────────────────────────────────────────
-                        # BUSCAR DADOS DA SESSÃO PARA MOSTRAR RESUMO
-                        # ─────────────────────────────────────────────────────────────────
-                        # Como já foi confirmado, vamos buscar os dados confirmados
-                        # e mostrar um resumo amigável ao usuário
-                        # ─────────────────────────────────────────────────────────────────
-                        
-                        patient_name = session.get('patient_name', 'Paciente')
-                        doctor = session.get('selected_doctor', 'médico')
-                        specialty = session.get('selected_specialty', 'especialidade')
-                        date = session.get('preferred_date')
-                        time = session.get('preferred_time')
-                        
-                        # ─────────────────────────────────────────────────────────────────
-                        # FORMATAR DATA E HORA PARA EXIBIÇÃO AMIGÁVEL
-                        # ─────────────────────────────────────────────────────────────────
-                        # Os dados podem estar em formatos diferentes (string ou objeto)
-                        # Precisamos normalizar para mostrar ao usuário
-                        # ─────────────────────────────────────────────────────────────────
-                        
-                        if date:
-                            try:
-                                from datetime import datetime
-
-                                # Se for string, converter para datetime
-                                if isinstance(date, str):
-                                    date_obj = datetime.fromisoformat(date)
-                                    date_str = date_obj.strftime('%d/%m/%Y')
-                                else:
-                                    # Se já for objeto datetime
-                                    date_str = date.strftime('%d/%m/%Y')
-                            except Exception as e:
-                                logger.warning(f"Erro ao formatar data: {e}")
-                                date_str = str(date)
-                        else:
-                            date_str = 'data a definir'
-                        
-                        if time:
-                            try:
-                                # Extrair apenas HH:MM do horário
-                                if isinstance(time, str):
-                                    time_str = time[:5]  # Pega apenas "HH:MM"
-                                else:
-                                    time_str = time.strftime('%H:%M')
-                            except Exception as e:
-                                logger.warning(f"Erro ao formatar horário: {e}")
-                                time_str = str(time)
-                        else:
-                            time_str = 'horário a definir'
-                        
-                        # ─────────────────────────────────────────────────────────────────
-                        # BUSCAR LINK DE HANDOFF ANTERIOR (se existir)
-                        # ─────────────────────────────────────────────────────────────────
-                        # Se o handoff já foi gerado anteriormente, o link estará
-                        # armazenado na sessão. Vamos incluí-lo na resposta caso o
-                        # usuário queira vê-lo novamente.
-                        # ─────────────────────────────────────────────────────────────────
-                        
-                        handoff_link = session.get('handoff_link', '')
-                        
-                        # ─────────────────────────────────────────────────────────────────
-                        # GERAR RESPOSTA AMIGÁVEL INFORMANDO QUE JÁ FOI CONFIRMADO
-                        # ─────────────────────────────────────────────────────────────────
-                        # Esta resposta evita que o Gemini seja chamado e peça
-                        # as informações novamente (que era o problema original)
-                        # 
-                        # Inclui o link de handoff se estiver disponível, permitindo
-                        # que o usuário acesse novamente se necessário
-                        # ─────────────────────────────────────────────────────────────────
-                        
-                        response_text = f"""✅ Seu agendamento já foi confirmado anteriormente!
+                        time_str = 'horário a definir'
+                    
+                    # ─────────────────────────────────────────────────────────────────
+                    # BUSCAR LINK DE HANDOFF ANTERIOR (se existir)
+                    # ─────────────────────────────────────────────────────────────────
+                    # Se o handoff já foi gerado anteriormente, o link estará
+                    # armazenado na sessão. Vamos incluí-lo na resposta caso o
+                    # usuário queira vê-lo novamente.
+                    # ─────────────────────────────────────────────────────────────────
+                    
+                    handoff_link = session.get('handoff_link', '')
+                    
+                    # ─────────────────────────────────────────────────────────────────
+                    # GERAR RESPOSTA AMIGÁVEL INFORMANDO QUE JÁ FOI CONFIRMADO
+                    # ─────────────────────────────────────────────────────────────────
+                    # Esta resposta evita que o Gemini seja chamado e peça
+                    # as informações novamente (que era o problema original)
+                    # 
+                    # Inclui o link de handoff se estiver disponível, permitindo
+                    # que o usuário acesse novamente se necessário
+                    # ─────────────────────────────────────────────────────────────────
+                    
+                    response_text = f"""✅ Seu agendamento já foi confirmado anteriormente!
 
 Dados do seu agendamento:
 Paciente: {patient_name}
@@ -744,158 +850,156 @@ Data: {date_str}
 Horário: {time_str}
 
 Nossa secretaria entrará em contato em breve para finalizar seu agendamento."""
-                        
-                        # Adicionar link de handoff se existir
-                        if handoff_link:
-                            response_text += f"\n\n🔗 Link de confirmação: {handoff_link}"
-                        
-                        response_text += "\n\nHá algo mais em que posso ajudar? 😊"
-                        
-                        response_result['response'] = response_text
-                        
-                        # Se o link existe, incluir no resultado também
-                        if handoff_link:
-                            response_result['handoff_link'] = handoff_link
-                
-                else:
-                    # ─────────────────────────────────────────────────────────────────
-                    # INFORMAÇÕES AINDA INCOMPLETAS
-                    # ─────────────────────────────────────────────────────────────────
-                    # Se o usuário tentou confirmar mas ainda faltam informações
-                    # (ex: falta médico, data, etc), mudamos o intent para continuar
-                    # coletando as informações faltantes
-                    # ─────────────────────────────────────────────────────────────────
                     
-                    logger.info(f"🔄 Informações faltantes para handoff: {missing_info_result['missing_info']}")
+                    # Adicionar link de handoff se existir
+                    if handoff_link:
+                        response_text += f"\n\n🔗 Link de confirmação: {handoff_link}"
                     
-                    # Mudar intent para 'agendar_consulta' para continuar coletando dados
-                    analysis_result['intent'] = 'agendar_consulta'
-                    analysis_result['missing_info'] = missing_info_result['missing_info']
-            
-            # 9.5. Obter missing_info quando o estado é collecting_patient_info
-            # ═══════════════════════════════════════════════════════════════════════════════
-            # Quando o estado é collecting_patient_info (ex: após saudação), precisamos
-            # obter as informações faltantes para que o response_generator saiba o que perguntar
-            # ═══════════════════════════════════════════════════════════════════════════════
-            current_state = session.get('current_state', 'idle')
-            if current_state == 'collecting_patient_info' and 'missing_info' not in analysis_result:
-                logger.info(f"📋 Obtendo informações faltantes para estado collecting_patient_info")
-                missing_info_result = conversation_service.get_missing_appointment_info(phone_number)
-                analysis_result['missing_info'] = missing_info_result.get('missing_info', [])
-                logger.info(f"📋 Informações faltantes: {analysis_result['missing_info']}")
+                    response_text += "\n\nHá algo mais em que posso ajudar? 😊"
+                    
+                    response_result['response'] = response_text
+                    
+                    # Se o link existe, incluir no resultado também
+                    if handoff_link:
+                        response_result['handoff_link'] = handoff_link
             
-            # 10. Gerar resposta se ainda não foi gerada
-            if not response_result.get('response'):
-                response_result = self.response_generator.generate_response(
-                    message, analysis_result, session, conversation_history, clinic_data
-                )
+            else:
+                # ─────────────────────────────────────────────────────────────────
+                # INFORMAÇÕES AINDA INCOMPLETAS
+                # ─────────────────────────────────────────────────────────────────
+                # Se o usuário tentou confirmar mas ainda faltam informações
+                # (ex: falta médico, data, etc), mudamos o intent para continuar
+                # coletando as informações faltantes
+                # ─────────────────────────────────────────────────────────────────
                 
-                # ═══════════════════════════════════════════════════════════════════
-                # VERIFICAÇÃO FINAL: Interceptar se Gemini perguntou data sem especialidade
-                # ═══════════════════════════════════════════════════════════════════
-                response_text = response_result.get('response', '')
-                has_specialty = bool(session.get('selected_specialty'))
-                has_doctor = bool(session.get('selected_doctor'))
+                logger.info("🔄 Informações faltantes para handoff: %s", missing_info_result['missing_info'])
                 
-                # Verificar se a resposta contém perguntas sobre data/horário sem ter especialidade
-                response_lower = response_text.lower()
-                asking_date_time = any(keyword in response_lower for keyword in [
-                    'data', 'horário', 'horario', 'dia', 'quando', 'qual data', 'qual horário'
-                ])
+                # Mudar intent para 'agendar_consulta' para continuar coletando dados
+                analysis_result['intent'] = 'agendar_consulta'
+                analysis_result['missing_info'] = missing_info_result['missing_info']
+        
+        # 9.5. Obter missing_info quando o estado é collecting_patient_info
+        # ═══════════════════════════════════════════════════════════════════════════════
+        # Quando o estado é collecting_patient_info (ex: após saudação), precisamos
+        # obter as informações faltantes para que o response_generator saiba o que perguntar
+        # ═══════════════════════════════════════════════════════════════════════════════
+        current_state = session.get('current_state', 'idle')
+        if current_state == 'collecting_patient_info' and 'missing_info' not in analysis_result:
+            logger.info("📋 Obtendo informações faltantes para estado collecting_patient_info")
+            missing_info_result = conversation_service.get_missing_appointment_info(phone_number, session)
+            analysis_result['missing_info'] = missing_info_result.get('missing_info', [])
+            logger.info("📋 Informações faltantes: %s", analysis_result['missing_info'])
+        
+        return analysis_result, response_result, False
+    
+    def _complete_turn(self, phone_number: str, message: str, session: Dict, clinic_data: Dict,
+                       analysis_result: Dict, response_result: Dict, generated: bool) -> Dict[str, Any]:
+        """
+        Final do turno depois da resposta: verificação da resposta gerada pelo Gemini,
+        retomada automática do agendamento e histórico (passos 10 a 11)
+        
+        Args:
+            generated: Se a resposta veio do Gemini neste turno (passo 10)
+        """
+        if generated:
+            # ═══════════════════════════════════════════════════════════════════
+            # VERIFICAÇÃO FINAL: Interceptar se Gemini perguntou data sem especialidade
+            # ═══════════════════════════════════════════════════════════════════
+            response_text = response_result.get('response', '')
+            has_specialty = bool(session.get('selected_specialty'))
+            has_doctor = bool(session.get('selected_doctor'))
+            
+            # Verificar se a resposta contém perguntas sobre data/horário sem ter especialidade
+            response_lower = response_text.lower()
+            asking_date_time = any(keyword in response_lower for keyword in [
+                'data', 'horário', 'horario', 'dia', 'quando', 'qual data', 'qual horário'
+            ])
+            
+            if asking_date_time and not (has_specialty and has_doctor):
+                # Gemini tentou perguntar data/horário sem ter especialidade E médico
+                logger.warning("⚠️ Gemini tentou perguntar data/horário sem especialidade E médico - interceptando")
                 
-                if asking_date_time and not (has_specialty and has_doctor):
-                    # Gemini tentou perguntar data/horário sem ter especialidade E médico
-                    logger.warning("⚠️ Gemini tentou perguntar data/horário sem especialidade E médico - interceptando")
-                    
-                    # Determinar o que falta
-                    if not has_specialty:
-                        # Obter especialidades do médico se tiver médico selecionado
-                        if has_doctor:
-                            doctor_name = session.get('selected_doctor')
-                            # Buscar especialidades do médico (usar clinic_data que já foi carregado)
-                            medicos = clinic_data.get('medicos', [])
-                            doctor_specialties = []
-                            for medico in medicos:
-                                if medico.get('nome', '').lower() == doctor_name.lower():
-                                    especialidades_medico = medico.get('especialidades_display', '')
-                                    if especialidades_medico:
-                                        specialties_list_raw = especialidades_medico.replace(';', ',').split(',')
-                                        doctor_specialties = [s.strip() for s in specialties_list_raw if s.strip()]
-                                    break
-                            
-                            if doctor_specialties:
-                                specialties_display = ', '.join(doctor_specialties)
-                                response_result['response'] = f"Para agendar com o {doctor_name}, primeiro preciso saber qual especialidade você precisa. As especialidades disponíveis são: {specialties_display}. Qual especialidade você gostaria?"
-                            else:
-                                response_result['response'] = f"Para agendar com o {doctor_name}, primeiro preciso saber qual especialidade você precisa. Qual especialidade você gostaria?"
+                # Determinar o que falta
+                if not has_specialty:
+                    # Obter especialidades do médico se tiver médico selecionado
+                    if has_doctor:
+                        doctor_name = session.get('selected_doctor')
+                        # Buscar especialidades do médico (usar clinic_data que já foi carregado)
+                        medicos = clinic_data.get('medicos', [])
+                        doctor_specialties = []
+                        for medico in medicos:
+                            if medico.get('nome', '').lower() == doctor_name.lower():
+                                especialidades_medico = medico.get('especialidades_display', '')
+                                if especialidades_medico:
+                                    specialties_list_raw = especialidades_medico.replace(';', ',').split(',')
+                                    doctor_specialties = [s.strip() for s in specialties_list_raw if s.strip()]
+                                break
+                        
+                        if doctor_specialties:
+                            specialties_display = ', '.join(doctor_specialties)
+                            response_result['response'] = f"Para agendar com o {doctor_name}, primeiro preciso saber qual especialidade você precisa. As especialidades disponíveis são: {specialties_display}. Qual especialidade você gostaria?"
                         else:
-                            # Não tem nem médico nem especialidade
-                            response_result['response'] = "Para agendar sua consulta, primeiro preciso saber qual especialidade médica você procura. Qual especialidade você gostaria?"
-                    elif not has_doctor:
-                        # Tem especialidade mas falta médico
-                        response_result['response'] = f"Para a especialidade de {session.get('selected_specialty')}, qual médico você prefere?"
-                
-                # Atualizar sessão com a resposta final
-                self.session_manager.update_session(
-                    phone_number, session, analysis_result, response_result
-                )
-
-            # 10.5. Retomar automaticamente se usuário fornecer informações de agendamento enquanto está em answering_questions
-            # IMPORTANTE: Isso é feito DEPOIS da geração da resposta para garantir que dúvidas sejam respondidas primeiro
-            if session.get('current_state') == 'answering_questions' and session.get('previous_state'):
-                entities = analysis_result.get('entities', {})
-                
-                # Verificar se há entidades NOVAS de agendamento sendo fornecidas
-                # NÃO considerar nome_paciente se já estava na sessão (sempre é extraído)
-                has_new_appointment_entities = any([
-                    entities.get('medico') and entities.get('medico') != session.get('selected_doctor'),
-                    entities.get('especialidade') and entities.get('especialidade') != session.get('selected_specialty'),
-                    entities.get('data'),
-                    entities.get('horario')
-                ])
-                
-                intent = analysis_result.get('intent', '')
-                
-                # LÓGICA DE RETOMADA:
-                # 1. Se há entidades NOVAS de agendamento (data, horário, médico, especialidade), 
-                #    retomar SEMPRE, mesmo que a intenção seja buscar_info ou duvida
-                #    (porque o usuário está fornecendo informações, não apenas perguntando)
-                # 2. Se a intenção é explicitamente de agendamento, retomar
-                # 3. NÃO retomar se é apenas uma pergunta sem entidades de agendamento
-                should_resume = False
-                
-                if has_new_appointment_entities:
-                    # Se há entidades de agendamento, retomar independente da intenção
-                    # (usuário está fornecendo informações, não apenas perguntando)
-                    should_resume = True
-                    logger.info(f"🔄 Retomada automática detectada: há entidades de agendamento (data/horário/médico/especialidade) mesmo com intent={intent}")
-                elif intent in ['agendar_consulta', 'confirmar_agendamento', 'selecionar_especialidade', 'confirming_name']:
-                    # Se a intenção é explicitamente de agendamento, retomar
-                    should_resume = True
-                
-                if should_resume:
-                    restored_state = session.get('previous_state')
-                    session['current_state'] = restored_state
-                    session['previous_state'] = None
-                    # Atualizar no banco também
-                    db_session = conversation_service.get_or_create_session(phone_number)
-                    db_session.current_state = restored_state
-                    db_session.previous_state = None
-                    db_session.save()
-                    logger.info(f"🔄 Retomada automática do agendamento: answering_questions → {restored_state} (usuário forneceu informações de agendamento)")
+                            response_result['response'] = f"Para agendar com o {doctor_name}, primeiro preciso saber qual especialidade você precisa. Qual especialidade você gostaria?"
+                    else:
+                        # Não tem nem médico nem especialidade
+                        response_result['response'] = "Para agendar sua consulta, primeiro preciso saber qual especialidade médica você procura. Qual especialidade você gostaria?"
+                elif not has_doctor:
+                    # Tem especialidade mas falta médico
+                    response_result['response'] = f"Para a especialidade de {session.get('selected_specialty')}, qual médico você prefere?"
+            
+            # Atualizar sessão com a resposta final
+            self.session_manager.update_session(
+                phone_number, session, analysis_result, response_result
+            )
 
-            # 11. Salvar mensagens no histórico
-            self.session_manager.save_messages(
-                phone_number, message, response_result['response'], analysis_result
-            )   
+        # 10.5. Retomar automaticamente se usuário fornecer informações de agendamento enquanto está em answering_questions
+        # IMPORTANTE: Isso é feito DEPOIS da geração da resposta para garantir que dúvidas sejam respondidas primeiro
+        if session.get('current_state') == 'answering_questions' and session.get('previous_state'):
+            entities = analysis_result.get('entities', {})
             
-            return response_result
+            # Verificar se há entidades NOVAS de agendamento sendo fornecidas
+            # NÃO considerar nome_paciente se já estava na sessão (sempre é extraído)
+            has_new_appointment_entities = any([
+                entities.get('medico') and entities.get('medico') != session.get('selected_doctor'),
+                entities.get('especialidade') and entities.get('especialidade') != session.get('selected_specialty'),
+                entities.get('data'),
+                entities.get('horario')
+            ])
             
-        except Exception as e:
-            logger.error(f"❌ Erro ao processar mensagem: {e}")
-            import traceback
-            traceback.print_exc()
-            return self._get_fallback_response(message)
+            intent = analysis_result.get('intent', '')
+            
+            # LÓGICA DE RETOMADA:
+            # 1. Se há entidades NOVAS de agendamento (data, horário, médico, especialidade), 
+            #    retomar SEMPRE, mesmo que a intenção seja buscar_info ou duvida
+            #    (porque o usuário está fornecendo informações, não apenas perguntando)
+            # 2. Se a intenção é explicitamente de agendamento, retomar
+            # 3. NÃO retomar se é apenas uma pergunta sem entidades de agendamento
+            should_resume = False
+            
+            if has_new_appointment_entities:
+                # Se há entidades de agendamento, retomar independente da intenção
+                # (usuário está fornecendo informações, não apenas perguntando)
+                should_resume = True
+                logger.info("🔄 Retomada automática detectada: há entidades de agendamento (data/horário/médico/especialidade) mesmo com intent=%s", intent)
+            elif intent in ['agendar_consulta', 'confirmar_agendamento', 'selecionar_especialidade', 'confirming_name']:
+                # Se a intenção é explicitamente de agendamento, retomar
+                should_resume = True
+            
+            if should_resume:
+                restored_state = session.get('previous_state')
+                session['current_state'] = restored_state
+                session['previous_state'] = None
+                # Persistir junto com o restante da sessão do turno
+                self.session_manager.save_session(phone_number, session)
+                logger.info("🔄 Retomada automática do agendamento: answering_questions → %s (usuário forneceu informações de agendamento)", restored_state)
+
+        # 11. Salvar mensagens no histórico
+        self.session_manager.save_messages(
+            phone_number, message, response_result['response'], analysis_result, session=session
+        )   
+        
+        return response_result
+
     
     def _handle_scheduling_request(self, message: str, session: Dict, 
                                   analysis_result: Dict) -> Dict:
@@ -909,14 +1013,14 @@ Nossa secretaria entrará em contato em breve para finalizar seu agendamento."""
         - Retorna informações de disponibilidade para o paciente
         """
         try:
-            logger.info(f"🗓️ Processando solicitação de agendamento")
+            logger.info("🗓️ Processando solicitação de agendamento")
             
             # Usar o smart_scheduling_service para analisar a solicitação
             scheduling_analysis = smart_scheduling_service.analyze_scheduling_request(
                 message, session
             )
             
-            logger.info(f"📊 Análise de agendamento: {scheduling_analysis.get('response_type')}")
+            logger.info("📊 Análise de agendamento: %s", scheduling_analysis.get('response_type'))
             
             # Se temos informações suficientes para consultar disponibilidade
             if scheduling_analysis.get('response_type') == 'availability_info':
@@ -927,7 +1031,7 @@ Nossa secretaria entrará em contato em breve para finalizar seu agendamento."""
                 doctor_info = scheduling_analysis.get('doctor_info')
                 if doctor_info and doctor_info.get('nome'):
                     doctor_name = doctor_info['nome']
-                    logger.info(f"👨‍⚕️ Consultando disponibilidade para: {doctor_name}")
+                    logger.info("👨‍⚕️ Consultando disponibilidade para: %s", doctor_name)
                     
                     # Se já temos disponibilidade do analyze_scheduling_request, usar ela
                     # Caso contrário, fazer nova consulta
@@ -943,7 +1047,7 @@ Nossa secretaria entrará em contato em breve para finalizar seu agendamento."""
                         # Preservar mensagem formatada se existir
                         if formatted_message:
                             scheduling_analysis['formatted_availability_message'] = formatted_message
-                        logger.info(f"✅ Encontrados {availability['available_slots']} horários disponíveis")
+                        logger.info("✅ Encontrados %s horários disponíveis", availability['available_slots'])
                     else:
                         logger.warning(f"⚠️ Nenhum horário disponível encontrado para {doctor_name}")
                         scheduling_analysis['has_availability_info'] = False
@@ -979,7 +1083,7 @@ Nossa secretaria entrará em contato em breve para finalizar seu agendamento."""
             # 1) Se estamos aguardando confirmação de um nome pendente
             # ──────────────────────────────────────────────────────────────────────
             if session.get('pending_name'):
-                confirmation = conversation_service.confirm_patient_name(phone_number, message)
+                confirmation = conversation_service.confirm_patient_name(phone_number, message, session)
                 status = confirmation.get('status')
 
                 if status == 'confirmed':
@@ -989,7 +1093,7 @@ Nossa secretaria entrará em contato em breve para finalizar seu agendamento."""
                     session['name_confirmed'] = True
 
                     # Determinar próximo estado correto baseado no que falta
-                    missing_info = conversation_service.get_missing_appointment_info(phone_number)
+                    missing_info = conversation_service.get_missing_appointment_info(phone_number, session)
                     next_action = missing_info.get('next_action', 'ask_general')
                     
                     # Mapear next_action para next_state correto
@@ -1010,7 +1114,7 @@ Nossa secretaria entrará em contato em breve para finalizar seu agendamento."""
                     analysis_result['intent'] = 'confirmar_nome'
                     analysis_result['next_state'] = next_state
                     analysis_result['entities'] = {'nome_paciente': confirmed_name}
-                    logger.info(f"🔄 Próximo estado determinado: {next_state} (baseado em next_action: {next_action})")
+                    logger.info("🔄 Próximo estado determinado: %s (baseado em next_action: %s)", next_state, next_action)
 
                     follow_up = self._build_follow_up_after_name(phone_number, session)
                     response_text = f"Perfeito, {confirmed_name}! {follow_up}"
@@ -1128,7 +1232,7 @@ Nossa secretaria entrará em contato em breve para finalizar seu agendamento."""
     def _build_follow_up_after_name(self, phone_number: str, session: Dict) -> str:
         """Gera pergunta apropriada após confirmar o nome do paciente."""
         try:
-            missing_info = conversation_service.get_missing_appointment_info(phone_number)
+            missing_info = conversation_service.get_missing_appointment_info(phone_number, session)
             next_action = missing_info.get('next_action', 'ask_general')
 
             specialty = session.get('selected_specialty')
@@ -1156,24 +1260,51 @@ Nossa secretaria entrará em contato em breve para finalizar seu agendamento."""
         except Exception:
             return "Como posso te ajudar na sequência?"
 
+    def _hold_time_slot(self, phone_number: str, doctor_name: str, requested_date: Any, requested_time: Any,
+                        time_slot_check: Dict, ttl: Optional[int] = None) -> Dict:
+        """
+        Reserva o horário validado (SlotHold) para o paciente
+        
+        Se outro paciente reservou o mesmo horário entre a validação e a reserva,
+        revalida: o horário reservado passa a contar como ocupado e a resposta
+        traz as alternativas. Horário indisponível libera a reserva do paciente.
+        
+        Args:
+            phone_number: Telefone do paciente
+            doctor_name: Nome do médico
+            requested_date: Data solicitada
+            requested_time: Horário solicitado
+            time_slot_check: Resultado de is_time_slot_available
+            ttl: Validade da reserva em segundos (padrão: SLOT_HOLD_TTL)
+            
+        Returns:
+            Resultado da validação (revalidado se a reserva falhou)
+        """
+        if time_slot_check.get('available') and slot_hold_service.acquire(
+            doctor_name, time_slot_check.get('date_formatted'), time_slot_check.get('time_formatted'),
+            phone_number, ttl=ttl
+        ):
+            return time_slot_check
+        
+        if time_slot_check.get('available'):
+            logger.warning(f"⚠️ Horário {requested_time} em {requested_date} reservado por outro paciente durante a validação")
+            time_slot_check = smart_scheduling_service.is_time_slot_available(
+                doctor_name=doctor_name,
+                requested_date=requested_date,
+                requested_time=requested_time,
+                phone_number=phone_number
+            )
+            time_slot_check['available'] = False
+        
+        slot_hold_service.release(phone_number)
+        return time_slot_check
+    
     def _format_date_for_user(self, date_value: Any) -> str:
         """Normaliza datas (string ou date) para formato DD/MM/YYYY amigável."""
         if not date_value:
             return ''
-        try:
-            from datetime import date, datetime
-
-            if isinstance(date_value, str):
-                try:
-                    parsed = datetime.fromisoformat(date_value)
-                except ValueError:
-                    parsed = datetime.strptime(date_value, '%Y-%m-%d')
-                return parsed.strftime('%d/%m/%Y')
-            if isinstance(date_value, date):
-                return date_value.strftime('%d/%m/%Y')
-        except Exception:
-            return str(date_value)
-        return str(date_value)
+        parsed = parse_date(date_value)
+        return parsed.strftime('%d/%m/%Y') if parsed else str(date_value)
     
     def _get_clinic_data_optimized(self) -> Dict:
         """Obtém dados da clínica de forma otimizada"""
@@ -1221,7 +1352,7 @@ Nossa secretaria entrará em contato em breve para finalizar seu agendamento."""
             # Adicionar o link à mensagem de confirmação
             full_message = f"{confirmation_message}\n{handoff_link}"
             
-            logger.info(f"✅ Handoff gerado com sucesso para {phone_number}")
+            logger.info("✅ Handoff gerado com sucesso para %s", phone_number)
             
             return {
                 'message': full_message,
@@ -1252,7 +1383,7 @@ Nossa secretaria entrará em contato em breve para finalizar seu agendamento."""
                 if telefone:
                     telefone_info = f" ou entre em contato com o telefone da clínica {telefone}"
         except Exception as e:
-            logger.debug(f"Não foi possível obter telefone da clínica: {e}")
+            logger.debug("Não foi possível obter telefone da clínica: %s", e)
         
         return {
             'response': f"Desculpe, estou com dificuldades técnicas no momento. Por favor, tente novamente em alguns instantes{telefone_info}.",
@@ -4,7 +4,8 @@ Entity Extractor - Extração de Entidades das Mensagens
 Responsável por:
 - Extrair entidades relevantes das mensagens usando Gemini
 - Normalizar e validar dados extraídos
-- Sem fallbacks - se Gemini falhar, retorna vazio
+- Reconhecer especialidades por sinônimos/termos leigos no índice local (rag_agent.specialty_index)
+- Sem fallbacks para as demais entidades - se Gemini falhar, retorna vazio
 """
 
 import json
@@ -12,9 +13,11 @@ import logging
 import re
 from typing import Dict, List, Optional
 
-import google.generativeai as genai
+from asgiref.sync import sync_to_async
 from django.conf import settings
 
+from ..container import services
+
 logger = logging.getLogger(__name__)
 
 
@@ -22,13 +25,22 @@ logger = logging.getLogger(__name__)
 class EntityExtractor:
     """Extração de entidades das mensagens"""
     
+    # Parâmetros de geração da extração
+    GENERATION_CONFIG = {
+        "temperature": 0.4,  # Mantido baixo para extração precisa, mas aumentado de 0.5 para melhor contexto
+        "top_p": 0.85,      # Aumentado de 0.8 para melhor compreensão de referências
+        "top_k": 30,        # Aumentado de 20 para considerar mais variações de nomes/entidades
+        "max_output_tokens": 300  # Aumentado de 200 para extrair nomes completos e entidades complexas
+    }
+    
     def __init__(self):
         self.api_key = getattr(settings, 'GEMINI_API_KEY', '')
         self.model = None
         
         if self.api_key:
             try:
-                genai.configure(api_key=self.api_key)
+                # SDK importado e configurado uma única vez pelo container de serviços
+                genai = services.get('genai')
                 model_name = getattr(settings, 'GEMINI_MODEL', 'gemini-2.5-flash-lite')
                 self.model = genai.GenerativeModel(model_name)
             except Exception as e:
@@ -41,27 +53,57 @@ class EntityExtractor:
         Sem fallbacks - se falhar, retorna vazio e pede novamente ao usuário
         """
         try:
-            # Tentar extração com Gemini primeiro
-            if self.model:
-                entities = self.extract_entities_with_gemini(message, session, conversation_history, clinic_data)
-                if entities and any(entities.values()):
-                    # Verificar se o nome extraído parece incompleto (apenas 2 palavras quando deveria ter mais)
-                    if 'nome_paciente' in entities:
-                        # Validar nome extraído pelo Gemini
-                        nome_extraido = entities['nome_paciente']
-                        if nome_extraido:
-                            logger.info(f"✅ Nome extraído pelo Gemini: '{nome_extraido}'")
-                    
-                    return self.validate_entities(entities)
+            entities = self.extract_entities_with_gemini(message, session, conversation_history, clinic_data) if self.model else {}
+            return self._finalize_entities(entities, message, session)
             
-            # Sem fallback - se Gemini não extraiu, retornar vazio
-            logger.warning("⚠️ Gemini não retornou entidades - retornando vazio")
+        except Exception as e:
+            logger.error(f"❌ Erro na extração de entidades com Gemini: {e}")
+            # Sem fallback - retornar vazio e deixar o sistema pedir novamente
             return {}
+    
+    async def aextract_entities(self, message: str, session: Dict, conversation_history: List, clinic_data: Dict) -> Dict[str, str]:
+        """
+        Versão assíncrona de extract_entities (webhook ASGI)
+        
+        Só a chamada ao Gemini roda no event loop; validação e índice local de
+        especialidades (que consultam o banco) rodam em thread.
+        """
+        try:
+            entities = await self.aextract_entities_with_gemini(message, session, conversation_history, clinic_data) if self.model else {}
+            return await sync_to_async(self._finalize_entities)(entities, message, session)
             
         except Exception as e:
             logger.error(f"❌ Erro na extração de entidades com Gemini: {e}")
-            # Sem fallback - retornar vazio e deixar o sistema pedir novamente
             return {}
+    
+    def _finalize_entities(self, entities: Optional[Dict[str, str]], message: str, session: Dict) -> Dict[str, str]:
+        """Valida as entidades do Gemini e completa a especialidade pelo índice local"""
+        validated = {}
+        
+        if entities and any(entities.values()):
+            # Verificar se o nome extraído parece incompleto (apenas 2 palavras quando deveria ter mais)
+            if 'nome_paciente' in entities:
+                # Validar nome extraído pelo Gemini
+                nome_extraido = entities['nome_paciente']
+                if nome_extraido:
+                    logger.info(f"✅ Nome extraído pelo Gemini: '{nome_extraido}'")
+            
+            validated = self.validate_entities(entities)
+        
+        # Especialidade em termos leigos ("pulmão", "ronco") reconhecida localmente
+        if not validated.get('especialidade') and session.get('current_state') == 'selecting_specialty':
+            from rag_agent.specialty_index import specialty_index
+            especialidade = specialty_index.resolve(message)
+            if especialidade:
+                logger.info(f"🏷️ Especialidade reconhecida pelo índice local: '{especialidade}'")
+                validated['especialidade'] = especialidade
+        
+        if validated:
+            return validated
+        
+        # Sem fallback - se Gemini não extraiu, retornar vazio
+        logger.warning("⚠️ Gemini não retornou entidades - retornando vazio")
+        return {}
         
     # Método para extrair entidades com Gemini
     def extract_entities_with_gemini(self, message: str, session: Dict,
@@ -72,12 +114,7 @@ class EntityExtractor:
             
             response = self.model.generate_content(
                 prompt,
-                generation_config={
-                    "temperature": 0.4,  # Mantido baixo para extração precisa, mas aumentado de 0.5 para melhor contexto
-                    "top_p": 0.85,      # Aumentado de 0.8 para melhor compreensão de referências
-                    "top_k": 30,        # Aumentado de 20 para considerar mais variações de nomes/entidades
-                    "max_output_tokens": 300  # Aumentado de 200 para extrair nomes completos e entidades complexas
-                }
+                generation_config=self.GENERATION_CONFIG
             )
             
             # Monitorar tokens
@@ -90,6 +127,28 @@ class EntityExtractor:
         except Exception as e:
             logger.error(f"Erro ao extrair entidades com Gemini: {e}")
             return {}
+    
+    async def aextract_entities_with_gemini(self, message: str, session: Dict,
+                                            conversation_history: List, clinic_data: Dict) -> Dict[str, str]:
+        """Extrai entidades usando Gemini (chamada assíncrona)"""
+        try:
+            prompt = await sync_to_async(self._build_entity_extraction_prompt)(
+                message, session, conversation_history, clinic_data
+            )
+            
+            response = await self.model.generate_content_async(
+                prompt,
+                generation_config=self.GENERATION_CONFIG
+            )
+            
+            from ..token_monitor import token_monitor
+            token_monitor.log_token_usage("EXTRAÇÃO_ENTIDADES", prompt, response.text, session.get('phone_number'))
+            
+            return self._extract_entities_from_response(response.text)
+            
+        except Exception as e:
+            logger.error(f"Erro ao extrair entidades com Gemini: {e}")
+            return {}
         
     # Método para construir o prompt de extração de entidades
     def _build_entity_extraction_prompt(self, message: str, session: Dict, conversation_history: List, clinic_data: Dict) -> str:
@@ -117,21 +176,27 @@ class EntityExtractor:
             if history_lines:
                 history_summary = "\n".join(history_lines)
 
-        # Resumo de especialidades disponíveis (limitar a 5)
+        # Referências priorizadas pela relevância para a mensagem (limitadas a RETRIEVAL_REFERENCE_LIMIT)
+        from ..retrieval_service import retrieval_service
+        retrieval_context = retrieval_service.get_context(message, session, conversation_history)
+
+        # Resumo de especialidades disponíveis
         specialties_summary = "Não disponível"
-        specialties = clinic_data.get('especialidades') or []
+        specialties = retrieval_service.prioritize(
+            clinic_data.get('especialidades') or [], retrieval_context['especialidade_ids']
+        )
         if specialties:
             specialties_summary = ', '.join([
                 esp.get('nome', '').strip()
-                for esp in specialties[:5]
+                for esp in specialties
                 if esp.get('nome')
             ]) or "Não disponível"
 
-        # Resumo de médicos disponíveis (limitar a 5)
+        # Resumo de médicos disponíveis
         doctors_summary = "Não disponível"
-        medicos = clinic_data.get('medicos') or []
+        medicos = retrieval_service.prioritize(clinic_data.get('medicos') or [], retrieval_context['medico_ids'])
         doctor_entries: List[str] = []
-        for medico in medicos[:5]:
+        for medico in medicos:
             nome = (medico.get('nome') or '').strip()
             if not nome:
                 continue
@@ -261,11 +326,12 @@ Responda APENAS com JSON válido:
             if len(doctor) >= 3:
                 validated['medico'] = doctor
         
-        # Validar especialidade
+        # Validar especialidade (sinônimos/termos leigos -> nome oficial do catálogo)
         if entities.get('especialidade'):
             specialty = entities['especialidade'].strip()
             if len(specialty) >= 3:
-                validated['especialidade'] = specialty.title()
+                from rag_agent.specialty_index import specialty_index
+                validated['especialidade'] = specialty_index.resolve(specialty) or specialty.title()
         
         # Validar data
         if entities.get('data'):
@@ -12,9 +12,10 @@ import logging
 import re
 from typing import Any, Dict, List
 
-import google.generativeai as genai
+from asgiref.sync import sync_to_async
 from django.conf import settings
 
+from ..container import services
 from ..token_monitor import token_monitor
 
 logger = logging.getLogger(__name__)
@@ -23,13 +24,22 @@ logger = logging.getLogger(__name__)
 class IntentDetector:
     """Detecção de intenções do usuário"""
     
+    # Parâmetros de geração da análise
+    GENERATION_CONFIG = {
+        "temperature": 0.6,  # Ligeiramente reduzido para análise mais precisa (mas ainda flexível)
+        "top_p": 0.85,       # Aumentado para melhor compreensão de contexto
+        "top_k": 30,         # Aumentado de 20 para considerar mais opções na análise
+        "max_output_tokens": 400  # Aumentado de 300 para permitir análises mais detalhadas
+    }
+    
     def __init__(self):
         self.api_key = getattr(settings, 'GEMINI_API_KEY', '')
         self.model = None
         
         if self.api_key:
             try:
-                genai.configure(api_key=self.api_key)
+                # SDK importado e configurado uma única vez pelo container de serviços
+                genai = services.get('genai')
                 model_name = getattr(settings, 'GEMINI_MODEL', 'gemini-2.5-flash-lite')
                 self.model = genai.GenerativeModel(model_name)
             except Exception as e:
@@ -74,12 +84,7 @@ class IntentDetector:
             # O Gemini analisa a mensagem e retorna um JSON com a análise estruturada
             response = self.model.generate_content(
                 analysis_prompt,
-                generation_config={
-                    "temperature": 0.6,  # Ligeiramente reduzido para análise mais precisa (mas ainda flexível)
-                    "top_p": 0.85,       # Aumentado para melhor compreensão de contexto
-                    "top_k": 30,         # Aumentado de 20 para considerar mais opções na análise
-                    "max_output_tokens": 400  # Aumentado de 300 para permitir análises mais detalhadas
-                }
+                generation_config=self.GENERATION_CONFIG
             )
             
             # ETAPA 3: Monitorar uso de tokens para controle de custos
@@ -105,12 +110,39 @@ class IntentDetector:
             logger.error(f"Erro na análise com Gemini: {e}")
             
             # Retornar erro para o usuário pedir reformulação
-            return {
-                'intent': 'error',
-                'next_state': session.get('current_state', 'idle'),
-                'confidence': 0.0,
-                'reasoning': f'Erro ao processar com Gemini: {str(e)}'
-            }
+            return self._error_result(session, e)
+    
+    async def aanalyze_message(self, message: str, session: Dict,
+                               conversation_history: List, clinic_data: Dict) -> Dict[str, Any]:
+        """
+        Versão assíncrona de analyze_message (webhook ASGI)
+        
+        O prompt é montado em thread (pode consultar o catálogo no banco) e a
+        chamada ao Gemini usa generate_content_async, sem bloquear o event loop.
+        """
+        try:
+            analysis_prompt = await sync_to_async(self._build_analysis_prompt)(
+                message, session, conversation_history, clinic_data
+            )
+            response = await self.model.generate_content_async(
+                analysis_prompt,
+                generation_config=self.GENERATION_CONFIG
+            )
+            token_monitor.log_token_usage("ANÁLISE", analysis_prompt, response.text, session.get('phone_number'))
+            return self._extract_analysis_from_response(response.text, message, session)
+            
+        except Exception as e:
+            logger.error(f"Erro na análise com Gemini: {e}")
+            return self._error_result(session, e)
+    
+    def _error_result(self, session: Dict, error: Exception) -> Dict[str, Any]:
+        """Resultado de análise quando o Gemini falha"""
+        return {
+            'intent': 'error',
+            'next_state': session.get('current_state', 'idle'),
+            'confidence': 0.0,
+            'reasoning': f'Erro ao processar com Gemini: {str(error)}'
+        }
     
     def _build_analysis_prompt(self, message: str, session: Dict, 
                              conversation_history: List, clinic_data: Dict) -> str:
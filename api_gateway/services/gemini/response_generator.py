@@ -10,9 +10,12 @@ Responsável por:
 import logging
 from typing import Any, Dict, List, Tuple
 
-import google.generativeai as genai
+from asgiref.sync import sync_to_async
 from django.conf import settings
 
+from ..container import services
+from ..datetime_parser import parse_date
+from ..retrieval_service import retrieval_service
 from ..token_monitor import token_monitor
 
 logger = logging.getLogger(__name__)
@@ -39,7 +42,8 @@ class ResponseGenerator:
         
         if self.api_key:
             try:
-                genai.configure(api_key=self.api_key)
+                # SDK importado e configurado uma única vez pelo container de serviços
+                genai = services.get('genai')
                 model_name = getattr(settings, 'GEMINI_MODEL', 'gemini-2.5-flash-lite')
                 self.model = genai.GenerativeModel(model_name)
                 
@@ -87,53 +91,81 @@ class ResponseGenerator:
                 generation_config=self.generation_config
             )
             
-            # Log do uso de tokens para resposta
-            token_monitor.log_token_usage("RESPOSTA", response_prompt, response.text, session.get('phone_number'))
+            return self._build_result(response_prompt, prompt_metadata, response.text, analysis_result, session)
             
-            metadata = prompt_metadata or {}
-            
-            # Preparar resposta base
-            response_text = response.text.strip()
-            
-            # Adicionar mensagem de retomada APENAS se:
-            # 1. Está em answering_questions
-            # 2. Há previous_state (agendamento pausado)
-            # 3. A intenção NÃO é agendar_consulta (ou seja, está realmente em dúvidas, não fornecendo informações)
-            # 4. Não há entidades de agendamento sendo fornecidas (nome, médico, especialidade, data, horário)
-            current_state = session.get('current_state')
-            previous_state = session.get('previous_state')
-            intent = analysis_result.get('intent', '')
-            entities = analysis_result.get('entities', {})
-            
-            # Verificar se há entidades de agendamento sendo fornecidas
-            has_appointment_entities = any([
-                entities.get('nome_paciente'),
-                entities.get('medico'),
-                entities.get('especialidade'),
-                entities.get('data'),
-                entities.get('horario')
-            ])
-            
-            # Só mostrar mensagem de retomada se está em dúvidas (não fornecendo informações de agendamento)
-            if (current_state == 'answering_questions' and 
-                previous_state and
-                intent not in ['agendar_consulta', 'confirmar_agendamento', 'selecionar_especialidade', 'confirming_name'] and
-                not has_appointment_entities):
-                response_text += "\n\nℹ️ Para voltar ao agendamento, diga 'continuar', 'retomar' ou 'voltar'."
-            
-            return {
-                'response': response_text,
-                'intent': analysis_result['intent'],
-                'confidence': analysis_result['confidence'],
-                # Enviar lista de médicos sugeridos para que outros módulos possam usar o contexto
-                'suggested_doctors': metadata.get('suggested_doctors', []),
-                'primary_suggested_doctor': metadata.get('primary_suggested_doctor')
-            }
+        except Exception as e:
+            logger.error(f"Erro na geração de resposta com Gemini: {e}")
+            return self._get_fallback_response(message)
+    
+    async def agenerate_response(self, message: str, analysis_result: Dict,
+                                 session: Dict, conversation_history: List,
+                                 clinic_data: Dict) -> Dict[str, Any]:
+        """
+        Versão assíncrona de generate_response (webhook ASGI)
+        
+        O prompt é montado em thread (recuperação no catálogo, banco) e a chamada
+        ao Gemini usa generate_content_async, sem bloquear o event loop.
+        """
+        try:
+            response_prompt, prompt_metadata = await sync_to_async(self._build_response_prompt)(
+                message, analysis_result, session, conversation_history, clinic_data
+            )
+            response = await self.model.generate_content_async(
+                response_prompt,
+                generation_config=self.generation_config
+            )
+            return self._build_result(response_prompt, prompt_metadata, response.text, analysis_result, session)
             
         except Exception as e:
             logger.error(f"Erro na geração de resposta com Gemini: {e}")
             return self._get_fallback_response(message)
     
+    def _build_result(self, response_prompt: str, prompt_metadata: Dict, raw_text: str,
+                      analysis_result: Dict, session: Dict) -> Dict[str, Any]:
+        """Resultado da geração a partir do texto do Gemini (tokens, aviso de retomada e médicos sugeridos)"""
+        # Log do uso de tokens para resposta
+        token_monitor.log_token_usage("RESPOSTA", response_prompt, raw_text, session.get('phone_number'))
+        
+        metadata = prompt_metadata or {}
+        
+        # Preparar resposta base
+        response_text = raw_text.strip()
+        
+        # Adicionar mensagem de retomada APENAS se:
+        # 1. Está em answering_questions
+        # 2. Há previous_state (agendamento pausado)
+        # 3. A intenção NÃO é agendar_consulta (ou seja, está realmente em dúvidas, não fornecendo informações)
+        # 4. Não há entidades de agendamento sendo fornecidas (nome, médico, especialidade, data, horário)
+        current_state = session.get('current_state')
+        previous_state = session.get('previous_state')
+        intent = analysis_result.get('intent', '')
+        entities = analysis_result.get('entities', {})
+        
+        # Verificar se há entidades de agendamento sendo fornecidas
+        has_appointment_entities = any([
+            entities.get('nome_paciente'),
+            entities.get('medico'),
+            entities.get('especialidade'),
+            entities.get('data'),
+            entities.get('horario')
+        ])
+        
+        # Só mostrar mensagem de retomada se está em dúvidas (não fornecendo informações de agendamento)
+        if (current_state == 'answering_questions' and 
+            previous_state and
+            intent not in ['agendar_consulta', 'confirmar_agendamento', 'selecionar_especialidade', 'confirming_name'] and
+            not has_appointment_entities):
+            response_text += "\n\nℹ️ Para voltar ao agendamento, diga 'continuar', 'retomar' ou 'voltar'."
+        
+        return {
+            'response': response_text,
+            'intent': analysis_result['intent'],
+            'confidence': analysis_result['confidence'],
+            # Enviar lista de médicos sugeridos para que outros módulos possam usar o contexto
+            'suggested_doctors': metadata.get('suggested_doctors', []),
+            'primary_suggested_doctor': metadata.get('primary_suggested_doctor')
+        }
+    
     def _build_response_prompt(self, message: str, analysis_result: Dict,
                              session: Dict, conversation_history: List,
                              clinic_data: Dict) -> Tuple[str, Dict[str, Any]]:
@@ -149,6 +181,10 @@ class ResponseGenerator:
         especialidades = clinic_data.get('especialidades', [])
 
         prompt_metadata: Dict[str, Any] = {}
+
+        # Trechos do catálogo relevantes para a mensagem (em vez dos primeiros itens do catálogo)
+        retrieval_context = retrieval_service.get_context(message, session, conversation_history)
+        relevant_specialties = retrieval_service.prioritize(especialidades, retrieval_context['especialidade_ids'])
         
         
         # Informações já coletadas
@@ -199,11 +235,11 @@ class ResponseGenerator:
             if doctor_specialties:
                 specialties_list = ', '.join(doctor_specialties)
             else:
-                # Se não encontrou especialidades do médico, usar todas
-                specialties_list = ', '.join([esp.get('nome', '') for esp in especialidades[:5]]) if especialidades else 'diversas especialidades'
+                # Se não encontrou especialidades do médico, usar as mais relevantes
+                specialties_list = ', '.join([esp.get('nome', '') for esp in relevant_specialties]) if relevant_specialties else 'diversas especialidades'
         else:
-            # Se não tem médico selecionado, mostrar todas as especialidades
-            specialties_list = ', '.join([esp.get('nome', '') for esp in especialidades[:5]]) if especialidades else 'diversas especialidades'
+            # Se não tem médico selecionado, mostrar as especialidades mais relevantes para a mensagem
+            specialties_list = ', '.join([esp.get('nome', '') for esp in relevant_specialties]) if relevant_specialties else 'diversas especialidades'
         
         # Obter médicos disponíveis (filtrar por especialidade se selecionada)
         medicos_list = []
@@ -345,31 +381,19 @@ DISPONIBILIDADE REAL DO GOOGLE CALENDAR:
                     elif has_date and not has_time:
                         # Tem data mas falta horário - mostrar apenas horários da data escolhida
                         # Normalizar formato da data para comparação
-                        from datetime import datetime
                         try:
-                            if isinstance(preferred_date, str):
-                                if '-' in preferred_date:
-                                    date_obj = datetime.strptime(preferred_date, '%Y-%m-%d').date()
-                                else:
-                                    date_obj = datetime.strptime(preferred_date, '%d/%m/%Y').date()
-                            else:
-                                date_obj = preferred_date
+                            date_obj = parse_date(preferred_date)
                             
-                            # Encontrar o dia específico
-                            selected_day_info = None
-                            for day in days_info:
-                                day_date_str = day.get('date', '')
-                                try:
-                                    if '/' in day_date_str:
-                                        day_date_obj = datetime.strptime(day_date_str, '%d/%m/%Y').date()
-                                    else:
-                                        day_date_obj = datetime.strptime(day_date_str, '%Y-%m-%d').date()
-                                    
-                                    if day_date_obj == date_obj:
-                                        selected_day_info = day
-                                        break
-                                except:
-                                    continue
+                            # Encontrar o dia específico (estrutura tipada; dias com strings como fallback)
+                            typed_availability = calendar_availability.get('availability')
+                            if typed_availability is not None:
+                                selected_days = typed_availability.on(date_obj).to_days() if date_obj else []
+                                selected_day_info = selected_days[0] if selected_days else None
+                            else:
+                                selected_day_info = next(
+                                    (day for day in days_info if date_obj and parse_date(day.get('date', '')) == date_obj),
+                                    None
+                                )
                             
                             if selected_day_info:
                                 available_times = selected_day_info.get('available_times', [])
@@ -485,6 +509,14 @@ INFORMAÇÕES DA CLÍNICA (USE APENAS ESTAS INFORMAÇÕES, NÃO INVENTE):
 - Referência de localização: {clinic_reference if clinic_reference else 'Não informado'}
 - Telefone: {clinic_phone if clinic_phone else 'Não informado'}
 - Email: {clinic_email if clinic_email else 'Não informado'}
+"""
+
+        # Trechos recuperados do catálogo
+        catalog_context = ""
+        if retrieval_context['text']:
+            catalog_context = f"""
+TRECHOS RELEVANTES DO CATÁLOGO (use para responder dúvidas; NÃO invente além disso):
+{retrieval_context['text']}
 """
 
         # Contexto específico baseado no estado
@@ -672,6 +704,7 @@ INTENÇÃO DETECTADA: {intent}
 SAUDAÇÃO JÁ ENVIADA: {saudacao_status}
 {state_context}
 {clinic_info_text}
+{catalog_context}
 {doctor_price_context}
 INFORMAÇÕES JÁ COLETADAS (NÃO PERGUNTE NOVAMENTE):
 {collected_info_str}
@@ -10,7 +10,6 @@ Responsável por:
 
 import logging
 import re
-from datetime import datetime
 from typing import Any, Dict, List, Optional
 
 # Termos usados para reconhecer que o usuário está confirmando o médico por pronome
@@ -31,10 +30,14 @@ PRONOUN_DOCTOR_MESSAGE_TERMS = PRONOUN_DOCTOR_TERMS.union(
 # Padrões regex para capturar pronome isolado na frase
 PRONOUN_DOCTOR_REGEX = [r'\bele\b', r'\bela\b']
 
-from django.core.cache import cache
 from django.utils import timezone
+from rag_agent.text import strip_doctor_title
 
-from ..token_monitor import token_monitor
+from ..datetime_parser import parse_date, parse_time
+from ..session_persistence import (SNAPSHOT_KEY, session_write_behind,
+                                   snapshot_from_model)
+from ..session_state import SessionState
+from ..session_store import session_store
 
 logger = logging.getLogger(__name__)
 
@@ -56,11 +59,9 @@ def resolve_doctor_reference(doctor_reference: Optional[str], message_lower: str
     reference_clean = (doctor_reference or '').strip()
     reference_lower = reference_clean.lower()
 
-    # Função auxiliar para normalizar expressões removendo prefixos como "dr." ou "com"
+    # Função auxiliar para normalizar expressões removendo "com" e títulos ("dr.", "dra.", "doutor")
     def _normalize_reference(text: str) -> str:
-        normalized = text.strip().lower()
-        # Remover prefixos comuns
-        normalized = re.sub(r'^(dr\.?|dra\.?|doutor(a)?)\s+', '', normalized)
+        normalized = strip_doctor_title(text.strip().lower())
         if normalized.startswith('com '):
             normalized = normalized[4:]
         return normalized.strip()
@@ -117,8 +118,7 @@ class SessionManager:
         Returns:
             Dict com dados da sessão
         """
-        cache_key = f"gemini_session_{phone_number}"
-        session = cache.get(cache_key)
+        session = session_store.get(phone_number)
         
         if not session:
             # Tentar carregar do banco de dados
@@ -128,7 +128,7 @@ class SessionManager:
                 
                 if db_session:
                     # Carregar dados do banco para o cache
-                    session = {
+                    session = SessionState({
                         'phone_number': phone_number,
                         'current_state': db_session.current_state,
                         'previous_state': db_session.previous_state,
@@ -137,46 +137,50 @@ class SessionManager:
                         'name_confirmed': db_session.name_confirmed,
                         'selected_doctor': db_session.selected_doctor,
                         'selected_specialty': db_session.selected_specialty,
-                        'preferred_date': db_session.preferred_date.isoformat() if db_session.preferred_date else None,
-                        'preferred_time': db_session.preferred_time.isoformat() if db_session.preferred_time else None,
+                        'preferred_date': db_session.preferred_date,
+                        'preferred_time': db_session.preferred_time,
                         'insurance_type': db_session.insurance_type,
-                        'created_at': db_session.created_at.isoformat(),
-                        'last_activity': timezone.now().isoformat(),
-                        'has_greeted': getattr(db_session, 'name_confirmed', False)
-                    }
-                    logger.info(f"📥 Sessão carregada do banco - Nome: {db_session.patient_name}, Médico: {db_session.selected_doctor}")
+                        'created_at': db_session.created_at,
+                        'last_activity': timezone.now(),
+                        'has_greeted': getattr(db_session, 'name_confirmed', False),
+                        # Último estado persistido (base para detectar campos alterados)
+                        SNAPSHOT_KEY: snapshot_from_model(db_session),
+                        '_db_id': db_session.id
+                    })
+                    logger.info("📥 Sessão carregada do banco - Nome: %s, Médico: %s", db_session.patient_name, db_session.selected_doctor)
                 else:
                     # Criar nova sessão
                     session = self._create_empty_session(phone_number)
-                    logger.info(f"🆕 Nova sessão criada para {phone_number}")
+                    logger.info("🆕 Nova sessão criada para %s", phone_number)
             except Exception as e:
                 logger.error(f"Erro ao carregar sessão do banco: {e}")
                 # Fallback: criar sessão vazia
                 session = self._create_empty_session(phone_number)
             
-            cache.set(cache_key, session, token_monitor.get_cache_timeout())
+            session_store.set(phone_number, session)
         
         session.setdefault('has_greeted', False)
         return session
     
-    def _create_empty_session(self, phone_number: str) -> Dict[str, Any]:
+    def _create_empty_session(self, phone_number: str) -> SessionState:
         """Cria uma sessão vazia"""
-        session = {
-            'phone_number': phone_number,
-            'current_state': 'idle',
-            'previous_state': None,
-            'patient_name': None,
-            'pending_name': None,
-            'name_confirmed': False,
-            'selected_doctor': None,
-            'selected_specialty': None,
-            'preferred_date': None,
-            'preferred_time': None,
-            'insurance_type': None,
-            'created_at': timezone.now().isoformat(),
-            'last_activity': timezone.now().isoformat(),
-            'has_greeted': False
-        }
+        now = timezone.now()
+        session = SessionState(
+            phone_number=phone_number,
+            current_state='idle',
+            previous_state=None,
+            patient_name=None,
+            pending_name=None,
+            name_confirmed=False,
+            selected_doctor=None,
+            selected_specialty=None,
+            preferred_date=None,
+            preferred_time=None,
+            insurance_type=None,
+            created_at=now,
+            last_activity=now,
+            has_greeted=False
+        )
         return session
     
     def update_session(self, phone_number: str, session: Dict, 
@@ -202,8 +206,8 @@ class SessionManager:
             next_state = analysis_result.get('next_state')
             if next_state and session.get('current_state') not in ['confirming', 'answering_questions']:
                 session['current_state'] = next_state
-                logger.debug(f"🔄 Estado atualizado no cache: {next_state}")
-            session['last_activity'] = timezone.now().isoformat()
+                logger.debug("🔄 Estado atualizado no cache: %s", next_state)
+            session['last_activity'] = timezone.now()
             
             # CORREÇÃO: Armazenar informações da resposta gerada
             if response_result:
@@ -228,13 +232,13 @@ class SessionManager:
                     normalized_suggestions = [doctor.strip() for doctor in suggested_doctors if isinstance(doctor, str) and doctor.strip()]
                     if normalized_suggestions:
                         session['last_suggested_doctors'] = normalized_suggestions
-                        logger.info(f"📝 Lista de médicos sugeridos registrada: {normalized_suggestions}")
+                        logger.info("📝 Lista de médicos sugeridos registrada: %s", normalized_suggestions)
                         if not primary_suggested_doctor:
                             primary_suggested_doctor = normalized_suggestions[0]
                 
                 if primary_suggested_doctor and isinstance(primary_suggested_doctor, str):
                     session['last_suggested_doctor'] = primary_suggested_doctor.strip()
-                    logger.info(f"🗂️ Último médico sugerido registrado:\n {session['last_suggested_doctor']}")
+                    logger.info("🗂️ Último médico sugerido registrado:\n %s", session['last_suggested_doctor'])
             
             # Atualizar entidades extraídas
             entities = analysis_result['entities']
@@ -249,14 +253,14 @@ class SessionManager:
             )
             if resolved_doctor:
                 entities['medico'] = resolved_doctor
-                logger.info(f"🤝 Médico confirmado a partir do contexto/pronome: {resolved_doctor}")
+                logger.info("🤝 Médico confirmado a partir do contexto/pronome: %s", resolved_doctor)
             elif entities.get('medico') and isinstance(entities['medico'], str):
                 # Garantir que nomes venham sem espaços extras
                 entities['medico'] = entities['medico'].strip()
             
             # Log das entidades extraídas para debug
             if entities:
-                logger.info(f"🔍 Entidades extraídas: {entities}")
+                logger.info("🔍 Entidades extraídas: %s", entities)
             
             # Atualizar nome do paciente
             if entities.get('nome_paciente') and entities['nome_paciente'] != 'null':
@@ -272,7 +276,7 @@ class SessionManager:
                 medico_validado = self._validate_doctor(medico_extraido, session.get('selected_specialty'))
                 if medico_validado:
                     session['selected_doctor'] = medico_validado
-                    logger.info(f"✅ Médico atualizado e validado: {medico_validado}")
+                    logger.info("✅ Médico atualizado e validado: %s", medico_validado)
                 else:
                     # Médico inválido - limpar se já estava salvo
                     if session.get('selected_doctor'):
@@ -288,7 +292,7 @@ class SessionManager:
                 especialidade_validada = self._validate_specialty(especialidade_extraida)
                 if especialidade_validada:
                     session['selected_specialty'] = especialidade_validada
-                    logger.info(f"✅ Especialidade atualizada e validada: {especialidade_validada}")
+                    logger.info("✅ Especialidade atualizada e validada: %s", especialidade_validada)
                 else:
                     # Especialidade inválida - limpar se já estava salva
                     if session.get('selected_specialty'):
@@ -304,7 +308,7 @@ class SessionManager:
                     processed_date = self._process_date(entities['data'])
                     if processed_date:
                         session['preferred_date'] = processed_date
-                        logger.info(f"✅ Data atualizada (normalizada): {processed_date}")
+                        logger.info("✅ Data atualizada (normalizada): %s", processed_date)
                     else:
                         # Data não pôde ser normalizada - marcar para informar ao usuário
                         session['invalid_date_provided'] = entities['data']
@@ -317,7 +321,7 @@ class SessionManager:
                 # Verificar se especialidade E médico já foram selecionados
                 if session.get('selected_specialty') and session.get('selected_doctor'):
                     session['preferred_time'] = self._process_time(entities['horario'])
-                    logger.info(f"✅ Horário atualizado (especialidade e médico já selecionados)")
+                    logger.info("✅ Horário atualizado (especialidade e médico já selecionados)")
                 else:
                     logger.warning(f"⚠️ Horário ignorado: '{entities['horario']}' - Especialidade e médico devem ser selecionados primeiro")
             
@@ -335,7 +339,7 @@ class SessionManager:
                 'data': bool(session.get('preferred_date')),
                 'horario': bool(session.get('preferred_time'))
             }
-            logger.info(f"📋 Status das informações: {info_status}")
+            logger.info("📋 Status das informações: %s", info_status)
             
             # ═══════════════════════════════════════════════════════════════════════════════
             # CORREÇÃO AUTOMÁTICA DO ESTADO DA SESSÃO
@@ -373,7 +377,7 @@ class SessionManager:
             if not has_name:
                 if session.get('current_state') != 'collecting_patient_info':
                     session['current_state'] = 'collecting_patient_info'
-                    logger.info(f"🔄 Estado corrigido: {session.get('current_state')} → collecting_patient_info (não tem nome)")
+                    logger.info("🔄 Estado corrigido: %s → collecting_patient_info (não tem nome)", session.get('current_state'))
             else:
                 # PRIORIDADE 2: Após nome confirmado, ajustar estado baseado no que falta
                 
@@ -382,14 +386,14 @@ class SessionManager:
                 if has_doctor and not has_specialty:
                     if session.get('current_state') != 'selecting_specialty':
                         session['current_state'] = 'selecting_specialty'
-                        logger.info(f"🔄 Estado corrigido: {session.get('current_state')} → selecting_specialty (tem médico mas falta especialidade)")
+                        logger.info("🔄 Estado corrigido: %s → selecting_specialty (tem médico mas falta especialidade)", session.get('current_state'))
                 
                 # Caso 2: Tem especialidade mas falta médico
                 # Exemplo: Usuário escolheu "Cardiologia" mas ainda não escolheu o médico
                 elif has_specialty and not has_doctor:
                     if session.get('current_state') != 'selecting_doctor':
                         session['current_state'] = 'selecting_doctor'
-                        logger.info(f"🔄 Estado corrigido: {session.get('current_state')} → selecting_doctor (tem especialidade mas falta médico)")
+                        logger.info("🔄 Estado corrigido: %s → selecting_doctor (tem especialidade mas falta médico)", session.get('current_state'))
                 
                 # Caso 3: Tem médico E especialidade - pode avançar para escolher data/horário
                 # Exemplo: Todas as informações básicas coletadas, pode perguntar quando
@@ -397,75 +401,39 @@ class SessionManager:
                     # Só avança se ainda estiver em estados anteriores (evita retrocesso)
                     if session.get('current_state') in ['selecting_doctor', 'selecting_specialty']:
                         session['current_state'] = 'choosing_schedule'
-                        logger.info(f"🔄 Estado avançado automaticamente: {session.get('current_state')} → choosing_schedule (médico e especialidade já selecionados)")
-            
-            # Salvar sessão no cache
-            cache_key = f"gemini_session_{phone_number}"
-            cache.set(cache_key, session, token_monitor.get_cache_timeout())
+                        logger.info("🔄 Estado avançado automaticamente: %s → choosing_schedule (médico e especialidade já selecionados)", session.get('current_state'))
             
             # Log do estado final da sessão ANTES de sincronizar
-            logger.info(f"📋 Sessão atualizada - Estado: {session['current_state']}, Nome: {session.get('patient_name')}, Médico: {session.get('selected_doctor')}")
+            logger.info("📋 Sessão atualizada - Estado: %s, Nome: %s, Médico: %s",
+                        session['current_state'], session.get('patient_name'), session.get('selected_doctor'))
             
-            # Sincronizar com banco de dados
-            # IMPORTANTE: O estado já foi atualizado no cache (linhas 201-202 e 337-361)
-            # Agora sincronizamos com o banco para persistir
+            # Sincronizar com banco de dados ANTES de salvar no cache,
+            # para que o snapshot de campos persistidos também vá para o cache
             self.sync_to_database(phone_number, session)
+            
+            # Salvar sessão no cache
+            session_store.set(phone_number, session)
         except Exception as e:
             logger.error(f"Erro ao atualizar sessão: {e}")
     
     def _process_date(self, date_str: str) -> Optional[str]:
-        """Processa e normaliza string de data"""
-        try:
-            # Primeiro, tentar extrair data de formatos como "Sexta (10/10/2025)"
-            date_pattern = r'\((\d{1,2}/\d{1,2}/\d{4})\)'
-            match = re.search(date_pattern, date_str)
-            if match:
-                extracted_date = match.group(1)
-                logger.info(f"🔍 Data extraída do padrão: {extracted_date}")
-                date_str = extracted_date
-            
-            # Normalizar data
-            from ..conversation_service import conversation_service
-            normalized_date = conversation_service.normalize_date_for_database(date_str)
-            
-            # Verificar se a data foi normalizada corretamente (formato YYYY-MM-DD)
-            if normalized_date and re.match(r'^\d{4}-\d{2}-\d{2}$', normalized_date):
-                logger.info(f"✅ Data atualizada (normalizada): {normalized_date}")
-                return normalized_date
-            else:
-                # Se não conseguir normalizar, NÃO salvar e retornar None
-                logger.warning(f"⚠️ Data não pôde ser normalizada: '{date_str}' - formato inválido")
-                return None
-                
-        except Exception as e:
-            logger.error(f"Erro ao processar data: {e}")
-            logger.warning(f"⚠️ Data não pôde ser normalizada: '{date_str}' - erro: {e}")
-            return None
+        """Processa e normaliza string de data ("amanhã", "Sexta (10/10/2025)"...) para YYYY-MM-DD"""
+        parsed_date = parse_date(date_str)
+        if parsed_date:
+            return parsed_date.isoformat()
+        
+        # Se não conseguir normalizar, NÃO salvar e retornar None
+        logger.warning(f"⚠️ Data não pôde ser normalizada: '{date_str}' - formato inválido")
+        return None
     
     def _process_time(self, time_str: str) -> Optional[str]:
-        """Processa e normaliza string de horário"""
-        try:
-            # Tentar diferentes formatos de horário
-            from datetime import datetime
-            time_formats = ['%H:%M', '%H:%M:%S', '%I:%M %p', '%I:%M:%S %p']
-            parsed_time = None
-            
-            for fmt in time_formats:
-                try:
-                    parsed_time = datetime.strptime(time_str, fmt).time()
-                    break
-                except ValueError:
-                    continue
-            
-            if parsed_time:
-                return parsed_time.isoformat()
-            else:
-                # Se não conseguir fazer parse, salvar como string
-                return time_str
-                
-        except Exception as e:
-            logger.error(f"Erro ao processar horário: {e}")
-            return time_str
+        """Processa e normaliza string de horário ("às 14h30", "14:30"...) para HH:MM:SS"""
+        parsed_time = parse_time(time_str)
+        if parsed_time:
+            return parsed_time.isoformat()
+        
+        # Se não conseguir fazer parse, salvar como string
+        return time_str
     
     def _validate_specialty(self, specialty_name: str) -> Optional[str]:
         """
@@ -478,32 +446,13 @@ class SessionManager:
             Nome da especialidade validada (normalizado) ou None se inválida
         """
         try:
-            from rag_agent.models import Especialidade
+            from rag_agent.specialty_index import specialty_index
             
             if not specialty_name:
                 return None
             
-            specialty_name_lower = specialty_name.lower().strip()
-            
-            # Busca exata (case-insensitive)
-            especialidade = Especialidade.objects.filter(
-                nome__iexact=specialty_name_lower,
-                ativa=True
-            ).first()
-            
-            if especialidade:
-                return especialidade.nome
-            
-            # Busca parcial (contém)
-            especialidade = Especialidade.objects.filter(
-                nome__icontains=specialty_name_lower,
-                ativa=True
-            ).first()
-            
-            if especialidade:
-                return especialidade.nome
-            
-            return None
+            # Índice em memória: nome, sinônimos e termos leigos (sem consulta ao banco)
+            return specialty_index.resolve(specialty_name)
             
         except Exception as e:
             logger.error(f"Erro ao validar especialidade '{specialty_name}': {e}")
@@ -521,147 +470,82 @@ class SessionManager:
             Nome do médico validado ou None se inválido
         """
         try:
-            from rag_agent.models import Especialidade, Medico
+            from rag_agent.doctor_index import doctor_index
             
             if not doctor_name:
                 return None
             
-            doctor_name_lower = doctor_name.lower().strip()
+            medico = doctor_index.resolve(doctor_name, specialty=specialty)
+            if medico:
+                logger.info("✅ Médico '%s' validado com sucesso%s", medico['nome'],
+                            f" para especialidade '{specialty}'" if specialty else "")
+                return medico['nome']
             
-            # Buscar médico diretamente no banco (mais confiável que via serializer)
-            medicos = Medico.objects.prefetch_related('especialidades').all()
-            
-            # Buscar médico por nome (busca flexível)
-            for medico in medicos:
-                medico_name = medico.nome
-                medico_name_lower = medico_name.lower()
-                
-                # Busca exata ou parcial
-                if (doctor_name_lower in medico_name_lower or 
-                    medico_name_lower in doctor_name_lower):
-                    
-                    # Se especialidade foi fornecida, validar se médico tem essa especialidade
-                    if specialty:
-                        # Buscar especialidades do médico diretamente do banco
-                        especialidades_medico = medico.especialidades.filter(ativa=True)
-                        especialidades_nomes = [esp.nome.lower() for esp in especialidades_medico]
-                        specialty_lower = specialty.lower()
-                        
-                        if specialty_lower not in especialidades_nomes:
-                            logger.warning(f"⚠️ Médico '{medico_name}' não tem especialidade '{specialty}'. Especialidades do médico: {[esp.nome for esp in especialidades_medico]}")
-                            continue
-                    
-                    logger.info(f"✅ Médico '{medico_name}' validado com sucesso" + (f" para especialidade '{specialty}'" if specialty else ""))
-                    return medico_name
-            
-            logger.warning(f"⚠️ Médico '{doctor_name}' não encontrado no banco de dados")
+            if specialty and doctor_index.resolve(doctor_name):
+                logger.warning(f"⚠️ Médico '{doctor_name}' não tem especialidade '{specialty}'")
+            else:
+                logger.warning(f"⚠️ Médico '{doctor_name}' não encontrado no banco de dados")
             return None
             
         except Exception as e:
             logger.error(f"Erro ao validar médico '{doctor_name}': {e}")
             return None
     
-    def sync_to_database(self, phone_number: str, session: Dict):
+    def sync_to_database(self, phone_number: str, session: Dict, force: bool = False):
         """
         Sincroniza sessão do cache com o banco de dados
         
+        Apenas os campos alterados desde a última sincronização são gravados.
+        A gravação é feita pelo write-behind (imediata em transições críticas
+        ou quando force=True; caso contrário em até SESSION_FLUSH_DELAY segundos).
+        
         Args:
             phone_number: Número de telefone
             session: Dados da sessão
+            force: Se True, grava imediatamente no banco
         """
         try:
-            from api_gateway.models import ConversationSession
-
-            from ..conversation_service import conversation_service
-
-            # Normalizar data antes de salvar
-            normalized_date = conversation_service.normalize_date_for_database(session.get('preferred_date'))
-
-            # Obter ou criar sessão no banco
-            db_session, created = ConversationSession.objects.get_or_create(
-                phone_number=phone_number,
-                defaults={
-                    'current_state': session.get('current_state', 'idle'),
-                    'previous_state': session.get('previous_state'),
-                    'patient_name': session.get('patient_name'),
-                    'pending_name': session.get('pending_name'),
-                    'name_confirmed': session.get('name_confirmed', False),
-                    'insurance_type': session.get('insurance_type'),
-                    'selected_doctor': session.get('selected_doctor'),
-                    'selected_specialty': session.get('selected_specialty'),
-                    'preferred_date': normalized_date,
-                    'preferred_time': session.get('preferred_time'),
-                    'additional_notes': session.get('additional_notes'),
-                    'created_at': timezone.now(),
-                    'updated_at': timezone.now()
-                }
-            )
-            
-            if not created:
-                # Atualizar sessão existente
-                current_state_from_session = session.get('current_state', 'idle')
-                # Log para debug: verificar se o estado está sendo atualizado
-                if db_session.current_state != current_state_from_session:
-                    logger.info(f"🔄 Atualizando estado no banco: {db_session.current_state} → {current_state_from_session}")
-                db_session.current_state = current_state_from_session
-                # IMPORTANTE: Preservar previous_state se já existir no banco e não estiver na sessão em memória
-                # Isso evita que o previous_state seja limpo incorretamente quando pause_for_question já salvou
-                previous_state_from_session = session.get('previous_state')
-                if previous_state_from_session is not None:
-                    # Se a sessão em memória tem previous_state, usar esse valor
-                    db_session.previous_state = previous_state_from_session
-                # Se previous_state não está na sessão em memória (None), manter o valor do banco
-                # Isso preserva o previous_state salvo pelo pause_for_question mesmo se a sessão em memória não foi atualizada
-                elif db_session.previous_state:
-                    # Manter o previous_state do banco se ele já existir
-                    pass  # Não sobrescrever
-                else:
-                    # Se não tem no banco nem na sessão, pode ser None
-                    db_session.previous_state = None
-                # Garantir que o nome completo seja salvo (sem truncamento)
-                patient_name = session.get('patient_name')
-                if patient_name:
-                    patient_name = patient_name.strip()
-                db_session.patient_name = patient_name
-                # Garantir que o pending_name completo seja salvo (sem truncamento)
-                pending_name = session.get('pending_name')
-                if pending_name:
-                    pending_name = pending_name.strip()
-                db_session.pending_name = pending_name
-                db_session.name_confirmed = session.get('name_confirmed', False)
-                db_session.insurance_type = session.get('insurance_type')
-                db_session.selected_doctor = session.get('selected_doctor')
-                db_session.selected_specialty = session.get('selected_specialty')
-                db_session.preferred_date = normalized_date
-                db_session.preferred_time = session.get('preferred_time')
-                db_session.additional_notes = session.get('additional_notes')
-                db_session.updated_at = timezone.now()
-                db_session.save()
-            
-            logger.info(f"💾 Sessão sincronizada com banco - ID: {db_session.id}, Estado: {db_session.current_state}, Nome: {db_session.patient_name}, Data: {normalized_date}")
-            
+            dirty_fields = session_write_behind.persist(phone_number, session, force=force)
+            if dirty_fields:
+                if 'current_state' in dirty_fields:
+                    logger.info("🔄 Estado a persistir: %s", dirty_fields['current_state'])
+                logger.debug("💾 Campos alterados da sessão %s: %s", phone_number, sorted(dirty_fields))
         except Exception as e:
             logger.error(f"Erro ao sincronizar sessão com banco: {e}")
     
-    def get_conversation_history(self, phone_number: str, limit: int = 10) -> List[Dict]:
+    def save_session(self, phone_number: str, session: Dict, force: bool = False):
+        """
+        Salva a sessão no cache e agenda a persistência dos campos alterados
+        
+        Args:
+            phone_number: Número de telefone
+            session: Dados da sessão
+            force: Se True, grava imediatamente no banco
+        """
+        self.sync_to_database(phone_number, session, force=force)
+        session_store.set(phone_number, session)
+    
+    def get_conversation_history(self, phone_number: str, limit: int = 10,
+                                 session: Optional[Dict] = None) -> List[Dict]:
         """
         Obtém histórico da conversa
         
         Args:
             phone_number: Número de telefone
             limit: Limite de mensagens a retornar
+            session: Sessão do turno (evita reler a linha da sessão)
             
         Returns:
             Lista de mensagens do histórico
         """
         try:
             from ..conversation_service import conversation_service
-            return conversation_service.get_conversation_history(phone_number, limit)
+            return conversation_service.get_conversation_history(phone_number, limit, session=session)
         except:
             return []
     
     def save_messages(self, phone_number: str, user_message: str, bot_response: str, 
-                     analysis_result: Dict = None):
+                     analysis_result: Dict = None, session: Optional[Dict] = None):
         """
         Salva mensagens no histórico com entidades extraídas
         
@@ -670,6 +554,7 @@ class SessionManager:
             user_message: Mensagem do usuário
             bot_response: Resposta do bot
             analysis_result: Resultado da análise (opcional)
+            session: Sessão do turno (grava pelo ID, sem reler a linha da sessão)
         """
         try:
             from ..conversation_service import conversation_service
@@ -684,15 +569,22 @@ class SessionManager:
                 phone_number, user_message, 'user',
                 analysis_result.get('intent', 'user_message') if analysis_result else 'user_message',
                 analysis_result.get('confidence', 1.0) if analysis_result else 1.0,
-                entities_to_save
+                entities_to_save,
+                session=session
             )
             
             # Salvar resposta do bot
             conversation_service.add_message(
                 phone_number, bot_response, 'bot',
-                'bot_response', 1.0, {}
+                'bot_response', 1.0, {},
+                session=session
             )
             
+            if session is not None:
+                # Registrar atividade e manter no cache o ID da sessão no banco
+                session_write_behind.touch(phone_number)
+                self.save_session(phone_number, session)
+            
         except Exception as e:
             logger.error(f"Erro ao salvar mensagens: {e}")
 
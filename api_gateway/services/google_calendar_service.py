@@ -21,8 +21,14 @@ except ImportError:
 from django.conf import settings
 from django.utils import timezone
 
+from .availability import DoctorAvailability
+from .calendar_events import EventsByDay, partition_events
+from .container import lazy_service
+
 logger = logging.getLogger(__name__)
 
+SLOT_MINUTES = 30
+
 
 class GoogleCalendarService:
     """
@@ -33,6 +39,14 @@ class GoogleCalendarService:
         self.service = None
         self.enabled = getattr(settings, 'GOOGLE_CALENDAR_ENABLED', False)
         
+        # Backend sintético (testes de carga): mesma interface events().list, sem Google
+        if getattr(settings, 'GOOGLE_CALENDAR_BACKEND', 'google') == 'synthetic':
+            from .synthetic_calendar import build_synthetic_calendar
+            self.service = build_synthetic_calendar()
+            self.enabled = True
+            logger.info(f"Google Calendar sintético com {len(self.service.doctors)} médicos")
+            return
+        
         if not GOOGLE_CALENDAR_AVAILABLE:
             logger.warning("Google Calendar API não está disponível. Execute: pip install google-api-python-client google-auth")
             self.enabled = False
@@ -72,56 +86,6 @@ class GoogleCalendarService:
             logger.error(f"Erro ao configurar credenciais: {e}")
             raise
     
-    def get_doctor_availability(self, doctor_name: str, days_ahead: int = 7) -> Dict[str, Any]:
-        """
-        Obtém disponibilidade de um médico nos próximos dias
-        
-        Args:
-            doctor_name: Nome do médico
-            days_ahead: Quantos dias à frente consultar
-            
-        Returns:
-            Dicionário com disponibilidade por dia
-        """
-        if not self.enabled or not self.service:
-            return self._get_mock_availability(doctor_name, days_ahead)
-        
-        try:
-            # Usar calendário único da clínica
-            clinic_calendar_id = self._get_clinic_calendar_id()
-            
-            # Definir período de consulta
-            now = timezone.now()
-            start_time = now.replace(hour=0, minute=0, second=0, microsecond=0)
-            end_time = start_time + timedelta(days=days_ahead)
-            
-            # Consultar eventos do médico específico no calendário da clínica
-            events_result = self.service.events().list(
-                calendarId=clinic_calendar_id,
-                timeMin=start_time.isoformat(),
-                timeMax=end_time.isoformat(),
-                singleEvents=True,
-                orderBy='startTime',
-                q=doctor_name  # Buscar eventos que contenham o nome do médico
-            ).execute()
-            
-            events = events_result.get('items', [])
-            
-            # Filtrar eventos específicos do médico
-            doctor_events = self._filter_doctor_events(events, doctor_name)
-            
-            # Processar disponibilidade
-            availability = self._process_availability(doctor_name, doctor_events, start_time, days_ahead)
-            
-            return availability
-            
-        except HttpError as e:
-            logger.error(f"Erro na API do Google Calendar: {e}")
-            return self._get_mock_availability(doctor_name, days_ahead)
-        except Exception as e:
-            logger.error(f"Erro ao consultar disponibilidade: {e}")
-            return self._get_mock_availability(doctor_name, days_ahead)
-    
     def _get_clinic_calendar_id(self) -> str:
         """
         Obtém o Calendar ID único da clínica
@@ -138,117 +102,66 @@ class GoogleCalendarService:
         
         return clinic_calendar_id
     
-    def _filter_doctor_events(self, events: List[Dict], doctor_name: str) -> List[Dict]:
+    def _process_availability(self, doctor_name: str, events_by_day: EventsByDay, start_date: datetime, days_ahead: int) -> Dict[str, Any]:
         """
-        Filtra eventos do calendário único que pertencem ao médico específico
+        Processa eventos e gera disponibilidade (formato com strings, para a API)
         
         Args:
-            events: Lista de todos os eventos do calendário
-            doctor_name: Nome do médico a filtrar
-            
-        Returns:
-            Lista de eventos específicos do médico
+            doctor_name: Nome do médico
+            events_by_day: Eventos do médico por dia (ver partition_events_by_doctor)
+            start_date: Primeiro dia
+            days_ahead: Quantidade de dias
         """
-        doctor_events = []
-        
-        # Gerar keywords de forma inteligente
-        keywords = self._generate_doctor_keywords(doctor_name)
-        
-        logger.debug(f"Buscando eventos para {doctor_name} com keywords: {keywords}")
-        
-        for event in events:
-            event_title = event.get('summary', '').lower()
-            event_description = event.get('description', '').lower()
-            event_text = f"{event_title} {event_description}"
-            
-            # Verificar se o evento pertence ao médico
-            if any(keyword in event_text for keyword in keywords):
-                doctor_events.append(event)
-                logger.debug(f"Evento encontrado para {doctor_name}: {event.get('summary', '')}")
-        
-        logger.info(f"Encontrados {len(doctor_events)} eventos para {doctor_name} no calendário da clínica")
-        return doctor_events
+        availability = self._compute_availability(doctor_name, events_by_day, start_date, days_ahead)
+        return {
+            'doctor_name': doctor_name,
+            'period': f"{start_date.strftime('%d/%m/%Y')} a {(start_date + timedelta(days=days_ahead-1)).strftime('%d/%m/%Y')}",
+            'days': availability.to_days()
+        }
     
-    def _generate_doctor_keywords(self, doctor_name: str) -> List[str]:
+    def _compute_availability(self, doctor_name: str, events_by_day: EventsByDay, start_date: datetime,
+                              days_ahead: int) -> DoctorAvailability:
         """
-        Gera keywords simples para identificar eventos do médico no calendário
+        Calcula os horários livres do médico no período
         
-        Baseado no padrão: "Dr./Dra. Nome - Tipo"
+        Um horário fica ocupado se algum evento do dia se sobrepõe a ele
+        (um exame de 60 minutos ocupa dois horários de 30).
         
         Args:
             doctor_name: Nome do médico
+            events_by_day: Eventos do médico por dia (ver partition_events_by_doctor)
+            start_date: Primeiro dia
+            days_ahead: Quantidade de dias
             
         Returns:
-            Lista de keywords para buscar eventos
-        """
-        keywords = []
-        
-        # Normalizar nome
-        normalized_name = ' '.join(doctor_name.lower().split())
-        clean_name = normalized_name.replace('dr. ', '').replace('dra. ', '')
-        
-        # Keywords principais
-        keywords.extend([
-            normalized_name,           # "dr. gustavo magno"
-            clean_name,               # "gustavo magno"
-            f"dr. {clean_name}",      # "dr. gustavo magno"
-            f"dra. {clean_name}",     # "dra. gustavo magno"
-        ])
-        
-        # Adicionar partes do nome para busca flexível
-        name_parts = clean_name.split()
-        if len(name_parts) >= 2:
-            keywords.extend([
-                name_parts[0],        # "gustavo"
-                name_parts[-1],       # "magno"
-            ])
-        
-        # Remover duplicatas
-        keywords = list(set(keywords))
-        
-        logger.debug(f"✅ Keywords geradas para {doctor_name}: {keywords}")
-        return keywords
-    
-    def _process_availability(self, doctor_name: str, events: List[Dict], start_date: datetime, days_ahead: int) -> Dict[str, Any]:
-        """
-        Processa eventos e gera disponibilidade
+            DoctorAvailability (fins de semana e horários já passados de hoje ficam de fora)
         """
         # Horários padrão de atendimento (pode vir do banco de dados)
-        default_hours = self._get_doctor_working_hours(doctor_name)
+        working_hours = self._get_doctor_working_hours(doctor_name)
+        all_slots = [int(slot[:2]) * 60 + int(slot[3:5])
+                     for slot in working_hours['morning'] + working_hours['afternoon']]
         
-        availability = {
-            'doctor_name': doctor_name,
-            'period': f"{start_date.strftime('%d/%m/%Y')} a {(start_date + timedelta(days=days_ahead-1)).strftime('%d/%m/%Y')}",
-            'days': []
-        }
-        
-        # Processar cada dia
+        now = timezone.localtime()
+        current_minutes = now.hour * 60 + now.minute
+        slots_by_day = {}
         for day_offset in range(days_ahead):
-            current_date = start_date + timedelta(days=day_offset)
+            current_date = (start_date + timedelta(days=day_offset)).date()
             
-            # Pular fins de semana se necessário
+            # Pular fins de semana
             if current_date.weekday() >= 5:  # Sábado=5, Domingo=6
                 continue
             
-            # Obter eventos do dia
-            day_events = [
-                event for event in events
-                if self._is_same_day(current_date, event.get('start', {}).get('dateTime', ''))
-            ]
+            busy_events = [event for event in events_by_day.get(current_date, []) if not event.cancelled]
+            free = [slot for slot in all_slots
+                    if not any(event.overlaps(slot, slot + SLOT_MINUTES) for event in busy_events)]
             
-            # Calcular horários disponíveis
-            available_slots = self._calculate_available_slots(
-                current_date, day_events, default_hours
-            )
+            # Remover horários passados se for hoje
+            if current_date == now.date():
+                free = [slot for slot in free if slot > current_minutes]
             
-            if available_slots:
-                availability['days'].append({
-                    'date': current_date.strftime('%d/%m/%Y'),
-                    'weekday': self._get_weekday_name(current_date.weekday()),
-                    'available_times': available_slots
-                })
+            slots_by_day[current_date] = free
         
-        return availability
+        return DoctorAvailability(doctor_name, slots_by_day)
     
     def _get_doctor_working_hours(self, doctor_name: str) -> Dict[str, List[str]]:
         """
@@ -270,45 +183,6 @@ class GoogleCalendarService:
         
         return default_schedule
     
-    def _calculate_available_slots(self, date: datetime, events: List[Dict], working_hours: Dict) -> List[str]:
-        """
-        Calcula horários disponíveis baseado nos eventos ocupados
-        """
-        all_slots = working_hours['morning'] + working_hours['afternoon']
-        occupied_slots = []
-        
-        # Processar eventos ocupados
-        for event in events:
-            start_time = event.get('start', {}).get('dateTime', '')
-            if start_time:
-                try:
-                    event_datetime = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
-                    event_time = event_datetime.strftime('%H:%M')
-                    occupied_slots.append(event_time)
-                except Exception as e:
-                    logger.warning(f"Erro ao processar horário do evento: {e}")
-        
-        # Filtrar horários disponíveis
-        available_slots = [slot for slot in all_slots if slot not in occupied_slots]
-        
-        # Remover horários passados se for hoje
-        if date.date() == timezone.now().date():
-            current_time = timezone.now().strftime('%H:%M')
-            available_slots = [slot for slot in available_slots if slot > current_time]
-        
-        return available_slots
-    
-    def _is_same_day(self, date: datetime, event_datetime_str: str) -> bool:
-        """Verifica se evento é no mesmo dia"""
-        if not event_datetime_str:
-            return False
-        
-        try:
-            event_date = datetime.fromisoformat(event_datetime_str.replace('Z', '+00:00'))
-            return date.date() == event_date.date()
-        except:
-            return False
-    
     def _get_weekday_name(self, weekday: int) -> str:
         """Converte número do dia para nome"""
         days = ['Segunda', 'Terça', 'Quarta', 'Quinta', 'Sexta', 'Sábado', 'Domingo']
@@ -407,9 +281,22 @@ class GoogleCalendarService:
                 'doctors': []
             }
             
-            for medico in medicos:
-                doctor_availability = self.get_doctor_availability(medico.nome, days_ahead)
-                all_availability['doctors'].append(doctor_availability)
+            doctor_names = [medico.nome for medico in medicos]
+            if not self.enabled or not self.service:
+                all_availability['doctors'] = [self._get_mock_availability(name, days_ahead) for name in doctor_names]
+                return all_availability
+            
+            # Uma consulta ao calendário e uma passada nos eventos para todos os médicos
+            start_date = timezone.localtime()
+            events = self.get_events_for_date_range(
+                start_date.strftime('%Y-%m-%d'),
+                (start_date + timedelta(days=days_ahead)).strftime('%Y-%m-%d')
+            )
+            events_by_doctor = self.partition_events_by_doctor(events, doctor_names)
+            for doctor_name in doctor_names:
+                all_availability['doctors'].append(
+                    self._process_availability(doctor_name, events_by_doctor[doctor_name], start_date, days_ahead)
+                )
             
             return all_availability
             
@@ -430,7 +317,7 @@ class GoogleCalendarService:
         """
         try:
             # Calcular período de busca - APENAS EVENTOS FUTUROS
-            start_date = datetime.now()
+            start_date = timezone.localtime()
             end_date = start_date + timedelta(days=days_ahead)
             
             # Buscar todos os eventos do período
@@ -439,11 +326,11 @@ class GoogleCalendarService:
                 end_date.strftime('%Y-%m-%d')
             )
             
-            # Filtrar eventos do médico específico
-            doctor_events = self._filter_doctor_events(all_events, doctor_name)
+            # Eventos do médico específico, por dia
+            events_by_day = self.partition_events_by_doctor(all_events, [doctor_name])[doctor_name]
             
             # Processar disponibilidade
-            availability = self._process_availability(doctor_name, doctor_events, start_date, days_ahead)
+            availability = self._process_availability(doctor_name, events_by_day, start_date, days_ahead)
             
             return availability
             
@@ -451,6 +338,30 @@ class GoogleCalendarService:
             logger.error(f"Erro ao obter disponibilidade do {doctor_name}: {e}")
             return self._get_mock_availability(doctor_name, days_ahead)
 
+    def get_availability(self, doctor_name: str, days_ahead: int = 7) -> DoctorAvailability:
+        """
+        Horários livres de um médico em estrutura tipada (dias -> minutos)
+        
+        Args:
+            doctor_name: Nome do médico
+            days_ahead: Quantos dias à frente consultar
+            
+        Returns:
+            DoctorAvailability (disponibilidade simulada em caso de erro)
+        """
+        try:
+            start_date = timezone.localtime()
+            all_events = self.get_events_for_date_range(
+                start_date.strftime('%Y-%m-%d'),
+                (start_date + timedelta(days=days_ahead)).strftime('%Y-%m-%d')
+            )
+            events_by_day = self.partition_events_by_doctor(all_events, [doctor_name])[doctor_name]
+            return self._compute_availability(doctor_name, events_by_day, start_date, days_ahead)
+            
+        except Exception as e:
+            logger.error(f"Erro ao obter disponibilidade do {doctor_name}: {e}")
+            return DoctorAvailability.from_days(doctor_name, self._get_mock_availability(doctor_name, days_ahead)['days'])
+
     def get_events_for_date_range(self, start_date: str, end_date: str) -> List[Dict[str, Any]]:
         """
         Obtém eventos do Google Calendar em um período específico
@@ -474,17 +385,15 @@ class GoogleCalendarService:
             # Obter ID do calendário da clínica
             clinic_calendar_id = self._get_clinic_calendar_id()
             
-            # Buscar eventos no período
-            events_result = self.service.events().list(
+            # Buscar eventos no período (todas as páginas)
+            events = self._list_all_events(
                 calendarId=clinic_calendar_id,
                 timeMin=start_datetime,
                 timeMax=end_datetime,
-                maxResults=1000,  # Máximo de eventos
+                maxResults=2500,  # Máximo por página da API
                 singleEvents=True,
                 orderBy='startTime'
-            ).execute()
-            
-            events = events_result.get('items', [])
+            )
             logger.info(f"Encontrados {len(events)} eventos no período {start_date} a {end_date}")
             
             return events
@@ -496,6 +405,74 @@ class GoogleCalendarService:
             logger.error(f"Erro ao buscar eventos no período: {e}")
             return []
 
+    def list_events(self, time_min: datetime, time_max: datetime, **params) -> List[Dict[str, Any]]:
+        """
+        Eventos do calendário da clínica no período (todas as páginas)
+        
+        Diferente de get_events_for_date_range, erros são propagados: quem
+        materializa a agenda não pode confundir falha com agenda vazia.
+        
+        Args:
+            time_min: Início do período (com fuso)
+            time_max: Fim do período (com fuso)
+            **params: Parâmetros extras de events().list (updatedMin, showDeleted, q...)
+            
+        Returns:
+            Lista de eventos
+            
+        Raises:
+            RuntimeError: Google Calendar desabilitado ou sem credenciais
+        """
+        if not self.enabled or not self.service:
+            raise RuntimeError("Google Calendar não está habilitado ou configurado")
+        
+        return self._list_all_events(
+            calendarId=self._get_clinic_calendar_id(),
+            timeMin=time_min.isoformat(),
+            timeMax=time_max.isoformat(),
+            maxResults=2500,
+            singleEvents=True,
+            orderBy='startTime',
+            **params
+        )
+    
+    def partition_events_by_doctor(self, events: List[Dict], doctor_names: List[str]) -> Dict[str, EventsByDay]:
+        """
+        Separa os eventos do calendário único por médico e por dia, em uma passada
+        
+        O médico do evento é identificado pelos tokens do nome no título
+        ("Dr. João Carvalho - Consulta"); ver calendar_events.DoctorMatcher.
+        
+        Args:
+            events: Eventos do calendário
+            doctor_names: Nomes dos médicos
+            
+        Returns:
+            Dict nome do médico -> {dia: [CalendarEvent]}
+        """
+        partitioned = partition_events(events, doctor_names)
+        logger.info("Eventos separados: %d eventos para %d médicos", len(events), len(partitioned))
+        return partitioned
+
+    def _list_all_events(self, **params) -> List[Dict[str, Any]]:
+        """
+        Executa events().list seguindo nextPageToken até a última página
+        
+        Args:
+            **params: Parâmetros de events().list
+            
+        Returns:
+            Eventos de todas as páginas
+        """
+        events = []
+        page_token = None
+        while True:
+            events_result = self.service.events().list(pageToken=page_token, **params).execute()
+            events.extend(events_result.get('items', []))
+            page_token = events_result.get('nextPageToken')
+            if not page_token:
+                return events
+
     def test_connection(self) -> bool:
         """
         Testa conexão com Google Calendar API e acesso ao calendário da clínica
@@ -532,5 +509,5 @@ class GoogleCalendarService:
             return False
 
 
-# Instância global do serviço
-google_calendar_service = GoogleCalendarService()
+# Instância global (proxy: credenciais e cliente de descoberta só no primeiro uso)
+google_calendar_service = lazy_service('google_calendar')
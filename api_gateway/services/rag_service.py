@@ -6,6 +6,7 @@ from typing import Any, Dict, List
 
 from rag_agent.models import (ClinicaInfo, Convenio, Especialidade, Exame,
                               Medico)
+from rag_agent.search_index import search_catalog
 from rag_agent.serializers import (ClinicaInfoSerializer, ConvenioSerializer,
                                    EspecialidadeSerializer, ExameSerializer,
                                    MedicoResumoSerializer)
@@ -74,7 +75,7 @@ class RAGService:
             Lista de médicos ou lista vazia se erro
         """
         try:
-            medicos = Medico.objects.prefetch_related('especialidades', 'convenios')
+            medicos = Medico.objects.for_resumo()
             return MedicoResumoSerializer(medicos, many=True).data
         except Exception as e:
             logger.error(f"Erro ao obter médicos: {e}")
@@ -107,9 +108,7 @@ class RAGService:
             Dados do médico ou None se não encontrado
         """
         try:
-            medico = Medico.objects.prefetch_related(
-                'especialidades', 'convenios', 'horarios_trabalho'
-            ).get(id=medico_id)
+            medico = Medico.objects.for_detalhe().get(id=medico_id)
             from rag_agent.serializers import MedicoSerializer
             return MedicoSerializer(medico).data
         except Medico.DoesNotExist:
@@ -132,7 +131,7 @@ class RAGService:
         """
         try:
             especialidade = Especialidade.objects.get(id=especialidade_id, ativa=True)
-            medicos = Medico.objects.filter(especialidades=especialidade)
+            medicos = Medico.objects.filter(especialidades=especialidade).for_resumo()
             return MedicoResumoSerializer(medicos, many=True).data
         except Especialidade.DoesNotExist:
             logger.warning(f"Especialidade com ID {especialidade_id} não encontrada")
@@ -146,39 +145,16 @@ class RAGService:
         """
         Busca informações gerais baseada em uma query
         
+        Busca textual ranqueada em todo o catálogo (ver rag_agent.search_index).
+        
         Args:
             query: Termo de busca
             
         Returns:
-            Dicionário com resultados da busca
+            Dicionário com 'hits' (trechos destacados) e objetos encontrados por tipo
         """
         try:
-            query_lower = query.lower()
-            results = {}
-            
-            # Buscar na clínica info
-            clinica = ClinicaInfo.objects.first()
-            if clinica:
-                results['clinica'] = ClinicaInfoSerializer(clinica).data
-            
-            # Buscar especialidades
-            especialidades = Especialidade.objects.filter(
-                nome__icontains=query_lower, ativa=True
-            )
-            if especialidades.exists():
-                results['especialidades'] = EspecialidadeSerializer(especialidades, many=True).data
-            
-            # Buscar médicos
-            medicos = Medico.objects.filter(nome__icontains=query_lower)
-            if medicos.exists():
-                results['medicos'] = MedicoResumoSerializer(medicos, many=True).data
-            
-            # Buscar exames
-            exames = Exame.objects.filter(nome__icontains=query_lower)
-            if exames.exists():
-                results['exames'] = ExameSerializer(exames, many=True).data
-            
-            return results
+            return search_catalog(query)
         except Exception as e:
             logger.error(f"Erro na busca por '{query}': {e}")
             return {}
@@ -236,7 +212,7 @@ class RAGService:
             normalized_name = doctor_name.lower().replace('dr. ', '').replace('dra. ', '')
             
             # Buscar médico no banco
-            medico = Medico.objects.prefetch_related('especialidades', 'convenios').filter(
+            medico = Medico.objects.for_detalhe().filter(
                 nome__icontains=normalized_name
             ).first()
             
@@ -0,0 +1,120 @@
+"""
+Serviço de recuperação de contexto para os prompts do Gemini
+
+Responsável por:
+- Montar a consulta de recuperação a partir da mensagem e da sessão
+- Buscar os trechos mais relevantes do catálogo (rag_agent.retrieval)
+- Priorizar médicos/especialidades relevantes nas listas de referência dos prompts,
+  em vez de enviar sempre os primeiros itens do catálogo
+"""
+
+import logging
+from typing import Any, Dict, List, Optional, Sequence
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOP_K = 4
+# Máximo de itens nas listas de referência (especialidades/médicos) dos prompts
+DEFAULT_REFERENCE_LIMIT = 5
+# Caracteres da última resposta do assistente usados na consulta (pronomes: "com ele")
+HISTORY_QUERY_CHARS = 300
+
+
+def _empty_context() -> Dict[str, Any]:
+    return {'chunks': [], 'text': '', 'especialidade_ids': [], 'medico_ids': []}
+
+
+class RetrievalService:
+    """Recuperação dos trechos do catálogo relevantes para a mensagem"""
+
+    def __init__(self):
+        self.top_k = getattr(settings, 'RETRIEVAL_TOP_K', DEFAULT_TOP_K)
+        self.reference_limit = getattr(settings, 'RETRIEVAL_REFERENCE_LIMIT', DEFAULT_REFERENCE_LIMIT)
+
+    def build_query(self, message: str, session: Optional[Dict] = None,
+                    conversation_history: Optional[List] = None) -> str:
+        """
+        Consulta de recuperação: mensagem + escolhas já feitas + última resposta do assistente
+
+        Args:
+            message: Mensagem do paciente
+            session: Sessão atual
+            conversation_history: Histórico da conversa
+
+        Returns:
+            Texto da consulta
+        """
+        parts = [message or '']
+        session = session or {}
+        for key in ('selected_specialty', 'selected_doctor'):
+            if session.get(key):
+                parts.append(str(session[key]))
+        for msg in reversed(conversation_history or []):
+            if not msg.get('is_user'):
+                parts.append((msg.get('content') or '')[:HISTORY_QUERY_CHARS])
+                break
+        return ' '.join(part for part in parts if part)
+
+    def get_context(self, message: str, session: Optional[Dict] = None,
+                    conversation_history: Optional[List] = None, k: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Trechos relevantes do catálogo para a mensagem
+
+        Args:
+            message: Mensagem do paciente
+            session: Sessão atual
+            conversation_history: Histórico da conversa
+            k: Máximo de trechos (padrão: RETRIEVAL_TOP_K)
+
+        Returns:
+            Dict com 'chunks' (lista de (trecho, score)), 'text' (trechos formatados para o prompt)
+            e 'especialidade_ids'/'medico_ids' (ids em ordem de relevância)
+        """
+        try:
+            from rag_agent.retrieval import (KIND_ESPECIALIDADE, KIND_MEDICO,
+                                             format_chunk, retrieval_index)
+
+            query = self.build_query(message, session, conversation_history)
+            chunks = retrieval_index.search(query, k=k or self.top_k)
+            context = _empty_context()
+            context['chunks'] = chunks
+            context['text'] = '\n'.join(format_chunk(chunk) for chunk, _ in chunks)
+            for chunk, _ in chunks:
+                if chunk.kind == KIND_ESPECIALIDADE and chunk.object_id not in context['especialidade_ids']:
+                    context['especialidade_ids'].append(chunk.object_id)
+                elif chunk.kind == KIND_MEDICO and chunk.object_id not in context['medico_ids']:
+                    context['medico_ids'].append(chunk.object_id)
+            return context
+        except Exception as e:
+            logger.error(f"Erro ao recuperar trechos do catálogo: {e}")
+            return _empty_context()
+
+    def prioritize(self, items: Sequence[Dict[str, Any]], relevant_ids: Sequence[int],
+                   limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Itens relevantes primeiro (na ordem da recuperação), completados com os demais até o limite
+
+        Args:
+            items: Itens serializados do catálogo (com 'id')
+            relevant_ids: Ids recuperados, em ordem de relevância
+            limit: Tamanho máximo da lista (padrão: RETRIEVAL_REFERENCE_LIMIT)
+
+        Returns:
+            Lista com até `limit` itens
+        """
+        limit = limit or self.reference_limit
+        by_id = {item.get('id'): item for item in items}
+        selected = [by_id[item_id] for item_id in relevant_ids if item_id in by_id][:limit]
+        chosen = {item.get('id') for item in selected}
+        for item in items:
+            if len(selected) >= limit:
+                break
+            if item.get('id') not in chosen:
+                selected.append(item)
+        return selected
+
+
+# Instância global do serviço
+retrieval_service = RetrievalService()
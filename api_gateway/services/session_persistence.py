@@ -0,0 +1,297 @@
+"""
+Persistência Write-Behind das Sessões de Conversa
+
+Responsável por:
+- Detectar campos alterados (dirty) da sessão em cache em relação ao último estado persistido
+- Agrupar (coalescer) atualizações por número de telefone
+- Gravar imediatamente transições críticas (confirmação/handoff)
+- Gravar as demais atualizações em lote dentro de um atraso máximo configurável
+
+Modos de durabilidade (settings.SESSION_PERSISTENCE_MODE):
+- 'write_through': toda alteração é gravada no banco na hora (apenas campos alterados)
+- 'write_behind': alterações são acumuladas e gravadas em até SESSION_FLUSH_DELAY segundos;
+  estados em SESSION_FLUSH_STATES e links de handoff são gravados imediatamente
+"""
+
+import atexit
+import logging
+import threading
+from datetime import time
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections
+from django.utils import timezone
+
+from .datetime_parser import parse_date, parse_time
+
+logger = logging.getLogger(__name__)
+
+# Chave usada dentro do dicionário da sessão para guardar o último estado persistido
+SNAPSHOT_KEY = '_db_snapshot'
+
+# Campos da sessão em cache que são espelhados em ConversationSession
+SESSION_DB_FIELDS = (
+    'current_state',
+    'previous_state',
+    'patient_name',
+    'pending_name',
+    'name_confirmed',
+    'insurance_type',
+    'selected_doctor',
+    'selected_specialty',
+    'preferred_date',
+    'preferred_time',
+    'additional_notes',
+)
+
+DEFAULT_PERSISTENCE_MODE = 'write_behind'
+DEFAULT_FLUSH_DELAY = 2.0
+DEFAULT_FLUSH_STATES = ('confirming', 'confirming_name')
+
+
+def _normalize_date(value: Any) -> Optional[str]:
+    """Normaliza data para o formato YYYY-MM-DD aceito pelo DateField"""
+    if not value:
+        return None
+    parsed = parse_date(value)
+    return parsed.isoformat() if parsed else None
+
+
+def _normalize_time(value: Any) -> Optional[str]:
+    """Normaliza horário para HH:MM:SS aceito pelo TimeField"""
+    if not value:
+        return None
+    if isinstance(value, time):
+        return value.isoformat()
+    parsed = parse_time(value)
+    return parsed.isoformat() if parsed else None
+
+
+def _strip(value: Any) -> Any:
+    """Remove espaços extras de textos (sem truncar)"""
+    return value.strip() if isinstance(value, str) else value
+
+
+def session_to_db_fields(session: Dict) -> Dict[str, Any]:
+    """
+    Converte a sessão em cache para os valores das colunas do banco
+
+    Args:
+        session: Dados da sessão
+
+    Returns:
+        Dict campo -> valor já normalizado para ConversationSession
+    """
+    return {
+        'current_state': session.get('current_state') or 'idle',
+        'previous_state': session.get('previous_state'),
+        'patient_name': _strip(session.get('patient_name')),
+        'pending_name': _strip(session.get('pending_name')),
+        'name_confirmed': bool(session.get('name_confirmed', False)),
+        'insurance_type': session.get('insurance_type'),
+        'selected_doctor': session.get('selected_doctor'),
+        'selected_specialty': session.get('selected_specialty'),
+        'preferred_date': _normalize_date(session.get('preferred_date')),
+        'preferred_time': _normalize_time(session.get('preferred_time')),
+        'additional_notes': session.get('additional_notes'),
+    }
+
+
+def snapshot_from_model(db_session) -> Dict[str, Any]:
+    """
+    Gera o snapshot persistido a partir de uma instância de ConversationSession
+
+    Args:
+        db_session: Instância do modelo
+
+    Returns:
+        Dict no mesmo formato de session_to_db_fields
+    """
+    return {
+        'current_state': db_session.current_state,
+        'previous_state': db_session.previous_state,
+        'patient_name': db_session.patient_name,
+        'pending_name': db_session.pending_name,
+        'name_confirmed': db_session.name_confirmed,
+        'insurance_type': db_session.insurance_type,
+        'selected_doctor': db_session.selected_doctor,
+        'selected_specialty': db_session.selected_specialty,
+        'preferred_date': db_session.preferred_date.isoformat() if db_session.preferred_date else None,
+        'preferred_time': db_session.preferred_time.isoformat() if db_session.preferred_time else None,
+        'additional_notes': db_session.additional_notes,
+    }
+
+
+def get_dirty_fields(session: Dict) -> Dict[str, Any]:
+    """
+    Retorna apenas os campos alterados desde a última persistência
+
+    Sessões sem snapshot (recém-criadas) retornam todos os campos.
+
+    Args:
+        session: Dados da sessão
+
+    Returns:
+        Dict com campos alterados e seus novos valores
+    """
+    current = session_to_db_fields(session)
+    snapshot = session.get(SNAPSHOT_KEY)
+    if snapshot is None:
+        return current
+
+    return {field: value for field, value in current.items() if snapshot.get(field) != value}
+
+
+class SessionWriteBehind:
+    """
+    Fila write-behind que coalesce atualizações de sessão por telefone
+    """
+
+    def __init__(self):
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+
+    @property
+    def mode(self) -> str:
+        return getattr(settings, 'SESSION_PERSISTENCE_MODE', DEFAULT_PERSISTENCE_MODE)
+
+    @property
+    def flush_delay(self) -> float:
+        return float(getattr(settings, 'SESSION_FLUSH_DELAY', DEFAULT_FLUSH_DELAY))
+
+    @property
+    def flush_states(self) -> tuple:
+        return tuple(getattr(settings, 'SESSION_FLUSH_STATES', DEFAULT_FLUSH_STATES))
+
+    def persist(self, phone_number: str, session: Dict, force: bool = False) -> Dict[str, Any]:
+        """
+        Registra as alterações da sessão para persistência
+
+        Args:
+            phone_number: Número de telefone
+            session: Dados da sessão (o snapshot interno é atualizado)
+            force: Se True, grava imediatamente independente do modo
+
+        Returns:
+            Dict com os campos alterados (vazio se nada mudou)
+        """
+        dirty = get_dirty_fields(session)
+        if not dirty:
+            return {}
+
+        snapshot = dict(session.get(SNAPSHOT_KEY) or {})
+        snapshot.update(dirty)
+        session[SNAPSHOT_KEY] = snapshot
+
+        with self._lock:
+            self._pending.setdefault(phone_number, {}).update(dirty)
+
+        if force or self._is_critical(session, dirty):
+            self.flush(phone_number)
+        else:
+            self._schedule_flush()
+
+        return dirty
+
+    def touch(self, phone_number: str):
+        """
+        Registra atividade da sessão sem campos alterados
+
+        A próxima gravação atualiza apenas last_activity/updated_at.
+        """
+        with self._lock:
+            self._pending.setdefault(phone_number, {})
+        if self.mode == 'write_through':
+            self.flush(phone_number)
+        else:
+            self._schedule_flush()
+
+    def _is_critical(self, session: Dict, dirty: Dict[str, Any]) -> bool:
+        """Verifica se a alteração exige gravação imediata"""
+        if self.mode == 'write_through':
+            return True
+        if 'current_state' in dirty and dirty['current_state'] in self.flush_states:
+            return True
+        # Handoff gerado: a secretária pode consultar o banco a qualquer momento
+        return bool(session.get('handoff_link')) and session.get('current_state') == 'confirming'
+
+    def _schedule_flush(self):
+        """Agenda gravação em lote (no máximo um timer ativo)"""
+        with self._lock:
+            if self._timer is not None:
+                return
+            self._timer = threading.Timer(self.flush_delay, self._flush_from_timer)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush_from_timer(self):
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush()
+        finally:
+            # Thread do timer não passa pelo ciclo de request do Django
+            close_old_connections()
+
+    def flush(self, phone_number: Optional[str] = None) -> int:
+        """
+        Grava no banco as alterações pendentes
+
+        Args:
+            phone_number: Se informado, grava apenas as pendências desse telefone
+
+        Returns:
+            Número de sessões gravadas
+        """
+        with self._lock:
+            if phone_number is not None:
+                batch = {phone_number: self._pending.pop(phone_number)} if phone_number in self._pending else {}
+            else:
+                batch, self._pending = self._pending, {}
+
+        written = 0
+        for phone, fields in batch.items():
+            try:
+                self._write(phone, fields)
+                written += 1
+            except Exception as e:
+                logger.error(f"Erro ao gravar sessão {phone} no banco: {e}")
+                # Devolver para a fila sem sobrescrever alterações mais recentes
+                with self._lock:
+                    newer = self._pending.get(phone, {})
+                    self._pending[phone] = {**fields, **newer}
+        return written
+
+    def _write(self, phone_number: str, fields: Dict[str, Any]):
+        """Grava somente os campos alterados (UPDATE) ou cria a sessão se não existir"""
+        from api_gateway.models import ConversationSession
+
+        now = timezone.now()
+        updated = ConversationSession.objects.filter(phone_number=phone_number).update(
+            **fields, updated_at=now, last_activity=now
+        )
+        if not updated:
+            try:
+                ConversationSession.objects.create(phone_number=phone_number, **fields)
+            except IntegrityError:
+                # Criada concorrentemente por outra requisição
+                ConversationSession.objects.filter(phone_number=phone_number).update(
+                    **fields, updated_at=now, last_activity=now
+                )
+        logger.info("💾 Sessão sincronizada com banco - Telefone: %s, Campos: %s", phone_number, sorted(fields))
+
+    def has_pending(self, phone_number: Optional[str] = None) -> bool:
+        """Indica se há alterações aguardando gravação"""
+        with self._lock:
+            if phone_number is None:
+                return bool(self._pending)
+            return phone_number in self._pending
+
+
+# Instância global do serviço
+session_write_behind = SessionWriteBehind()
+
+# Garantir que nada fique pendente ao encerrar o processo
+atexit.register(session_write_behind.flush)
@@ -0,0 +1,502 @@
+"""
+Session State - Representação Tipada e Compacta da Sessão
+
+Responsável por:
+- Guardar a sessão em um objeto com __slots__ (campos fixos, sem __dict__ por instância)
+- Manter datas e horários como date/time/datetime (parse único, na atribuição)
+- Serializar em formato binário compacto: ordem fixa de campos, bitmaps de presença,
+  inteiros variáveis (varint) e estados como enum de 1 byte
+- Oferecer uma visão compatível com dict (session['campo'], get, setdefault, in...)
+  durante a migração do código que trata a sessão como dicionário
+
+Compatibilidade da visão dict:
+- Datas, horários e timestamps são devolvidos como strings ISO (mesmo formato de antes)
+- Valores fora do tipo esperado (ex.: data em texto livre) são mantidos como vieram
+- Chaves desconhecidas ficam em `extras` e são serializadas em um bloco JSON
+  (pickle quando o JSON não devolveria os mesmos valores, ex.: tuplas)
+
+Formato binário (versão 1):
+    versão (1 byte) | presentes (u32) | não nulos (u32) | valores na ordem de FIELDS | extras
+"""
+
+import json
+import pickle
+import struct
+from collections.abc import MutableMapping
+from datetime import date, datetime, time, timedelta
+from datetime import timezone as dt_timezone
+from typing import Any, Dict, Iterator, Optional
+
+from .session_persistence import SESSION_DB_FIELDS, SNAPSHOT_KEY
+
+FORMAT_VERSION = 1
+
+# Estados conhecidos -> código de 1 byte (ordem fixa: só acrescentar no final)
+STATES = (
+    'idle',
+    'collecting_patient_info',
+    'answering_questions',
+    'confirming_name',
+    'selecting_doctor',
+    'selecting_specialty',
+    'choosing_schedule',
+    'confirming',
+    'showing_doctors',
+    'showing_availability',
+    'appointment_confirmed',
+)
+STATE_CODES = {state: code for code, state in enumerate(STATES)}
+# Estado fora da lista: código reservado seguido do texto
+STATE_LITERAL = 0xFF
+
+# Tipos de campo
+STR, STATE, BOOL, INT, FLOAT, DATE, TIME, DATETIME, STR_LIST, SNAPSHOT = range(10)
+
+# Campos da sessão na ordem de serialização (só acrescentar no final; máximo 32)
+FIELDS = (
+    ('phone_number', STR),
+    ('current_state', STATE),
+    ('previous_state', STATE),
+    ('patient_name', STR),
+    ('pending_name', STR),
+    ('name_confirmed', BOOL),
+    ('has_greeted', BOOL),
+    ('selected_doctor', STR),
+    ('selected_specialty', STR),
+    ('preferred_date', DATE),
+    ('preferred_time', TIME),
+    ('insurance_type', STR),
+    ('additional_notes', STR),
+    ('created_at', DATETIME),
+    ('last_activity', DATETIME),
+    ('last_intent', STR),
+    ('last_confidence', FLOAT),
+    ('last_response', STR),
+    ('handoff_link', STR),
+    ('last_suggested_doctor', STR),
+    ('last_suggested_doctors', STR_LIST),
+    ('invalid_date_provided', STR),
+    ('_db_id', INT),
+    (SNAPSHOT_KEY, SNAPSHOT),
+)
+FIELD_NAMES = tuple(name for name, _ in FIELDS)
+FIELD_KINDS = dict(FIELDS)
+
+# Snapshot das colunas persistidas (valores já normalizados como texto)
+SNAPSHOT_FIELDS = tuple(
+    (name, STATE if name.endswith('_state') else BOOL if name == 'name_confirmed' else STR)
+    for name in SESSION_DB_FIELDS
+)
+
+# Atributos Python não aceitam o prefixo "_" do dict sem conflito com os internos
+_SLOT_NAMES = tuple(f"f_{name.lstrip('_')}" for name in FIELD_NAMES)
+_SLOT_BY_FIELD = dict(zip(FIELD_NAMES, _SLOT_NAMES))
+
+_MISSING = object()
+_HEADER = struct.Struct('>BII')
+_FLOAT = struct.Struct('>d')
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+_SNAPSHOT_NAMES = frozenset(SESSION_DB_FIELDS)
+_EXTRAS_JSON = 0
+_EXTRAS_PICKLE = 1
+
+
+# ── Primitivas binárias ────────────────────────────────────────────────────
+
+def _write_varint(out: bytearray, value: int):
+    """Inteiro não negativo em 7 bits por byte (LEB128)"""
+    if value < 0:
+        raise ValueError("varint negativo")
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, offset: int):
+    result = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, offset
+        shift += 7
+
+
+def _write_str(out: bytearray, value: str):
+    if not isinstance(value, str):
+        raise TypeError("texto esperado")
+    raw = value.encode('utf-8')
+    _write_varint(out, len(raw))
+    out += raw
+
+
+def _read_str(data: bytes, offset: int):
+    length, offset = _read_varint(data, offset)
+    end = offset + length
+    return data[offset:end].decode('utf-8'), end
+
+
+def _write_state(out: bytearray, value: Any):
+    if not isinstance(value, str):
+        raise TypeError("estado deve ser texto")
+    code = STATE_CODES.get(value)
+    if code is None:
+        out.append(STATE_LITERAL)
+        _write_str(out, value)
+    else:
+        out.append(code)
+
+
+def _write_bool(out: bytearray, value: Any):
+    if value is not True and value is not False:
+        raise TypeError("booleano esperado")
+    out.append(1 if value else 0)
+
+
+def _write_int(out: bytearray, value: Any):
+    if type(value) is not int:
+        raise TypeError("inteiro esperado")
+    _write_varint(out, value)
+
+
+def _write_float(out: bytearray, value: Any):
+    if type(value) not in (int, float):
+        raise TypeError("número esperado")
+    out += _FLOAT.pack(float(value))
+
+
+def _write_date(out: bytearray, value: Any):
+    if type(value) is not date:
+        raise TypeError("date esperado")
+    _write_varint(out, value.toordinal())
+
+
+def _write_time(out: bytearray, value: Any):
+    if type(value) is not time or value.tzinfo is not None:
+        raise TypeError("time sem fuso esperado")
+    _write_varint(out, ((value.hour * 60 + value.minute) * 60 + value.second) * 1_000_000 + value.microsecond)
+
+
+def _write_datetime(out: bytearray, value: Any):
+    if not isinstance(value, datetime) or value.utcoffset() != timedelta(0):
+        raise TypeError("datetime em UTC esperado")
+    _write_varint(out, (value - _EPOCH) // _MICROSECOND)
+
+
+def _write_str_list(out: bytearray, value: Any):
+    if not isinstance(value, list):
+        raise TypeError("lista esperada")
+    _write_varint(out, len(value))
+    for item in value:
+        _write_str(out, item)
+
+
+def _write_snapshot(out: bytearray, value: Any):
+    if not isinstance(value, dict) or not value.keys() <= _SNAPSHOT_NAMES:
+        raise TypeError("snapshot inválido")
+    _write_record(out, SNAPSHOT_FIELDS, value.get)
+
+
+def _read_state(data: bytes, offset: int):
+    code = data[offset]
+    if code == STATE_LITERAL:
+        return _read_str(data, offset + 1)
+    return STATES[code], offset + 1
+
+
+def _read_bool(data: bytes, offset: int):
+    return data[offset] == 1, offset + 1
+
+
+def _read_float(data: bytes, offset: int):
+    return _FLOAT.unpack_from(data, offset)[0], offset + _FLOAT.size
+
+
+def _read_date(data: bytes, offset: int):
+    ordinal, offset = _read_varint(data, offset)
+    return date.fromordinal(ordinal), offset
+
+
+def _read_time(data: bytes, offset: int):
+    micros, offset = _read_varint(data, offset)
+    seconds, microsecond = divmod(micros, 1_000_000)
+    minutes, second = divmod(seconds, 60)
+    hour, minute = divmod(minutes, 60)
+    return time(hour, minute, second, microsecond), offset
+
+
+def _read_datetime(data: bytes, offset: int):
+    micros, offset = _read_varint(data, offset)
+    return _EPOCH + timedelta(microseconds=micros), offset
+
+
+def _read_str_list(data: bytes, offset: int):
+    count, offset = _read_varint(data, offset)
+    items = []
+    for _ in range(count):
+        item, offset = _read_str(data, offset)
+        items.append(item)
+    return items, offset
+
+
+def _read_snapshot(data: bytes, offset: int):
+    return _read_record(data, offset, SNAPSHOT_FIELDS)
+
+
+# Serializadores por tipo de campo: escrita levanta TypeError/ValueError se o valor não couber
+_WRITERS = {
+    STR: _write_str, STATE: _write_state, BOOL: _write_bool, INT: _write_int, FLOAT: _write_float,
+    DATE: _write_date, TIME: _write_time, DATETIME: _write_datetime, STR_LIST: _write_str_list,
+    SNAPSHOT: _write_snapshot,
+}
+_READERS = {
+    STR: _read_str, STATE: _read_state, BOOL: _read_bool, INT: _read_varint, FLOAT: _read_float,
+    DATE: _read_date, TIME: _read_time, DATETIME: _read_datetime, STR_LIST: _read_str_list,
+    SNAPSHOT: _read_snapshot,
+}
+
+
+def _write_record(out: bytearray, fields, getter, spill: Optional[Dict[str, Any]] = None):
+    """
+    Serializa um registro de campos fixos
+
+    Args:
+        out: Buffer de saída
+        fields: Sequência (nome, tipo) na ordem de serialização
+        getter: Função nome -> valor (_MISSING se ausente)
+        spill: Dict que recebe valores que não cabem no tipo (None = erro)
+    """
+    header_at = len(out)
+    out += bytes(_HEADER.size)
+    present = not_null = 0
+    for index, (name, kind) in enumerate(fields):
+        value = getter(name, _MISSING)
+        if value is _MISSING:
+            continue
+        if value is None:
+            present |= 1 << index
+            continue
+        mark = len(out)
+        try:
+            _WRITERS[kind](out, value)
+        except (TypeError, ValueError, AttributeError, UnicodeError):
+            if spill is None:
+                raise
+            del out[mark:]
+            spill[name] = value
+            continue
+        present |= 1 << index
+        not_null |= 1 << index
+    _HEADER.pack_into(out, header_at, FORMAT_VERSION, present, not_null)
+
+
+def _read_record(data: bytes, offset: int, fields):
+    version, present, not_null = _HEADER.unpack_from(data, offset)
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Versão de sessão não suportada: {version}")
+    offset += _HEADER.size
+    values = {}
+    for index, (name, kind) in enumerate(fields):
+        bit = 1 << index
+        if not present & bit:
+            continue
+        if not_null & bit:
+            values[name], offset = _READERS[kind](data, offset)
+        else:
+            values[name] = None
+    return values, offset
+
+
+# ── Conversões de atribuição / leitura ────────────────────────────────────
+
+def _parse(kind: int, value: Any) -> Any:
+    """Converte strings ISO para o tipo nativo do campo (mantém o valor se não for possível)"""
+    if not isinstance(value, str):
+        return value
+    try:
+        if kind == DATE:
+            return date.fromisoformat(value)
+        if kind == TIME:
+            parsed = time.fromisoformat(value)
+            return parsed if parsed.tzinfo is None else value
+        if kind == DATETIME:
+            parsed = datetime.fromisoformat(value)
+            return parsed if parsed.utcoffset() == timedelta(0) else value
+    except ValueError:
+        pass
+    return value
+
+
+def _json_exact(value: Any) -> bool:
+    """Se o valor volta idêntico de JSON (tuplas, chaves não texto, datas etc. não voltam)"""
+    if value is None or type(value) in (str, int, float, bool):
+        return True
+    if type(value) is list:
+        return all(_json_exact(item) for item in value)
+    if type(value) is dict:
+        return all(type(key) is str and _json_exact(item) for key, item in value.items())
+    return False
+
+
+def _present(value: Any) -> Any:
+    """Valor exposto pela visão dict (datas e horários como ISO)"""
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    return value
+
+
+class SessionState(MutableMapping):
+    """
+    Sessão de conversa tipada, com visão compatível com dict
+
+    Acesso tipado: state.preferred_date (date), state.created_at (datetime)...
+    Acesso legado: state['preferred_date'] (ISO), state.get(...), state.setdefault(...)
+    """
+
+    __slots__ = _SLOT_NAMES + ('extras',)
+
+    def __init__(self, data: Optional[Dict[str, Any]] = None, **fields):
+        for slot in _SLOT_NAMES:
+            object.__setattr__(self, slot, _MISSING)
+        self.extras: Dict[str, Any] = {}
+        if data:
+            self.update(data)
+        if fields:
+            self.update(fields)
+
+    @classmethod
+    def coerce(cls, session) -> 'SessionState':
+        """Retorna a própria instância ou converte um dict legado"""
+        if isinstance(session, SessionState):
+            return session
+        return cls(session)
+
+    # ── Acesso tipado ──────────────────────────────────────────────────────
+
+    def __getattr__(self, name: str) -> Any:
+        # Chamado só quando o atributo não é um slot: nomes de campos -> slot
+        slot = _SLOT_BY_FIELD.get(name)
+        if slot is None:
+            raise AttributeError(name)
+        value = object.__getattribute__(self, slot)
+        return None if value is _MISSING else value
+
+    def __setattr__(self, name: str, value: Any):
+        if name in _SLOT_BY_FIELD:
+            self[name] = value
+        else:
+            object.__setattr__(self, name, value)
+
+    # ── Visão dict ─────────────────────────────────────────────────────────
+
+    def __getitem__(self, key: str) -> Any:
+        slot = _SLOT_BY_FIELD.get(key)
+        if slot is None:
+            return self.extras[key]
+        value = object.__getattribute__(self, slot)
+        if value is _MISSING:
+            raise KeyError(key)
+        return _present(value)
+
+    def __setitem__(self, key: str, value: Any):
+        slot = _SLOT_BY_FIELD.get(key)
+        if slot is None:
+            self.extras[key] = value
+        else:
+            object.__setattr__(self, slot, _parse(FIELD_KINDS[key], value))
+
+    def __delitem__(self, key: str):
+        slot = _SLOT_BY_FIELD.get(key)
+        if slot is None:
+            del self.extras[key]
+            return
+        if object.__getattribute__(self, slot) is _MISSING:
+            raise KeyError(key)
+        object.__setattr__(self, slot, _MISSING)
+
+    def __iter__(self) -> Iterator[str]:
+        for name, slot in zip(FIELD_NAMES, _SLOT_NAMES):
+            if object.__getattribute__(self, slot) is not _MISSING:
+                yield name
+        yield from self.extras
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __contains__(self, key) -> bool:
+        slot = _SLOT_BY_FIELD.get(key)
+        if slot is None:
+            return key in self.extras
+        return object.__getattribute__(self, slot) is not _MISSING
+
+    def __repr__(self) -> str:
+        return f"SessionState({self.to_dict()!r})"
+
+    def __reduce__(self):
+        # pickle compatível (ex.: cache do Django) usando o formato compacto
+        return (SessionState.decode, (self.encode(),))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Cópia como dict legado (datas/horários em ISO)"""
+        return dict(self.items())
+
+    # ── Serialização ───────────────────────────────────────────────────────
+
+    def encode(self) -> bytes:
+        """
+        Serializa a sessão no formato binário compacto
+
+        Returns:
+            Bytes da sessão
+        """
+        out = bytearray()
+        spill: Dict[str, Any] = {}
+        _write_record(
+            out,
+            FIELDS,
+            lambda name, default: object.__getattribute__(self, _SLOT_BY_FIELD[name]),
+            spill,
+        )
+
+        extras = {**self.extras, **spill}
+        if extras:
+            # JSON só quando o valor volta idêntico; senão pickle (tuplas, datas, sets...)
+            if _json_exact(extras):
+                blob = json.dumps(extras, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+                out.append(_EXTRAS_JSON)
+            else:
+                blob = pickle.dumps(extras, protocol=pickle.HIGHEST_PROTOCOL)
+                out.append(_EXTRAS_PICKLE)
+            out += blob
+        return bytes(out)
+
+    @classmethod
+    def decode(cls, data: bytes) -> 'SessionState':
+        """
+        Reconstrói a sessão a partir de encode()
+
+        Args:
+            data: Bytes gerados por encode()
+
+        Returns:
+            SessionState
+        """
+        values, offset = _read_record(data, 0, FIELDS)
+        state = cls.__new__(cls)
+        for name, slot in zip(FIELD_NAMES, _SLOT_NAMES):
+            object.__setattr__(state, slot, values.get(name, _MISSING))
+        object.__setattr__(state, 'extras', {})
+
+        if offset < len(data):
+            tag, blob = data[offset], data[offset + 1:]
+            extras = json.loads(blob) if tag == _EXTRAS_JSON else pickle.loads(blob)
+            for key, value in extras.items():
+                # Campos conhecidos que não couberam no tipo voltam ao slot como vieram
+                if key in _SLOT_BY_FIELD:
+                    object.__setattr__(state, _SLOT_BY_FIELD[key], value)
+                else:
+                    state.extras[key] = value
+        return state
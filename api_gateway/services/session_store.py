@@ -0,0 +1,350 @@
+"""
+Session Store - Armazenamento de Sessões em Dois Níveis
+
+Responsável por:
+- L1: cache LRU em memória do processo, com carimbo de versão por sessão
+- L2: backend compartilhado entre workers (Redis, cache do Django ou fake em memória)
+- Serialização compacta das sessões (ver session_state.SessionState)
+- Invalidação entre workers: cada gravação publica uma versão nova no L2;
+  o L1 só é usado quando a versão local é igual à versão publicada no L2
+
+A versão é um carimbo aleatório de 63 bits (sem repetição na prática), e não
+um contador: depois de um delete (varredura) ou da expiração no L2, a próxima
+gravação não repete a versão que outro worker ainda guarda no L1. Entradas
+do L1 também expiram com o timeout da sessão.
+
+Formato no L2:
+- {prefixo}{telefone}      -> versão (8 bytes) + sessão serializada
+- {prefixo}{telefone}:v    -> versão atual (inteiro)
+
+As duas chaves são gravadas juntas (set_versioned do backend: transação no
+Redis, lock nos demais), de forma que o cabeçalho da sessão sempre traz a
+versão publicada mesmo com dois workers gravando a mesma sessão.
+"""
+
+import logging
+import pickle
+import secrets
+import struct
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+
+from django.conf import settings
+
+from .session_state import SessionState
+
+logger = logging.getLogger(__name__)
+
+# Importação opcional do cliente Redis
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+DEFAULT_KEY_PREFIX = 'gemini_session_'
+DEFAULT_L1_MAX_ENTRIES = 1024
+VERSION_HEADER = struct.Struct('>Q')
+# Primeiro byte de pickle protocolo >= 2 (formato anterior ao SessionState)
+PICKLE_MARKER = b'\x80'
+# Lock de gravação do backend sobre o cache do Django
+LOCK_TIMEOUT_SECONDS = 5
+LOCK_WAIT_SECONDS = 1.0
+
+
+def new_version() -> int:
+    """Carimbo de versão único (comparado só por igualdade, nunca por ordem)"""
+    return secrets.randbits(VERSION_HEADER.size * 8 - 1) + 1
+
+
+class InMemorySessionBackend:
+    """
+    Backend L2 em memória com a mesma interface do Redis usada pelo store
+
+    Aceita um mapeamento e um lock externos (ex.: multiprocessing.Manager) para
+    simular um L2 compartilhado entre processos em testes e benchmarks.
+    """
+
+    def __init__(self, data=None, lock=None):
+        self._data = data if data is not None else {}
+        self._lock = lock if lock is not None else threading.Lock()
+
+    def _get_live(self, key: str):
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and expires_at <= time.time():
+            self._data.pop(key, None)
+            return None
+        return value
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._get_live(key)
+
+    def mget(self, keys: Iterable[str]) -> List[Optional[bytes]]:
+        return [self._get_live(key) for key in keys]
+
+    def set(self, key: str, value: bytes, ex: Optional[int] = None):
+        self._data[key] = (value, time.time() + ex if ex else None)
+
+    def set_versioned(self, data_key: str, version_key: str, payload: bytes, ex: Optional[int] = None) -> int:
+        expires_at = time.time() + ex if ex else None
+        version = new_version()
+        with self._lock:
+            self._data[version_key] = (version, expires_at)
+            self._data[data_key] = (VERSION_HEADER.pack(version) + payload, expires_at)
+            return version
+
+    def delete(self, *keys: str):
+        for key in keys:
+            self._data.pop(key, None)
+
+
+class RedisSessionBackend:
+    """Backend L2 usando Redis (requer o pacote redis)"""
+
+    def __init__(self, url: str):
+        if not REDIS_AVAILABLE:
+            raise ImportError("Pacote 'redis' não instalado. Execute: pip install redis")
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._client.get(key)
+
+    def mget(self, keys: Iterable[str]) -> List[Optional[bytes]]:
+        return self._client.mget(list(keys))
+
+    def set(self, key: str, value: bytes, ex: Optional[int] = None):
+        self._client.set(key, value, ex=ex)
+
+    def set_versioned(self, data_key: str, version_key: str, payload: bytes, ex: Optional[int] = None) -> int:
+        # MULTI/EXEC: as duas chaves mudam juntas
+        version = new_version()
+        pipeline = self._client.pipeline(transaction=True)
+        pipeline.set(version_key, version, ex=ex)
+        pipeline.set(data_key, VERSION_HEADER.pack(version) + payload, ex=ex)
+        pipeline.execute()
+        return version
+
+    def delete(self, *keys: str):
+        if keys:
+            self._client.delete(*keys)
+
+
+class DjangoCacheSessionBackend:
+    """
+    Backend L2 sobre django.core.cache (comportamento original)
+
+    Só é compartilhado entre workers se CACHES apontar para um backend
+    compartilhado (Redis, Memcached); com LocMemCache é por processo.
+    """
+
+    def __init__(self, cache_alias: str = 'default'):
+        from django.core.cache import caches
+        self._cache = caches[cache_alias]
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._cache.get(key)
+
+    def mget(self, keys: Iterable[str]) -> List[Optional[bytes]]:
+        keys = list(keys)
+        values = self._cache.get_many(keys)
+        return [values.get(key) for key in keys]
+
+    def set(self, key: str, value: bytes, ex: Optional[int] = None):
+        self._cache.set(key, value, ex)
+
+    def set_versioned(self, data_key: str, version_key: str, payload: bytes, ex: Optional[int] = None) -> int:
+        # Sem transação no cache do Django: lock com add() (atômico no Redis/Memcached e no LocMemCache)
+        lock_key = f"{version_key}:lock"
+        deadline = time.monotonic() + LOCK_WAIT_SECONDS
+        locked = self._cache.add(lock_key, 1, LOCK_TIMEOUT_SECONDS)
+        while not locked and time.monotonic() < deadline:
+            time.sleep(0.001)
+            locked = self._cache.add(lock_key, 1, LOCK_TIMEOUT_SECONDS)
+        if not locked:
+            logger.warning(f"⚠️ Lock da sessão {data_key} não obtido, gravando sem lock")
+        try:
+            version = new_version()
+            self._cache.set_many({version_key: version, data_key: VERSION_HEADER.pack(version) + payload}, ex)
+            return version
+        finally:
+            if locked:
+                self._cache.delete(lock_key)
+
+    def delete(self, *keys: str):
+        self._cache.delete_many(keys)
+
+
+class SessionStore:
+    """
+    Store de sessões com L1 (processo) versionado na frente de um L2 compartilhado
+    """
+
+    def __init__(self, backend, l1_max_entries: int = DEFAULT_L1_MAX_ENTRIES,
+                 key_prefix: str = DEFAULT_KEY_PREFIX, timeout: Optional[int] = None):
+        self.backend = backend
+        self.l1_max_entries = l1_max_entries
+        self.key_prefix = key_prefix
+        self.timeout = timeout
+        self._l1: "OrderedDict[str, tuple]" = OrderedDict()
+        self._l1_lock = threading.Lock()
+        self.stats = {'l1_hits': 0, 'l2_hits': 0, 'misses': 0}
+
+    # ── Chaves e serialização ──────────────────────────────────────────────
+
+    def _data_key(self, phone_number: str) -> str:
+        return f"{self.key_prefix}{phone_number}"
+
+    def _version_key(self, phone_number: str) -> str:
+        return f"{self.key_prefix}{phone_number}:v"
+
+    def encode(self, session: Dict[str, Any]) -> bytes:
+        """Serializa a sessão no formato compacto de SessionState"""
+        return SessionState.coerce(session).encode()
+
+    def decode(self, payload: bytes) -> SessionState:
+        """Desserializa a sessão (aceita payloads pickle gravados antes do SessionState)"""
+        if payload[:1] == PICKLE_MARKER:
+            return SessionState.coerce(pickle.loads(payload))
+        return SessionState.decode(payload)
+
+    def _get_timeout(self) -> Optional[int]:
+        if self.timeout is not None:
+            return self.timeout
+        from .token_monitor import token_monitor
+        return token_monitor.get_cache_timeout()
+
+    # ── L1 ─────────────────────────────────────────────────────────────────
+
+    def _l1_get(self, phone_number: str) -> Optional[tuple]:
+        with self._l1_lock:
+            entry = self._l1.get(phone_number)
+            if entry is None:
+                return None
+            # Expirada junto com a sessão no L2
+            if entry[2] is not None and entry[2] <= time.monotonic():
+                del self._l1[phone_number]
+                return None
+            self._l1.move_to_end(phone_number)
+            return entry
+
+    def _l1_put(self, phone_number: str, version: int, payload: bytes, timeout: Optional[int] = None):
+        if self.l1_max_entries <= 0:
+            return
+        # Versões não têm ordem: a última leitura/gravação no L2 sempre substitui
+        expires_at = time.monotonic() + timeout if timeout else None
+        with self._l1_lock:
+            self._l1[phone_number] = (version, payload, expires_at)
+            self._l1.move_to_end(phone_number)
+            while len(self._l1) > self.l1_max_entries:
+                self._l1.popitem(last=False)
+
+    def _l1_discard(self, phone_number: str):
+        with self._l1_lock:
+            self._l1.pop(phone_number, None)
+
+    # ── API pública ────────────────────────────────────────────────────────
+
+    def get(self, phone_number: str) -> Optional[Dict[str, Any]]:
+        """
+        Obtém a sessão (cópia nova a cada chamada)
+
+        Args:
+            phone_number: Número de telefone
+
+        Returns:
+            Dict da sessão ou None se não existir
+        """
+        try:
+            entry = self._l1_get(phone_number)
+            if entry is not None:
+                published_version = self.backend.get(self._version_key(phone_number))
+                if published_version is not None and int(published_version) == entry[0]:
+                    self.stats['l1_hits'] += 1
+                    return self.decode(entry[1])
+
+            stored = self.backend.get(self._data_key(phone_number))
+            if stored is None:
+                self._l1_discard(phone_number)
+                self.stats['misses'] += 1
+                return None
+
+            version = VERSION_HEADER.unpack_from(stored)[0]
+            payload = bytes(stored[VERSION_HEADER.size:])
+            self._l1_put(phone_number, version, payload, self._get_timeout())
+            self.stats['l2_hits'] += 1
+            return self.decode(payload)
+        except Exception as e:
+            logger.error(f"Erro ao ler sessão {phone_number} do store: {e}")
+            return None
+
+    def set(self, phone_number: str, session: Dict[str, Any]) -> Optional[int]:
+        """
+        Grava a sessão e publica nova versão (invalida o L1 dos outros workers)
+
+        Args:
+            phone_number: Número de telefone
+            session: Dados da sessão
+
+        Returns:
+            Nova versão da sessão ou None em caso de erro
+        """
+        try:
+            timeout = self._get_timeout()
+            payload = self.encode(session)
+            version = self.backend.set_versioned(
+                self._data_key(phone_number), self._version_key(phone_number), payload, ex=timeout
+            )
+            self._l1_put(phone_number, version, payload, timeout)
+            return version
+        except Exception as e:
+            logger.error(f"Erro ao gravar sessão {phone_number} no store: {e}")
+            return None
+
+    def delete(self, phone_number: str):
+        """Remove a sessão do L1 e do L2"""
+        try:
+            self.backend.delete(self._data_key(phone_number), self._version_key(phone_number))
+        except Exception as e:
+            logger.error(f"Erro ao remover sessão {phone_number} do store: {e}")
+        self._l1_discard(phone_number)
+
+    def clear_l1(self):
+        """Esvazia o cache local do processo"""
+        with self._l1_lock:
+            self._l1.clear()
+
+
+def build_session_store() -> SessionStore:
+    """
+    Cria o store a partir de settings.SESSION_STORE
+
+    BACKEND: 'django_cache' (padrão), 'redis' ou 'memory'
+    """
+    config = getattr(settings, 'SESSION_STORE', {}) or {}
+    backend_name = config.get('BACKEND', 'django_cache')
+
+    if backend_name == 'redis':
+        try:
+            backend = RedisSessionBackend(config.get('REDIS_URL', 'redis://localhost:6379/0'))
+        except ImportError as e:
+            logger.warning(f"⚠️ {e} - usando cache do Django como L2")
+            backend = DjangoCacheSessionBackend()
+    elif backend_name == 'memory':
+        backend = InMemorySessionBackend()
+    else:
+        backend = DjangoCacheSessionBackend(config.get('CACHE_ALIAS', 'default'))
+
+    return SessionStore(
+        backend,
+        l1_max_entries=config.get('L1_MAX_ENTRIES', DEFAULT_L1_MAX_ENTRIES),
+        key_prefix=config.get('KEY_PREFIX', DEFAULT_KEY_PREFIX),
+    )
+
+
+# Instância global do serviço
+session_store = build_session_store()
@@ -0,0 +1,184 @@
+"""
+Reservas provisórias de horário (SlotHold)
+
+Responsável por:
+- Reservar o horário validado para o paciente até a secretária confirmar,
+  impedindo que dois pacientes recebam link de handoff para o mesmo horário
+- Garantir um único dono por horário com inserção condicional na chave única
+  (doctor_key, start); reservas expiradas podem ser tomadas por outro paciente
+- Manter no máximo uma reserva por paciente (trocar de horário libera a anterior)
+- Informar os horários reservados por outros pacientes, que saem das respostas
+  de disponibilidade
+
+Uso:
+    from .slot_hold_service import slot_hold_service
+
+    if slot_hold_service.acquire('Dr. João Carvalho', '02/03/2026', '09:00', phone_number):
+        ...  # horário reservado para este paciente
+    slot_hold_service.release(phone_number)
+"""
+
+import logging
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Optional, Set, Tuple, Union
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, router, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from rag_agent.text import normalize_name
+
+from ..models import SlotHold
+from .datetime_parser import parse_date, parse_time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOLD_TTL = 900            # segundos: paciente escolheu o horário
+DEFAULT_HANDOFF_HOLD_TTL = 7200   # segundos: handoff gerado, aguardando a secretária
+
+
+def _slot_start(day: Union[date, str], start: Union[time, str]) -> Optional[datetime]:
+    """Data e horário ('DD/MM/YYYY' ou ISO, 'HH:MM') no fuso local"""
+    day, start = parse_date(day), parse_time(start)
+    if not day or not start:
+        return None
+    return timezone.make_aware(datetime.combine(day, start))
+
+
+class SlotHoldService:
+    """Reservas provisórias com expiração"""
+
+    @property
+    def ttl(self) -> int:
+        return getattr(settings, 'SLOT_HOLD_TTL', DEFAULT_HOLD_TTL)
+
+    @property
+    def handoff_ttl(self) -> int:
+        return getattr(settings, 'SLOT_HOLD_HANDOFF_TTL', DEFAULT_HANDOFF_HOLD_TTL)
+
+    def acquire(self, doctor_name: str, day: Union[date, str], start: Union[time, str], phone_number: str,
+                ttl: Optional[int] = None) -> bool:
+        """
+        Reserva o horário para o paciente (ou renova a reserva dele)
+
+        Inserção condicional: cria a reserva; se o horário já tem dono, só a
+        assume se ela expirou ou já é deste paciente (UPDATE com condição, atômico).
+        Reservas do paciente em outros horários são liberadas.
+
+        Args:
+            doctor_name: Nome do médico
+            day: Data (date, 'DD/MM/YYYY' ou 'YYYY-MM-DD')
+            start: Horário (time ou 'HH:MM')
+            phone_number: Paciente
+            ttl: Segundos até expirar (padrão: SLOT_HOLD_TTL)
+
+        Returns:
+            True se o horário ficou reservado para o paciente; False se outro
+            paciente tem uma reserva válida (em erro de banco retorna True: a
+            validação do horário segue como antes das reservas)
+        """
+        slot_start = _slot_start(day, start)
+        if slot_start is None:
+            logger.warning(f"⚠️ Reserva ignorada: data/horário inválidos ({day} {start})")
+            return True
+
+        doctor_key = normalize_name(doctor_name)
+        now = timezone.now()
+        expires_at = now + timedelta(seconds=ttl or self.ttl)
+        try:
+            with transaction.atomic(using=router.db_for_write(SlotHold)):
+                acquired = self._insert_or_take_over(doctor_key, doctor_name, slot_start, phone_number, now, expires_at)
+                if acquired:
+                    # Uma reserva por paciente: trocar de horário libera a anterior
+                    SlotHold.objects.filter(phone_number=phone_number).exclude(
+                        doctor_key=doctor_key, start=slot_start
+                    ).delete()
+        except DatabaseError as e:
+            logger.error(f"❌ Erro ao reservar horário {slot_start:%d/%m/%Y %H:%M} de {doctor_name}: {e}")
+            return True
+
+        if acquired:
+            logger.info("🔒 Horário %s de %s reservado para %s", f"{slot_start:%d/%m/%Y %H:%M}", doctor_name, phone_number)
+        else:
+            logger.info("⛔ Horário %s de %s já reservado por outro paciente", f"{slot_start:%d/%m/%Y %H:%M}", doctor_name)
+        return acquired
+
+    def _insert_or_take_over(self, doctor_key: str, doctor_name: str, slot_start: datetime, phone_number: str,
+                             now: datetime, expires_at: datetime) -> bool:
+        """Cria a reserva ou assume uma expirada/própria (a chave única decide quem ganha)"""
+        try:
+            with transaction.atomic(using=router.db_for_write(SlotHold)):
+                SlotHold.objects.create(doctor_key=doctor_key, doctor_name=doctor_name, start=slot_start,
+                                        phone_number=phone_number, expires_at=expires_at)
+            return True
+        except IntegrityError:
+            pass
+
+        taken = SlotHold.objects.filter(doctor_key=doctor_key, start=slot_start).filter(
+            Q(phone_number=phone_number) | Q(expires_at__lte=now)
+        ).update(phone_number=phone_number, doctor_name=doctor_name, expires_at=expires_at, created_at=now)
+        return taken == 1
+
+    def release(self, phone_number: str) -> int:
+        """
+        Libera as reservas do paciente (horário recusado, trocado ou indisponível)
+
+        Returns:
+            Quantidade de reservas liberadas
+        """
+        try:
+            released = SlotHold.objects.filter(phone_number=phone_number).delete()[0]
+        except DatabaseError as e:
+            logger.error(f"❌ Erro ao liberar reservas de {phone_number}: {e}")
+            return 0
+        if released:
+            logger.info("🔓 %d reserva(s) de %s liberada(s)", released, phone_number)
+        return released
+
+    def held_by_others(self, doctor_name: str, first_day: date, last_day: date,
+                       phone_number: Optional[str] = None) -> Set[Tuple[date, int]]:
+        """
+        Horários com reserva válida de outros pacientes no período
+
+        Args:
+            doctor_name: Nome do médico
+            first_day: Primeiro dia
+            last_day: Último dia
+            phone_number: Paciente atual (as reservas dele não contam)
+
+        Returns:
+            Conjunto de (data, minutos desde a meia-noite) no fuso local
+        """
+        first = timezone.make_aware(datetime.combine(first_day, time.min))
+        last = timezone.make_aware(datetime.combine(last_day + timedelta(days=1), time.min))
+        holds = SlotHold.objects.filter(
+            doctor_key=normalize_name(doctor_name), start__gte=first, start__lt=last, expires_at__gt=timezone.now(),
+        )
+        if phone_number:
+            holds = holds.exclude(phone_number=phone_number)
+
+        held = set()
+        try:
+            for start in holds.values_list('start', flat=True):
+                local = timezone.localtime(start)
+                held.add((local.date(), local.hour * 60 + local.minute))
+        except DatabaseError as e:
+            logger.error(f"❌ Erro ao consultar reservas de {doctor_name}: {e}")
+        return held
+
+    def purge_expired(self) -> int:
+        """Remove reservas expiradas (já ignoradas nas consultas; limpeza periódica)"""
+        return SlotHold.objects.filter(expires_at__lte=timezone.now()).delete()[0]
+
+    def stats(self) -> Dict[str, int]:
+        """Reservas válidas e expiradas ainda não removidas"""
+        now = timezone.now()
+        return {
+            'active': SlotHold.objects.filter(expires_at__gt=now).count(),
+            'expired': SlotHold.objects.filter(expires_at__lte=now).count(),
+        }
+
+
+# Instância global do serviço
+slot_hold_service = SlotHoldService()
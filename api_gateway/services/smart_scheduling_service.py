@@ -4,8 +4,8 @@ Consulta disponibilidade no Google Calendar e informa horários ao usuário
 """
 import logging
 import re
-from datetime import date, datetime, timedelta
-from typing import Any, Dict, List, Optional
+from datetime import date
+from typing import Any, Dict, Optional, Sequence
 
 from django.utils import timezone
 
@@ -14,8 +14,13 @@ from .gemini.session_manager import (PRONOUN_DOCTOR_MESSAGE_TERMS,
                                      PRONOUN_DOCTOR_REGEX,
                                      PRONOUN_DOCTOR_TERMS,
                                      resolve_doctor_reference)
+from ..models import AvailabilitySlot
+from .availability import WEEKDAY_NAMES, DoctorAvailability, format_minutes, to_minutes
+from .availability_store import availability_store
+from .datetime_parser import parse_date, parse_time
 from .google_calendar_service import google_calendar_service
 from .rag_service import RAGService
+from .slot_hold_service import slot_hold_service
 
 logger = logging.getLogger(__name__)
 
@@ -90,14 +95,14 @@ class SmartSchedulingService:
                 resolved_doctor = resolve_doctor_reference(doctor_reference, message_lower, session)
                 if resolved_doctor:
                     info['doctor_mentioned'] = resolved_doctor
-                    logger.info(f"🤝 Referência ao médico interpretada como: {resolved_doctor}")
+                    logger.info("🤝 Referência ao médico interpretada como: %s", resolved_doctor)
                     break
                 # Caso a referência encontrada seja apenas um pronome sem contexto, continuar procurando
         
         # Se não encontrou médico na mensagem, buscar na sessão
         if not info['doctor_mentioned'] and session.get('selected_doctor'):
             info['doctor_mentioned'] = session.get('selected_doctor')
-            logger.info(f"🔄 Médico recuperado da sessão: {info['doctor_mentioned']}")
+            logger.info("🔄 Médico recuperado da sessão: %s", info['doctor_mentioned'])
         
         # Extrair data mencionada da mensagem
         date_patterns = [
@@ -116,7 +121,7 @@ class SmartSchedulingService:
         # Se não encontrou data na mensagem, buscar na sessão
         if not info['date_mentioned'] and session.get('preferred_date'):
             info['date_mentioned'] = session.get('preferred_date')
-            logger.info(f"🔄 Data recuperada da sessão: {info['date_mentioned']}")
+            logger.info("🔄 Data recuperada da sessão: %s", info['date_mentioned'])
         
         # Extrair horário mencionado da mensagem
         time_patterns = [
@@ -144,7 +149,7 @@ class SmartSchedulingService:
         # Se não encontrou horário na mensagem, buscar na sessão
         if not info['time_mentioned'] and session.get('preferred_time'):
             info['time_mentioned'] = session.get('preferred_time')
-            logger.info(f"🔄 Horário recuperado da sessão: {info['time_mentioned']}")
+            logger.info("🔄 Horário recuperado da sessão: %s", info['time_mentioned'])
         
         # Extrair tipo de consulta
         if any(word in message_lower for word in ['consulta', 'retorno']):
@@ -154,8 +159,8 @@ class SmartSchedulingService:
                 info['appointment_type'] = 'consulta'
         
         # Log das informações extraídas
-        logger.info(f"📋 Informações extraídas - Médico: {info['doctor_mentioned']}, "
-                   f"Data: {info['date_mentioned']}, Horário: {info['time_mentioned']}")
+        logger.info("📋 Informações extraídas - Médico: %s, Data: %s, Horário: %s",
+                    info['doctor_mentioned'], info['date_mentioned'], info['time_mentioned'])
         
         return info
 
@@ -289,24 +294,13 @@ class SmartSchedulingService:
 
     def _validate_doctor(self, doctor_name: str) -> Optional[Dict]:
         """
-        Valida se médico existe no banco de dados
+        Valida se médico existe no catálogo e retorna o resumo (formato MedicoResumoSerializer)
         """
         try:
-            clinic_data = self.rag_service.get_all_clinic_data()
-            medicos = clinic_data.get('medicos', [])
+            from rag_agent.doctor_index import doctor_index
             
-            # Buscar médico por nome (busca flexível)
-            doctor_name_lower = doctor_name.lower().strip()
-            
-            for medico in medicos:
-                medico_name_lower = medico.get('nome', '').lower()
-                
-                # Busca exata ou parcial
-                if (doctor_name_lower in medico_name_lower or 
-                    medico_name_lower in doctor_name_lower):
-                    return medico
-            
-            return None
+            # Índice em memória (nome, prefixo e erros de digitação)
+            return doctor_index.resolve(doctor_name)
             
         except Exception as e:
             logger.error(f"Erro ao validar médico: {e}")
@@ -320,103 +314,7 @@ class SmartSchedulingService:
         days = ['Segunda-feira', 'Terça-feira', 'Quarta-feira', 'Quinta-feira', 'Sexta-feira', 'Sábado', 'Domingo']
         return days[date_obj.weekday()]
     
-    def _parse_date(self, date_str: str) -> Optional[date]:
-        """
-        Converte string de data para objeto date
-        Suporta múltiplos formatos: DD/MM, DD/MM/YYYY, YYYY-MM-DD, nomes de dias, etc.
-        """
-        import re  # Import no início da função
-        
-        try:
-            today = timezone.now().date()
-            date_lower = date_str.lower().strip()
-            
-            # Se já é um objeto date, retornar diretamente
-            if isinstance(date_str, date):
-                return date_str
-            
-            # Tentar formato ISO primeiro (YYYY-MM-DD)
-            if re.match(r'^\d{4}-\d{1,2}-\d{1,2}$', date_str):
-                try:
-                    return datetime.strptime(date_str, '%Y-%m-%d').date()
-                except ValueError:
-                    logger.warning(f"Erro ao parsear data ISO: {date_str}")
-            
-            # Nomes de dias relativos
-            if 'hoje' in date_lower:
-                return today
-            elif 'amanhã' in date_lower:
-                return today + timedelta(days=1)
-            elif 'depois de amanhã' in date_lower:
-                return today + timedelta(days=2)
-            elif 'segunda' in date_lower:
-                days_ahead = 0 - today.weekday()  # Monday is 0
-                if days_ahead <= 0:  # Target day already happened this week
-                    days_ahead += 7
-                return today + timedelta(days=days_ahead)
-            elif 'terça' in date_lower:
-                days_ahead = 1 - today.weekday()
-                if days_ahead <= 0:
-                    days_ahead += 7
-                return today + timedelta(days=days_ahead)
-            elif 'quarta' in date_lower:
-                days_ahead = 2 - today.weekday()
-                if days_ahead <= 0:
-                    days_ahead += 7
-                return today + timedelta(days=days_ahead)
-            elif 'quinta' in date_lower:
-                days_ahead = 3 - today.weekday()
-                if days_ahead <= 0:
-                    days_ahead += 7
-                return today + timedelta(days=days_ahead)
-            elif 'sexta' in date_lower:
-                days_ahead = 4 - today.weekday()
-                if days_ahead <= 0:
-                    days_ahead += 7
-                return today + timedelta(days=days_ahead)
-            
-            # Tentar parsear formato DD/MM ou DD/MM/YYYY
-            date_match = re.search(r'(\d{1,2})/(\d{1,2})(?:/(\d{2,4}))?', date_str)
-            if date_match:
-                day, month, year = date_match.groups()
-                year = int(year) if year else today.year
-                if year < 100:
-                    year += 2000
-                return date(int(year), int(month), int(day))
-            
-            # Se só tem um número (ex: "20"), assumir como dia do mês atual
-            if re.match(r'^\d{1,2}$', date_str):
-                try:
-                    day = int(date_str)
-                    # Verificar se o dia é válido
-                    if 1 <= day <= 31:
-                        # Tentar criar data com mês/ano atuais
-                        try:
-                            result_date = date(today.year, today.month, day)
-                            # Se a data resultante já passou, assumir mês seguinte
-                            if result_date < today:
-                                # Tentar próximo mês
-                                if today.month == 12:
-                                    result_date = date(today.year + 1, 1, day)
-                                else:
-                                    result_date = date(today.year, today.month + 1, day)
-                            logger.info(f"✅ Dia isolado '{day}' convertido para: {result_date}")
-                            return result_date
-                        except ValueError:
-                            # Dia inválido para o mês (ex: 31 de fevereiro)
-                            logger.warning(f"⚠️ Dia {day} inválido para mês {today.month}")
-                except ValueError:
-                    pass
-            
-            return None
-            
-        except Exception as e:
-            logger.error(f"Erro ao parsear data '{date_str}': {e}")
-            return None
-
-    # REMOVIDO: _parse_time() - função não utilizada (código morto)
-    # Era usada apenas por _check_real_availability() que também foi removida
-    # O parsing de horário é feito pelo entity_extractor que retorna no formato correto
+    # Datas e horários em texto: ver datetime_parser (parse_date / parse_time)
 
     # Métodos de mensagens
     def _format_doctor_price(self, preco) -> str:
@@ -620,7 +518,8 @@ Entre em contato conosco para mais informações ligando para:
         
         return message
 
-    def get_doctor_availability(self, doctor_name: str, days_ahead: int = 7, date_filter: Optional[str] = None) -> Dict[str, Any]:
+    def get_doctor_availability(self, doctor_name: str, days_ahead: int = 7, date_filter: Optional[str] = None,
+                                phone_number: Optional[str] = None) -> Dict[str, Any]:
         """
         Consulta disponibilidade do médico no Google Calendar
         
@@ -634,13 +533,15 @@ Entre em contato conosco para mais informações ligando para:
             days_ahead: Quantos dias à frente consultar (padrão: 7)
             date_filter: Data específica para filtrar (opcional, ex: "20/11", "amanhã")
                         Se especificado, retorna apenas o dia solicitado
+            phone_number: Paciente atual (as reservas dele continuam sendo oferecidas)
             
         Returns:
             Dict com informações de disponibilidade:
             - success: bool - Se a consulta foi bem-sucedida
             - doctor_name: str - Nome do médico
             - days_ahead: int - Quantos dias foram consultados
-            - days_info: list - Lista de dias com horários disponíveis
+            - days_info: list - Lista de dias com horários disponíveis (strings, para mensagens)
+            - availability: DoctorAvailability - Os mesmos horários em estrutura tipada
             - available_slots: int - Total de slots disponíveis
             - has_availability: bool - Se há horários disponíveis
             - available: bool - Compatibilidade com código antigo
@@ -650,39 +551,17 @@ Entre em contato conosco para mais informações ligando para:
         """
         try:
             if date_filter:
-                logger.info(f"🗓️ Consultando disponibilidade para {doctor_name} - filtrando por data: {date_filter}")
+                logger.info("🗓️ Consultando disponibilidade para %s - filtrando por data: %s", doctor_name, date_filter)
             else:
-                logger.info(f"🗓️ Consultando disponibilidade para {doctor_name} - próximos {days_ahead} dias")
-            
-            # Consultar disponibilidade para os próximos 7 dias (máximo)
-            # Depois filtramos conforme necessário
-            availability = self.calendar_service.get_doctor_availability(
-                doctor_name=doctor_name,
-                days_ahead=7
-            )
+                logger.info("🗓️ Consultando disponibilidade para %s - próximos %s dias", doctor_name, days_ahead)
             
-            if not availability:
-                return {
-                    'success': False,
-                    'available': False,
-                    'doctor_name': doctor_name,
-                    'doctor': doctor_name,
-                    'days_ahead': days_ahead,
-                    'days_info': [],
-                    'available_slots': 0,
-                    'has_availability': False,
-                    'total_days': 0,
-                    'reason': 'calendar_error',
-                    'message': 'Erro ao consultar agenda',
-                    'error': 'Erro ao consultar agenda'
-                }
-            
-            # Obter lista de dias
-            days_info = availability.get('days', [])
+            # Consultar disponibilidade para os próximos 7 dias (máximo), sem horários
+            # reservados por outros pacientes; depois filtramos conforme necessário
+            availability = self._load_availability(doctor_name, phone_number)
             
             # Filtrar por data específica se solicitado
             if date_filter:
-                target_date = self._parse_date(date_filter)
+                target_date = parse_date(date_filter)
                 if target_date:
                     # Validar se a data é fim de semana ANTES de consultar o calendário
                     if target_date.weekday() >= 5:  # Sábado=5, Domingo=6
@@ -704,9 +583,7 @@ Entre em contato conosco para mais informações ligando para:
                         }
                     
                     # Filtrar apenas o dia solicitado
-                    filtered_days = [day for day in days_info 
-                                   if datetime.strptime(day['date'], '%d/%m/%Y').date() == target_date]
-                    days_info = filtered_days
+                    availability = availability.on(target_date)
                 else:
                     # Se não conseguiu parsear a data, retornar erro
                     logger.warning(f"⚠️ Não foi possível parsear a data: {date_filter}")
@@ -727,13 +604,11 @@ Entre em contato conosco para mais informações ligando para:
             
             # Limitar aos dias solicitados (se não foi filtrado por data específica)
             if not date_filter and days_ahead < 7:
-                days_info = days_info[:days_ahead]
+                availability = availability.first_days(days_ahead)
             
-            # Verificar se há horários disponíveis
-            has_availability = any(len(day.get('available_times', [])) > 0 for day in days_info)
-            
-            # Contar slots disponíveis
-            total_slots = sum(len(day.get('available_times', [])) for day in days_info)
+            has_availability = bool(availability)
+            # Strings só para quem monta mensagens e respostas da API
+            days_info = availability.to_days()
             
             # Retornar formato unificado com compatibilidade
             return {
@@ -743,7 +618,8 @@ Entre em contato conosco para mais informações ligando para:
                 'doctor': doctor_name,  # Compatibilidade
                 'days_ahead': days_ahead,
                 'days_info': days_info,
-                'available_slots': total_slots,
+                'availability': availability,
+                'available_slots': availability.total_slots,
                 'has_availability': has_availability,
                 'total_days': len(days_info)  # Compatibilidade
             }
@@ -765,14 +641,41 @@ Entre em contato conosco para mais informações ligando para:
                 'error': str(e)
             }
 
-    def is_time_slot_available(self, doctor_name: str, requested_date: str, requested_time: str) -> Dict[str, Any]:
+    def _load_availability(self, doctor_name: str, phone_number: Optional[str] = None) -> DoctorAvailability:
+        """
+        Horários livres dos próximos 7 dias, sem os reservados por outros pacientes
+        
+        Usa a agenda materializada quando atualizada; senão, o calendário.
+        
+        Args:
+            doctor_name: Nome do médico
+            phone_number: Paciente atual (as reservas dele são mantidas)
+            
+        Returns:
+            DoctorAvailability
+        """
+        availability = availability_store.get_availability(doctor_name, days_ahead=7)
+        if availability is None:
+            availability = self.calendar_service.get_availability(doctor_name, days_ahead=7)
+        if not availability:
+            return availability
+        
+        days = availability.days
+        held = slot_hold_service.held_by_others(doctor_name, days[0], days[-1], phone_number)
+        return availability.without(held)
+
+    def is_time_slot_available(self, doctor_name: str, requested_date: str, requested_time: str,
+                               phone_number: Optional[str] = None) -> Dict[str, Any]:
         """
         Verifica se um horário específico está disponível no calendário
         
+        Horários reservados por outros pacientes (SlotHold) contam como ocupados.
+        
         Args:
             doctor_name: Nome do médico
             requested_date: Data solicitada (formato DD/MM ou DD/MM/YYYY ou date object)
             requested_time: Horário solicitado (formato HH:MM ou time object)
+            phone_number: Paciente atual (a reserva dele não bloqueia o horário)
             
         Returns:
             Dict com:
@@ -783,152 +686,113 @@ Entre em contato conosco para mais informações ligando para:
                 - message: str - Mensagem descritiva
         """
         try:
-            # Normalizar data
-            if isinstance(requested_date, str):
-                logger.info(f"📅 Parseando data string: '{requested_date}'")
-                target_date = self._parse_date(requested_date)
-                if target_date:
-                    logger.info(f"✅ Data parseada com sucesso: {target_date}")
-                else:
-                    logger.error(f"❌ Falha ao parsear data: '{requested_date}'")
-            elif isinstance(requested_date, date):
-                target_date = requested_date
-                logger.info(f"📅 Data já é objeto date: {target_date}")
-            else:
-                # Tentar converter tipos diversos
-                logger.warning(f"⚠️ Tipo de data inesperado: {type(requested_date)}")
-                target_date = None
-            
+            # Normalizar data (texto PT-BR, ISO ou date)
+            target_date = parse_date(requested_date)
             if not target_date:
+                logger.error(f"❌ Falha ao parsear data: '{requested_date}'")
                 return {
                     'available': False,
                     'error': 'Data inválida',
                     'message': 'Não foi possível processar a data solicitada.'
                 }
             
-            # Normalizar horário
-            logger.info(f"⏰ Parseando horário: '{requested_time}' (tipo: {type(requested_time)})")
-            if isinstance(requested_time, str):
-                # Remover "as" ou "às" se presente
-                time_clean = requested_time.lower().replace('as ', '').replace('às ', '').replace('horas', '').replace('h', '').strip()
-                # Remover segundos se presente (HH:MM:SS -> HH:MM)
-                if time_clean.count(':') == 2:
-                    time_clean = ':'.join(time_clean.split(':')[:2])
-                # Garantir formato HH:MM
-                if ':' not in time_clean:
-                    if len(time_clean) <= 2:
-                        # Se é só um número (ex: "8"), adicionar ":00"
-                        time_clean = f"{time_clean.zfill(2)}:00"
-                time_str = time_clean
-            else:
-                # Se é um objeto time
-                time_str = requested_time.strftime('%H:%M')
-            
-            # Garantir formato HH:MM com zero à esquerda se necessário
-            if len(time_str.split(':')[0]) == 1:
-                time_str = f"0{time_str}"
+            # Normalizar horário ("às 14h30", "14:30:00", time...) para HH:MM
+            requested_time_obj = parse_time(requested_time)
+            if not requested_time_obj:
+                logger.error(f"❌ Falha ao parsear horário: '{requested_time}'")
+                return {
+                    'available': False,
+                    'error': 'Horário inválido',
+                    'message': 'Não foi possível processar o horário solicitado.'
+                }
+            time_str = requested_time_obj.strftime('%H:%M')
+            requested_minutes = to_minutes(requested_time_obj)
             
-            logger.info(f"✅ Horário normalizado para: '{time_str}'")
+            logger.info("✅ Horário normalizado para: '%s'", time_str)
             
             # ═══════════════════════════════════════════════════════════════════
             # VERIFICAR SE A DATA É HOJE E SE JÁ PASSOU O HORÁRIO DE EXPEDIENTE
             # ═══════════════════════════════════════════════════════════════════
-            from django.utils import timezone
-            today = timezone.now().date()
-            current_time = timezone.now().time()
+            # Fuso local, o mesmo de parse_date ("hoje", "amanhã")
+            now = timezone.localtime()
+            today = now.date()
+            current_time = now.time()
             
             if target_date == today:
                 # Se é hoje, verificar se já passou o horário de expediente (18:00)
                 from datetime import time as dt_time
                 end_of_day = dt_time(18, 0)  # 18:00
                 
-                # Converter time_str para objeto time para comparação
-                try:
-                    requested_time_obj = datetime.strptime(time_str, '%H:%M').time()
+                # Se o horário solicitado já passou hoje OU se já passou 18:00
+                if requested_time_obj < current_time or current_time >= end_of_day:
+                    logger.warning(f"⚠️ Data é hoje ({today}) mas horário já passou ou expediente acabou")
                     
-                    # Se o horário solicitado já passou hoje OU se já passou 18:00
-                    if requested_time_obj < current_time or current_time >= end_of_day:
-                        logger.warning(f"⚠️ Data é hoje ({today}) mas horário já passou ou expediente acabou")
+                    # Consultar disponibilidade para outros dias: dias futuros (não hoje), até 3
+                    future = self._load_availability(doctor_name, phone_number).after(today).first_days(3)
+                    if future:
+                        alternative_days = [
+                            {'date': day['date'], 'weekday': day['weekday'], 'times': day['available_times'][:5]}
+                            for day in future.to_days()
+                        ]
                         
-                        # Consultar disponibilidade para outros dias
-                        availability = self.get_doctor_availability(
-                            doctor_name=doctor_name,
-                            days_ahead=7
+                        return {
+                            'available': False,
+                            'date_formatted': target_date.strftime('%d/%m/%Y'),
+                            'time_formatted': time_str,
+                            'message': f'Hoje ({target_date.strftime("%d/%m/%Y")}) o expediente já acabou ou o horário {time_str} já passou.',
+                            'alternative_days': alternative_days,
+                            'alternative_times': [],
+                            'reason': 'past_time_today'
+                        }
+            
+            # Agenda materializada: busca pontual, sem montar a semana
+            status = availability_store.lookup(doctor_name, target_date, time_str)
+            if status is not None:
+                held = slot_hold_service.held_by_others(doctor_name, target_date, target_date, phone_number)
+                if status == AvailabilitySlot.STATUS_FREE and (target_date, requested_minutes) not in held:
+                    target_date_str = target_date.strftime('%d/%m/%Y')
+                    logger.info("✅ Horário %s está disponível (agenda materializada)", time_str)
+                    return {
+                        'available': True,
+                        'date_formatted': target_date_str,
+                        'time_formatted': time_str,
+                        'weekday': WEEKDAY_NAMES[target_date.weekday()],
+                        'message': f'Horário {time_str} disponível em {target_date_str}.'
+                    }
+                
+                # Ocupado: alternativas do próprio dia; dia sem vagas cai na consulta completa (sugere outros dias)
+                day_availability = availability_store.get_day(doctor_name, target_date)
+                if day_availability is not None:
+                    day_availability = day_availability.without(held)
+                    day_slots = day_availability.slots_on(target_date)
+                    if day_slots:
+                        return self._unavailable_time_result(
+                            day_availability, target_date, time_str, requested_minutes, day_slots
                         )
-                        
-                        if availability.get('has_availability'):
-                            days_info = availability.get('days_info', [])
-                            # Filtrar apenas dias futuros (não hoje)
-                            future_days = [day for day in days_info 
-                                         if datetime.strptime(day['date'], '%d/%m/%Y').date() > today]
-                            
-                            if future_days:
-                                alternative_days = []
-                                for day in future_days[:3]:
-                                    if day.get('available_times'):
-                                        alternative_days.append({
-                                            'date': day.get('date'),
-                                            'weekday': day.get('weekday'),
-                                            'times': day.get('available_times', [])[:5]
-                                        })
-                                
-                                return {
-                                    'available': False,
-                                    'date_formatted': target_date.strftime('%d/%m/%Y'),
-                                    'time_formatted': time_str,
-                                    'message': f'Hoje ({target_date.strftime("%d/%m/%Y")}) o expediente já acabou ou o horário {time_str} já passou.',
-                                    'alternative_days': alternative_days,
-                                    'alternative_times': [],
-                                    'reason': 'past_time_today'
-                                }
-                except ValueError:
-                    logger.warning(f"⚠️ Erro ao converter horário para comparação: {time_str}")
-                    # Continuar com validação normal se não conseguir converter
             
             # Consultar disponibilidade do médico
-            availability = self.get_doctor_availability(
-                doctor_name=doctor_name,
-                days_ahead=7
-            )
+            doctor_availability = self._load_availability(doctor_name, phone_number)
             
-            if not availability.get('has_availability'):
+            if not doctor_availability:
                 return {
                     'available': False,
                     'message': f'O médico {doctor_name} não tem horários disponíveis nos próximos dias.',
                     'alternative_times': []
                 }
             
-            # Procurar o dia específico
-            days_info = availability.get('days_info', [])
-            if not days_info:
-                days_info = availability.get('days', [])  # Compatibilidade com formato antigo
-            
+            # Procurar o dia específico (busca binária nos minutos do dia)
             target_date_str = target_date.strftime('%d/%m/%Y')
+            day_slots = doctor_availability.slots_on(target_date)
             
-            logger.info(f"🔍 DEBUG - Procurando dia {target_date_str} em {len(days_info)} dias disponíveis")
-            
-            target_day = None
-            for day in days_info:
-                day_date = day.get('date')
-                logger.debug(f"  Comparando: '{day_date}' == '{target_date_str}'")
-                if day_date == target_date_str:
-                    target_day = day
-                    logger.info(f"✅ Dia encontrado: {day_date}")
-                    break
-            
-            if not target_day:
+            if not day_slots:
                 # Dia não tem disponibilidade - sugerir dias próximos
                 logger.warning(f"⚠️ Dia {target_date_str} não encontrado na disponibilidade")
-                alternative_days = []
-                for day in days_info[:3]:
-                    if day.get('available_times'):
-                        alternative_days.append({
-                            'date': day.get('date'),
-                            'weekday': day.get('weekday'),
-                            'times': day.get('available_times', [])[:5]
-                        })
+                alternative_days = [
+                    {'date': day['date'], 'weekday': day['weekday'], 'times': day['available_times'][:5]}
+                    for day in doctor_availability.first_days(3).to_days()
+                ]
                 
-                logger.info(f"📅 Sugerindo {len(alternative_days)} dias alternativos")
+                logger.info("📅 Sugerindo %d dias alternativos", len(alternative_days))
                 return {
                     'available': False,
                     'date_formatted': target_date_str,
@@ -937,56 +801,22 @@ Entre em contato conosco para mais informações ligando para:
                     'alternative_times': []
                 }
             
-            # Verificar se o horário específico está disponível
-            available_times = target_day.get('available_times', [])
-            logger.info(f"📋 Horários disponíveis no dia {target_date_str}: {len(available_times)} horários")
-            logger.debug(f"  Horários: {available_times[:10]}")  # Mostrar até 10 para debug
-            
-            # Normalizar horários para comparação (remover segundos se necessário)
-            available_times_normalized = []
-            for t in available_times:
-                t_clean = t.strip()
-                # Se tem formato HH:MM:SS, converter para HH:MM
-                if t_clean.count(':') == 2:
-                    t_clean = ':'.join(t_clean.split(':')[:2])
-                available_times_normalized.append(t_clean)
-            
-            # Normalizar horário solicitado
-            time_str_normalized = time_str.strip()
-            # Se tem formato HH:MM:SS, converter para HH:MM
-            if time_str_normalized.count(':') == 2:
-                time_str_normalized = ':'.join(time_str_normalized.split(':')[:2])
-            
-            logger.info(f"🔍 Verificando se '{time_str_normalized}' está em {available_times_normalized[:5]}...")
+            logger.info("📋 Horários disponíveis no dia %s: %d horários", target_date_str, len(day_slots))
+            weekday = WEEKDAY_NAMES[target_date.weekday()]
             
-            is_available = time_str_normalized in available_times_normalized
-            
-            if is_available:
-                logger.info(f"✅ Horário {time_str_normalized} está disponível!")
+            if doctor_availability.is_free(target_date, requested_minutes):
+                logger.info("✅ Horário %s está disponível!", time_str)
                 return {
                     'available': True,
                     'date_formatted': target_date_str,
-                    'time_formatted': time_str_normalized,
-                    'weekday': target_day.get('weekday'),
-                    'message': f'Horário {time_str_normalized} disponível em {target_date_str}.'
+                    'time_formatted': time_str,
+                    'weekday': weekday,
+                    'message': f'Horário {time_str} disponível em {target_date_str}.'
                 }
-            else:
-                # Horário não disponível - sugerir horários próximos do mesmo dia
-                logger.warning(f"❌ Horário {time_str_normalized} NÃO está disponível")
-                logger.info(f"📅 Retornando {len(available_times)} horários alternativos")
-                logger.info(f"📋 Horários alternativos: {available_times[:8]}")
-                
-                result = {
-                    'available': False,
-                    'date_formatted': target_date_str,
-                    'time_formatted': time_str_normalized,
-                    'weekday': target_day.get('weekday'),
-                    'message': f'O horário {time_str_normalized} não está disponível em {target_date_str}.',
-                    'alternative_times': available_times[:8],  # Até 8 horários alternativos
-                    'total_alternatives': len(available_times)
-                }
-                logger.info(f"📦 RETORNO FINAL: {result}")
-                return result
+            
+            return self._unavailable_time_result(
+                doctor_availability, target_date, time_str, requested_minutes, day_slots
+            )
                 
         except Exception as e:
             logger.error(f"Erro ao verificar disponibilidade de horário: {e}")
@@ -998,6 +828,25 @@ Entre em contato conosco para mais informações ligando para:
                 'message': 'Erro ao verificar disponibilidade do horário.'
             }
     
+    def _unavailable_time_result(self, doctor_availability: DoctorAvailability, target_date: date, time_str: str,
+                                 requested_minutes: int, day_slots: Sequence[int]) -> Dict[str, Any]:
+        """Horário não disponível: sugere os horários mais próximos do mesmo dia"""
+        target_date_str = target_date.strftime('%d/%m/%Y')
+        alternative_times = [format_minutes(minutes)
+                             for minutes in doctor_availability.nearest(target_date, requested_minutes, 8)]
+        logger.warning(f"❌ Horário {time_str} NÃO está disponível")
+        logger.info("📋 Horários alternativos: %s", alternative_times)
+        
+        return {
+            'available': False,
+            'date_formatted': target_date_str,
+            'time_formatted': time_str,
+            'weekday': WEEKDAY_NAMES[target_date.weekday()],
+            'message': f'O horário {time_str} não está disponível em {target_date_str}.',
+            'alternative_times': alternative_times,  # Até 8 horários mais próximos do pedido
+            'total_alternatives': len(day_slots)
+        }
+    
     def _get_fallback_analysis(self) -> Dict[str, Any]:
         return {
             'action': 'fallback',
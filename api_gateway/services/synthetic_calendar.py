@@ -0,0 +1,425 @@
+"""
+Calendário sintético para testes de carga (mesma interface do cliente do Google Calendar)
+
+Responsável por:
+- Gerar agendas determinísticas (mesma semente -> mesmos eventos) para
+  milhares de médicos e meses de eventos, sem acessar o Google
+- Implementar service.events().list(...).execute() com timeMin/timeMax, q,
+  showDeleted, updatedMin, maxResults e paginação por nextPageToken, como a API real
+- Simular ocupação realista: densidade configurável, durações variadas,
+  cancelamentos e ausências de dia inteiro (férias, congressos)
+- Simular alterações da secretária (book/cancel/move), visíveis via updatedMin
+
+Os eventos de cada dia são gerados sob demanda e mantidos em um cache
+limitado, então consultar meses de agenda não exige manter tudo em memória.
+
+Uso:
+    calendar = SyntheticCalendarService(doctors=2000, seed=42, density=0.7)
+    page = calendar.events().list(calendarId='agenda@clinica.com', timeMin=..., timeMax=...).execute()
+
+    # Em settings: GOOGLE_CALENDAR_BACKEND=synthetic (GoogleCalendarService usa este backend)
+"""
+
+import random
+import re
+import time
+from collections import OrderedDict
+from datetime import date, datetime, time as dt_time, timedelta, timezone as dt_timezone, tzinfo
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from django.conf import settings
+from django.utils import timezone
+
+# Expediente padrão (igual ao de GoogleCalendarService._get_doctor_working_hours)
+DEFAULT_WORKING_PERIODS = ((dt_time(8, 0), dt_time(12, 0)), (dt_time(14, 0), dt_time(18, 0)))
+SLOT_MINUTES = 30
+
+# (tipo, duração em minutos, peso)
+DEFAULT_APPOINTMENT_TYPES = (
+    ('Consulta', 30, 6),
+    ('Retorno', 30, 3),
+    ('Exame', 60, 1),
+)
+
+DEFAULT_PAGE_SIZE = 250   # padrão da API do Google
+MAX_PAGE_SIZE = 2500      # limite da API do Google
+
+FIRST_NAMES = (
+    'Ana', 'Bruno', 'Carla', 'Daniel', 'Eduarda', 'Felipe', 'Gabriela', 'Gustavo', 'Helena', 'Igor',
+    'Juliana', 'Lucas', 'Mariana', 'Nelson', 'Olívia', 'Paulo', 'Renata', 'Sérgio', 'Tatiana', 'Vitor',
+)
+LAST_NAMES = (
+    'Almeida', 'Barbosa', 'Cardoso', 'Dias', 'Esteves', 'Ferreira', 'Gomes', 'Lima', 'Magno', 'Nunes',
+    'Oliveira', 'Pereira', 'Queiroz', 'Ribeiro', 'Santos', 'Teixeira', 'Vieira', 'Xavier', 'Souza', 'Moura',
+)
+FEMALE_FIRST_NAMES = {'Ana', 'Carla', 'Eduarda', 'Gabriela', 'Helena', 'Juliana', 'Mariana', 'Olívia', 'Renata', 'Tatiana'}
+
+# IDs dos eventos: syn<semente>d<médico>o<dia>n<n> (gerados) e syn<semente>b<n>o<dia> (book)
+_EVENT_ORDINAL_RE = re.compile(r'o(\d+)')
+
+
+def synthetic_doctor_names(count: int) -> List[str]:
+    """
+    Nomes únicos e determinísticos no padrão do calendário ("Dr./Dra. Nome Sobrenome Sobrenome")
+
+    Args:
+        count: Quantidade de nomes (até 20 * 20 * 20 combinações)
+
+    Returns:
+        Lista de nomes
+    """
+    names = []
+    for index in range(count):
+        first = FIRST_NAMES[index % len(FIRST_NAMES)]
+        middle = LAST_NAMES[(index // len(FIRST_NAMES)) % len(LAST_NAMES)]
+        last = LAST_NAMES[(index // (len(FIRST_NAMES) * len(LAST_NAMES)) + index) % len(LAST_NAMES)]
+        title = 'Dra.' if first in FEMALE_FIRST_NAMES else 'Dr.'
+        names.append(f"{title} {first} {middle} {last}")
+    if len(set(names)) != len(names):
+        raise ValueError(f"Máximo de {len(FIRST_NAMES) * len(LAST_NAMES) ** 2} médicos sintéticos")
+    return names
+
+
+def _rfc3339_utc(value: datetime) -> str:
+    """Formato do campo 'updated' da API (UTC com milissegundos)"""
+    return value.astimezone(dt_timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.') + f"{value.microsecond // 1000:03d}Z"
+
+
+def _parse_rfc3339(value: Optional[str], tz: tzinfo) -> Optional[datetime]:
+    """Converte timeMin/timeMax (RFC 3339) em datetime com fuso"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if timezone.is_naive(parsed):
+        parsed = parsed.replace(tzinfo=tz)
+    return parsed
+
+
+class _SyntheticRequest:
+    """Requisição preparada (equivalente ao HttpRequest do googleapiclient)"""
+
+    def __init__(self, calendar: 'SyntheticCalendarService', params: Dict):
+        self._calendar = calendar
+        self._params = params
+
+    def execute(self) -> Dict:
+        return self._calendar._list_events(**self._params)
+
+
+class _SyntheticEvents:
+    """Recurso events() (somente list)"""
+
+    def __init__(self, calendar: 'SyntheticCalendarService'):
+        self._calendar = calendar
+
+    def list(self, **params) -> _SyntheticRequest:
+        return _SyntheticRequest(self._calendar, params)
+
+
+class SyntheticCalendarService:
+    """
+    Calendário único da clínica gerado de forma determinística
+
+    Cada dia de cada médico usa um gerador próprio derivado de (semente, médico,
+    data), então a agenda de um dia não depende do período consultado.
+    """
+
+    def __init__(self, doctors: Union[int, Sequence[str]] = 50, seed: int = 0, density: float = 0.6,
+                 cancellation_rate: float = 0.05, absence_rate: float = 0.01,
+                 appointment_types: Sequence[Tuple[str, int, int]] = DEFAULT_APPOINTMENT_TYPES,
+                 working_periods: Sequence[Tuple[dt_time, dt_time]] = DEFAULT_WORKING_PERIODS,
+                 work_weekends: bool = False, latency: float = 0.0, cache_days: int = 64,
+                 tz: Optional[tzinfo] = None):
+        """
+        Args:
+            doctors: Quantidade de médicos (nomes gerados) ou lista de nomes
+            seed: Semente (mesma semente -> mesmos eventos)
+            density: Fração aproximada dos horários do expediente ocupada
+            cancellation_rate: Fração dos agendamentos com status 'cancelled'
+            absence_rate: Probabilidade de um dia inteiro de ausência por médico
+            appointment_types: Tuplas (tipo, duração em minutos, peso)
+            working_periods: Períodos de atendimento (início, fim)
+            work_weekends: Se False, não há agendamentos aos sábados e domingos
+            latency: Segundos de espera em cada execute() (simula a rede)
+            cache_days: Dias gerados mantidos em memória
+            tz: Fuso dos eventos (padrão: TIME_ZONE)
+        """
+        self.doctors = synthetic_doctor_names(doctors) if isinstance(doctors, int) else list(doctors)
+        self.seed = seed
+        self.density = density
+        self.cancellation_rate = cancellation_rate
+        self.absence_rate = absence_rate
+        self.appointment_types = tuple(appointment_types)
+        self._type_weights = [weight for _, _, weight in self.appointment_types]
+        self.working_periods = tuple(working_periods)
+        self.work_weekends = work_weekends
+        self.latency = latency
+        self.cache_days = cache_days
+        self.tz = tz or timezone.get_default_timezone()
+        self._days: 'OrderedDict[int, List[Dict]]' = OrderedDict()
+        # Alterações simuladas (book/cancel/move) por dia: id -> evento (None: saiu do dia)
+        self._changes: Dict[int, Dict[str, Optional[Dict]]] = {}
+        # Eventos remarcados para outro dia: id -> dia atual (ordinal)
+        self._moved: Dict[str, int] = {}
+        self._booked = 0
+        self.requests_count = 0
+
+    def events(self) -> _SyntheticEvents:
+        return _SyntheticEvents(self)
+
+    def events_for_day(self, day: date) -> List[Dict]:
+        """
+        Eventos de todos os médicos em um dia, ordenados por início (inclui cancelados)
+
+        Args:
+            day: Data
+
+        Returns:
+            Lista de eventos no formato da API
+        """
+        ordinal = day.toordinal()
+        events = self._days.get(ordinal)
+        if events is not None:
+            self._days.move_to_end(ordinal)
+            return events
+
+        events = []
+        for doctor_index, doctor in enumerate(self.doctors):
+            events.extend(self._generate_doctor_day(doctor_index, doctor, day))
+        changes = self._changes.get(ordinal)
+        if changes:
+            events = ([event for event in events if event['id'] not in changes]
+                      + [event for event in changes.values() if event is not None])
+        events.sort(key=lambda event: (event['_start'], event['id']))
+
+        self._days[ordinal] = events
+        if len(self._days) > self.cache_days:
+            self._days.popitem(last=False)
+        return events
+
+    def book(self, doctor: str, start: datetime, minutes: int = SLOT_MINUTES, kind: str = 'Consulta') -> Dict:
+        """
+        Simula um agendamento feito pela secretária
+
+        Args:
+            doctor: Nome do médico
+            start: Início (com fuso; sem fuso usa o do calendário)
+            minutes: Duração
+            kind: Tipo ("Consulta", "Retorno", ...)
+
+        Returns:
+            Evento criado (formato da API)
+        """
+        if timezone.is_naive(start):
+            start = start.replace(tzinfo=self.tz)
+        start = start.astimezone(self.tz)
+        end = start + timedelta(minutes=minutes)
+        self._booked += 1
+        ordinal = start.date().toordinal()
+        event = {
+            'id': f"syn{self.seed}b{self._booked}o{ordinal}",
+            'status': 'confirmed',
+            'summary': f"{doctor} - {kind}",
+            'description': 'Paciente: agendado',
+            'start': {'dateTime': start.isoformat(), 'timeZone': settings.TIME_ZONE},
+            'end': {'dateTime': end.isoformat(), 'timeZone': settings.TIME_ZONE},
+            '_start': start,
+            '_end': end,
+        }
+        self._save_change(ordinal, event)
+        return self._public(event)
+
+    def cancel(self, event_id: str) -> bool:
+        """
+        Simula o cancelamento de um evento
+
+        Returns:
+            True se o evento existia e não estava cancelado
+        """
+        ordinal, event = self._find(event_id)
+        if event is None or event['status'] == 'cancelled':
+            return False
+        self._save_change(ordinal, dict(event, status='cancelled'))
+        return True
+
+    def move(self, event_id: str, start: datetime) -> Optional[Dict]:
+        """
+        Simula a remarcação de um evento (mesma duração, novo início)
+
+        Args:
+            event_id: Id do evento
+            start: Novo início (com fuso; sem fuso usa o do calendário)
+
+        Returns:
+            Evento remarcado (formato da API) ou None se não existe ou está cancelado
+        """
+        ordinal, event = self._find(event_id)
+        if event is None or event['status'] == 'cancelled':
+            return None
+        if timezone.is_naive(start):
+            start = start.replace(tzinfo=self.tz)
+        start = start.astimezone(self.tz)
+        end = start + (event['_end'] - event['_start'])
+        moved = dict(event, start=dict(event['start'], dateTime=start.isoformat()),
+                     end=dict(event['end'], dateTime=end.isoformat()), _start=start, _end=end)
+
+        new_ordinal = start.date().toordinal()
+        if new_ordinal != ordinal:
+            self._changes.setdefault(ordinal, {})[event_id] = None
+            self._days.pop(ordinal, None)
+            self._moved[event_id] = new_ordinal
+        self._save_change(new_ordinal, moved)
+        return self._public(moved)
+
+    def _find(self, event_id: str) -> Tuple[Optional[int], Optional[Dict]]:
+        """Dia (ordinal) e evento pelo id (o id traz o dia original)"""
+        ordinal = self._moved.get(event_id)
+        if ordinal is None:
+            match = _EVENT_ORDINAL_RE.search(event_id)
+            if not match:
+                return None, None
+            ordinal = int(match.group(1))
+        for event in self.events_for_day(date.fromordinal(ordinal)):
+            if event['id'] == event_id:
+                return ordinal, event
+        return ordinal, None
+
+    def _save_change(self, ordinal: int, event: Dict):
+        now = timezone.now()
+        event.update(updated=_rfc3339_utc(now), _updated=now)
+        self._changes.setdefault(ordinal, {})[event['id']] = event
+        self._days.pop(ordinal, None)
+
+    @staticmethod
+    def _public(event: Dict) -> Dict:
+        """Evento sem os campos internos (_start, _end, _updated)"""
+        return {key: value for key, value in event.items() if not key.startswith('_')}
+
+    def iter_events(self, start: date, end: date, include_cancelled: bool = False) -> Iterable[Dict]:
+        """Eventos de start até end (exclusivo), dia a dia"""
+        for ordinal in range(start.toordinal(), end.toordinal()):
+            for event in self.events_for_day(date.fromordinal(ordinal)):
+                if include_cancelled or event['status'] != 'cancelled':
+                    yield event
+
+    def _generate_doctor_day(self, doctor_index: int, doctor: str, day: date) -> List[Dict]:
+        """Agenda de um médico em um dia (determinística por semente, médico e data)"""
+        if not self.work_weekends and day.weekday() >= 5:
+            return []
+
+        rng = random.Random(f"{self.seed}:{doctor_index}:{day.toordinal()}")
+        id_prefix = f"syn{self.seed}d{doctor_index}o{day.toordinal()}"
+        # Eventos gerados foram criados/alterados antes do dia (nunca depois da consulta ao calendário)
+        updated = datetime.combine(day - timedelta(days=rng.randint(1, 30)), dt_time(12, 0), tzinfo=self.tz)
+        updated = min(updated, timezone.now() - timedelta(days=1))
+        updated_fields = {'updated': _rfc3339_utc(updated), '_updated': updated}
+
+        if rng.random() < self.absence_rate:
+            return [{
+                'id': f"{id_prefix}a",
+                'status': 'confirmed',
+                'summary': f"{doctor} - Ausência",
+                'description': rng.choice(('Férias', 'Congresso', 'Folga')),
+                'start': {'date': day.isoformat()},
+                'end': {'date': (day + timedelta(days=1)).isoformat()},
+                '_start': datetime.combine(day, dt_time(0, 0), tzinfo=self.tz),
+                '_end': datetime.combine(day + timedelta(days=1), dt_time(0, 0), tzinfo=self.tz),
+                **updated_fields,
+            }]
+
+        events = []
+        for period_start, period_end in self.working_periods:
+            cursor = datetime.combine(day, period_start, tzinfo=self.tz)
+            period_end_dt = datetime.combine(day, period_end, tzinfo=self.tz)
+            while cursor < period_end_dt:
+                if rng.random() >= self.density:
+                    cursor += timedelta(minutes=SLOT_MINUTES)
+                    continue
+
+                kind, duration, _ = rng.choices(self.appointment_types, weights=self._type_weights)[0]
+                end = min(cursor + timedelta(minutes=duration), period_end_dt)
+                status = 'cancelled' if rng.random() < self.cancellation_rate else 'confirmed'
+                events.append({
+                    'id': f"{id_prefix}n{len(events)}",
+                    'status': status,
+                    'summary': f"{doctor} - {kind}",
+                    'description': f"Paciente: Paciente {rng.randrange(100000):05d}",
+                    'start': {'dateTime': cursor.isoformat(), 'timeZone': settings.TIME_ZONE},
+                    'end': {'dateTime': end.isoformat(), 'timeZone': settings.TIME_ZONE},
+                    '_start': cursor,
+                    '_end': end,
+                    **updated_fields,
+                })
+                cursor = end
+        return events
+
+    def _list_events(self, calendarId: str = 'primary', timeMin: Optional[str] = None,
+                     timeMax: Optional[str] = None, q: Optional[str] = None, showDeleted: bool = False,
+                     updatedMin: Optional[str] = None, maxResults: Optional[int] = None, pageToken: Optional[str] = None, **kwargs) -> Dict:
+        """
+        Implementação de events().list (singleEvents/orderBy são aceitos: a saída já é ordenada por início)
+
+        O pageToken guarda (dia, posição no dia), então cada página custa só os
+        dias que percorre, como na API real.
+        """
+        self.requests_count += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        time_min = _parse_rfc3339(timeMin, self.tz)
+        time_max = _parse_rfc3339(timeMax, self.tz)
+        updated_min = _parse_rfc3339(updatedMin, self.tz)
+        if time_min is None:
+            # Sem timeMin: a partir de hoje (a agenda sintética não tem início)
+            time_min = datetime.combine(timezone.localdate(), dt_time(0, 0), tzinfo=self.tz)
+        if time_max is None:
+            time_max = time_min + timedelta(days=365)
+        page_size = min(maxResults or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+        query = q.lower() if q else None
+
+        if pageToken:
+            ordinal, offset = (int(part) for part in pageToken.split(':'))
+        else:
+            # Eventos de dia inteiro e agendamentos que atravessam a meia-noite local
+            ordinal, offset = time_min.astimezone(self.tz).date().toordinal() - 1, 0
+        last_ordinal = time_max.astimezone(self.tz).date().toordinal()
+
+        items = []
+        while ordinal <= last_ordinal:
+            day_events = self.events_for_day(date.fromordinal(ordinal))
+            for position in range(offset, len(day_events)):
+                event = day_events[position]
+                if len(items) == page_size:
+                    return {'kind': 'calendar#events', 'items': items, 'nextPageToken': f"{ordinal}:{position}"}
+                if event['_end'] <= time_min or event['_start'] >= time_max:
+                    continue
+                if event['status'] == 'cancelled' and not showDeleted:
+                    continue
+                if updated_min and event['_updated'] < updated_min:
+                    continue
+                if query and query not in f"{event['summary']} {event['description']}".lower():
+                    continue
+                items.append(self._public(event))
+            ordinal, offset = ordinal + 1, 0
+
+        return {'kind': 'calendar#events', 'items': items}
+
+
+def build_synthetic_calendar() -> SyntheticCalendarService:
+    """
+    Calendário sintético a partir de settings (GOOGLE_CALENDAR_BACKEND=synthetic)
+
+    SYNTHETIC_CALENDAR_DOCTORS=0 usa os nomes dos médicos cadastrados no catálogo.
+    """
+    doctors = getattr(settings, 'SYNTHETIC_CALENDAR_DOCTORS', 0)
+    if not doctors:
+        from rag_agent.models import Medico
+        doctors = list(Medico.objects.values_list('nome', flat=True)) or 50
+
+    return SyntheticCalendarService(
+        doctors=doctors,
+        seed=getattr(settings, 'SYNTHETIC_CALENDAR_SEED', 0),
+        density=getattr(settings, 'SYNTHETIC_CALENDAR_DENSITY', 0.6),
+        cancellation_rate=getattr(settings, 'SYNTHETIC_CALENDAR_CANCELLATION_RATE', 0.05),
+        latency=getattr(settings, 'SYNTHETIC_CALENDAR_LATENCY', 0.0),
+    )
@@ -8,6 +8,7 @@ from typing import Any, Dict, Optional
 
 from django.conf import settings
 from django.core.cache import cache
+from django.utils.functional import SimpleLazyObject
 
 logger = logging.getLogger(__name__)
 
@@ -98,17 +99,22 @@ class TokenMonitor:
             cache_key = f"gemini_tokens_{today}"
             cache.set(cache_key, self.token_usage_today, 86400)  # 24 horas
             
-            # Log detalhado
-            logger.info(f"📊 TOKENS - {operation}: Input={input_tokens:,}, Output={output_tokens:,}, Total={total_tokens:,}")
-            
-            # Log da sessão se especificada
-            if phone_number:
-                session_total = self.session_token_usage[phone_number]
-                logger.info(f"📊 SESSÃO {phone_number}: Total={total_tokens:,}, Acumulado={session_total:,}")
-            
-            # Log do dia
+            # Log único por chamada (formatado pela pipeline de logging, com campos estruturados)
             usage_percentage = (self.token_usage_today / self.daily_token_limit) * 100
-            logger.info(f"📊 DIA: Total={self.token_usage_today:,}, Limite={self.daily_token_limit:,}, Uso={usage_percentage:.1f}%")
+            session_total = self.session_token_usage.get(phone_number, 0) if phone_number else None
+            logger.info(
+                "📊 TOKENS - %s: Input=%d, Output=%d, Total=%d | Sessão %s: %s | Dia: %d/%d (%.1f%%)",
+                operation, input_tokens, output_tokens, total_tokens,
+                phone_number or '-', session_total if session_total is not None else '-',
+                self.token_usage_today, self.daily_token_limit, usage_percentage,
+                extra={
+                    'operation': operation,
+                    'input_tokens': input_tokens,
+                    'output_tokens': output_tokens,
+                    'session_tokens': session_total,
+                    'daily_tokens': self.token_usage_today,
+                },
+            )
             
             # Alertas baseados no uso
             if usage_percentage >= 95:
@@ -183,21 +189,11 @@ class TokenMonitor:
         return 3600  # 1 hora
 
 
-# Criar instância global usando lazy initialization
-_token_monitor_instance = None
-
 def get_token_monitor():
-    """Retorna a instância do TokenMonitor (lazy loading)"""
-    global _token_monitor_instance
-    if _token_monitor_instance is None:
-        _token_monitor_instance = TokenMonitor()
-    return _token_monitor_instance
+    """Retorna a instância do TokenMonitor (construída pelo container no primeiro uso)"""
+    from .container import services
+    return services.get('token_monitor')
+
 
-# Para compatibilidade, criar instância somente quando Django estiver configurado
-try:
-    token_monitor = TokenMonitor()
-except Exception:
-    # Fallback para lazy loading
-    token_monitor = type('TokenMonitor', (), {
-        '__getattr__': lambda self, name: getattr(get_token_monitor(), name)
-    })()
\ No newline at end of file
+# Instância global (proxy: o TokenMonitor só lê o cache no primeiro acesso)
+token_monitor = SimpleLazyObject(get_token_monitor)
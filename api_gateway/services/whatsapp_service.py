@@ -1,14 +1,26 @@
 """
 Serviço para integração com WhatsApp Business API
 """
+import asyncio
 import logging
-from typing import Any, Dict, Optional
+import weakref
+from typing import Any, Dict, Optional, Tuple
 
 import requests
 from django.conf import settings
 
+# Importação opcional do httpx (cliente HTTP assíncrono para o webhook ASGI)
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+# Timeout (segundos) das chamadas assíncronas à Graph API
+ASYNC_TIMEOUT = 10.0
+
 
 class WhatsAppService:
     """
@@ -25,6 +37,28 @@ class WhatsAppService:
             logger.warning("WHATSAPP_ACCESS_TOKEN não configurado")
         if not self.phone_number_id:
             logger.warning("WHATSAPP_PHONE_NUMBER_ID não configurado")
+        
+        # Um cliente httpx por event loop (conexões reaproveitadas entre envios)
+        self._async_clients = weakref.WeakKeyDictionary()
+    
+    def _text_message_request(self, to: str, message: str) -> Tuple[str, Dict[str, str], Dict[str, Any]]:
+        """URL, headers e corpo do envio de uma mensagem de texto"""
+        url = f"{self.api_url}/{self.phone_number_id}/messages"
+        
+        headers = {
+            'Authorization': f'Bearer {self.access_token}',
+            'Content-Type': 'application/json'
+        }
+        
+        data = {
+            "messaging_product": "whatsapp",
+            "to": to,
+            "type": "text",
+            "text": {
+                "body": message
+            }
+        }
+        return url, headers, data
     
     def send_message(self, to: str, message: str) -> bool:
         """
@@ -38,23 +72,41 @@ class WhatsAppService:
             True se a mensagem foi enviada com sucesso
         """
         try:
-            url = f"{self.api_url}/{self.phone_number_id}/messages"
+            url, headers, data = self._text_message_request(to, message)
             
-            headers = {
-                'Authorization': f'Bearer {self.access_token}',
-                'Content-Type': 'application/json'
-            }
+            response = requests.post(url, headers=headers, json=data)
             
-            data = {
-                "messaging_product": "whatsapp",
-                "to": to,
-                "type": "text",
-                "text": {
-                    "body": message
-                }
-            }
+            if response.status_code == 200:
+                return True
+            else:
+                logger.error(f"❌ Erro ao enviar mensagem: {response.status_code} - {response.text}")
+                return False
+                
+        except Exception as e:
+            logger.error(f"❌ Erro ao enviar mensagem via WhatsApp: {e}")
+            return False
+    
+    async def asend_message(self, to: str, message: str) -> bool:
+        """
+        Versão assíncrona de send_message (webhook ASGI)
+        
+        Usa httpx.AsyncClient quando instalado; sem httpx, executa send_message
+        em uma thread (asyncio.to_thread) para não bloquear o event loop.
+        
+        Args:
+            to: Número do destinatário (formato: 5511999999999)
+            message: Mensagem a ser enviada
             
-            response = requests.post(url, headers=headers, json=data)
+        Returns:
+            True se a mensagem foi enviada com sucesso
+        """
+        if not HTTPX_AVAILABLE:
+            return await asyncio.to_thread(self.send_message, to, message)
+        
+        try:
+            url, headers, data = self._text_message_request(to, message)
+            
+            response = await self._get_async_client().post(url, headers=headers, json=data)
             
             if response.status_code == 200:
                 return True
@@ -66,6 +118,15 @@ class WhatsAppService:
             logger.error(f"❌ Erro ao enviar mensagem via WhatsApp: {e}")
             return False
     
+    def _get_async_client(self):
+        """Cliente httpx do event loop atual"""
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(timeout=ASYNC_TIMEOUT)
+            self._async_clients[loop] = client
+        return client
+    
     def send_template_message(self, to: str, template_name: str, parameters: list = None) -> bool:
         """
         Envia uma mensagem de template via WhatsApp API
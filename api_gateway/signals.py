@@ -0,0 +1,26 @@
+"""
+Sinais do api_gateway: mantêm a agenda materializada (AvailabilitySlot) em dia
+com o expediente dos médicos
+"""
+
+import logging
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from rag_agent.models import HorarioTrabalho
+
+from .services.availability_store import availability_store
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=HorarioTrabalho)
+@receiver(post_delete, sender=HorarioTrabalho)
+def mark_availability_dirty(sender, instance, **kwargs):
+    """Expediente alterado: a próxima atualização recalcula a agenda do médico"""
+    try:
+        availability_store.mark_dirty(instance.medico.nome)
+    except Exception as e:
+        # Médico removido em cascata: a agenda dele não é mais consultada
+        logger.error(f"Erro ao marcar agenda para atualização ({instance!r}): {e}")
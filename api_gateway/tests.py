@@ -0,0 +1,1483 @@
+import asyncio
+import json
+import logging
+import sys
+import threading
+import time as time_module
+import uuid
+import warnings
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time, timedelta
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
+
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import AsyncRequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+
+from core import json_codec
+from core.db_router import CatalogConversationRouter
+from core.drf_json import FastJSONParser, FastJSONRenderer
+from core.log_pipeline import JSONLogFormatter, QueueLogHandler, SamplingFilter
+
+from .models import (AvailabilitySlot, AvailabilitySync, ConversationArchive,
+                     ConversationMessage, ConversationSession, SlotHold)
+from .services.availability import DoctorAvailability, format_minutes, to_minutes
+from .services.availability_store import AvailabilityStore
+from .services.calendar_events import partition_events
+from .services.conversation_service import conversation_service
+from .services.container import ServiceContainer, lazy_service, warm_up_on_startup
+from .services.datetime_parser import parse_date, parse_time
+from .services.gemini.core_service import GeminiChatbotService
+from .services.gemini.entity_extractor import EntityExtractor
+from .services.gemini.response_generator import ResponseGenerator
+from .services.gemini.session_manager import SessionManager
+from .services.retrieval_service import RetrievalService
+from .services.session_persistence import (SNAPSHOT_KEY, SessionWriteBehind, get_dirty_fields,
+                                           session_write_behind)
+from .services.session_state import SessionState
+from .services.session_store import (DEFAULT_KEY_PREFIX, VERSION_HEADER,
+                                     DjangoCacheSessionBackend, InMemorySessionBackend,
+                                     SessionStore, session_store)
+from .services.slot_hold_service import slot_hold_service
+from .services.synthetic_calendar import SyntheticCalendarService
+from .webhook import parse_webhook
+
+
+def webhook_body(messages=(), statuses=()):
+    value = {
+        'messaging_product': 'whatsapp',
+        'contacts': [{'profile': {'name': 'Paciente'}, 'wa_id': '5511999990000'}],
+        'messages': list(messages),
+        'statuses': list(statuses),
+    }
+    return json_codec.dumps({
+        'object': 'whatsapp_business_account',
+        'entry': [{'id': '1', 'changes': [{'field': 'messages', 'value': value}]}],
+    })
+
+
+def text_message(message_id, body='Olá', sender='5511999990000'):
+    return {'id': message_id, 'from': sender, 'timestamp': '1749416383',
+            'type': 'text', 'text': {'body': body}}
+
+
+class WebhookEnvelopeTests(TestCase):
+    """Webhook decodificado uma vez, com mensagens e status separados"""
+
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+
+    def test_parse_splits_messages_and_statuses(self):
+        envelope = parse_webhook(webhook_body(
+            messages=[text_message('wamid.1', 'Quero agendar'), {'id': 'wamid.2', 'from': '5511999990000',
+                                                                 'type': 'image', 'image': {}}],
+            statuses=[{'id': 'wamid.0', 'status': 'delivered', 'recipient_id': '5511999990000'}],
+        ))
+
+        self.assertTrue(envelope.valid)
+        self.assertEqual([(m.id, m.type, m.text) for m in envelope.messages],
+                         [('wamid.1', 'text', 'Quero agendar'), ('wamid.2', 'image', '')])
+        self.assertEqual(envelope.messages[0].contact_name, 'Paciente')
+        self.assertEqual([(s.id, s.status) for s in envelope.statuses], [('wamid.0', 'delivered')])
+
+    def test_invalid_body(self):
+        self.assertFalse(parse_webhook(b'{invalido').valid)
+
+    def test_redelivered_message_is_processed_once(self):
+        body = webhook_body(messages=[text_message('wamid.repetida')])
+        with mock.patch('api_gateway.views.process_message') as process_message:
+            for _ in range(2):
+                response = self.client.post('/api/webhook/whatsapp/', body, content_type='application/json',
+                                            HTTP_HOST='localhost')
+                self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(process_message.call_count, 1)
+        self.assertEqual(process_message.call_args.args[0].id, 'wamid.repetida')
+
+    async def test_async_webhook_processes_batch_once(self):
+        from .views import whatsapp_webhook_async
+
+        body = webhook_body(messages=[text_message('wamid.a'), text_message('wamid.b'), text_message('wamid.a')])
+        request = AsyncRequestFactory().post('/api/webhook/whatsapp/', body, content_type='application/json')
+        with mock.patch('api_gateway.views.aprocess_message', new_callable=mock.AsyncMock) as aprocess_message:
+            response = await whatsapp_webhook_async(request)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([call.args[0].id for call in aprocess_message.await_args_list], ['wamid.a', 'wamid.b'])
+
+    async def test_async_webhook_serializes_same_sender(self):
+        from .views import whatsapp_webhook_async
+
+        events = []
+
+        async def fake_process(message):
+            events.append(('início', message.id))
+            await asyncio.sleep(0.01)
+            events.append(('fim', message.id))
+
+        body = webhook_body(messages=[
+            text_message('wamid.a1', 'Quero agendar'),
+            text_message('wamid.b1', 'Oi', sender='5511888880000'),
+            text_message('wamid.a2', 'Com a Dra. Ana'),
+        ])
+        request = AsyncRequestFactory().post('/api/webhook/whatsapp/', body, content_type='application/json')
+        with mock.patch('api_gateway.views.aprocess_message', side_effect=fake_process):
+            response = await whatsapp_webhook_async(request)
+
+        self.assertEqual(response.status_code, 200)
+        # Mesmo remetente: a2 só começa depois que a1 termina
+        self.assertLess(events.index(('fim', 'wamid.a1')), events.index(('início', 'wamid.a2')))
+        # Remetentes diferentes rodam juntos: b1 começa antes de a1 terminar
+        self.assertLess(events.index(('início', 'wamid.b1')), events.index(('fim', 'wamid.a1')))
+        self.assertEqual(len(events), 6)
+
+
+class SyntheticCalendarTests(TestCase):
+    """Calendário sintético: determinístico e paginado como a API do Google"""
+
+    PERIOD = {'calendarId': 'agenda@clinica.com', 'timeMin': '2026-03-02T00:00:00Z',
+              'timeMax': '2026-03-09T00:00:00Z', 'singleEvents': True, 'orderBy': 'startTime'}
+
+    def list_all(self, calendar, **params):
+        items, page_token, pages = [], None, 0
+        while True:
+            page = calendar.events().list(pageToken=page_token, **self.PERIOD, **params).execute()
+            items.extend(page['items'])
+            pages += 1
+            page_token = page.get('nextPageToken')
+            if not page_token:
+                return items, pages
+
+    def test_same_seed_same_events(self):
+        first, _ = self.list_all(SyntheticCalendarService(doctors=20, seed=7))
+        second, _ = self.list_all(SyntheticCalendarService(doctors=20, seed=7))
+        other, _ = self.list_all(SyntheticCalendarService(doctors=20, seed=8))
+
+        self.assertTrue(first)
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+
+    def test_pagination_returns_every_event_once(self):
+        calendar = SyntheticCalendarService(doctors=30, seed=1)
+        single_page, _ = self.list_all(calendar, maxResults=2500)
+        paged, pages = self.list_all(calendar, maxResults=50)
+
+        self.assertGreater(pages, 1)
+        self.assertEqual([event['id'] for event in paged], [event['id'] for event in single_page])
+        self.assertEqual(len({event['id'] for event in paged}), len(paged))
+
+    def test_cancelled_only_with_show_deleted(self):
+        calendar = SyntheticCalendarService(doctors=30, seed=1, cancellation_rate=0.5)
+        visible, _ = self.list_all(calendar, maxResults=2500)
+        with_deleted, _ = self.list_all(calendar, maxResults=2500, showDeleted=True)
+
+        self.assertNotIn('cancelled', {event['status'] for event in visible})
+        self.assertIn('cancelled', {event['status'] for event in with_deleted})
+
+    def test_query_filters_by_doctor(self):
+        calendar = SyntheticCalendarService(doctors=30, seed=1)
+        doctor = calendar.doctors[3]
+        events, _ = self.list_all(calendar, maxResults=2500, q=doctor)
+
+        self.assertTrue(events)
+        self.assertTrue(all(event['summary'].startswith(doctor) for event in events))
+
+    @override_settings(GOOGLE_CALENDAR_BACKEND='synthetic', SYNTHETIC_CALENDAR_DOCTORS=200)
+    def test_calendar_service_reads_all_pages(self):
+        from .services.google_calendar_service import GoogleCalendarService
+
+        calendar = GoogleCalendarService()
+        events = calendar.get_events_for_date_range('2026-03-02', '2026-03-09')
+        expected, _ = self.list_all(calendar.service, maxResults=2500)
+
+        self.assertGreater(len(expected), 2500)
+        self.assertEqual(len(events), len(expected))
+
+
+class CalendarEventsTests(TestCase):
+    """Eventos separados por médico e por dia em uma passada"""
+
+    DOCTORS = ['Dr. João Carvalho', 'Dr. João Silva', 'Dra. Maria Santos']
+
+    def setUp(self):
+        # Próximo dia útil (fins de semana não entram na disponibilidade)
+        self.day = timezone.localdate() + timedelta(days=1)
+        while self.day.weekday() >= 5:
+            self.day += timedelta(days=1)
+
+    def at(self, hour_minute, day=None):
+        moment = datetime.strptime(hour_minute, '%H:%M').time()
+        return datetime.combine(day or self.day, moment, tzinfo=timezone.get_current_timezone()).isoformat()
+
+    def event(self, event_id, summary, start, end, description=''):
+        return {'id': event_id, 'summary': summary, 'description': description,
+                'start': {'dateTime': self.at(start)}, 'end': {'dateTime': self.at(end)}}
+
+    def test_event_goes_to_best_matching_doctor(self):
+        events = [
+            self.event('e1', 'Dr. João Carvalho - Consulta', '09:00', '09:30', description='Paciente: Maria'),
+            self.event('e2', 'Dra. Santos - Retorno', '10:00', '10:30'),
+            self.event('e3', 'Reunião geral', '11:00', '12:00'),
+        ]
+        by_doctor = partition_events(events, self.DOCTORS)
+
+        self.assertEqual([event.id for event in by_doctor['Dr. João Carvalho'][self.day]], ['e1'])
+        self.assertEqual(by_doctor['Dr. João Silva'], {})
+        self.assertEqual([event.id for event in by_doctor['Dra. Maria Santos'][self.day]], ['e2'])
+
+    def test_overnight_event_is_split_by_day(self):
+        event = {'id': 'e1', 'summary': 'Dra. Maria Santos - Plantão', 'start': {'dateTime': self.at('22:00')},
+                 'end': {'dateTime': self.at('02:00', day=self.day + timedelta(days=1))}}
+        by_day = partition_events([event], self.DOCTORS)['Dra. Maria Santos']
+
+        self.assertEqual((by_day[self.day][0].start, by_day[self.day][0].end), (22 * 60, 24 * 60))
+        next_day = by_day[self.day + timedelta(days=1)][0]
+        self.assertEqual((next_day.start, next_day.end), (0, 2 * 60))
+
+    def test_long_event_blocks_every_overlapping_slot(self):
+        from .services.google_calendar_service import GoogleCalendarService
+
+        calendar = GoogleCalendarService()
+        events = [self.event('e1', 'Dr. João Silva - Exame', '09:00', '10:00')]
+        by_day = calendar.partition_events_by_doctor(events, ['Dr. João Silva'])['Dr. João Silva']
+        start = datetime.fromisoformat(self.at('00:00'))
+        availability = calendar._process_availability('Dr. João Silva', by_day, start, 1)
+
+        times = availability['days'][0]['available_times']
+        self.assertIn('08:30', times)
+        self.assertNotIn('09:00', times)
+        self.assertNotIn('09:30', times)
+        self.assertIn('10:00', times)
+
+
+class AvailabilityStoreTests(TestCase):
+    """Agenda materializada: atualização incremental e consultas pontuais"""
+
+    databases = '__all__'
+    DOCTORS = ['Dr. João Carvalho', 'Dra. Maria Souza', 'Dr. Pedro Lima']
+
+    def setUp(self):
+        from .services.google_calendar_service import GoogleCalendarService
+
+        with override_settings(GOOGLE_CALENDAR_BACKEND='synthetic', SYNTHETIC_CALENDAR_DOCTORS=1):
+            self.calendar = GoogleCalendarService()
+        self.calendar.service = SyntheticCalendarService(doctors=self.DOCTORS, seed=3, density=0.5,
+                                                         cancellation_rate=0, absence_rate=0)
+        self.store = AvailabilityStore(self.calendar)
+        today = timezone.localdate()
+        # Primeiro dia útil depois de hoje
+        self.day = next(today + timedelta(days=offset) for offset in range(1, 8)
+                        if (today + timedelta(days=offset)).weekday() < 5)
+
+    def doctor_events(self, doctor):
+        return [event for event in self.calendar.service.events_for_day(self.day)
+                if event['summary'].startswith(doctor) and event['status'] != 'cancelled']
+
+    def test_refresh_materializes_calendar(self):
+        stats = self.store.refresh(self.DOCTORS, days_ahead=7)
+
+        self.assertEqual(stats['created'], AvailabilitySlot.objects.count())
+        event = self.doctor_events('Dr. João Carvalho')[0]
+        start = datetime.fromisoformat(event['start']['dateTime']).time()
+        self.assertEqual(self.store.lookup('Dr. João Carvalho', self.day, start.strftime('%H:%M')), 'busy')
+        self.assertEqual(self.store.lookup('joao carvalho', self.day, '07:00'), 'busy')  # fora do expediente
+
+        days = self.store.get_days('Dr. João Carvalho', days_ahead=7)
+        free_times = next(day['available_times'] for day in days if day['date'] == self.day.strftime('%d/%m/%Y'))
+        self.assertNotIn(start.strftime('%H:%M'), free_times)
+        self.assertEqual(self.store.lookup('Dr. João Carvalho', self.day, free_times[0]), 'free')
+
+    def test_incremental_refresh_rewrites_only_changed_days(self):
+        self.store.refresh(self.DOCTORS, days_ahead=7)
+        unchanged = self.store.refresh(self.DOCTORS, days_ahead=7)
+        self.assertEqual((unchanged['doctor_days'], unchanged['created'], unchanged['updated']), (0, 0, 0))
+
+        event = self.doctor_events('Dra. Maria Souza')[0]
+        self.assertTrue(self.calendar.service.cancel(event['id']))
+        stats = self.store.refresh(self.DOCTORS, days_ahead=7)
+
+        self.assertEqual(stats['doctor_days'], 1)
+        self.assertGreaterEqual(stats['updated'], 1)
+        start = datetime.fromisoformat(event['start']['dateTime']).strftime('%H:%M')
+        self.assertEqual(self.store.lookup('Dra. Maria Souza', self.day, start), 'free')
+
+    def test_moved_event_frees_its_previous_day(self):
+        self.store.refresh(self.DOCTORS, days_ahead=7)
+        event = self.doctor_events('Dra. Maria Souza')[0]
+        old_start = datetime.fromisoformat(event['start']['dateTime'])
+        # Remarcado para um horário livre de outro dia útil da janela
+        new_day = next(self.day + timedelta(days=offset) for offset in range(1, 6)
+                       if (self.day + timedelta(days=offset)).weekday() < 5
+                       and (self.day + timedelta(days=offset)) < timezone.localdate() + timedelta(days=7))
+        new_time = self.store.get_day('Dra. Maria Souza', new_day).slots_on(new_day)[0]
+        new_start = datetime.combine(new_day, time(new_time // 60, new_time % 60), tzinfo=old_start.tzinfo)
+        self.assertIsNotNone(self.calendar.service.move(event['id'], new_start))
+
+        stats = self.store.refresh(self.DOCTORS, days_ahead=7)
+
+        self.assertEqual(stats['doctor_days'], 2)
+        self.assertEqual(self.store.lookup('Dra. Maria Souza', self.day, old_start.strftime('%H:%M')), 'free')
+        self.assertEqual(self.store.lookup('Dra. Maria Souza', new_day, new_start.strftime('%H:%M')), 'busy')
+        self.assertFalse(AvailabilitySlot.objects.filter(event_id=event['id'], date=self.day).exists())
+
+    def test_working_hours_edit_invalidates_doctor(self):
+        from rag_agent.models import HorarioTrabalho, Medico
+
+        self.store.refresh(self.DOCTORS, days_ahead=7)
+        medico = Medico.objects.create(nome='Dr. Pedro Lima', bio='Bio', formas_pagamento='Pix')
+        HorarioTrabalho.objects.create(medico=medico, dia_da_semana=self.day.isoweekday(),
+                                       hora_inicio='13:00', hora_fim='15:00')
+
+        self.assertIsNone(self.store.get_days('Dr. Pedro Lima'))
+        self.assertIsNotNone(self.store.get_days('Dr. João Carvalho'))
+
+        stats = self.store.refresh(self.DOCTORS, days_ahead=7)
+        self.assertEqual(stats['doctor_days'], 7)
+        starts = AvailabilitySlot.objects.filter(doctor_key='pedro lima', date=self.day).values_list('start', flat=True)
+        self.assertEqual([start.strftime('%H:%M') for start in starts], ['13:00', '13:30', '14:00', '14:30'])
+
+    def test_working_hours_edit_during_refresh_is_not_lost(self):
+        self.store.refresh(self.DOCTORS, days_ahead=7)
+        self.store.mark_dirty('Dr. Pedro Lima')
+        write_slots = self.store._write_slots
+
+        def edit_while_writing(doctor_key, *args):
+            # Expediente alterado depois de a atualização ler a marcação
+            if doctor_key == 'pedro lima':
+                self.store.mark_dirty('Dr. Pedro Lima')
+            return write_slots(doctor_key, *args)
+
+        with mock.patch.object(self.store, '_write_slots', side_effect=edit_while_writing):
+            self.store.refresh(self.DOCTORS, days_ahead=7)
+
+        self.assertTrue(AvailabilitySync.objects.get(doctor_key='pedro lima').dirty)
+        self.assertIsNone(self.store.get_days('Dr. Pedro Lima'))
+        self.assertIsNotNone(self.store.get_days('Dr. João Carvalho'))
+
+        stats = self.store.refresh(self.DOCTORS, days_ahead=7)
+        self.assertEqual(stats['doctor_days'], 7)
+        self.assertIsNotNone(self.store.get_days('Dr. Pedro Lima'))
+
+    def test_busy_time_is_answered_from_the_day(self):
+        from .services.smart_scheduling_service import SmartSchedulingService
+
+        self.store.refresh(self.DOCTORS, days_ahead=7)
+        event = self.doctor_events('Dr. João Carvalho')[0]
+        start = datetime.fromisoformat(event['start']['dateTime']).time()
+        day_availability = self.store.get_day('Dr. João Carvalho', self.day)
+        self.assertEqual(list(day_availability.days), [self.day])
+
+        scheduling = SmartSchedulingService()
+        with mock.patch('api_gateway.services.smart_scheduling_service.availability_store', self.store), \
+                mock.patch.object(scheduling, '_load_availability') as load_availability:
+            check = scheduling.is_time_slot_available('Dr. João Carvalho', self.day.strftime('%d/%m/%Y'),
+                                                         start.strftime('%H:%M'))
+
+        load_availability.assert_not_called()
+        self.assertFalse(check['available'])
+        expected = [format_minutes(minutes) for minutes in day_availability.nearest(self.day, to_minutes(start), 8)]
+        self.assertEqual(check['alternative_times'], expected)
+        self.assertEqual(check['total_alternatives'], len(day_availability.slots_on(self.day)))
+
+    def test_stale_materialization_is_not_used(self):
+        self.store.refresh(self.DOCTORS, days_ahead=7)
+        with override_settings(AVAILABILITY_MAX_STALENESS=0):
+            self.assertIsNone(self.store.lookup('Dr. João Carvalho', self.day, '09:00'))
+        self.assertIsNone(self.store.get_days('Dr. João Carvalho', days_ahead=30))
+
+        metrics = self.store.staleness()
+        self.assertEqual((metrics['doctors'], metrics['dirty'], metrics['misses']), (3, 0, 2))
+
+
+class SlotHoldTests(TestCase):
+    """Reservas provisórias: um dono por horário, expiração e exclusão da disponibilidade"""
+
+    databases = '__all__'
+    DOCTOR = 'Dr. João Carvalho'
+
+    def setUp(self):
+        self.day = timezone.localdate() + timedelta(days=2)
+        self.date_str = self.day.strftime('%d/%m/%Y')
+
+    def test_single_owner_until_expiry(self):
+        self.assertTrue(slot_hold_service.acquire(self.DOCTOR, self.date_str, '09:00', '5511900000001'))
+        self.assertFalse(slot_hold_service.acquire('Dr. Joao Carvalho', self.day, '09:00', '5511900000002'))
+        # Renovação pelo próprio paciente
+        self.assertTrue(slot_hold_service.acquire(self.DOCTOR, self.day.isoformat(), '09:00', '5511900000001'))
+
+        SlotHold.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertTrue(slot_hold_service.acquire(self.DOCTOR, self.date_str, '09:00', '5511900000002'))
+        self.assertEqual(list(SlotHold.objects.values_list('phone_number', flat=True)), ['5511900000002'])
+
+    def test_changing_slot_releases_previous_hold(self):
+        slot_hold_service.acquire(self.DOCTOR, self.date_str, '09:00', '5511900000001')
+        slot_hold_service.acquire(self.DOCTOR, self.date_str, '10:00', '5511900000001')
+
+        self.assertEqual(SlotHold.objects.count(), 1)
+        self.assertTrue(slot_hold_service.acquire(self.DOCTOR, self.date_str, '09:00', '5511900000002'))
+        self.assertEqual(slot_hold_service.release('5511900000001'), 1)
+
+    def test_held_times_are_not_offered_to_other_patients(self):
+        from .services.smart_scheduling_service import SmartSchedulingService
+
+        scheduling = SmartSchedulingService()
+        scheduling.calendar_service = mock.Mock()
+        scheduling.calendar_service.get_availability.return_value = DoctorAvailability(self.DOCTOR, {self.day: [540, 570]})
+        slot_hold_service.acquire(self.DOCTOR, self.date_str, '09:00', '5511900000001')
+
+        other = scheduling.get_doctor_availability(self.DOCTOR, phone_number='5511900000002')
+        holder = scheduling.get_doctor_availability(self.DOCTOR, phone_number='5511900000001')
+        self.assertEqual(other['days_info'][0]['available_times'], ['09:30'])
+        self.assertEqual(holder['days_info'][0]['available_times'], ['09:00', '09:30'])
+
+        check = scheduling.is_time_slot_available(self.DOCTOR, self.date_str, '09:00', phone_number='5511900000002')
+        self.assertFalse(check['available'])
+        self.assertEqual(check['alternative_times'], ['09:30'])
+
+
+class DoctorAvailabilityTests(TestCase):
+    """Disponibilidade tipada: buscas por minutos e strings só na borda"""
+
+    DAY = date(2026, 10, 19)  # segunda-feira
+    NEXT_DAY = date(2026, 10, 20)
+
+    def setUp(self):
+        self.availability = DoctorAvailability('Dr. João Carvalho', {
+            self.NEXT_DAY: [840, 480],
+            self.DAY: [600, 480, 540, 570, 960],
+            date(2026, 10, 21): [],
+        })
+
+    def test_queries(self):
+        self.assertEqual(self.availability.days, [self.DAY, self.NEXT_DAY])
+        self.assertEqual(self.availability.total_slots, 7)
+        self.assertTrue(self.availability.is_free(self.DAY, 570))
+        self.assertFalse(self.availability.is_free(self.DAY, 575))
+        self.assertEqual(self.availability.nearest(self.DAY, 585, 3), [540, 570, 600])
+        self.assertEqual(self.availability.nearest(self.DAY, 1000, 2), [600, 960])
+        self.assertEqual(self.availability.next_slots(self.DAY, 600, 3),
+                         [(self.DAY, 960), (self.NEXT_DAY, 480), (self.NEXT_DAY, 840)])
+
+    def test_derivations(self):
+        self.assertEqual(self.availability.on(self.NEXT_DAY).days, [self.NEXT_DAY])
+        self.assertFalse(self.availability.on(date(2026, 10, 21)))
+        self.assertEqual(self.availability.after(self.DAY).days, [self.NEXT_DAY])
+        self.assertEqual(self.availability.first_days(1).days, [self.DAY])
+
+        remaining = self.availability.without({(self.NEXT_DAY, 480), (self.NEXT_DAY, 840), (self.DAY, 540)})
+        self.assertEqual(remaining.days, [self.DAY])
+        self.assertEqual(list(remaining.slots_on(self.DAY)), [480, 570, 600, 960])
+
+    def test_rendering_round_trip(self):
+        days = self.availability.to_days()
+        self.assertEqual(days[0], {'date': '19/10/2026', 'weekday': 'Segunda',
+                                   'available_times': ['08:00', '09:00', '09:30', '10:00', '16:00']})
+
+        parsed = DoctorAvailability.from_days('Dr. João Carvalho', days + [{'date': '', 'available_times': ['09:00']}])
+        self.assertEqual(parsed.to_days(), days)
+
+
+class DateTimeParserTests(TestCase):
+    """Datas e horários em português: absolutos, relativos e memória por (texto, hoje)"""
+
+    TODAY = date(2026, 10, 19)  # segunda-feira
+
+    def test_relative_dates(self):
+        expected = {
+            'hoje': date(2026, 10, 19),
+            'Amanhã': date(2026, 10, 20),
+            'depois de amanhã': date(2026, 10, 21),
+            'sexta que vem': date(2026, 10, 23),
+            'próxima segunda': date(2026, 10, 26),
+            'dia 5': date(2026, 11, 5),
+        }
+        for text, day in expected.items():
+            self.assertEqual(parse_date(text, today=self.TODAY), day, text)
+
+    def test_day_of_month_with_time(self):
+        expected = {
+            'dia 20 às 14h': date(2026, 10, 20),
+            'dia 20, às 14:30': date(2026, 10, 20),
+            'dia 5 de manhã': date(2026, 11, 5),
+            'dia 25 às 3 da tarde': date(2026, 10, 25),
+        }
+        for text, day in expected.items():
+            self.assertEqual(parse_date(text, today=self.TODAY), day, text)
+        # Só o horário não é um dia do mês
+        for text in ('às 14h', '14:30', 'às 2'):
+            self.assertIsNone(parse_date(text, today=self.TODAY), text)
+
+    def test_absolute_dates(self):
+        expected = {
+            '25/10': date(2026, 10, 25),
+            '25/10/25': date(2025, 10, 25),
+            '2025-10-25T10:00:00': date(2025, 10, 25),
+            '3 de março de 2027': date(2027, 3, 3),
+            'Sexta (10/10/2025)': date(2025, 10, 10),
+        }
+        for text, day in expected.items():
+            self.assertEqual(parse_date(text, today=self.TODAY), day, text)
+        self.assertIsNone(parse_date('31/02', today=self.TODAY))
+        self.assertIsNone(parse_date('quando puder', today=self.TODAY))
+
+    def test_times(self):
+        expected = {'às 14h30': time(14, 30), '14 horas': time(14, 0), '2 da tarde': time(14, 0),
+                    '08:00:00': time(8, 0), '2:30 PM': time(14, 30), '9': time(9, 0)}
+        for text, moment in expected.items():
+            self.assertEqual(parse_time(text), moment, text)
+        self.assertIsNone(parse_time('25h'))
+
+    def test_bare_hours_fall_in_clinic_hours(self):
+        expected = {'às 2': time(14, 0), '3': time(15, 0), 'às 6': time(18, 0), 'às 8': time(8, 0),
+                    'às 11': time(11, 0), '2 da manhã': time(2, 0), 'às 02:00': time(2, 0)}
+        for text, moment in expected.items():
+            self.assertEqual(parse_time(text), moment, text)
+
+    def test_relative_dates_follow_today(self):
+        self.assertEqual(parse_date('amanhã', today=self.TODAY), date(2026, 10, 20))
+        self.assertEqual(parse_date('amanhã', today=date(2026, 10, 20)), date(2026, 10, 21))
+
+
+class SessionWriteBehindTests(TestCase):
+    """Write-behind das sessões: campos alterados, coalescência, gravação imediata e nova tentativa"""
+
+    databases = '__all__'
+    PHONE = '5511900000010'
+
+    def setUp(self):
+        self.writer = SessionWriteBehind()
+        # Sem timer de verdade: a gravação em lote é disparada pelos testes
+        patcher = mock.patch.object(SessionWriteBehind, '_schedule_flush')
+        self.schedule_flush = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_dirty_fields_against_snapshot(self):
+        session = {'current_state': 'selecting_doctor', 'patient_name': ' Ana Souza ', 'preferred_date': '25/10/2026'}
+        self.assertEqual(get_dirty_fields(session)['patient_name'], 'Ana Souza')
+        self.assertEqual(get_dirty_fields(session)['preferred_date'], '2026-10-25')
+
+        self.writer.persist(self.PHONE, session)
+        self.assertEqual(get_dirty_fields(session), {})
+
+        session['preferred_time'] = 'às 14h30'
+        self.assertEqual(get_dirty_fields(session), {'preferred_time': '14:30:00'})
+
+    def test_pending_writes_are_coalesced(self):
+        session = {'current_state': 'selecting_doctor'}
+        self.writer.persist(self.PHONE, session)
+        session['selected_doctor'] = 'Dr. João Carvalho'
+        self.writer.persist(self.PHONE, session)
+        session['current_state'] = 'choosing_schedule'
+        self.writer.persist(self.PHONE, session)
+
+        self.assertFalse(ConversationSession.objects.filter(phone_number=self.PHONE).exists())
+        with mock.patch.object(self.writer, '_write', wraps=self.writer._write) as write:
+            self.assertEqual(self.writer.flush(), 1)
+
+        self.assertEqual(write.call_count, 1)
+        self.assertEqual(write.call_args.args[1]['current_state'], 'choosing_schedule')
+        db_session = ConversationSession.objects.get(phone_number=self.PHONE)
+        self.assertEqual((db_session.current_state, db_session.selected_doctor),
+                         ('choosing_schedule', 'Dr. João Carvalho'))
+        self.assertFalse(self.writer.has_pending())
+
+    def test_critical_state_is_written_immediately(self):
+        session = {'current_state': 'choosing_schedule'}
+        self.writer.persist(self.PHONE, session)
+        self.assertTrue(self.writer.has_pending(self.PHONE))
+
+        session['current_state'] = 'confirming'
+        self.writer.persist(self.PHONE, session)
+
+        self.assertFalse(self.writer.has_pending(self.PHONE))
+        self.assertEqual(ConversationSession.objects.get(phone_number=self.PHONE).current_state, 'confirming')
+
+    @override_settings(SESSION_PERSISTENCE_MODE='write_through')
+    def test_write_through_writes_every_change(self):
+        self.writer.persist(self.PHONE, {'current_state': 'selecting_doctor'})
+
+        self.assertFalse(self.writer.has_pending())
+        self.assertTrue(ConversationSession.objects.filter(phone_number=self.PHONE).exists())
+
+    def test_failed_write_is_requeued_without_losing_newer_changes(self):
+        session = {'current_state': 'selecting_doctor', 'selected_doctor': 'Dr. João Carvalho'}
+        self.writer.persist(self.PHONE, session)
+
+        def fail_and_change(phone_number, fields):
+            # Alteração mais recente chega enquanto a gravação falha
+            session['selected_doctor'] = 'Dra. Maria Santos'
+            self.writer.persist(self.PHONE, session)
+            raise DatabaseError('banco indisponível')
+
+        with mock.patch.object(self.writer, '_write', side_effect=fail_and_change):
+            self.assertEqual(self.writer.flush(), 0)
+
+        self.assertTrue(self.writer.has_pending(self.PHONE))
+        self.assertEqual(self.writer.flush(self.PHONE), 1)
+        db_session = ConversationSession.objects.get(phone_number=self.PHONE)
+        self.assertEqual((db_session.current_state, db_session.selected_doctor),
+                         ('selecting_doctor', 'Dra. Maria Santos'))
+
+
+class ConversationSessionFlowTests(TestCase):
+    """Pausa, retomada e confirmação de nome sobre a sessão do turno (cache + write-behind)"""
+
+    databases = '__all__'
+    PHONE = '5511900000020'
+
+    def setUp(self):
+        cache.clear()
+        session_store.clear_l1()
+        # Sem timer de verdade: a gravação em lote é disparada pelos testes
+        patcher = mock.patch.object(SessionWriteBehind, '_schedule_flush')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(session_write_behind.flush)
+        self.manager = SessionManager()
+
+    def start_session(self, **fields):
+        session = self.manager.get_or_create_session(self.PHONE)
+        session.update(fields)
+        self.manager.save_session(self.PHONE, session)
+        return session
+
+    def db_session(self):
+        session_write_behind.flush(self.PHONE)
+        return ConversationSession.objects.get(phone_number=self.PHONE)
+
+    def test_pause_question_and_resume_on_the_turn_session(self):
+        session = self.start_session(current_state='selecting_specialty', patient_name='Ana Souza')
+
+        self.assertTrue(conversation_service.pause_for_question(self.PHONE, session=session))
+        self.assertEqual((session['current_state'], session['previous_state']),
+                         ('answering_questions', 'selecting_specialty'))
+        self.assertTrue(conversation_service.has_paused_appointment(self.PHONE, session=session))
+        self.assertFalse(conversation_service.pause_for_question(self.PHONE, session=session))
+        self.assertEqual(session_store.get(self.PHONE)['current_state'], 'answering_questions')
+
+        # Dúvida no meio do agendamento: o estado já foi decidido, a intenção não muda a sessão
+        message = conversation_service.add_message(self.PHONE, 'Qual o endereço?', intent='buscar_info',
+                                                   session=session)
+        self.assertEqual(message.session_id, session['_db_id'])
+        self.assertEqual(session['current_state'], 'answering_questions')
+
+        result = conversation_service.resume_appointment(self.PHONE, session=session)
+        self.assertTrue(result['resumed'])
+        self.assertEqual(result['restored_state'], 'selecting_specialty')
+        self.assertEqual(result['next_question'], 'Olá Ana Souza! Qual especialidade médica você procura?')
+        self.assertFalse(conversation_service.has_paused_appointment(self.PHONE, session=session))
+
+        db_session = self.db_session()
+        self.assertEqual((db_session.current_state, db_session.previous_state, db_session.patient_name),
+                         ('selecting_specialty', None, 'Ana Souza'))
+        self.assertEqual(list(db_session.messages.values_list('content', flat=True)), ['Qual o endereço?'])
+
+    def test_name_confirmation_on_the_turn_session(self):
+        session = self.start_session(current_state='confirming_name', pending_name='Ana Souza')
+
+        result = conversation_service.confirm_patient_name(self.PHONE, 'Sim, correto', session=session)
+        self.assertEqual((result['status'], result['patient_name']), ('confirmed', 'Ana Souza'))
+        self.assertEqual((session['patient_name'], session['name_confirmed'], session['pending_name']),
+                         ('Ana Souza', True, None))
+        missing = conversation_service.get_missing_appointment_info(self.PHONE, session=session)
+        self.assertEqual(missing['missing_info'][0], 'selected_specialty')
+
+        db_session = self.db_session()
+        self.assertEqual((db_session.patient_name, db_session.name_confirmed, db_session.pending_name),
+                         ('Ana Souza', True, None))
+
+        session['pending_name'] = 'Ana Sousa'
+        result = conversation_service.confirm_patient_name(self.PHONE, 'não', session=session)
+        self.assertEqual(result['status'], 'rejected')
+        self.assertIsNone(session_store.get(self.PHONE)['pending_name'])
+
+    def test_phone_only_signatures_use_the_cached_session(self):
+        self.start_session(current_state='selecting_doctor', patient_name='Ana Souza')
+
+        self.assertTrue(conversation_service.pause_for_question(self.PHONE))
+        self.assertTrue(conversation_service.has_paused_appointment(self.PHONE))
+        self.assertEqual(session_store.get(self.PHONE)['previous_state'], 'selecting_doctor')
+        self.assertEqual(conversation_service.get_next_question(self.PHONE),
+                         'Olá Ana Souza! Qual especialidade médica você procura?')
+        self.assertEqual(conversation_service.resume_appointment(self.PHONE)['restored_state'], 'selecting_doctor')
+        self.assertEqual(conversation_service.confirm_patient_name(self.PHONE, 'sim')['status'], 'no_pending_name')
+        self.assertEqual(self.db_session().current_state, 'selecting_doctor')
+
+        # Sem a sessão do turno, a intenção ainda decide o estado gravado no banco
+        conversation_service.add_message(self.PHONE, 'Qual o endereço?', intent='buscar_info')
+        self.assertEqual(self.db_session().current_state, 'answering_questions')
+
+    def test_session_id_is_memoized(self):
+        session = self.manager.get_or_create_session(self.PHONE)
+        self.assertIsNone(conversation_service.get_session_id(self.PHONE, session))
+
+        session_id = conversation_service.get_session_id(self.PHONE, session, create=True)
+        self.assertEqual(session_id, ConversationSession.objects.get(phone_number=self.PHONE).id)
+        with self.assertNumQueries(0):
+            self.assertEqual(conversation_service.get_session_id(self.PHONE, session), session_id)
+
+    def test_get_or_create_session_flushes_pending_changes(self):
+        session = self.start_session(current_state='selecting_doctor')
+        self.db_session()
+        session['selected_doctor'] = 'Dr. João Carvalho'
+        self.manager.save_session(self.PHONE, session)
+        self.assertTrue(session_write_behind.has_pending(self.PHONE))
+
+        db_session = conversation_service.get_or_create_session(self.PHONE)
+        self.assertFalse(session_write_behind.has_pending(self.PHONE))
+        self.assertEqual(db_session.selected_doctor, 'Dr. João Carvalho')
+
+    def test_turn_resumes_paused_appointment_through_the_cached_session(self):
+        self.start_session(current_state='answering_questions', previous_state='choosing_schedule',
+                           patient_name='Ana Souza')
+        service = GeminiChatbotService.__new__(GeminiChatbotService)
+        service.session_manager = self.manager
+
+        session, history, clinic_data, early = service._start_turn(self.PHONE, 'podemos continuar?')
+
+        self.assertEqual(early['intent'], 'retomar_agendamento')
+        self.assertEqual(session['current_state'], 'choosing_schedule')
+        self.assertEqual(session_store.get(self.PHONE)['current_state'], 'choosing_schedule')
+        self.assertEqual(self.db_session().current_state, 'choosing_schedule')
+
+
+class ConversationHistoryTests(TestCase):
+    """Histórico: últimas N mensagens em ordem cronológica, pelo índice (sessão, horário)"""
+
+    databases = '__all__'
+    PHONE = '5511900000040'
+
+    def setUp(self):
+        cache.clear()
+        session_store.clear_l1()
+        self.db_session = ConversationSession.objects.create(phone_number=self.PHONE, current_state='idle')
+        start = timezone.now() - timedelta(hours=1)
+        for index in range(15):
+            message = ConversationMessage.objects.create(session=self.db_session, content=f'mensagem {index}')
+            ConversationMessage.objects.filter(pk=message.pk).update(timestamp=start + timedelta(minutes=index))
+
+    def test_returns_last_messages_oldest_first(self):
+        expected = [f'mensagem {index}' for index in range(5, 15)]
+        history = conversation_service.get_conversation_history(self.PHONE, limit=10)
+        self.assertEqual([item['content'] for item in history], expected)
+
+        session = SessionManager().get_or_create_session(self.PHONE)
+        history = conversation_service.get_conversation_history(self.PHONE, limit=10, session=session)
+        self.assertEqual([item['content'] for item in history], expected)
+
+    def test_query_uses_session_timestamp_index(self):
+        plan = ConversationMessage.objects.filter(session_id=self.db_session.id).order_by('-timestamp')[:10].explain()
+        self.assertIn('conv_msg_session_ts_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan.upper())
+
+
+class SweepStaleSessionsTests(TestCase):
+    """Varredura de sessões inativas: paginação por chave, sessões reativadas e arquivo"""
+
+    databases = '__all__'
+
+    def setUp(self):
+        self.stale_at = timezone.now() - timedelta(days=3)
+
+    def create_session(self, phone_number, messages=2, last_activity=None, **fields):
+        session = ConversationSession.objects.create(phone_number=phone_number, current_state='choosing_schedule',
+                                                     **fields)
+        for index in range(messages):
+            ConversationMessage.objects.create(session=session, message_type='user' if index % 2 == 0 else 'bot',
+                                               content=f'Mensagem {index} ção', intent='agendar_consulta',
+                                               entities={'medico': 'Dr. João Carvalho'})
+        ConversationSession.objects.filter(pk=session.pk).update(last_activity=last_activity or self.stale_at)
+        return session
+
+    def sweep(self, *args):
+        call_command('sweep_stale_sessions', *args, stdout=StringIO())
+
+    def test_keyset_batches_visit_each_session_once(self):
+        # Mesmo last_activity: o desempate pelo id não pode pular nem repetir sessões
+        sessions = [self.create_session(f'55119000001{index:02d}') for index in range(5)]
+        active = self.create_session('5511900000199', last_activity=timezone.now())
+
+        self.sweep('--batch-size', '2')
+
+        self.assertEqual(ConversationArchive.objects.count(), 5)
+        self.assertEqual(sorted(ConversationArchive.objects.values_list('phone_number', flat=True)),
+                         [session.phone_number for session in sessions])
+        self.assertFalse(ConversationMessage.objects.exclude(session=active).exists())
+        self.assertEqual(ConversationMessage.objects.filter(session=active).count(), 2)
+        self.assertEqual(set(ConversationSession.objects.exclude(pk=active.pk).values_list('current_state', flat=True)),
+                         {'idle'})
+
+    def test_max_sessions_limits_run_in_last_activity_order(self):
+        for index in range(4):
+            self.create_session(f'55119000002{index:02d}', last_activity=self.stale_at + timedelta(minutes=index))
+
+        self.sweep('--batch-size', '2', '--max-sessions', '3')
+        self.assertEqual(sorted(ConversationArchive.objects.values_list('phone_number', flat=True)),
+                         ['5511900000200', '5511900000201', '5511900000202'])
+
+        # Execução seguinte continua de onde parou
+        self.sweep('--batch-size', '2', '--max-sessions', '3')
+        self.assertEqual(ConversationArchive.objects.count(), 4)
+
+    def test_session_reactivated_during_sweep_is_left_alone(self):
+        session = self.create_session('5511900000300', messages=3, patient_name='Ana Souza')
+        compress = ConversationArchive.compress_messages
+
+        def compress_and_reactivate(messages):
+            # Paciente volta a conversar depois do primeiro lote
+            ConversationSession.objects.filter(pk=session.pk).update(last_activity=timezone.now())
+            return compress(messages)
+
+        with mock.patch.object(ConversationArchive, 'compress_messages', side_effect=compress_and_reactivate):
+            self.sweep('--chunk-size', '1')
+
+        self.assertEqual(ConversationArchive.objects.count(), 1)
+        self.assertEqual(ConversationMessage.objects.filter(session=session).count(), 2)
+        self.assertEqual(ConversationSession.objects.get(pk=session.pk).current_state, 'choosing_schedule')
+
+    def test_archive_round_trip(self):
+        session = self.create_session('5511900000400', messages=3, patient_name='Ana Souza')
+        original = list(ConversationMessage.objects.filter(session=session).order_by('timestamp', 'id')
+                        .values('message_type', 'content', 'intent', 'entities', 'timestamp'))
+
+        self.sweep('--delete-sessions')
+
+        archive = ConversationArchive.objects.get()
+        self.assertEqual((archive.phone_number, archive.patient_name, archive.message_count),
+                         ('5511900000400', 'Ana Souza', 3))
+        messages = archive.get_messages()
+        self.assertEqual([(m['message_type'], m['content'], m['intent'], m['entities']) for m in messages],
+                         [(m['message_type'], m['content'], m['intent'], m['entities']) for m in original])
+        self.assertEqual([datetime.fromisoformat(m['timestamp']) for m in messages], [m['timestamp'] for m in original])
+        self.assertFalse(ConversationSession.objects.filter(pk=session.pk).exists())
+
+    def test_dry_run_changes_nothing(self):
+        self.create_session('5511900000500')
+        self.sweep('--dry-run')
+
+        self.assertFalse(ConversationArchive.objects.exists())
+        self.assertEqual(ConversationMessage.objects.count(), 2)
+
+
+class SessionStoreTests(TestCase):
+    """Store de sessões: L1 versionado, invalidação entre workers e gravação atômica no L2"""
+
+    PHONE = '5511900000600'
+
+    def backends(self):
+        cache.clear()
+        return [InMemorySessionBackend(), DjangoCacheSessionBackend()]
+
+    def workers(self, backend):
+        # Dois workers: L1 próprio, mesmo L2
+        return SessionStore(backend, timeout=60), SessionStore(backend, timeout=60)
+
+    def test_l1_hit_after_write(self):
+        for backend in self.backends():
+            with self.subTest(backend=type(backend).__name__):
+                store, _ = self.workers(backend)
+                self.assertIsNotNone(store.set(self.PHONE, {'current_state': 'idle'}))
+
+                self.assertEqual(store.get(self.PHONE)['current_state'], 'idle')
+                self.assertEqual(store.stats, {'l1_hits': 1, 'l2_hits': 0, 'misses': 0})
+
+    def test_write_in_one_worker_invalidates_the_other(self):
+        for backend in self.backends():
+            with self.subTest(backend=type(backend).__name__):
+                first, second = self.workers(backend)
+                first.set(self.PHONE, {'current_state': 'selecting_doctor'})
+                self.assertEqual(second.get(self.PHONE)['current_state'], 'selecting_doctor')
+
+                first.set(self.PHONE, {'current_state': 'choosing_schedule'})
+                self.assertEqual(second.get(self.PHONE)['current_state'], 'choosing_schedule')
+                self.assertEqual(second.get(self.PHONE)['current_state'], 'choosing_schedule')
+                self.assertEqual(second.stats, {'l1_hits': 1, 'l2_hits': 2, 'misses': 0})
+
+    def test_delete_reaches_every_worker(self):
+        for backend in self.backends():
+            with self.subTest(backend=type(backend).__name__):
+                first, second = self.workers(backend)
+                first.set(self.PHONE, {'current_state': 'confirming'})
+                second.get(self.PHONE)
+
+                first.delete(self.PHONE)
+                self.assertIsNone(first.get(self.PHONE))
+                self.assertIsNone(second.get(self.PHONE))
+
+    def test_new_session_after_delete_is_not_served_from_old_l1(self):
+        for backend in self.backends():
+            with self.subTest(backend=type(backend).__name__):
+                first, second = self.workers(backend)
+                first.set(self.PHONE, {'patient_name': 'Old', 'current_state': 'confirming'})
+                first.get(self.PHONE)
+
+                # Varredura remove a sessão (e a chave da versão); paciente volta com sessão nova
+                second.delete(self.PHONE)
+                second.set(self.PHONE, {'current_state': 'idle'})
+
+                session = first.get(self.PHONE)
+                self.assertEqual(session['current_state'], 'idle')
+                self.assertIsNone(session.get('patient_name'))
+
+    def test_l1_expires_with_session_timeout(self):
+        backend = InMemorySessionBackend()
+        store = SessionStore(backend, timeout=60)
+        store.set(self.PHONE, {'current_state': 'idle'})
+
+        with mock.patch('api_gateway.services.session_store.time.monotonic', return_value=time_module.monotonic() + 61):
+            self.assertIsNone(store._l1_get(self.PHONE))
+        self.assertEqual(store.get(self.PHONE)['current_state'], 'idle')
+        self.assertEqual(store.stats['l2_hits'], 1)
+
+    def test_concurrent_writers_keep_header_and_version_in_sync(self):
+        for backend in self.backends():
+            with self.subTest(backend=type(backend).__name__):
+                stores = [SessionStore(backend, timeout=60) for _ in range(8)]
+                with ThreadPoolExecutor(max_workers=8) as pool:
+                    versions = list(pool.map(
+                        lambda index: stores[index % 8].set(self.PHONE, {'current_state': 'idle', 'turn': index}),
+                        range(200),
+                    ))
+
+                self.assertEqual(len(set(versions)), 200)
+                stored = backend.get(f'{DEFAULT_KEY_PREFIX}{self.PHONE}')
+                published = int(backend.get(f'{DEFAULT_KEY_PREFIX}{self.PHONE}:v'))
+                self.assertEqual(VERSION_HEADER.unpack_from(stored)[0], published)
+                # Leitura seguinte volta a usar o L1 de quem gravou por último
+                reader = SessionStore(backend, timeout=60)
+                reader.get(self.PHONE)
+                reader.get(self.PHONE)
+                self.assertEqual(reader.stats['l1_hits'], 1)
+
+
+class SessionStateCodecTests(TestCase):
+    """Formato binário da sessão: ida e volta sem perder tipos nem valores"""
+
+    def round_trip(self, session):
+        return SessionState.decode(SessionState.coerce(session).encode())
+
+    def test_typed_fields_none_and_unicode(self):
+        session = {
+            'phone_number': '5511900000700',
+            'current_state': 'choosing_schedule',
+            'previous_state': None,
+            'patient_name': 'João Ação 🩺',
+            'name_confirmed': True,
+            'preferred_date': '2026-10-25',
+            'preferred_time': '14:30:00',
+            'created_at': '2026-10-19T12:00:00.123456+00:00',
+            'last_confidence': 0.875,
+            'last_suggested_doctors': ['Dr. João Carvalho', 'Dra. Maria Santos'],
+            '_db_id': 2 ** 40,
+            SNAPSHOT_KEY: {'current_state': 'choosing_schedule', 'patient_name': 'João Ação 🩺',
+                           'name_confirmed': True, 'preferred_date': None},
+        }
+        state = self.round_trip(session)
+
+        self.assertEqual(state.to_dict(), session)
+        self.assertEqual(state.preferred_date, date(2026, 10, 25))
+        self.assertEqual(state.preferred_time, time(14, 30))
+        self.assertEqual(state.created_at, datetime(2026, 10, 19, 12, 0, 0, 123456, tzinfo=dt_timezone.utc))
+        self.assertIsNone(state['previous_state'])
+        self.assertNotIn('selected_doctor', state)
+
+    def test_values_outside_field_type_are_kept(self):
+        session = {'current_state': 'estado_novo', 'preferred_date': 'sexta que vem', 'name_confirmed': 'sim'}
+        self.assertEqual(self.round_trip(session).to_dict(), session)
+
+    def test_extras_keep_their_types(self):
+        json_extras = {'contexto': {'tentativas': 2, 'médicos': ['Dr. João'], 'nota': None}}
+        self.assertEqual(self.round_trip(json_extras).to_dict(), json_extras)
+
+        # Tuplas, datas e chaves numéricas não sobrevivem ao JSON: vão por pickle
+        pickled_extras = {'ultimo_horario': ('25/10/2026', '14:30'), 'dia': date(2026, 10, 25), 'ids': {1: 'a'}}
+        state = self.round_trip(pickled_extras)
+        self.assertEqual(state.to_dict(), pickled_extras)
+        self.assertIsInstance(state['ultimo_horario'], tuple)
+
+    def test_empty_session(self):
+        self.assertEqual(self.round_trip({}).to_dict(), {})
+
+
+@override_settings(GEMINI_API_KEY='')
+class EntityExtractorSpecialtyTests(TestCase):
+    """Especialidade em termos leigos resolvida pelos sinônimos do catálogo"""
+
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        from rag_agent.models import Especialidade
+        Especialidade.objects.create(nome='Pneumologia', sinonimos='pulmão, falta de ar')
+        Especialidade.objects.create(nome='Medicina do Sono', sinonimos='ronco, apneia')
+
+    def setUp(self):
+        from rag_agent.specialty_index import specialty_index
+        specialty_index.invalidate()
+        self.extractor = EntityExtractor()
+
+    def test_local_index_fills_specialty_while_selecting(self):
+        session = {'current_state': 'selecting_specialty'}
+        self.assertEqual(
+            self.extractor.extract_entities('tô com ronco', session, [], {}),
+            {'especialidade': 'Medicina do Sono'},
+        )
+        self.assertEqual(
+            self.extractor._finalize_entities({}, 'dor no pulmão', session),
+            {'especialidade': 'Pneumologia'},
+        )
+
+    def test_local_index_only_runs_in_specialty_state(self):
+        session = {'current_state': 'idle'}
+        self.assertEqual(self.extractor._finalize_entities({}, 'tô com ronco', session), {})
+
+    def test_gemini_lay_term_is_mapped_to_catalog_name(self):
+        validated = self.extractor.validate_entities({'especialidade': 'pulmão'})
+        self.assertEqual(validated['especialidade'], 'Pneumologia')
+        validated = self.extractor.validate_entities({'especialidade': 'dermatologia'})
+        self.assertEqual(validated['especialidade'], 'Dermatologia')
+
+
+class RetrievalServiceTests(TestCase):
+    """Consulta de recuperação, contexto ranqueado e priorização das listas dos prompts"""
+
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        from rag_agent.models import Especialidade, Medico
+        cls.pneumo = Especialidade.objects.create(nome='Pneumologia', sinonimos='pulmão, falta de ar')
+        cls.sono = Especialidade.objects.create(nome='Medicina do Sono', sinonimos='ronco, apneia')
+        cls.carlos = Medico.objects.create(nome='Dr. Carlos Lima', crm='RET-1', bio='Asma e bronquite',
+                                           formas_pagamento='PIX')
+        cls.carlos.especialidades.add(cls.pneumo)
+        cls.ana = Medico.objects.create(nome='Dra. Ana Souza', crm='RET-2', bio='Ronco e apneia do sono',
+                                        formas_pagamento='PIX')
+        cls.ana.especialidades.add(cls.sono)
+
+    def setUp(self):
+        from rag_agent.retrieval import retrieval_index
+        retrieval_index.invalidate()
+        self.service = RetrievalService()
+
+    def test_build_query_uses_session_and_last_assistant_message(self):
+        history = [
+            {'is_user': False, 'content': 'Primeira resposta'},
+            {'is_user': True, 'content': 'pergunta'},
+            {'is_user': False, 'content': 'Temos a Dra. Ana Souza'},
+        ]
+        query = self.service.build_query('quero com ela', {'selected_specialty': 'Medicina do Sono'}, history)
+        self.assertEqual(query, 'quero com ela Medicina do Sono Temos a Dra. Ana Souza')
+
+    def test_context_ranks_relevant_catalog_first(self):
+        context = self.service.get_context('eu ronco e tenho apneia', k=3)
+        self.assertEqual(context['medico_ids'][0], self.ana.pk)
+        self.assertEqual(context['especialidade_ids'], [self.sono.pk])
+        self.assertLessEqual(len(context['chunks']), 3)
+        self.assertIn('Dra. Ana Souza', context['text'])
+        self.assertNotIn('Carlos', context['text'])
+
+    def test_context_is_empty_without_matches(self):
+        self.assertEqual(self.service.get_context('bom dia'),
+                         {'chunks': [], 'text': '', 'especialidade_ids': [], 'medico_ids': []})
+
+    def test_prioritize_puts_relevant_items_first(self):
+        items = [{'id': pk} for pk in range(1, 8)]
+        self.assertEqual([item['id'] for item in self.service.prioritize(items, [6, 99, 2], limit=4)],
+                         [6, 2, 1, 3])
+        self.assertEqual([item['id'] for item in self.service.prioritize(items, [], limit=3)], [1, 2, 3])
+
+
+class JSONCodecRendererParityTests(TestCase):
+    """FastJSONRenderer com json padrão e com orjson: mesma saída do JSONRenderer do DRF"""
+
+    def sample(self):
+        return {
+            'nome': 'Pneumologia — São Paulo',
+            'separadores': 'linha\u2028parágrafo\u2029fim',
+            'preco': Decimal('150.00'),
+            'quando': datetime(2026, 10, 19, 14, 30, 15, 123456, tzinfo=dt_timezone.utc),
+            'data': date(2026, 10, 19),
+            'hora': time(9, 5),
+            'duracao': timedelta(minutes=30),
+            'id': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+            'lista': [1, 2.5, None, True, ('tupla', 2)],
+            'aninhado': {'vazio': {}, 'texto': 'aspas " e barra \\'},
+        }
+
+    def codecs(self):
+        names = ['stdlib']
+        if json_codec.ORJSON_AVAILABLE:
+            names.append('orjson')
+        return names
+
+    def render(self, codec_name, data, **kwargs):
+        with override_settings(JSON_CODEC=codec_name):
+            self.assertEqual(json_codec.get_codec().name, codec_name)
+            return FastJSONRenderer().render(data, **kwargs)
+
+    def test_output_matches_drf_renderer(self):
+        expected = JSONRenderer().render(self.sample())
+        for codec_name in self.codecs():
+            with self.subTest(codec=codec_name):
+                self.assertEqual(self.render(codec_name, self.sample()), expected)
+
+    def test_indent_and_empty_responses_follow_drf(self):
+        context = {'indent': 4}
+        expected = JSONRenderer().render(self.sample(), renderer_context=context)
+        for codec_name in self.codecs():
+            with self.subTest(codec=codec_name):
+                self.assertEqual(self.render(codec_name, self.sample(), renderer_context=context), expected)
+                self.assertEqual(self.render(codec_name, None), b'')
+
+    def test_nan_never_produces_invalid_json(self):
+        data = {'valor': float('nan'), 'limite': float('inf')}
+        with self.assertRaises(ValueError):
+            JSONRenderer().render(data)
+        with self.assertRaises(ValueError):
+            self.render('stdlib', data)
+        with self.assertRaises(ValueError):
+            json_codec.get_codec('stdlib').dumps(data, indent=True)
+
+    @skipUnless(json_codec.ORJSON_AVAILABLE, 'orjson não instalado')
+    def test_orjson_writes_null_for_nan(self):
+        self.assertEqual(self.render('orjson', {'valor': float('nan')}), b'{"valor":null}')
+
+    def test_parser_matches_stdlib(self):
+        body = JSONRenderer().render(self.sample())
+        for codec_name in self.codecs():
+            with self.subTest(codec=codec_name), override_settings(JSON_CODEC=codec_name):
+                self.assertEqual(FastJSONParser().parse(BytesIO(body)), json.loads(body))
+                with self.assertRaises(ParseError):
+                    FastJSONParser().parse(BytesIO(b'{"a": NaN'))
+
+
+class LogPipelineTests(TestCase):
+    """Fila de logs (mensagem montada na chamada), formatador JSON e amostragem por logger"""
+
+    def make_record(self, name='api_gateway.services.gemini.core_service', level=logging.INFO,
+                    msg='📦 Entidades: %s', args=(), **extra):
+        record = logging.LogRecord(name, level, __file__, 1, msg, args, None)
+        record.__dict__.update(extra)
+        return record
+
+    def test_queue_handler_snapshots_mutable_args(self):
+        output = StringIO()
+        handler = QueueLogHandler(output)
+        handler.setFormatter(logging.Formatter('%(levelname)s %(message)s'))
+        entities = {'medico': 'Dra. Ana'}
+        prepared = handler.prepare(self.make_record(args=(entities,)))
+        handler.handle(self.make_record(args=(entities,)))
+        entities['medico'] = 'Dr. Carlos'
+        handler.close()
+        self.assertEqual(prepared.getMessage(), "📦 Entidades: {'medico': 'Dra. Ana'}")
+        self.assertIsNone(prepared.args)
+        self.assertEqual(output.getvalue(), "INFO 📦 Entidades: {'medico': 'Dra. Ana'}\n")
+
+    def test_queue_handler_formats_exceptions_off_thread(self):
+        output = StringIO()
+        handler = QueueLogHandler(output)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        try:
+            raise ValueError('falhou')
+        except ValueError:
+            record = self.make_record(level=logging.ERROR, msg='❌ Erro: %s', args=('x',))
+            record.exc_info = sys.exc_info()
+        handler.handle(record)
+        handler.close()
+        self.assertIn('❌ Erro: x\nTraceback', output.getvalue())
+        self.assertIn('ValueError: falhou', output.getvalue())
+
+    def test_json_formatter(self):
+        record = self.make_record(args=({'data': '20/10'},), phone_number='5511999990000',
+                                  when=date(2026, 10, 20), _private='x')
+        record.created = 1760000000.1234
+        data = json.loads(JSONLogFormatter().format(record))
+        self.assertEqual(data, {
+            'ts': '2025-10-09T08:53:20.123+00:00',
+            'level': 'INFO',
+            'logger': 'api_gateway.services.gemini.core_service',
+            'message': "📦 Entidades: {'data': '20/10'}",
+            'phone_number': '5511999990000',
+            'when': '2026-10-20',
+        })
+
+    def test_json_formatter_exception_and_unserializable_extra(self):
+        try:
+            raise RuntimeError('quebrou')
+        except RuntimeError:
+            record = self.make_record(level=logging.ERROR, msg='falha', objeto=object())
+            record.exc_info = sys.exc_info()
+        line = JSONLogFormatter().format(record)
+        self.assertNotIn('\n', line)
+        data = json.loads(line)
+        self.assertIn('RuntimeError: quebrou', data['exc_info'])
+        self.assertTrue(data['objeto'].startswith('<object object'))
+
+    def test_sampling_by_logger_prefix(self):
+        sampler = SamplingFilter({'api_gateway.services': 0.0, 'api_gateway.services.gemini': 1.0})
+        self.assertTrue(sampler.filter(self.make_record()))
+        self.assertFalse(sampler.filter(self.make_record(name='api_gateway.services.availability_store')))
+        self.assertFalse(sampler.filter(self.make_record(name='api_gateway.services', level=logging.DEBUG)))
+        self.assertTrue(sampler.filter(self.make_record(name='api_gateway.views')))
+        self.assertTrue(sampler.filter(self.make_record(name='api_gateway.servicesx')))
+
+    def test_sampling_never_drops_warnings(self):
+        sampler = SamplingFilter({'api_gateway': 0.0})
+        self.assertTrue(sampler.filter(self.make_record(name='api_gateway.views', level=logging.WARNING)))
+        self.assertTrue(sampler.filter(self.make_record(name='api_gateway.views', level=logging.ERROR)))
+        only_debug = SamplingFilter({'api_gateway': 0.0}, max_level='DEBUG')
+        self.assertTrue(only_debug.filter(self.make_record(name='api_gateway.views')))
+        self.assertFalse(only_debug.filter(self.make_record(name='api_gateway.views', level=logging.DEBUG)))
+
+    def test_sampling_keeps_configured_fraction(self):
+        sampler = SamplingFilter({'api_gateway': 0.25})
+        with mock.patch('core.log_pipeline.random.random', side_effect=[0.1, 0.24, 0.25, 0.9]):
+            kept = [sampler.filter(self.make_record(name='api_gateway.views')) for _ in range(4)]
+        self.assertEqual(kept, [True, True, False, False])
+        self.assertTrue(SamplingFilter().filter(self.make_record()))
+
+
+class CatalogConversationRouterTests(SimpleTestCase):
+    """Roteador: catálogo e conversas em bancos próprios só quando os aliases existem"""
+
+    def setUp(self):
+        from rag_agent.models import Medico
+
+        self.router = CatalogConversationRouter()
+        self.medico = Medico(nome='Dr. João Carvalho')
+        self.conversation = ConversationSession(phone_number='5511900000030')
+
+    @contextmanager
+    def configured(self, *aliases):
+        sqlite = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}
+        with warnings.catch_warnings():
+            # Django avisa que sobrescrever DATABASES é arriscado; o roteador só lê os aliases
+            warnings.simplefilter('ignore', UserWarning)
+            with override_settings(DATABASES={alias: sqlite for alias in ('default',) + aliases}):
+                yield
+
+    def test_unsplit_setup_stays_on_default(self):
+        with self.configured():
+            for obj in (self.medico, self.conversation):
+                self.assertIsNone(self.router.db_for_read(type(obj)))
+                self.assertIsNone(self.router.db_for_write(type(obj)))
+            self.assertTrue(self.router.allow_relation(self.medico, self.conversation))
+            self.assertTrue(self.router.allow_migrate('default', 'rag_agent'))
+            self.assertTrue(self.router.allow_migrate('default', 'api_gateway'))
+
+    def test_each_app_goes_to_its_database(self):
+        with self.configured('catalog', 'conversations'):
+            self.assertEqual(self.router.db_for_read(type(self.medico)), 'catalog')
+            self.assertEqual(self.router.db_for_write(type(self.medico)), 'catalog')
+            self.assertEqual(self.router.db_for_read(type(self.conversation)), 'conversations')
+            self.assertEqual(self.router.db_for_write(type(self.conversation)), 'conversations')
+            self.assertIsNone(self.router.db_for_read(Group))
+
+    def test_replica_serves_catalog_reads_only(self):
+        with self.configured('catalog', 'catalog_replica'):
+            self.assertEqual(self.router.db_for_read(type(self.medico)), 'catalog_replica')
+            self.assertEqual(self.router.db_for_write(type(self.medico)), 'catalog')
+            self.assertIsNone(self.router.db_for_read(type(self.conversation)))
+        # Sem o alias da réplica, leituras voltam para o catálogo
+        with self.configured('catalog'):
+            self.assertEqual(self.router.db_for_read(type(self.medico)), 'catalog')
+
+    def test_cross_database_relations_are_refused(self):
+        with self.configured('catalog', 'conversations'):
+            self.assertFalse(self.router.allow_relation(self.medico, self.conversation))
+            self.assertTrue(self.router.allow_relation(self.conversation, ConversationSession()))
+        with self.configured('catalog'):
+            self.assertFalse(self.router.allow_relation(self.medico, self.conversation))
+            self.assertTrue(self.router.allow_relation(self.conversation, Group()))
+
+    def test_migrations(self):
+        with self.configured('catalog', 'catalog_replica', 'conversations'):
+            for app_label in ('rag_agent', 'api_gateway', 'auth'):
+                self.assertFalse(self.router.allow_migrate('catalog_replica', app_label))
+            self.assertTrue(self.router.allow_migrate('catalog', 'rag_agent'))
+            self.assertFalse(self.router.allow_migrate('catalog', 'api_gateway'))
+            self.assertTrue(self.router.allow_migrate('conversations', 'api_gateway'))
+            self.assertFalse(self.router.allow_migrate('conversations', 'rag_agent'))
+            # Apps movidos não são criados no default; o resto continua lá
+            self.assertFalse(self.router.allow_migrate('default', 'rag_agent'))
+            self.assertFalse(self.router.allow_migrate('default', 'api_gateway'))
+            self.assertTrue(self.router.allow_migrate('default', 'auth'))
+            self.assertIsNone(self.router.allow_migrate('benchmark', 'rag_agent'))
+
+
+class ServiceContainerTests(TestCase):
+    """Construção única sob concorrência, reset, aquecimento e proxies preguiçosos"""
+
+    def counting_factory(self, delay=0.0):
+        calls = []
+
+        def factory():
+            calls.append(threading.get_ident())
+            time_module.sleep(delay)
+            return object()
+
+        return factory, calls
+
+    def test_concurrent_get_builds_once(self):
+        factory, calls = self.counting_factory(delay=0.05)
+        container = ServiceContainer({'lento': factory})
+        barrier = threading.Barrier(16)
+
+        def get():
+            barrier.wait()
+            return container.get('lento')
+
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            instances = list(executor.map(lambda _: get(), range(16)))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len({id(instance) for instance in instances}), 1)
+        self.assertIn('lento', container.build_times)
+
+    def test_services_build_independently(self):
+        slow, slow_calls = self.counting_factory(delay=0.2)
+        container = ServiceContainer({'lento': slow, 'rapido': dict})
+        worker = threading.Thread(target=container.get, args=('lento',))
+        worker.start()
+        started = time_module.perf_counter()
+        self.assertEqual(container.get('rapido'), {})
+        self.assertLess(time_module.perf_counter() - started, 0.1)
+        worker.join()
+        self.assertTrue(container.is_built('lento'))
+
+    def test_string_factories_and_unknown_services(self):
+        container = ServiceContainer({'ordenado': 'collections.OrderedDict'})
+        self.assertFalse(container.is_built('ordenado'))
+        self.assertEqual(type(container.get('ordenado')).__name__, 'OrderedDict')
+        with self.assertRaises(KeyError):
+            container.get('inexistente')
+
+    def test_reset_and_register_rebuild(self):
+        factory, calls = self.counting_factory()
+        container = ServiceContainer({'a': factory, 'b': factory})
+        first_a, first_b = container.get('a'), container.get('b')
+        container.reset('a')
+        self.assertFalse(container.is_built('a'))
+        self.assertIsNot(container.get('a'), first_a)
+        self.assertIs(container.get('b'), first_b)
+        container.reset()
+        self.assertIsNot(container.get('b'), first_b)
+        self.assertEqual(len(calls), 4)
+        container.register('a', list)
+        self.assertEqual(container.get('a'), [])
+
+    def test_warm_up_builds_in_order_and_survives_errors(self):
+        built = []
+
+        def failing():
+            raise RuntimeError('sem credenciais')
+
+        container = ServiceContainer({
+            'a': lambda: built.append('a'),
+            'falha': failing,
+            'b': lambda: built.append('b'),
+        })
+        with mock.patch('api_gateway.services.container.warm_catalog', side_effect=lambda: built.append('catalog')):
+            self.assertIsNone(container.warm_up(('catalog', 'a', 'falha', 'b'), background=False))
+        self.assertEqual(built, ['catalog', 'a', 'b'])
+        self.assertFalse(container.is_built('falha'))
+
+    def test_background_warm_up_runs_once_at_a_time(self):
+        release = threading.Event()
+        container = ServiceContainer({'lento': release.wait})
+        thread = container.warm_up(('lento',))
+        self.assertTrue(thread.daemon)
+        self.assertIs(container.warm_up(('lento',)), thread)
+        release.set()
+        thread.join(timeout=5)
+        self.assertTrue(container.is_built('lento'))
+
+    def test_lazy_service_and_startup_switch(self):
+        container = ServiceContainer({'lista': list})
+        with mock.patch('api_gateway.services.container.services', container):
+            proxy = lazy_service('lista')
+            self.assertFalse(container.is_built('lista'))
+            proxy.append(1)
+            self.assertEqual(container.get('lista'), [1])
+            with override_settings(SERVICES_WARMUP=False), mock.patch.object(container, 'warm_up') as warm_up:
+                warm_up_on_startup()
+            warm_up.assert_not_called()
+
+
+@override_settings(GEMINI_API_KEY='')
+class AsyncResponseGenerationTests(TestCase):
+    """Geração da resposta aguardada no event loop (generate_content_async) no turno assíncrono"""
+
+    def setUp(self):
+        self.generator = ResponseGenerator()
+        reply = mock.Mock(text='  Temos horários com a Dra. Ana.  ')
+        self.generator.model = mock.Mock()
+        self.generator.model.generate_content.return_value = reply
+        self.generator.model.generate_content_async = mock.AsyncMock(return_value=reply)
+        patcher = mock.patch.object(self.generator, '_build_response_prompt',
+                                    return_value=('prompt', {'suggested_doctors': ['Dra. Ana']}))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch('api_gateway.services.gemini.response_generator.token_monitor')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_async_generation_matches_sync(self):
+        analysis = {'intent': 'buscar_info', 'confidence': 0.9, 'entities': {}}
+        session = {'current_state': 'answering_questions', 'previous_state': 'choosing_schedule'}
+        expected = self.generator.generate_response('quais horários?', analysis, session, [], {})
+        result = await self.generator.agenerate_response('quais horários?', analysis, session, [], {})
+        self.assertEqual(result, expected)
+        self.assertTrue(result['response'].startswith('Temos horários com a Dra. Ana.\n\nℹ️'))
+        self.generator.model.generate_content_async.assert_awaited_once()
+
+    async def test_async_generation_falls_back_on_error(self):
+        self.generator.model.generate_content_async.side_effect = RuntimeError('timeout')
+        analysis = {'intent': 'buscar_info', 'confidence': 0.9}
+        result = await self.generator.agenerate_response('oi', analysis, {}, [], {})
+        self.assertEqual(result, self.generator._get_fallback_response('oi'))
+
+    def chatbot(self):
+        service = GeminiChatbotService.__new__(GeminiChatbotService)
+        service.enabled = True
+        service.intent_detector = mock.Mock(aanalyze_message=mock.AsyncMock(return_value={'intent': 'buscar_info'}))
+        service.entity_extractor = mock.Mock(aextract_entities=mock.AsyncMock(return_value={}))
+        service.response_generator = mock.Mock(agenerate_response=mock.AsyncMock(return_value={'response': 'Olá!'}))
+        service._start_turn = mock.Mock(return_value=({'current_state': 'idle'}, [], {}, None))
+        service._complete_turn = mock.Mock(side_effect=lambda *args: args[5])
+        return service
+
+    async def test_turn_awaits_async_generation(self):
+        service = self.chatbot()
+        service._prepare_turn = mock.Mock(return_value=({'intent': 'buscar_info'}, {}, False))
+        result = await service.aprocess_message('5511999990000', 'oi')
+        self.assertEqual(result, {'response': 'Olá!'})
+        service.response_generator.agenerate_response.assert_awaited_once()
+        service.response_generator.generate_response.assert_not_called()
+        self.assertTrue(service._complete_turn.call_args.args[-1])
+
+    async def test_turn_skips_generation_when_flow_answered(self):
+        service = self.chatbot()
+        service._prepare_turn = mock.Mock(return_value=({'intent': 'agendar_consulta'}, {'response': 'Pronto'}, True))
+        self.assertEqual(await service.aprocess_message('5511999990000', 'oi'), {'response': 'Pronto'})
+        service.response_generator.agenerate_response.assert_not_awaited()
+        service._complete_turn.assert_not_called()
+
+    async def test_turn_errors_are_logged_with_traceback(self):
+        service = self.chatbot()
+        service._prepare_turn = mock.Mock(side_effect=RuntimeError('banco fora do ar'))
+        service._get_fallback_response = mock.Mock(return_value={'response': 'fallback'})
+        with self.assertLogs('api_gateway.services.gemini.core_service', level='ERROR') as logs:
+            self.assertEqual(await service.aprocess_message('5511999990000', 'oi'), {'response': 'fallback'})
+        self.assertIsNotNone(logs.records[0].exc_info)
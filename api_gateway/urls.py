@@ -1,6 +1,7 @@
 """
 URLs para API Gateway
 """
+from django.conf import settings
 from django.urls import path
 
 from . import views
@@ -8,10 +9,17 @@ from . import views
 app_name = 'api_gateway'
 
 urlpatterns = [
-    # Webhook do WhatsApp
-    path('webhook/whatsapp/', views.whatsapp_webhook, name='whatsapp_webhook'),
+    # Webhook do WhatsApp (versão assíncrona em deploy ASGI)
+    path(
+        'webhook/whatsapp/',
+        views.whatsapp_webhook_async if getattr(settings, 'WHATSAPP_WEBHOOK_ASYNC', False) else views.whatsapp_webhook,
+        name='whatsapp_webhook',
+    ),
         
     # Endpoints de monitoramento de tokens
     path('monitor/tokens/', views.token_usage_stats, name='token_usage_stats'),
     path('monitor/tokens/reset/', views.reset_token_usage, name='reset_token_usage'),
+
+    # Atualidade da agenda materializada
+    path('monitor/availability/', views.availability_stats, name='availability_stats'),
 ]
@@ -1,7 +1,7 @@
 """
 Views para API Gateway - Integração com WhatsApp
 """
-import json
+import asyncio
 import logging
 from typing import Dict, List
 
@@ -14,18 +14,18 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 
+from .services.container import lazy_service
 from .services.conversation_service import (conversation_logger,
                                             conversation_service)
-from .services.gemini import GeminiChatbotService
-from .services.whatsapp_service import WhatsAppService
+from .webhook import WebhookMessage, aclaim_message, claim_message, get_envelope
 
-# Instância global do serviço Gemini (versão modular)
-gemini_chatbot_service = GeminiChatbotService()
+# Instâncias globais dos serviços (construídas pelo container no primeiro uso
+# ou no aquecimento da subida do servidor)
+gemini_chatbot_service = lazy_service('gemini_chatbot')
+whatsapp_service = lazy_service('whatsapp')
 
 logger = logging.getLogger(__name__)
 
-# Inicializar serviços
-whatsapp_service = WhatsAppService()
 # Obter dados da clínica através do RAGService
 def get_clinic_data():
     """Obtém dados atualizados da clínica"""
@@ -70,25 +70,52 @@ def handle_webhook(request):
     Processa mensagens recebidas do WhatsApp (POST)
     """
     try:
-        body = json.loads(request.body.decode('utf-8'))
+        # Envelope decodificado uma única vez (normalmente já pelo RequestLoggingMiddleware)
+        envelope = get_envelope(request)
+        if not envelope.valid:
+            raise ValueError(envelope.error)
+
+        for message in envelope.messages:
+            # O WhatsApp reenvia o webhook se não recebe 200 a tempo
+            if not claim_message(message.id):
+                logger.info(f"🔁 Mensagem repetida ignorada: {message.id}")
+                continue
+            process_message(message)
 
-        # Verificar se é uma mensagem válida
-        if 'entry' not in body:
-            return JsonResponse({'status': 'ok'})
+        return JsonResponse({'status': 'ok'})
 
-        total_messages = 0
-        for entry in body['entry']:
-            if 'changes' not in entry:
-                continue
+    except Exception as e:
+        logger.error(f"❌ Erro ao processar webhook: {e}")
+        return JsonResponse({'status': 'error'}, status=500)
 
-            for change in entry['changes']:
-                if change.get('field') == 'messages':
-                    messages = change.get('value', {}).get('messages', [])
-                    total_messages += len(messages)
 
-                    for message in messages:
-                        process_message(message, change['value'])
+@csrf_exempt
+@require_http_methods(["GET", "POST"])
+async def whatsapp_webhook_async(request):
+    """
+    Webhook do WhatsApp para deploy ASGI (WHATSAPP_WEBHOOK_ASYNC)
 
+    Remetentes diferentes são processados concorrentemente no event loop; as
+    mensagens de um mesmo remetente, uma após a outra e na ordem do lote (cada
+    turno lê e grava a sessão do paciente, como no webhook síncrono).
+    """
+    if request.method == 'GET':
+        return verify_webhook(request)
+
+    try:
+        envelope = get_envelope(request)
+        if not envelope.valid:
+            raise ValueError(envelope.error)
+
+        messages_by_sender: Dict[str, List[WebhookMessage]] = {}
+        for message in envelope.messages:
+            # O WhatsApp reenvia o webhook se não recebe 200 a tempo
+            if await aclaim_message(message.id):
+                messages_by_sender.setdefault(message.from_number, []).append(message)
+            else:
+                logger.info(f"🔁 Mensagem repetida ignorada: {message.id}")
+
+        await asyncio.gather(*(aprocess_sender_messages(messages) for messages in messages_by_sender.values()))
         return JsonResponse({'status': 'ok'})
 
     except Exception as e:
@@ -96,89 +123,145 @@ def handle_webhook(request):
         return JsonResponse({'status': 'error'}, status=500)
 
 
-def process_message(message, webhook_data):
+# Mensagem de erro personalizada baseada no tipo (imagem, áudio, vídeo, documento, etc.)
+UNSUPPORTED_MESSAGE_RESPONSES = {
+    'image': "📷 Desculpe, não consigo processar imagens. Por favor, envie sua mensagem como texto.",
+    'audio': "🎵 Desculpe, não consigo processar áudios. Por favor, envie sua mensagem como texto.",
+    'video': "🎬 Desculpe, não consigo processar vídeos. Por favor, envie sua mensagem como texto.",
+    'document': "📄 Desculpe, não consigo processar documentos. Por favor, envie sua mensagem como texto.",
+    'sticker': "😊 Desculpe, não consigo processar figurinhas. Por favor, envie sua mensagem como texto.",
+    'location': "📍 Desculpe, não consigo processar localizações. Por favor, envie sua mensagem como texto.",
+    'contacts': "👥 Desculpe, não consigo processar contatos. Por favor, envie sua mensagem como texto.",
+    'interactive': "🔘 Desculpe, não consigo processar mensagens interativas. Por favor, envie sua mensagem como texto.",
+    'button': "🔘 Desculpe, não consigo processar botões. Por favor, envie sua mensagem como texto.",
+    'list': "📋 Desculpe, não consigo processar listas. Por favor, envie sua mensagem como texto."
+}
+
+INVALID_TEXT_RESPONSE = "❌ Desculpe, não consegui processar sua mensagem. Por favor, envie uma mensagem de texto válida."
+UNAVAILABLE_RESPONSE = "Desculpe, estou temporariamente indisponível. Como posso ajudá-lo?"
+
+
+def unsupported_message_response(message_type: str) -> str:
+    """Resposta para tipos de mensagem não suportados"""
+    # Mensagem padrão para tipos não mapeados
+    return UNSUPPORTED_MESSAGE_RESPONSES.get(
+        message_type,
+        f"❌ Desculpe, não consigo processar mensagens do tipo '{message_type}'. Por favor, envie sua mensagem como texto."
+    )
+
+
+def log_chatbot_result(result: Dict) -> str:
+    """Registra o resultado do chatbot e retorna o texto da resposta"""
+    response_text = result.get('response', 'Como posso ajudá-lo?')
+    intent = result.get('intent', 'unknown')
+    confidence = result.get('confidence', 0.0)
+    state = result.get('state', 'unknown')
+    agent = result.get('agent', 'gemini')
+
+    logger.info("🤖 [%s] State: %s | Conf: %.2f | Agent: %s", intent.upper(), state, confidence, agent)
+    return response_text
+
+
+def process_message(message: WebhookMessage):
     """
     Processa uma mensagem individual
+
+    Args:
+        message: Mensagem do envelope do webhook
+    """
+    try:
+        from_number = message.from_number
+
+        logger.info("🔄 Processando mensagem %s de %s", message.id, from_number)
+
+        # Rejeitar todos os outros tipos de mensagem (imagem, áudio, vídeo, documento, etc.)
+        if message.type != 'text':
+            logger.warning(f"❌ Tipo de mensagem não suportado: {message.type} de {from_number}")
+            whatsapp_service.send_message(from_number, unsupported_message_response(message.type))
+            return
+
+        # Validar se o conteúdo de texto não está vazio
+        text_content = message.text
+        if not text_content or not text_content.strip():
+            whatsapp_service.send_message(from_number, INVALID_TEXT_RESPONSE)
+            return
+
+        logger.info("👤 USUÁRIO (%s): %s", from_number, text_content)
+
+        try:
+            # Processar mensagem com Gemini centralizado
+            result = gemini_chatbot_service.process_message(from_number, text_content)
+            response_text = log_chatbot_result(result)
+
+            # Enviar resposta
+            if whatsapp_service.send_message(from_number, response_text):
+                # Log limpo da conversação
+                conversation_logger.info("💬 %s → %s", from_number, text_content)
+                conversation_logger.info("🤖 GEMINI → %s", response_text)
+            else:
+                logger.error(f"❌ Falha ao enviar resposta para {from_number}")
+
+        except Exception as e:
+            logger.error(f"❌ Erro no Gemini Chatbot Service: {e}")
+
+            # Fallback simples
+            if not whatsapp_service.send_message(from_number, UNAVAILABLE_RESPONSE):
+                logger.error(f"❌ Falha ao enviar resposta fallback para {from_number}")
+
+    except Exception as e:
+        logger.error(f"❌ Erro ao processar mensagem: {e}")
+
+
+async def aprocess_sender_messages(messages: List[WebhookMessage]):
+    """
+    Processa em ordem as mensagens de um mesmo remetente
+
+    Args:
+        messages: Mensagens do remetente, na ordem do lote
+    """
+    for message in messages:
+        await aprocess_message(message)
+
+
+async def aprocess_message(message: WebhookMessage):
+    """
+    Versão assíncrona de process_message (webhook ASGI)
+
+    Args:
+        message: Mensagem do envelope do webhook
     """
     try:
-        # Extrair informações da mensagem
-        message_id = message.get('id')
-        from_number = message.get('from')
-        message_type = message.get('type')
-        timestamp = message.get('timestamp')
-
-        logger.info(f"🔄 Processando mensagem {message_id} de {from_number}")
-
-        # Verificar se é mensagem de texto válida
-        if message_type == 'text':
-            text_content = message.get('text', {}).get('body', '')
-
-            # Validar se o conteúdo de texto não está vazio e tem tamanho mínimo
-            if text_content and len(text_content.strip()) > 0:
-                logger.info(f"👤 USUÁRIO ({from_number}): {text_content}")
-
-                # NOVO: Usar Gemini Chatbot Service como protagonista principal
-                try:
-                    # Processar mensagem com Gemini centralizado
-                    result = gemini_chatbot_service.process_message(from_number, text_content)
-
-                    response_text = result.get('response', 'Como posso ajudá-lo?')
-                    intent = result.get('intent', 'unknown')
-                    confidence = result.get('confidence', 0.0)
-                    state = result.get('state', 'unknown')
-                    agent = result.get('agent', 'gemini')
-
-                    logger.info(f"🤖 [{intent.upper()}] State: {state} | Conf: {confidence:.2f} | Agent: {agent}")
-
-                    # Enviar resposta
-                    success = whatsapp_service.send_message(from_number, response_text)
-
-                    if success:
-                        # Log limpo da conversação
-                        conversation_logger.info(f"💬 {from_number} → {text_content}")
-                        conversation_logger.info(f"🤖 GEMINI → {response_text}")
-                    else:
-                        logger.error(f"❌ Falha ao enviar resposta para {from_number}")
-
-                except Exception as e:
-                    logger.error(f"❌ Erro no Gemini Chatbot Service: {e}")
-                    
-                    # Fallback simples
-                    response_text = "Desculpe, estou temporariamente indisponível. Como posso ajudá-lo?"
-                    success = whatsapp_service.send_message(from_number, response_text)
-                    
-                    if not success:
-                        logger.error(f"❌ Falha ao enviar resposta fallback para {from_number}")
+        from_number = message.from_number
+
+        logger.info("🔄 Processando mensagem %s de %s", message.id, from_number)
 
+        if message.type != 'text':
+            logger.warning(f"❌ Tipo de mensagem não suportado: {message.type} de {from_number}")
+            await whatsapp_service.asend_message(from_number, unsupported_message_response(message.type))
+            return
+
+        text_content = message.text
+        if not text_content or not text_content.strip():
+            await whatsapp_service.asend_message(from_number, INVALID_TEXT_RESPONSE)
+            return
+
+        logger.info("👤 USUÁRIO (%s): %s", from_number, text_content)
+
+        try:
+            result = await gemini_chatbot_service.aprocess_message(from_number, text_content)
+            response_text = log_chatbot_result(result)
+
+            if await whatsapp_service.asend_message(from_number, response_text):
+                conversation_logger.info("💬 %s → %s", from_number, text_content)
+                conversation_logger.info("🤖 GEMINI → %s", response_text)
             else:
-                # Mensagem de texto vazia ou inválida
-                response_text = "❌ Desculpe, não consegui processar sua mensagem. Por favor, envie uma mensagem de texto válida."
-                whatsapp_service.send_message(from_number, response_text)
+                logger.error(f"❌ Falha ao enviar resposta para {from_number}")
 
-        else:
-            # Rejeitar todos os outros tipos de mensagem (imagem, áudio, vídeo, documento, etc.)
-            logger.warning(f"❌ Tipo de mensagem não suportado: {message_type} de {from_number}")
-            
-            # Mensagem de erro personalizada baseada no tipo
-            error_messages = {
-                'image': "📷 Desculpe, não consigo processar imagens. Por favor, envie sua mensagem como texto.",
-                'audio': "🎵 Desculpe, não consigo processar áudios. Por favor, envie sua mensagem como texto.",
-                'video': "🎬 Desculpe, não consigo processar vídeos. Por favor, envie sua mensagem como texto.",
-                'document': "📄 Desculpe, não consigo processar documentos. Por favor, envie sua mensagem como texto.",
-                'sticker': "😊 Desculpe, não consigo processar figurinhas. Por favor, envie sua mensagem como texto.",
-                'location': "📍 Desculpe, não consigo processar localizações. Por favor, envie sua mensagem como texto.",
-                'contacts': "👥 Desculpe, não consigo processar contatos. Por favor, envie sua mensagem como texto.",
-                'interactive': "🔘 Desculpe, não consigo processar mensagens interativas. Por favor, envie sua mensagem como texto.",
-                'button': "🔘 Desculpe, não consigo processar botões. Por favor, envie sua mensagem como texto.",
-                'list': "📋 Desculpe, não consigo processar listas. Por favor, envie sua mensagem como texto."
-            }
-            
-            # Mensagem padrão para tipos não mapeados
-            response_text = error_messages.get(message_type, 
-                f"❌ Desculpe, não consigo processar mensagens do tipo '{message_type}'. Por favor, envie sua mensagem como texto.")
-            
-            # Enviar mensagem de erro
-            whatsapp_service.send_message(from_number, response_text)
+        except Exception as e:
+            logger.error(f"❌ Erro no Gemini Chatbot Service: {e}")
+
+            if not await whatsapp_service.asend_message(from_number, UNAVAILABLE_RESPONSE):
+                logger.error(f"❌ Falha ao enviar resposta fallback para {from_number}")
 
     except Exception as e:
         logger.error(f"❌ Erro ao processar mensagem: {e}")
@@ -218,10 +301,9 @@ def check_stored_data(request):
     try:
         phone_number = request.GET.get('phone_number', '5511999999999')
         
-        # Verificar sessão no cache
-        from django.core.cache import cache
-        cache_key = f"gemini_session_{phone_number}"
-        cached_session = cache.get(cache_key)
+        # Verificar sessão no cache (store L1/L2)
+        from .services.session_store import session_store
+        cached_session = session_store.get(phone_number)
         
         # Verificar sessão no banco
         from .models import ConversationMessage, ConversationSession
@@ -232,7 +314,7 @@ def check_stored_data(request):
         
         return Response({
             'phone_number': phone_number,
-            'cache_session': cached_session,
+            'cache_session': cached_session.to_dict() if cached_session else None,
             'database_session': {
                 'id': db_session.id if db_session else None,
                 'current_state': db_session.current_state if db_session else None,
@@ -337,3 +419,26 @@ def reset_token_usage(request):
             {'error': 'Erro ao resetar contador de tokens'}, 
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def availability_stats(request):
+    """
+    Endpoint para monitorar a atualidade da agenda materializada (refresh_availability)
+    """
+    try:
+        from .services.availability_store import availability_store
+        
+        return Response({
+            'success': True,
+            'data': availability_store.staleness(),
+            'message': 'Métricas da agenda materializada obtidas com sucesso'
+        })
+        
+    except Exception as e:
+        logger.error(f"Erro ao obter métricas da agenda materializada: {e}")
+        return Response(
+            {'error': 'Erro ao obter métricas da agenda materializada'}, 
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
@@ -0,0 +1,184 @@
+"""
+Envelope do webhook do WhatsApp, decodificado uma única vez por requisição
+
+Responsável por:
+- Decodificar o corpo do webhook (core.json_codec) e separar mensagens e
+  status de entrega em uma única passada
+- Guardar o resultado na própria requisição (request.whatsapp_envelope), para
+  que middleware e view usem o mesmo objeto
+- Descartar mensagens repetidas (o WhatsApp reenvia webhooks sem resposta 200)
+
+Uso:
+    envelope = get_envelope(request)
+    for message in envelope.messages:
+        if claim_message(message.id):
+            process_message(message)
+"""
+
+import logging
+from typing import List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core import json_codec
+
+logger = logging.getLogger(__name__)
+
+REQUEST_ATTR = 'whatsapp_envelope'
+DEDUP_KEY_PREFIX = 'whatsapp:msg:'
+DEFAULT_DEDUP_TTL = 3600  # segundos
+
+
+class WebhookMessage:
+    """Mensagem recebida (campos usados pelo chatbot)"""
+
+    __slots__ = ('id', 'from_number', 'type', 'timestamp', 'text', 'contact_name')
+
+    def __init__(self, id: str, from_number: str, type: str, timestamp: str,
+                 text: str = '', contact_name: str = ''):
+        self.id = id
+        self.from_number = from_number
+        self.type = type
+        self.timestamp = timestamp
+        self.text = text
+        self.contact_name = contact_name
+
+    def __repr__(self):
+        return f"WebhookMessage(id={self.id!r}, from={self.from_number!r}, type={self.type!r})"
+
+
+class WebhookStatus:
+    """Status de entrega de uma mensagem enviada (sent, delivered, read, failed)"""
+
+    __slots__ = ('id', 'status', 'recipient_id', 'timestamp')
+
+    def __init__(self, id: str, status: str, recipient_id: str, timestamp: str):
+        self.id = id
+        self.status = status
+        self.recipient_id = recipient_id
+        self.timestamp = timestamp
+
+    def __repr__(self):
+        return f"WebhookStatus(id={self.id!r}, status={self.status!r})"
+
+
+class WebhookEnvelope:
+    """Conteúdo de um webhook: mensagens, status e erro de decodificação (se houver)"""
+
+    __slots__ = ('messages', 'statuses', 'error')
+
+    def __init__(self, messages: Optional[List[WebhookMessage]] = None,
+                 statuses: Optional[List[WebhookStatus]] = None, error: Optional[str] = None):
+        self.messages = messages or []
+        self.statuses = statuses or []
+        self.error = error
+
+    @property
+    def valid(self) -> bool:
+        return self.error is None
+
+    def __repr__(self):
+        return f"WebhookEnvelope(messages={len(self.messages)}, statuses={len(self.statuses)}, error={self.error!r})"
+
+
+def parse_webhook(body: bytes) -> WebhookEnvelope:
+    """
+    Decodifica o corpo do webhook em uma única passada
+
+    Args:
+        body: Corpo bruto da requisição
+
+    Returns:
+        WebhookEnvelope (com error preenchido se o JSON for inválido)
+    """
+    try:
+        data = json_codec.loads(body)
+    except ValueError as e:
+        return WebhookEnvelope(error=str(e))
+    if not isinstance(data, dict):
+        return WebhookEnvelope(error='Corpo do webhook não é um objeto JSON')
+
+    messages = []
+    statuses = []
+    for entry in data.get('entry') or ():
+        for change in entry.get('changes') or ():
+            if change.get('field') != 'messages':
+                continue
+            value = change.get('value') or {}
+
+            contacts = {contact.get('wa_id'): (contact.get('profile') or {}).get('name', '')
+                        for contact in value.get('contacts') or ()}
+            for message in value.get('messages') or ():
+                from_number = message.get('from')
+                text = message.get('text')
+                messages.append(WebhookMessage(
+                    id=message.get('id'),
+                    from_number=from_number,
+                    type=message.get('type'),
+                    timestamp=message.get('timestamp'),
+                    text=text.get('body', '') if isinstance(text, dict) else '',
+                    contact_name=contacts.get(from_number, ''),
+                ))
+
+            for item in value.get('statuses') or ():
+                statuses.append(WebhookStatus(
+                    id=item.get('id'),
+                    status=item.get('status'),
+                    recipient_id=item.get('recipient_id'),
+                    timestamp=item.get('timestamp'),
+                ))
+
+    return WebhookEnvelope(messages, statuses)
+
+
+def get_envelope(request) -> WebhookEnvelope:
+    """
+    Envelope da requisição (decodificado na primeira chamada e reaproveitado)
+
+    Args:
+        request: HttpRequest do webhook
+
+    Returns:
+        WebhookEnvelope
+    """
+    envelope = getattr(request, REQUEST_ATTR, None)
+    if envelope is None:
+        envelope = parse_webhook(request.body)
+        setattr(request, REQUEST_ATTR, envelope)
+    return envelope
+
+
+def claim_message(message_id: Optional[str]) -> bool:
+    """
+    Reserva o processamento de uma mensagem (False se já foi recebida antes)
+
+    Usa cache.add, atômico no backend de cache; entre workers só vale se
+    CACHES apontar para um backend compartilhado.
+
+    Args:
+        message_id: ID da mensagem (wamid)
+
+    Returns:
+        True se a mensagem ainda não havia sido processada
+    """
+    if not message_id:
+        return True
+    ttl = getattr(settings, 'WHATSAPP_WEBHOOK_DEDUP_TTL', DEFAULT_DEDUP_TTL)
+    try:
+        return cache.add(f"{DEDUP_KEY_PREFIX}{message_id}", 1, ttl)
+    except Exception as e:
+        logger.error(f"❌ Erro ao verificar mensagem repetida {message_id}: {e}")
+        return True
+
+
+async def aclaim_message(message_id: Optional[str]) -> bool:
+    """Versão assíncrona de claim_message (cache.aadd)"""
+    if not message_id:
+        return True
+    ttl = getattr(settings, 'WHATSAPP_WEBHOOK_DEDUP_TTL', DEFAULT_DEDUP_TTL)
+    try:
+        return await cache.aadd(f"{DEDUP_KEY_PREFIX}{message_id}", 1, ttl)
+    except Exception as e:
+        logger.error(f"❌ Erro ao verificar mensagem repetida {message_id}: {e}")
+        return True
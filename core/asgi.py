@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 application = get_asgi_application()
+
+# Aquece serviços e índices do catálogo em segundo plano (SERVICES_WARMUP)
+from api_gateway.services.container import warm_up_on_startup  # noqa: E402
+
+warm_up_on_startup()
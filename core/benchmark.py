@@ -0,0 +1,103 @@
+"""
+Utilitários compartilhados pelos comandos de benchmark (manage.py benchmark_*)
+
+Responsável por:
+- Medir latência de funções (p50/p95/média)
+- Criar bancos SQLite temporários migrados para não poluir o banco real
+"""
+
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+
+def measure(func: Callable[[], object], repeat: int = 100, warmup: int = 3) -> Dict[str, float]:
+    """
+    Executa a função várias vezes e retorna estatísticas de latência em milissegundos
+
+    Args:
+        func: Função sem argumentos a medir
+        repeat: Número de execuções medidas
+        warmup: Execuções descartadas antes da medição
+
+    Returns:
+        Dict com min, p50, p95, mean e total (ms)
+    """
+    for _ in range(warmup):
+        func()
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+
+    return summarize(samples)
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Estatísticas (min, p50, p95, mean, total) de amostras já coletadas, em ms"""
+    samples = sorted(samples)
+    return {
+        'min': samples[0],
+        'p50': statistics.median(samples),
+        'p95': samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        'mean': statistics.fmean(samples),
+        'total': sum(samples),
+    }
+
+
+def format_stats(label: str, stats: Dict[str, float]) -> str:
+    """Formata estatísticas de measure() em uma linha"""
+    return (
+        f"{label:<40} p50={stats['p50']:.3f}ms p95={stats['p95']:.3f}ms "
+        f"mean={stats['mean']:.3f}ms min={stats['min']:.3f}ms"
+    )
+
+
+@contextmanager
+def temporary_database(alias: str = 'benchmark', path: Optional[str] = None,
+                       migrate: bool = True, fast_io: bool = True) -> Iterator[str]:
+    """
+    Registra um alias de banco SQLite temporário e aplica as migrações
+
+    Args:
+        alias: Nome do alias em django.db.connections
+        path: Caminho do arquivo (um diretório temporário é usado se None)
+        migrate: Se True, executa migrate no alias
+        fast_io: Se True, desliga fsync (dados descartáveis); use False para
+            medir contenção de escrita com a durabilidade padrão
+
+    Yields:
+        Alias registrado
+    """
+    from django.core.management import call_command
+    from django.db import connections
+
+    temp_dir = None
+    if path is None:
+        temp_dir = tempfile.mkdtemp(prefix='clinica_bench_')
+        path = os.path.join(temp_dir, f'{alias}.sqlite3')
+
+    settings_dict = dict(connections['default'].settings_dict)
+    settings_dict.update({'ENGINE': 'django.db.backends.sqlite3', 'NAME': path})
+    options = dict(settings_dict.get('OPTIONS') or {})
+    if fast_io:
+        options['init_command'] = 'PRAGMA synchronous=OFF; PRAGMA journal_mode=MEMORY;'
+    settings_dict['OPTIONS'] = options
+    connections.settings[alias] = settings_dict
+
+    try:
+        if migrate:
+            call_command('migrate', database=alias, verbosity=0, interactive=False)
+        yield alias
+    finally:
+        connections[alias].close()
+        del connections[alias]
+        connections.settings.pop(alias, None)
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
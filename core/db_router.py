@@ -0,0 +1,75 @@
+"""
+Roteador de banco de dados: catálogo (rag_agent) x conversas (api_gateway)
+
+Os aliases só são usados quando configurados em settings.DATABASES; sem eles
+tudo continua no 'default' (comportamento original).
+
+- 'catalog': leituras e escritas do rag_agent
+- 'catalog_replica': leituras do rag_agent (escritas continuam no 'catalog')
+- 'conversations': leituras e escritas do api_gateway
+
+Migrações:
+    python manage.py migrate
+    python manage.py migrate --database=catalog
+    python manage.py migrate --database=conversations
+"""
+
+from typing import Optional
+
+from django.conf import settings
+
+CATALOG_APPS = {'rag_agent'}
+CONVERSATION_APPS = {'api_gateway'}
+
+CATALOG_ALIAS = 'catalog'
+CATALOG_REPLICA_ALIAS = 'catalog_replica'
+CONVERSATIONS_ALIAS = 'conversations'
+
+
+def _configured(alias: str) -> bool:
+    """Verifica se o alias existe em settings.DATABASES"""
+    return alias in settings.DATABASES
+
+
+class CatalogConversationRouter:
+    """
+    Direciona o catálogo e as conversas para bancos separados, quando configurados
+    """
+
+    def _write_alias(self, app_label: str) -> Optional[str]:
+        if app_label in CATALOG_APPS and _configured(CATALOG_ALIAS):
+            return CATALOG_ALIAS
+        if app_label in CONVERSATION_APPS and _configured(CONVERSATIONS_ALIAS):
+            return CONVERSATIONS_ALIAS
+        return None
+
+    def db_for_read(self, model, **hints) -> Optional[str]:
+        app_label = model._meta.app_label
+        if app_label in CATALOG_APPS and _configured(CATALOG_REPLICA_ALIAS):
+            return CATALOG_REPLICA_ALIAS
+        return self._write_alias(app_label)
+
+    def db_for_write(self, model, **hints) -> Optional[str]:
+        return self._write_alias(model._meta.app_label)
+
+    def allow_relation(self, obj1, obj2, **hints) -> Optional[bool]:
+        alias1 = self._write_alias(obj1._meta.app_label) or 'default'
+        alias2 = self._write_alias(obj2._meta.app_label) or 'default'
+        if alias1 == alias2:
+            return True
+        # Relações entre bancos diferentes não são suportadas
+        return False
+
+    def allow_migrate(self, db: str, app_label: str, model_name: str = None, **hints) -> Optional[bool]:
+        if db == CATALOG_REPLICA_ALIAS:
+            # Réplica é alimentada pelo primário, nunca migrada diretamente
+            return False
+        if db == CATALOG_ALIAS:
+            return app_label in CATALOG_APPS
+        if db == CONVERSATIONS_ALIAS:
+            return app_label in CONVERSATION_APPS
+        if db == 'default':
+            # Apps movidos para bancos próprios não são criados no default
+            return self._write_alias(app_label) is None
+        # Outros aliases (ex.: bancos temporários de benchmark) recebem tudo
+        return None
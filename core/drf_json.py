@@ -0,0 +1,46 @@
+"""
+Renderer e parser JSON do Django REST Framework sobre core.json_codec
+
+Configurados em REST_FRAMEWORK (core/settings.py). A saída é equivalente à do
+JSONRenderer padrão (mesmas conversões de Decimal/datas/QuerySet do encoder do
+DRF); a API navegável e pedidos com indentação continuam no renderer padrão.
+"""
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from . import json_codec
+
+# Mesmos escapes do JSONRenderer (JSON válido dentro de <script>)
+_LINE_SEPARATOR = '\u2028'.encode('utf-8')
+_PARAGRAPH_SEPARATOR = '\u2029'.encode('utf-8')
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer usando orjson quando disponível"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = json_codec.get_codec().dumps(
+            data, default=self.encoder_class().default, passthrough_datetime=True
+        )
+        if _LINE_SEPARATOR in ret or _PARAGRAPH_SEPARATOR in ret:
+            ret = ret.replace(_LINE_SEPARATOR, b'\\u2028').replace(_PARAGRAPH_SEPARATOR, b'\\u2029')
+        return ret
+
+
+class FastJSONParser(JSONParser):
+    """JSONParser usando orjson quando disponível"""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return json_codec.loads(stream.read())
+        except ValueError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
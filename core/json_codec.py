@@ -0,0 +1,157 @@
+"""
+Codificação JSON do projeto (orjson quando instalado, json da biblioteca padrão como alternativa)
+
+Responsável por:
+- Expor dumps()/loads() únicos para webhook, logs, arquivamento e respostas da API
+- Escolher a implementação pelo setting JSON_CODEC ('auto', 'orjson' ou 'stdlib')
+- Manter a mesma saída nas duas implementações: UTF-8 sem escapes, sem espaços,
+  Decimal/datas/UUID convertidos para texto e nunca NaN/Infinity (JSON inválido)
+
+Uso:
+    from core import json_codec
+
+    payload = json_codec.loads(request.body)       # bytes ou str
+    data = json_codec.dumps({'status': 'ok'})      # bytes (UTF-8)
+"""
+
+import datetime
+import decimal
+import json
+import logging
+import uuid
+from typing import Any, Callable, Dict, Optional
+
+from django.conf import settings
+from django.utils.functional import Promise
+
+# Importação opcional do orjson
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CODEC = 'auto'
+
+
+def default_encoder(obj: Any) -> Any:
+    """Conversão de tipos não nativos do JSON (usada pelas duas implementações)"""
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, datetime.timedelta):
+        return str(obj.total_seconds())
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, Promise):
+        return str(obj)
+    if isinstance(obj, bytes):
+        return obj.decode()
+    raise TypeError(f"Objeto do tipo {type(obj).__name__} não é serializável em JSON")
+
+
+class StdlibJSONCodec:
+    """json da biblioteca padrão"""
+
+    name = 'stdlib'
+
+    def dumps(self, obj: Any, indent: bool = False, default: Optional[Callable] = None,
+              passthrough_datetime: bool = False) -> bytes:
+        """
+        Serializa para bytes UTF-8
+
+        Args:
+            obj: Objeto a serializar
+            indent: Se True, indenta com 2 espaços (logs legíveis)
+            default: Conversor de tipos não nativos (padrão: default_encoder)
+            passthrough_datetime: Envia datas ao conversor (sem efeito aqui: o json
+                da biblioteca padrão sempre usa o conversor para datas)
+
+        Raises:
+            ValueError: NaN/Infinity (como o JSONRenderer do DRF; o orjson grava null)
+        """
+        return json.dumps(
+            obj,
+            default=default or default_encoder,
+            ensure_ascii=False,
+            allow_nan=False,
+            indent=2 if indent else None,
+            separators=(',', ': ') if indent else (',', ':'),
+        ).encode('utf-8')
+
+    def loads(self, data: Any) -> Any:
+        """Decodifica bytes/str (ValueError se inválido)"""
+        return json.loads(data)
+
+
+class OrjsonJSONCodec:
+    """orjson (Rust): serialização e parsing várias vezes mais rápidos"""
+
+    name = 'orjson'
+
+    def __init__(self):
+        self._fallback = StdlibJSONCodec()
+
+    def dumps(self, obj: Any, indent: bool = False, default: Optional[Callable] = None,
+              passthrough_datetime: bool = False) -> bytes:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if passthrough_datetime:
+            option |= orjson.OPT_PASSTHROUGH_DATETIME
+        try:
+            return orjson.dumps(obj, default=default or default_encoder, option=option)
+        except orjson.JSONEncodeError:
+            # Casos que o orjson recusa (ex.: inteiros acima de 64 bits)
+            return self._fallback.dumps(obj, indent=indent, default=default)
+
+    def loads(self, data: Any) -> Any:
+        return orjson.loads(data)
+
+
+_codecs: Dict[str, Any] = {}
+
+
+def get_codec(name: Optional[str] = None):
+    """
+    Implementação configurada
+
+    Args:
+        name: 'auto', 'orjson' ou 'stdlib' (padrão: setting JSON_CODEC)
+
+    Returns:
+        Instância de StdlibJSONCodec ou OrjsonJSONCodec
+    """
+    name = name or getattr(settings, 'JSON_CODEC', DEFAULT_CODEC)
+    codec = _codecs.get(name)
+    if codec is not None:
+        return codec
+
+    if name == 'orjson' and not ORJSON_AVAILABLE:
+        logger.warning("⚠️ JSON_CODEC='orjson' mas orjson não está instalado - usando json padrão")
+    if name in ('auto', 'orjson') and ORJSON_AVAILABLE:
+        codec = OrjsonJSONCodec()
+    else:
+        codec = StdlibJSONCodec()
+    _codecs[name] = codec
+    return codec
+
+
+def dumps(obj: Any, indent: bool = False, default: Optional[Callable] = None) -> bytes:
+    """Serializa com a implementação configurada (bytes UTF-8)"""
+    return get_codec().dumps(obj, indent=indent, default=default)
+
+
+def dumps_str(obj: Any, indent: bool = False, default: Optional[Callable] = None) -> str:
+    """Serializa com a implementação configurada (str)"""
+    return get_codec().dumps(obj, indent=indent, default=default).decode('utf-8')
+
+
+def loads(data: Any) -> Any:
+    """Decodifica bytes/str com a implementação configurada (ValueError se inválido)"""
+    return get_codec().loads(data)
@@ -0,0 +1,136 @@
+"""
+Pipeline de logging assíncrona (QueueHandler/QueueListener)
+
+Responsável por:
+- Tirar a formatação e a escrita dos logs da thread da requisição: o handler
+  só enfileira o LogRecord e uma thread de fundo formata e escreve
+- Saída estruturada em JSON (uma linha por registro) para agregadores de log
+- Amostragem por logger de linhas INFO/DEBUG de alto volume
+
+Configurado em LOGGING (core/settings.py) pelos settings LOG_ASYNC,
+LOG_FORMAT e LOG_SAMPLE_RATES. Prefira argumentos %-style nos logs do caminho
+quente: a mensagem só é montada para registros que passam pelo nível e pela
+amostragem (o restante da formatação fica na thread de fundo):
+
+    logger.info("📊 TOKENS - %s: Total=%d", operation, total)   # montada só se o registro for escrito
+    logger.info(f"📊 TOKENS - {operation}: Total={total}")      # montada sempre, mesmo se descartado
+"""
+
+import atexit
+import copy
+import logging
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+from . import json_codec
+
+# Atributos padrão do LogRecord (o restante vem de extra={...})
+_RECORD_ATTRS = frozenset(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+
+class QueueLogHandler(QueueHandler):
+    """
+    Handler que enfileira os registros para um StreamHandler em thread de fundo
+
+    formatter/level definidos em LOGGING valem para a escrita; filters rodam
+    antes de enfileirar (descartes não custam nada à thread de fundo).
+    """
+
+    def __init__(self, stream=None, maxsize: int = 10000):
+        super().__init__(queue.Queue(maxsize))
+        self.target = logging.StreamHandler(stream or sys.stderr)
+        self.listener = QueueListener(self.queue, self.target, respect_handler_level=True)
+        self.listener.start()
+        atexit.register(self.close)
+
+    def setFormatter(self, fmt):
+        # A formatação é feita pelo handler de destino, na thread de fundo
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        """
+        Copia o registro com a mensagem já montada (msg % args)
+
+        A mensagem é montada aqui porque os args podem ser objetos mutáveis (dicts
+        de entidades, sessão) que a requisição altera antes do listener rodar: o
+        log precisa mostrar o estado do momento da chamada. Formatter (data,
+        cores, JSON) e traceback de exc_info continuam na thread de fundo.
+        """
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Fila cheia (escrita mais lenta que a produção): escreve de forma síncrona
+            self.target.handle(record)
+
+    def close(self):
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+            self.target.close()
+        super().close()
+
+
+class JSONLogFormatter(logging.Formatter):
+    """Formatador JSON: uma linha por registro, com campos de extra={...} no nível raiz"""
+
+    def format(self, record):
+        data = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                data[key] = value
+        if record.exc_info:
+            data['exc_info'] = self.formatException(record.exc_info)
+        if record.stack_info:
+            data['stack_info'] = self.formatStack(record.stack_info)
+        return json_codec.dumps_str(data, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Mantém apenas uma fração dos registros INFO/DEBUG de loggers selecionados
+
+    Args:
+        rates: {nome do logger: fração mantida (0.0 a 1.0)}; vale também para
+            os loggers filhos (ex.: 'api_gateway.services.gemini')
+        max_level: Nível máximo amostrado (WARNING e acima nunca são descartados)
+    """
+
+    def __init__(self, rates: Optional[Dict[str, float]] = None, max_level: int = logging.INFO):
+        super().__init__()
+        self.rates = dict(rates or {})
+        self.max_level = max_level if isinstance(max_level, int) else logging.getLevelName(max_level)
+        self._resolved: Dict[str, Optional[float]] = {}
+
+    def _rate_for(self, name: str) -> Optional[float]:
+        if name not in self._resolved:
+            rate = None
+            candidate = name
+            while candidate:
+                if candidate in self.rates:
+                    rate = float(self.rates[candidate])
+                    break
+                candidate = candidate.rpartition('.')[0]
+            self._resolved[name] = rate
+        return self._resolved[name]
+
+    def filter(self, record):
+        if record.levelno > self.max_level or not self.rates:
+            return True
+        rate = self._rate_for(record.name)
+        return rate is None or random.random() < rate
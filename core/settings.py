@@ -92,13 +92,37 @@ class ColoredFormatter(logging.Formatter):
         return super().format(record)
 
 
+# Aquecimento de serviços (Gemini, WhatsApp, Calendar) e índices do catálogo em
+# segundo plano ao carregar core/wsgi.py ou core/asgi.py (api_gateway/services/container.py)
+SERVICES_WARMUP = config('SERVICES_WARMUP', default=True, cast=bool)
+
+# Pipeline de logging (core/log_pipeline.py)
+# LOG_ASYNC: formata e escreve os logs em thread de fundo (QueueHandler/QueueListener)
+# LOG_FORMAT: 'colored' (terminal) ou 'json' (uma linha JSON por registro)
+# LOG_SAMPLE_RATES: fração mantida de INFO/DEBUG por logger,
+#   ex.: 'api_gateway.services.gemini.session_manager=0.1,api_gateway.services.token_monitor=0.5'
+LOG_ASYNC = config('LOG_ASYNC', default=True, cast=bool)
+LOG_FORMAT = config('LOG_FORMAT', default='colored')
+LOG_SAMPLE_RATES = {
+    name.strip(): float(rate)
+    for name, _, rate in (item.partition('=') for item in config('LOG_SAMPLE_RATES', default='').split(','))
+    if name.strip() and rate
+}
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
     'handlers': {
         'console': {
-            'class': 'logging.StreamHandler',
-            'formatter': 'colored',
+            **({'()': 'core.log_pipeline.QueueLogHandler'} if LOG_ASYNC else {'class': 'logging.StreamHandler'}),
+            'formatter': LOG_FORMAT,
+            'filters': ['sampling'],
+        },
+    },
+    'filters': {
+        'sampling': {
+            '()': 'core.log_pipeline.SamplingFilter',
+            'rates': LOG_SAMPLE_RATES,
         },
     },
     'formatters': {
@@ -107,6 +131,9 @@ LOGGING = {
             'format': '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
             'datefmt': '%H:%M:%S'
         },
+        'json': {
+            '()': 'core.log_pipeline.JSONLogFormatter',
+        },
     },
     'root': {
         'handlers': ['console'],
@@ -166,6 +193,36 @@ DATABASES = {
     }
 }
 
+# Bancos separados (opcional) - ver core/db_router.py
+# - 'catalog': base de conhecimento (rag_agent), majoritariamente leitura
+# - 'catalog_replica': réplica de leitura do catálogo
+# - 'conversations': sessões e mensagens (api_gateway), majoritariamente escrita
+# SPLIT_SQLITE_DATABASES=True cria o setup local com dois arquivos SQLite
+SPLIT_SQLITE_DATABASES = config('SPLIT_SQLITE_DATABASES', default=False, cast=bool)
+CATALOG_DB_NAME = config('CATALOG_DB_NAME', default=str(BASE_DIR / 'catalog.sqlite3') if SPLIT_SQLITE_DATABASES else '')
+CONVERSATIONS_DB_NAME = config('CONVERSATIONS_DB_NAME', default=str(BASE_DIR / 'conversations.sqlite3') if SPLIT_SQLITE_DATABASES else '')
+CATALOG_REPLICA_DB_NAME = config('CATALOG_REPLICA_DB_NAME', default='')
+
+if CATALOG_DB_NAME:
+    DATABASES['catalog'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': CATALOG_DB_NAME,
+    }
+if CONVERSATIONS_DB_NAME:
+    DATABASES['conversations'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': CONVERSATIONS_DB_NAME,
+    }
+if CATALOG_REPLICA_DB_NAME:
+    DATABASES['catalog_replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': CATALOG_REPLICA_DB_NAME,
+        # Nos testes a réplica espelha o banco do catálogo
+        'TEST': {'MIRROR': 'catalog' if CATALOG_DB_NAME else 'default'},
+    }
+
+DATABASE_ROUTERS = ['core.db_router.CatalogConversationRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -225,6 +282,11 @@ WHATSAPP_ACCESS_TOKEN = config('WHATSAPP_ACCESS_TOKEN', default='')
 WHATSAPP_VERIFY_TOKEN = config('WHATSAPP_VERIFY_TOKEN', default='meu_verify_token_123')
 WHATSAPP_PHONE_NUMBER_ID = config('WHATSAPP_PHONE_NUMBER_ID', default='')
 WHATSAPP_API_URL = config('WHATSAPP_API_URL', default='https://graph.facebook.com/v18.0')
+# Webhook assíncrono (api_gateway.views.whatsapp_webhook_async): use com servidor ASGI
+# (core/asgi.py com uvicorn/daphne); em WSGI mantenha False
+WHATSAPP_WEBHOOK_ASYNC = config('WHATSAPP_WEBHOOK_ASYNC', default=False, cast=bool)
+# Janela (segundos) em que um ID de mensagem reenviado pelo WhatsApp é ignorado
+WHATSAPP_WEBHOOK_DEDUP_TTL = config('WHATSAPP_WEBHOOK_DEDUP_TTL', default=3600, cast=int)
 
 # Número da clínica para handoff (formato: 5511999999999)
 CLINIC_WHATSAPP_NUMBER = config('CLINIC_WHATSAPP_NUMBER', default='5511999999999')
@@ -237,6 +299,71 @@ CLINIC_DOMAIN = config('CLINIC_DOMAIN', default='clinica.com')
 # Calendário único da clínica (controlado pela secretária)
 CLINIC_CALENDAR_ID = config('CLINIC_CALENDAR_ID', default='agenda@clinica.com')
 
+# Backend do calendário: 'google' (API real) ou 'synthetic' (agenda gerada para testes de carga,
+# api_gateway.services.synthetic_calendar); SYNTHETIC_CALENDAR_DOCTORS=0 usa os médicos do catálogo
+GOOGLE_CALENDAR_BACKEND = config('GOOGLE_CALENDAR_BACKEND', default='google')
+SYNTHETIC_CALENDAR_DOCTORS = config('SYNTHETIC_CALENDAR_DOCTORS', default=0, cast=int)
+SYNTHETIC_CALENDAR_SEED = config('SYNTHETIC_CALENDAR_SEED', default=0, cast=int)
+SYNTHETIC_CALENDAR_DENSITY = config('SYNTHETIC_CALENDAR_DENSITY', default=0.6, cast=float)
+SYNTHETIC_CALENDAR_CANCELLATION_RATE = config('SYNTHETIC_CALENDAR_CANCELLATION_RATE', default=0.05, cast=float)
+SYNTHETIC_CALENDAR_LATENCY = config('SYNTHETIC_CALENDAR_LATENCY', default=0.0, cast=float)
+
+# Agenda materializada (api_gateway.services.availability_store), atualizada por
+# manage.py refresh_availability: dias materializados e idade máxima (segundos) para
+# responder consultas sem o calendário
+AVAILABILITY_DAYS_AHEAD = config('AVAILABILITY_DAYS_AHEAD', default=14, cast=int)
+AVAILABILITY_MAX_STALENESS = config('AVAILABILITY_MAX_STALENESS', default=900, cast=int)
+
+# Reservas provisórias de horário (api_gateway.services.slot_hold_service), em segundos:
+# após a validação do horário e após o handoff (aguardando a secretária)
+SLOT_HOLD_TTL = config('SLOT_HOLD_TTL', default=900, cast=int)
+SLOT_HOLD_HANDOFF_TTL = config('SLOT_HOLD_HANDOFF_TTL', default=7200, cast=int)
+
+# Índices em memória do catálogo (médicos, especialidades): reconstruídos por sinais ou após o TTL (segundos)
+CATALOG_INDEX_TTL = config('CATALOG_INDEX_TTL', default=300, cast=int)
+
+# Versão do catálogo (ETag/Last-Modified das APIs de leitura e reconstrução dos índices)
+# Intervalo (segundos) em que cada processo reaproveita a versão lida do cache
+CATALOG_VERSION_CHECK_INTERVAL = config('CATALOG_VERSION_CHECK_INTERVAL', default=1.0, cast=float)
+# Corpo JSON das APIs de leitura guardado por versão do catálogo + URL
+CATALOG_API_CACHE_ENABLED = config('CATALOG_API_CACHE_ENABLED', default=True, cast=bool)
+CATALOG_API_CACHE_TIMEOUT = config('CATALOG_API_CACHE_TIMEOUT', default=3600, cast=int)
+
+# Recuperação de trechos do catálogo para os prompts (BM25 local; NumPy opcional)
+RETRIEVAL_TOP_K = config('RETRIEVAL_TOP_K', default=4, cast=int)
+RETRIEVAL_REFERENCE_LIMIT = config('RETRIEVAL_REFERENCE_LIMIT', default=5, cast=int)
+
+# Store de sessões em dois níveis (L1 no processo + L2 compartilhado)
+# BACKEND: 'django_cache' (usa CACHES; por processo com LocMemCache), 'redis' ou 'memory'
+SESSION_STORE = {
+    'BACKEND': config('SESSION_STORE_BACKEND', default='django_cache'),
+    'REDIS_URL': config('SESSION_STORE_REDIS_URL', default='redis://localhost:6379/0'),
+    'L1_MAX_ENTRIES': config('SESSION_STORE_L1_MAX_ENTRIES', default=1024, cast=int),
+}
+
+# Persistência de sessões de conversa
+# 'write_behind': alterações agrupadas por telefone e gravadas em até SESSION_FLUSH_DELAY segundos
+# 'write_through': toda alteração é gravada imediatamente (apenas campos alterados)
+SESSION_PERSISTENCE_MODE = config('SESSION_PERSISTENCE_MODE', default='write_behind')
+SESSION_FLUSH_DELAY = config('SESSION_FLUSH_DELAY', default=2.0, cast=float)
+# Estados gravados imediatamente mesmo em modo write_behind (confirmação/handoff)
+SESSION_FLUSH_STATES = ['confirming', 'confirming_name']
+
+# Codificação JSON (core/json_codec.py): 'auto' usa orjson quando instalado, 'stdlib' força o json padrão
+JSON_CODEC = config('JSON_CODEC', default='auto')
+
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.drf_json.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.drf_json.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
 # Configurações de CORS para desenvolvimento
 CORS_ALLOW_ALL_ORIGINS = True  # Apenas para desenvolvimento
 CORS_ALLOWED_ORIGINS = [
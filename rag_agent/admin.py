@@ -7,9 +7,9 @@ from .models import (ClinicaInfo, Convenio, Especialidade, Exame,
 
 @admin.register(Especialidade)
 class EspecialidadeAdmin(admin.ModelAdmin):
-    list_display = ['nome', 'ativa']
+    list_display = ['nome', 'ativa', 'sinonimos']
     list_filter = ['ativa']
-    search_fields = ['nome']
+    search_fields = ['nome', 'sinonimos']
 
 @admin.register(ClinicaInfo)
 class ClinicaInfoAdmin(admin.ModelAdmin):
@@ -31,6 +31,10 @@ class MedicoAdmin(admin.ModelAdmin):
     search_fields = ['nome', 'crm']
     filter_horizontal = ['especialidades', 'convenios']
 
+    def get_queryset(self, request):
+        # get_especialidades_display na listagem sem uma consulta por linha
+        return super().get_queryset(request).for_resumo()
+
 @admin.register(HorarioTrabalho)
 class HorarioTrabalhoAdmin(admin.ModelAdmin):
     list_display = ['medico', 'dia_da_semana', 'hora_inicio', 'hora_fim']
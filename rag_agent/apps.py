@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class RagAgentConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'rag_agent'
+
+    def ready(self):
+        # Conecta os sinais que invalidam os índices em memória do catálogo
+        from . import signals  # noqa: F401
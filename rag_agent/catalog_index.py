@@ -0,0 +1,68 @@
+"""
+Base dos índices em memória do catálogo (médicos, especialidades)
+
+Cada índice é construído sob demanda no primeiro uso, descartado pelos sinais do
+catálogo (rag_agent/signals.py) e reconstruído quando a versão do catálogo muda
+(alteração feita por outro processo/worker, ver rag_agent/catalog_version.py) ou
+após CATALOG_INDEX_TTL segundos.
+"""
+
+import threading
+import time
+from typing import Optional
+
+from django.conf import settings
+
+from .catalog_version import get_catalog_version
+
+DEFAULT_INDEX_TTL = 300
+
+
+class CatalogIndex:
+    """Índice reconstruído sob demanda (subclasses implementam _load)"""
+
+    def __init__(self, ttl: Optional[float] = None):
+        self._ttl = ttl
+        self._lock = threading.RLock()
+        self._built_at: Optional[float] = None
+        self._version: Optional[int] = None
+        self._loading_version: Optional[int] = None
+
+    @property
+    def ttl(self) -> float:
+        if self._ttl is not None:
+            return self._ttl
+        return float(getattr(settings, 'CATALOG_INDEX_TTL', DEFAULT_INDEX_TTL))
+
+    def warm(self):
+        """Constrói o índice agora, se necessário (aquecimento na subida do servidor)"""
+        self._ensure_built()
+
+    def invalidate(self):
+        """Descarta o índice (reconstruído no próximo uso)"""
+        with self._lock:
+            self._built_at = None
+
+    def _is_fresh(self) -> bool:
+        built_at = self._built_at
+        if built_at is None or time.monotonic() - built_at >= self.ttl:
+            return False
+        return self._version == get_catalog_version()
+
+    def _ensure_built(self):
+        if self._is_fresh():
+            return
+        with self._lock:
+            if not self._is_fresh():
+                # Versão lida antes da carga: alterações durante a carga forçam nova reconstrução
+                self._loading_version = get_catalog_version(fresh=True)
+                self._load()
+
+    def _mark_built(self):
+        self._built_at = time.monotonic()
+        self._version = self._loading_version if self._loading_version is not None else get_catalog_version()
+        self._loading_version = None
+
+    def _load(self):
+        """Carrega os dados do banco e chama build()"""
+        raise NotImplementedError
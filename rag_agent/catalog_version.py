@@ -0,0 +1,96 @@
+"""
+Versão do catálogo (carimbo compartilhado entre processos)
+
+Responsável por:
+- Guardar no cache do Django um carimbo que muda a cada alteração do catálogo
+  (incrementado pelos sinais em rag_agent/signals.py)
+- Servir de ETag/Last-Modified para as APIs de leitura (rag_agent/http_cache.py)
+- Indicar aos índices em memória que outro processo alterou o catálogo
+
+O carimbo é o instante da alteração em milissegundos; a leitura no cache é
+memorizada por CATALOG_VERSION_CHECK_INTERVAL segundos em cada processo.
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+CATALOG_VERSION_KEY = 'rag_agent:catalog_version'
+DEFAULT_CHECK_INTERVAL = 1.0
+
+_lock = threading.Lock()
+_memo = {'version': None, 'checked_at': 0.0}
+
+
+def _now_stamp() -> int:
+    return int(time.time() * 1000)
+
+
+def _check_interval() -> float:
+    return float(getattr(settings, 'CATALOG_VERSION_CHECK_INTERVAL', DEFAULT_CHECK_INTERVAL))
+
+
+def get_catalog_version(fresh: bool = False) -> int:
+    """
+    Versão atual do catálogo
+
+    Args:
+        fresh: Se True, ignora a memorização local e lê o cache
+
+    Returns:
+        Carimbo em milissegundos desde a época (criado no primeiro acesso)
+    """
+    now = time.monotonic()
+    if not fresh and _memo['version'] is not None and now - _memo['checked_at'] < _check_interval():
+        return _memo['version']
+
+    try:
+        version = cache.get(CATALOG_VERSION_KEY)
+        if version is None:
+            # Primeiro acesso (ou cache reiniciado): qualquer ETag anterior deixa de valer
+            cache.add(CATALOG_VERSION_KEY, _now_stamp(), timeout=None)
+            version = cache.get(CATALOG_VERSION_KEY)
+    except Exception as e:
+        logger.error(f"Erro ao ler versão do catálogo: {e}")
+        version = _memo['version']
+
+    if version is None:
+        version = _now_stamp()
+    with _lock:
+        _memo['version'], _memo['checked_at'] = version, now
+    return version
+
+
+def bump_catalog_version() -> int:
+    """
+    Registra uma alteração no catálogo
+
+    Returns:
+        Nova versão (sempre maior que a anterior neste cache)
+    """
+    previous: Optional[int] = _memo['version']
+    try:
+        previous = cache.get(CATALOG_VERSION_KEY, previous)
+    except Exception as e:
+        logger.error(f"Erro ao ler versão do catálogo: {e}")
+
+    version = max(_now_stamp(), (previous or 0) + 1)
+    try:
+        cache.set(CATALOG_VERSION_KEY, version, timeout=None)
+    except Exception as e:
+        logger.error(f"Erro ao gravar versão do catálogo: {e}")
+    with _lock:
+        _memo['version'], _memo['checked_at'] = version, time.monotonic()
+    return version
+
+
+def version_datetime(version: int) -> datetime:
+    """Instante (UTC) correspondente a uma versão, usado no Last-Modified"""
+    return datetime.fromtimestamp(version / 1000, tz=dt_timezone.utc)
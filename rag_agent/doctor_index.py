@@ -0,0 +1,241 @@
+"""
+Índice em memória dos médicos do catálogo
+
+Responsável por:
+- Carregar os médicos (com especialidades) uma vez e mantê-los em memória
+- Resolver referências ("dr gustavo", "Dra. Renata Alves", "gustaavo") para o médico
+  com candidatos ranqueados: nome exato, prefixo (trie) e distância de edição limitada
+- Ser reconstruído quando o catálogo muda (ver rag_agent/catalog_index.py)
+
+Uso:
+    from rag_agent.doctor_index import doctor_index
+
+    doctor_index.resolve('dr gustavo', specialty='Pneumologia')  # resumo do médico ou None
+    doctor_index.match('renata')                                  # candidatos ranqueados
+"""
+
+import logging
+from typing import Any, Dict, Iterable, List, Optional
+
+from .catalog_index import CatalogIndex
+from .text import fold_accents, normalize_name, tokenize_name
+
+logger = logging.getLogger(__name__)
+
+PREFIX_SCORE = 0.9
+MIN_PREFIX_LENGTH = 2
+
+
+def bounded_levenshtein(source: str, target: str, max_distance: int) -> int:
+    """
+    Distância de edição com limite (para cedo quando o limite é ultrapassado)
+
+    Args:
+        source: Texto de origem
+        target: Texto de destino
+        max_distance: Distância máxima de interesse
+
+    Returns:
+        Distância ou max_distance + 1 se for maior que o limite
+    """
+    if abs(len(source) - len(target)) > max_distance:
+        return max_distance + 1
+    if source == target:
+        return 0
+
+    previous = list(range(len(target) + 1))
+    for row, source_char in enumerate(source, start=1):
+        current = [row]
+        row_min = row
+        for column, target_char in enumerate(target, start=1):
+            cost = 0 if source_char == target_char else 1
+            value = min(previous[column] + 1, current[column - 1] + 1, previous[column - 1] + cost)
+            current.append(value)
+            if value < row_min:
+                row_min = value
+        if row_min > max_distance:
+            return max_distance + 1
+        previous = current
+    return previous[-1] if previous[-1] <= max_distance else max_distance + 1
+
+
+def max_edits_for(token: str) -> int:
+    """Erros de digitação tolerados conforme o tamanho do token"""
+    if len(token) <= 3:
+        return 0
+    if len(token) <= 6:
+        return 1
+    return 2
+
+
+class DoctorEntry:
+    """Médico indexado"""
+
+    __slots__ = ('id', 'nome', 'normalized', 'tokens', 'specialties', 'summary')
+
+    def __init__(self, medico):
+        especialidades = medico.get_especialidades_ativas()
+        self.id = medico.id
+        self.nome = medico.nome
+        self.normalized = normalize_name(medico.nome)
+        self.tokens = tuple(tokenize_name(medico.nome))
+        self.specialties = frozenset(fold_accents(esp.nome) for esp in especialidades)
+        # Mesmo formato do MedicoResumoSerializer
+        self.summary = {
+            'id': medico.id,
+            'nome': medico.nome,
+            'crm': medico.crm,
+            'especialidades_display': ', '.join(esp.nome for esp in especialidades),
+            'preco_particular': str(medico.preco_particular) if medico.preco_particular is not None else None,
+        }
+
+    def has_specialty(self, specialty: Optional[str]) -> bool:
+        return not specialty or fold_accents(specialty.strip()) in self.specialties
+
+
+class DoctorIndex(CatalogIndex):
+    """
+    Índice de nomes de médicos: nome normalizado, trie de prefixos e vocabulário para busca aproximada
+    """
+
+    def __init__(self, ttl: Optional[float] = None):
+        super().__init__(ttl)
+        self._entries: Dict[int, DoctorEntry] = {}
+        self._by_name: Dict[str, List[int]] = {}
+        self._trie: Dict[str, Any] = {}
+        self._vocabulary: Dict[str, frozenset] = {}
+
+    # ── Construção ─────────────────────────────────────────────────────────
+
+    def _load(self):
+        from .models import Medico
+        self.build(Medico.objects.for_resumo())
+
+    def build(self, medicos: Iterable):
+        """
+        (Re)constrói o índice a partir de médicos com especialidades pré-carregadas
+
+        Args:
+            medicos: Iterável de Medico (use Medico.objects.for_resumo())
+        """
+        entries, by_name, trie, vocabulary = {}, {}, {}, {}
+        for medico in medicos:
+            entry = DoctorEntry(medico)
+            entries[entry.id] = entry
+            by_name.setdefault(entry.normalized, []).append(entry.id)
+            for token in entry.tokens:
+                vocabulary.setdefault(token, set()).add(entry.id)
+                node = trie
+                for char in token:
+                    node = node.setdefault(char, {})
+                    # Cada nó guarda os médicos com algum token iniciando pelo prefixo
+                    node.setdefault('#', set()).add(entry.id)
+
+        self._entries = entries
+        self._by_name = by_name
+        self._trie = trie
+        self._vocabulary = {token: frozenset(ids) for token, ids in vocabulary.items()}
+        self._mark_built()
+        logger.info(f"🩺 Índice de médicos construído: {len(entries)} médicos, {len(vocabulary)} tokens")
+
+    # ── Consulta ───────────────────────────────────────────────────────────
+
+    def _prefix_ids(self, prefix: str) -> frozenset:
+        node = self._trie
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return frozenset()
+        return node.get('#', frozenset())
+
+    def _token_scores(self, token: str) -> Dict[int, float]:
+        """Melhor qualidade de casamento do token da consulta para cada médico"""
+        scores: Dict[int, float] = {}
+        for doctor_id in self._vocabulary.get(token, ()):
+            scores[doctor_id] = 1.0
+
+        if len(token) >= MIN_PREFIX_LENGTH:
+            for doctor_id in self._prefix_ids(token):
+                scores.setdefault(doctor_id, PREFIX_SCORE)
+
+        max_edits = max_edits_for(token)
+        if max_edits and not scores:
+            for candidate, doctor_ids in self._vocabulary.items():
+                distance = bounded_levenshtein(token, candidate, max_edits)
+                if distance <= max_edits:
+                    quality = 1.0 - distance / max(len(token), len(candidate))
+                    for doctor_id in doctor_ids:
+                        if quality > scores.get(doctor_id, 0.0):
+                            scores[doctor_id] = quality
+        return scores
+
+    def match(self, reference: str, specialty: Optional[str] = None, limit: int = 5) -> List[Dict[str, Any]]:
+        """
+        Candidatos ranqueados para uma referência a médico
+
+        Um médico é candidato quando todos os tokens da referência casam com tokens
+        do nome dele, ou quando todos os tokens do nome aparecem na referência.
+
+        Args:
+            reference: Texto citando o médico
+            specialty: Especialidade exigida (opcional)
+            limit: Máximo de candidatos
+
+        Returns:
+            Lista de {'doctor': resumo, 'score': 0..1, 'match': 'exact'|'partial'}
+        """
+        self._ensure_built()
+        entries = self._entries
+
+        normalized = normalize_name(reference or '')
+        if not normalized:
+            return []
+
+        exact_ids = self._by_name.get(normalized, [])
+        candidates = [
+            {'doctor': entries[doctor_id].summary, 'score': 1.0, 'match': 'exact'}
+            for doctor_id in exact_ids
+            if entries[doctor_id].has_specialty(specialty)
+        ]
+
+        query_tokens = normalized.split()
+        per_token = [self._token_scores(token) for token in query_tokens]
+        doctor_ids = set().union(*per_token) - set(exact_ids)
+
+        for doctor_id in doctor_ids:
+            entry = entries[doctor_id]
+            if not entry.has_specialty(specialty):
+                continue
+            qualities = [scores.get(doctor_id, 0.0) for scores in per_token]
+            matched_query = sum(1 for quality in qualities if quality > 0)
+            matched_name = sum(1 for token in entry.tokens if token in query_tokens)
+            if matched_query < len(query_tokens) and matched_name < len(entry.tokens):
+                continue
+            score = 0.7 * (sum(qualities) / len(query_tokens)) + 0.3 * (matched_name / len(entry.tokens))
+            candidates.append({'doctor': entry.summary, 'score': round(min(score, 0.99), 4), 'match': 'partial'})
+
+        candidates.sort(key=lambda candidate: (-candidate['score'], candidate['doctor']['nome']))
+        return candidates[:limit]
+
+    def resolve(self, reference: str, specialty: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Médico mais provável para a referência
+
+        Args:
+            reference: Texto citando o médico
+            specialty: Especialidade exigida (opcional)
+
+        Returns:
+            Resumo do médico (formato MedicoResumoSerializer) ou None
+        """
+        candidates = self.match(reference, specialty=specialty, limit=1)
+        return candidates[0]['doctor'] if candidates else None
+
+    def all(self) -> List[Dict[str, Any]]:
+        """Resumo de todos os médicos indexados"""
+        self._ensure_built()
+        return [entry.summary for entry in self._entries.values()]
+
+
+# Instância global do índice
+doctor_index = DoctorIndex()
@@ -0,0 +1,120 @@
+"""
+Cache HTTP das APIs de leitura do catálogo
+
+Responsável por:
+- ETag/Last-Modified derivados da versão do catálogo (rag_agent/catalog_version.py)
+- Responder 304 Not Modified sem consultar o banco quando o cliente já tem a versão atual
+- Guardar o corpo JSON já renderizado por versão + URL absoluta, servindo as próximas
+  requisições sem consulta nem serialização
+
+Respostas de outros formatos (API navegável do DRF) não são guardadas, mas
+continuam com ETag e 304.
+"""
+
+import logging
+import time
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from .catalog_version import get_catalog_version, version_datetime
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_PREFIX = 'rag_agent:api:'
+DEFAULT_RESPONSE_CACHE_TIMEOUT = 3600
+CACHE_STATUS_HEADER = 'X-Catalog-Cache'
+
+
+def _wants_json(request) -> bool:
+    """Requisição que será atendida pelo JSONRenderer (sem navegador pedindo HTML)"""
+    requested_format = request.GET.get('format')
+    if requested_format:
+        return requested_format == 'json'
+    return 'text/html' not in request.META.get('HTTP_ACCEPT', '')
+
+
+def last_modified_for(version: int) -> Optional[int]:
+    """
+    Last-Modified (segundos) da versão, apenas quando o segundo dela já terminou
+
+    O cabeçalho só tem resolução de segundos: enviado antes do fim do segundo, uma
+    alteração seguinte no mesmo segundo teria o mesmo Last-Modified e o
+    If-Modified-Since do cliente receberia um 304 desatualizado. Versões novas nunca
+    ficam atrás do relógio, então nenhuma cai num segundo já encerrado.
+    """
+    seconds = int(version_datetime(version).timestamp())
+    return seconds if time.time() >= seconds + 1 else None
+
+
+class CatalogCacheMixin:
+    """
+    Mixin para views DRF somente leitura do catálogo
+
+    Uso:
+        class ExameListView(CatalogCacheMixin, generics.ListAPIView): ...
+    """
+
+    def _catalog_cache_key(self, request, version: int) -> str:
+        # URL absoluta: os links de paginação ("next") do corpo incluem esquema e host
+        return f"{RESPONSE_CACHE_PREFIX}{version}:{request.build_absolute_uri()}"
+
+    def _apply_validators(self, response, etag: str, last_modified: Optional[int]):
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        # O cliente sempre revalida; a resposta 304 é barata
+        patch_cache_control(response, public=True, max_age=0, must_revalidate=True)
+        patch_vary_headers(response, ('Accept',))
+        return response
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or not getattr(settings, 'CATALOG_API_CACHE_ENABLED', True):
+            return super().dispatch(request, *args, **kwargs)
+
+        version = get_catalog_version()
+        etag = f'W/"{version}"'
+        last_modified = last_modified_for(version)
+
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return self._apply_validators(not_modified, etag, last_modified)
+
+        cacheable = _wants_json(request)
+        cache_key = self._catalog_cache_key(request, version)
+        if cacheable:
+            cached = self._get_cached_body(cache_key)
+            if cached is not None:
+                content, content_type = cached
+                response = HttpResponse(content, content_type=content_type)
+                response[CACHE_STATUS_HEADER] = 'HIT'
+                return self._apply_validators(response, etag, last_modified)
+
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code != 200:
+            return response
+
+        if cacheable:
+            # Renderiza agora para guardar o corpo (o Django não renderiza de novo)
+            response.render()
+            self._set_cached_body(cache_key, response.content, response['Content-Type'])
+            response[CACHE_STATUS_HEADER] = 'MISS'
+        return self._apply_validators(response, etag, last_modified)
+
+    def _get_cached_body(self, cache_key: str) -> Optional[tuple]:
+        try:
+            return cache.get(cache_key)
+        except Exception as e:
+            logger.error(f"Erro ao ler resposta em cache {cache_key}: {e}")
+            return None
+
+    def _set_cached_body(self, cache_key: str, content: bytes, content_type: str):
+        timeout = getattr(settings, 'CATALOG_API_CACHE_TIMEOUT', DEFAULT_RESPONSE_CACHE_TIMEOUT)
+        try:
+            cache.set(cache_key, (content, content_type), timeout=timeout)
+        except Exception as e:
+            logger.error(f"Erro ao guardar resposta em cache {cache_key}: {e}")
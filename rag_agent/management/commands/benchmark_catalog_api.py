@@ -0,0 +1,125 @@
+"""
+Benchmark das APIs de leitura do catálogo: sem cache x corpo em cache x 304
+
+Cria um banco de teste (o banco real não é tocado), popula um catálogo sintético
+e mede requisições por segundo de cada endpoint pelo cliente de testes do Django
+(pilha completa: middlewares, roteamento, DRF):
+- sem cache: CATALOG_API_CACHE_ENABLED=False (consulta + serialização a cada requisição)
+- corpo em cache: JSON já renderizado para a versão atual do catálogo
+- condicional: cliente envia If-None-Match e recebe 304
+
+Uso:
+    python manage.py benchmark_catalog_api
+    python manage.py benchmark_catalog_api --doctors 1000 --requests 500
+"""
+
+import random
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+
+from rag_agent.models import (ClinicaInfo, Convenio, Especialidade, Exame,
+                              HorarioTrabalho, Medico)
+
+ENDPOINTS = [
+    '/rag/api/especialidades/',
+    '/rag/api/convenios/',
+    '/rag/api/exames/',
+    '/rag/api/clinica/',
+    '/rag/api/medicos/',
+    '/rag/api/medicos/{medico_id}/',
+]
+
+
+class Command(BaseCommand):
+    help = 'Mede req/s das APIs de leitura do catálogo sem cache, com corpo em cache e com 304'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctors', type=int, default=300, help='Médicos a gerar')
+        parser.add_argument('--specialties', type=int, default=40, help='Especialidades a gerar')
+        parser.add_argument('--exams', type=int, default=200, help='Exames a gerar')
+        parser.add_argument('--requests', type=int, default=200, help='Requisições por medição')
+        parser.add_argument('--seed', type=int, default=42, help='Semente do gerador aleatório')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.stdout.write(
+                f"🌱 Populando {options['specialties']} especialidades / {options['doctors']} médicos / "
+                f"{options['exams']} exames..."
+            )
+            medico_id = self._seed(options['specialties'], options['doctors'], options['exams'])
+            client = Client(HTTP_HOST='localhost')
+            total = options['requests']
+
+            self.stdout.write(f"\n{'endpoint':<32} {'sem cache':>12} {'em cache':>12} {'304':>12}")
+            for endpoint in ENDPOINTS:
+                url = endpoint.format(medico_id=medico_id)
+                with override_settings(CATALOG_API_CACHE_ENABLED=False):
+                    uncached = self._requests_per_second(client, url, total)
+                cache.clear()
+                first = client.get(url)
+                cached = self._requests_per_second(client, url, total)
+                conditional = self._requests_per_second(client, url, total, HTTP_IF_NONE_MATCH=first['ETag'])
+                self.stdout.write(
+                    f"{endpoint:<32} {uncached:>8,.0f} r/s {cached:>8,.0f} r/s {conditional:>8,.0f} r/s"
+                    f"  ({len(first.content) / 1024:.1f} KB)"
+                )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _requests_per_second(self, client, url, total, **headers) -> float:
+        client.get(url, **headers)
+        start = time.perf_counter()
+        for _ in range(total):
+            response = client.get(url, **headers)
+        elapsed = time.perf_counter() - start
+        if response.status_code not in (200, 304):
+            self.stderr.write(f"⚠️ {url} respondeu {response.status_code}")
+        return total / elapsed
+
+    def _seed(self, total_specialties, total_doctors, total_exams) -> int:
+        """Insere via bulk_create (não dispara os sinais dos índices globais)"""
+        ClinicaInfo.objects.create(
+            objetivo_geral='Atendimento em pneumologia e medicina do sono', whatsapp_contato='5511999999999',
+            endereco='Rua Exemplo, 100', referencia_localizacao='Próximo ao metrô',
+            politica_agendamento='Horários pré-agendados sujeitos a confirmação',
+        )
+        especialidades = Especialidade.objects.bulk_create([
+            Especialidade(nome=f'Especialidade {index:03d}', descricao='Descrição da especialidade')
+            for index in range(total_specialties)
+        ])
+        convenios = Convenio.objects.bulk_create([Convenio(nome=f'Convênio {index:02d}') for index in range(20)])
+        medicos = Medico.objects.bulk_create([
+            Medico(nome=f'Dr. Médico {index:04d}', crm=f'CRM{index}', bio='Bio do médico ' * 20,
+                   formas_pagamento='Pix, cartão', preco_particular=350)
+            for index in range(total_doctors)
+        ])
+        EspecialidadeThrough = Medico.especialidades.through
+        EspecialidadeThrough.objects.bulk_create([
+            EspecialidadeThrough(medico_id=medico.id, especialidade_id=especialidade.id)
+            for medico in medicos
+            for especialidade in self.rng.sample(especialidades, 2)
+        ])
+        ConvenioThrough = Medico.convenios.through
+        ConvenioThrough.objects.bulk_create([
+            ConvenioThrough(medico_id=medico.id, convenio_id=convenio.id)
+            for medico in medicos
+            for convenio in self.rng.sample(convenios, 3)
+        ])
+        HorarioTrabalho.objects.bulk_create([
+            HorarioTrabalho(medico=medico, dia_da_semana=dia, hora_inicio='08:00', hora_fim='17:00')
+            for medico in medicos
+            for dia in range(1, 6)
+        ])
+        Exame.objects.bulk_create([
+            Exame(nome=f'Exame {index:04d}', o_que_e='Descrição ' * 15, como_funciona='Funcionamento ' * 15,
+                  preparacao='Preparo ' * 10, preco=150)
+            for index in range(total_exams)
+        ])
+        return medicos[0].id
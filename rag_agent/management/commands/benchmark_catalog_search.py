@@ -0,0 +1,127 @@
+"""
+Benchmark da busca no catálogo: LIKE (icontains) x FTS5 x índice em memória
+
+Popula um banco SQLite temporário com um catálogo inflado (padrão: 10k exames e
+10k médicos) e mede a latência das buscas usadas por /api/search/:
+- LIKE: as consultas icontains originais (somente nomes)
+- FTS5: índice rag_agent_search (todos os campos de texto, ranking bm25, destaque)
+- Memória: índice invertido usado quando o FTS5 não está disponível
+
+Uso:
+    python manage.py benchmark_catalog_search
+    python manage.py benchmark_catalog_search --exams 2000 --doctors 2000 --repeat 50
+"""
+
+import random
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core.benchmark import format_stats, measure, temporary_database
+from rag_agent.models import Especialidade, Exame, Medico
+from rag_agent.search_index import (CatalogSearchIndex, FtsSearchBackend,
+                                    MemorySearchBackend, collect_documents,
+                                    query_terms)
+
+WORDS = (
+    'respiração sono ronco apneia pulmão exame avaliação noturna oxigenação capacidade '
+    'espirometria polissonografia tosse asma bronquite alergia jejum medicação repouso '
+    'consulta acompanhamento tratamento diagnóstico preventivo crônico adulto infantil'
+).split()
+
+QUERIES = ['polissonografia', 'preparo jejum', 'apneia do sono', 'espirometria', 'Gustavo', 'xyzinexistente']
+
+
+class Command(BaseCommand):
+    help = 'Compara LIKE, FTS5 e índice em memória na busca do catálogo'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--exams', type=int, default=10_000, help='Exames a gerar')
+        parser.add_argument('--doctors', type=int, default=10_000, help='Médicos a gerar')
+        parser.add_argument('--repeat', type=int, default=100, help='Execuções por consulta')
+        parser.add_argument('--seed', type=int, default=42, help='Semente do gerador aleatório')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+
+        with temporary_database('bench_search') as alias:
+            self.stdout.write(f"🌱 Populando {options['exams']:,} exames / {options['doctors']:,} médicos...")
+            self._seed(alias, options['exams'], options['doctors'])
+
+            fts = FtsSearchBackend(alias)
+            memory = MemorySearchBackend(alias=alias)
+            index = CatalogSearchIndex(alias)
+            self.stdout.write(f"📚 FTS5 disponível: {fts.is_available()}")
+            if fts.is_available():
+                stats = measure(lambda: fts.rebuild(collect_documents(alias)), repeat=1, warmup=0)
+                self.stdout.write(format_stats('reconstrução FTS5', stats))
+            stats = measure(lambda: memory.rebuild(collect_documents(alias)), repeat=1, warmup=0)
+            self.stdout.write(format_stats('reconstrução índice em memória', stats))
+
+            for query in QUERIES:
+                self.stdout.write(self.style.MIGRATE_HEADING(f"\n=== '{query}' ==="))
+                terms = query_terms(query)
+                like_hits = self._like_search(alias, query)
+                self.stdout.write(format_stats(f'LIKE nomes ({like_hits} hits)',
+                                               measure(lambda: self._like_search(alias, query), repeat=options['repeat'])))
+                if fts.is_available():
+                    hits = fts.search(terms, None, 20)
+                    self.stdout.write(format_stats(f'FTS5 ({len(hits)} hits)',
+                                                   measure(lambda: fts.search(terms, None, 20), repeat=options['repeat'])))
+                hits = memory.search(terms, None, 20)
+                self.stdout.write(format_stats(f'memória ({len(hits)} hits)',
+                                               measure(lambda: memory.search(terms, None, 20), repeat=options['repeat'])))
+                top = index.search(query, limit=1)
+                if top:
+                    self.stdout.write(f"   1º: [{top[0]['tipo']}] {top[0]['titulo']} — {top[0]['trecho'][:90]}")
+
+    def _like_search(self, alias, query):
+        """Consultas da implementação original (4 LIKE, somente nomes)"""
+        query_lower = query.lower()
+        total = 0
+        for queryset in (
+            Especialidade.objects.using(alias).filter(nome__icontains=query_lower, ativa=True),
+            Medico.objects.using(alias).filter(nome__icontains=query_lower),
+            Exame.objects.using(alias).filter(nome__icontains=query_lower),
+        ):
+            total += len(list(queryset))
+        return total
+
+    def _text(self, words):
+        return ' '.join(self.rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+    def _seed(self, alias, total_exams, total_doctors):
+        """Insere via executemany (sem disparar sinais do índice global)"""
+        connection = connections[alias]
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                'INSERT INTO rag_agent_especialidade (nome, descricao, ativa, sinonimos) VALUES (%s, %s, %s, %s)',
+                [(f'Especialidade {index}', self._text(12), True, 'pulmão, sono') for index in range(20)],
+            )
+            cursor.executemany(
+                'INSERT INTO rag_agent_exame (nome, o_que_e, como_funciona, preparacao, vantagem, preco) '
+                'VALUES (%s, %s, %s, %s, %s, %s)',
+                [
+                    (f'Exame {self.rng.choice(WORDS)} {index}', self._text(30), self._text(40),
+                     self._text(20), self._text(15), '150.00')
+                    for index in range(total_exams)
+                ],
+            )
+            first_names = ['Gustavo', 'Renata', 'João', 'Maria', 'Paulo', 'Ana', 'Carlos', 'Beatriz']
+            cursor.executemany(
+                'INSERT INTO rag_agent_medico (nome, crm, bio, formas_pagamento, retorno_info) '
+                'VALUES (%s, %s, %s, %s, %s)',
+                [
+                    (f'Dr. {self.rng.choice(first_names)} Sobrenome{index}', f'CRM{index}', self._text(60),
+                     'Pix, cartão', 'Retorno em 30 dias')
+                    for index in range(total_doctors)
+                ],
+            )
+            cursor.execute('SELECT id FROM rag_agent_medico')
+            doctor_ids = [row[0] for row in cursor.fetchall()]
+            cursor.execute('SELECT id FROM rag_agent_especialidade')
+            specialty_ids = [row[0] for row in cursor.fetchall()]
+            cursor.executemany(
+                'INSERT INTO rag_agent_medico_especialidades (medico_id, especialidade_id) VALUES (%s, %s)',
+                [(doctor_id, self.rng.choice(specialty_ids)) for doctor_id in doctor_ids],
+            )
@@ -0,0 +1,20 @@
+"""
+Reconstrói o índice de busca textual do catálogo (FTS5 ou índice em memória)
+
+Uso:
+    python manage.py rebuild_search_index
+"""
+
+from django.core.management.base import BaseCommand
+
+from rag_agent.search_index import search_index
+
+
+class Command(BaseCommand):
+    help = 'Reindexa especialidades, médicos, exames, convênios e dados da clínica para a busca textual'
+
+    def handle(self, *args, **options):
+        total = search_index.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"🔎 Índice de busca reconstruído ({search_index.backend_name}): {total} documentos"
+        ))
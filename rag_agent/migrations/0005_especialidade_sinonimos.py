@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rag_agent', '0004_remove_clinicainfo_google_calendar_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='especialidade',
+            name='sinonimos',
+            field=models.TextField(blank=True, default='', help_text='Sinônimos e termos usados pelos pacientes (ex.: pulmão, falta de ar), separados por vírgula ou linha'),
+        ),
+    ]
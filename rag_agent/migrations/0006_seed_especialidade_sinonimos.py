@@ -0,0 +1,41 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:36
+
+import unicodedata
+
+from django.db import migrations
+
+# Termos leigos usados pelos pacientes da PneumoSono (chave: nome sem acentos, minúsculo)
+SINONIMOS_PADRAO = {
+    'pneumologia': 'pneumologista, pulmão, pulmões, pulmonar, respiração, falta de ar, '
+                   'asma, bronquite, tosse, enfisema, dpoc, chiado no peito',
+    'medicina do sono': 'sono, dormir, ronco, ronca, roncar, apneia, insônia, sonolência, '
+                        'polissonografia, cansaço ao acordar',
+    'otorrinolaringologia': 'otorrino, ouvido, nariz, garganta, sinusite, rinite, desvio de septo',
+    'alergia e imunologia': 'alergista, alergia, rinite alérgica, imunologista',
+    'cardiologia': 'cardiologista, coração, pressão alta, hipertensão, palpitação',
+}
+
+
+def _fold(text):
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).lower().strip()
+
+
+def seed_sinonimos(apps, schema_editor):
+    Especialidade = apps.get_model('rag_agent', 'Especialidade')
+    for especialidade in Especialidade.objects.using(schema_editor.connection.alias).filter(sinonimos=''):
+        sinonimos = SINONIMOS_PADRAO.get(_fold(especialidade.nome))
+        if sinonimos:
+            especialidade.sinonimos = sinonimos
+            especialidade.save(update_fields=['sinonimos'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rag_agent', '0005_especialidade_sinonimos'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_sinonimos, migrations.RunPython.noop),
+    ]
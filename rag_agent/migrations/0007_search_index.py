@@ -0,0 +1,77 @@
+# Generated by Django 5.2.6 on 2026-10-19 02:10
+
+from django.db import migrations
+
+FTS_TABLE = 'rag_agent_search'
+
+CREATE_TABLE = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+    kind UNINDEXED,
+    object_id UNINDEXED,
+    title,
+    body,
+    tokenize = 'unicode61 remove_diacritics 2'
+)
+"""
+
+# Carga inicial com o catálogo existente (mesmos campos de search_index.document_for)
+POPULATE = [
+    f"""INSERT INTO {FTS_TABLE} (kind, object_id, title, body)
+        SELECT 'especialidade', id, nome, coalesce(descricao, '') || char(10) || coalesce(sinonimos, '')
+        FROM rag_agent_especialidade WHERE ativa""",
+    f"""INSERT INTO {FTS_TABLE} (kind, object_id, title, body)
+        SELECT 'medico', m.id, m.nome,
+               coalesce((SELECT group_concat(e.nome, ', ')
+                         FROM rag_agent_medico_especialidades me
+                         JOIN rag_agent_especialidade e ON e.id = me.especialidade_id
+                         WHERE me.medico_id = m.id AND e.ativa), '')
+               || char(10) || coalesce(m.bio, '') || char(10) || coalesce(m.formas_pagamento, '')
+               || char(10) || coalesce(m.retorno_info, '')
+        FROM rag_agent_medico m""",
+    f"""INSERT INTO {FTS_TABLE} (kind, object_id, title, body)
+        SELECT 'exame', id, nome,
+               coalesce(o_que_e, '') || char(10) || coalesce(como_funciona, '') || char(10)
+               || coalesce(preparacao, '') || char(10) || coalesce(vantagem, '')
+        FROM rag_agent_exame""",
+    f"""INSERT INTO {FTS_TABLE} (kind, object_id, title, body)
+        SELECT 'convenio', id, nome, coalesce(descricao, '') FROM rag_agent_convenio""",
+    f"""INSERT INTO {FTS_TABLE} (kind, object_id, title, body)
+        SELECT 'clinica', id, nome,
+               coalesce(objetivo_geral, '') || char(10) || coalesce(endereco, '') || char(10)
+               || coalesce(referencia_localizacao, '') || char(10) || coalesce(politica_agendamento, '')
+        FROM rag_agent_clinicainfo""",
+]
+
+
+def create_search_index(apps, schema_editor):
+    """Cria o índice FTS5 (apenas SQLite compilado com FTS5; senão a busca usa o índice em memória)"""
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    from django.db import OperationalError
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute(CREATE_TABLE)
+        except OperationalError:
+            # SQLite sem FTS5
+            return
+        # Falha na carga inicial interrompe a migração: uma tabela vazia ou parcial
+        # seria vista como índice disponível e as buscas não voltariam nada
+        for statement in POPULATE:
+            cursor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rag_agent', '0006_seed_especialidade_sinonimos'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -1,3 +1,4 @@
+import re
 from decimal import Decimal
 
 from django.db import models
@@ -7,6 +8,11 @@ class Especialidade(models.Model):
     nome = models.CharField(max_length=100, unique=True)
     descricao = models.TextField(blank=True, null=True, help_text="Descrição da especialidade")
     ativa = models.BooleanField(default=True, help_text="Se a especialidade está ativa para seleção")
+    sinonimos = models.TextField(
+        blank=True,
+        default='',
+        help_text="Sinônimos e termos usados pelos pacientes (ex.: pulmão, falta de ar), separados por vírgula ou linha"
+    )
 
     class Meta:
         ordering = ['nome']
@@ -16,6 +22,10 @@ class Especialidade(models.Model):
     def __str__(self):
         return self.nome
 
+    def get_sinonimos_list(self):
+        """Retorna os sinônimos como lista (separados por vírgula, ponto e vírgula ou linha)"""
+        return [termo.strip() for termo in re.split(r'[,;\n]', self.sinonimos or '') if termo.strip()]
+
 
 # Modelo para armazenar informações globais da clínica (apenas 1 registro)
 class ClinicaInfo(models.Model):
@@ -44,6 +54,29 @@ class Convenio(models.Model):
         return self.nome
 
 
+class MedicoQuerySet(models.QuerySet):
+    """Consultas de médicos com as relações usadas pelos serializers já pré-carregadas"""
+
+    def for_resumo(self):
+        """
+        Para MedicoResumoSerializer (listagens, chatbot, busca): apenas especialidades ativas
+
+        Usa Prefetch com to_attr='especialidades_ativas', lido por get_especialidades_ativas();
+        o número de consultas não depende da quantidade de médicos.
+        """
+        return self.prefetch_related(
+            models.Prefetch(
+                'especialidades',
+                queryset=Especialidade.objects.filter(ativa=True),
+                to_attr='especialidades_ativas',
+            )
+        )
+
+    def for_detalhe(self):
+        """Para MedicoSerializer: especialidades, convênios e horários de trabalho"""
+        return self.prefetch_related('especialidades', 'convenios', 'horarios_trabalho')
+
+
 class Medico(models.Model):
     nome = models.CharField(max_length=100)
     crm = models.CharField(max_length=100, unique=True, null=True, blank=True,default="")
@@ -61,12 +94,25 @@ class Medico(models.Model):
         default="Consulta de retorno em até 30 dias incluído no valor."
     )
 
+    objects = MedicoQuerySet.as_manager()
+
     def __str__(self):
         return self.nome
 
+    def get_especialidades_ativas(self):
+        """
+        Especialidades ativas do médico
+
+        Aproveita o pré-carregamento quando existir (MedicoQuerySet.for_resumo ou
+        prefetch_related('especialidades')); sem ele, faz uma única consulta.
+        """
+        if hasattr(self, 'especialidades_ativas'):
+            return self.especialidades_ativas
+        return [esp for esp in self.especialidades.all() if esp.ativa]
+
     def get_especialidades_display(self):
         """Retorna as especialidades como string formatada"""
-        return ", ".join([esp.nome for esp in self.especialidades.filter(ativa=True)])
+        return ", ".join([esp.nome for esp in self.get_especialidades_ativas()])
 
 
 class HorarioTrabalho(models.Model):
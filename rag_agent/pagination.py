@@ -0,0 +1,29 @@
+"""
+Paginação das listagens do catálogo
+
+Paginação por cursor (estável mesmo com inserções entre páginas, sem OFFSET).
+É opcional: sem ?cursor= nem ?page_size= a listagem completa continua sendo
+retornada como lista, como antes.
+
+Uso:
+    GET /rag/api/medicos/?page_size=50
+    GET /rag/api/medicos/?cursor=cD0xMjM%3D&page_size=50
+"""
+
+from rest_framework.pagination import CursorPagination
+
+
+class CatalogCursorPagination(CursorPagination):
+    """Cursor ordenado por id (único e indexado)"""
+
+    ordering = 'id'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            # Sem parâmetros de paginação: resposta completa (compatibilidade com clientes atuais)
+            return None
+        return super().paginate_queryset(queryset, request, view)
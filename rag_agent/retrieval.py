@@ -0,0 +1,263 @@
+"""
+Recuperação de trechos do catálogo para os prompts (etapa "R" do RAG)
+
+Responsável por:
+- Dividir o catálogo em trechos curtos (uma especialidade, um médico, parágrafos de exames...)
+- Ranquear os trechos por BM25 para a mensagem do paciente, localmente e sem rede
+- Usar NumPy quando instalado (pontuação vetorizada) e Python puro como alternativa
+- Ser reconstruído quando o catálogo muda (ver rag_agent/catalog_index.py)
+
+Uso:
+    from rag_agent.retrieval import retrieval_index
+
+    for chunk, score in retrieval_index.search('tenho falta de ar, qual médico?', k=4):
+        print(chunk.kind, chunk.title, score)
+"""
+
+import heapq
+import logging
+import math
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from .catalog_index import CatalogIndex
+from .search_index import (KIND_CLINICA, KIND_CONVENIO, KIND_ESPECIALIDADE,
+                           KIND_EXAME, KIND_MEDICO, SearchDocument,
+                           collect_documents, query_terms)
+from .specialty_index import stem
+
+# Importação opcional do NumPy
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOP_K = 4
+# Tamanho máximo de um trecho (palavras); textos longos são quebrados por parágrafo
+CHUNK_WORDS = 60
+# Parâmetros clássicos do BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Palavras do título contam como se aparecessem várias vezes no trecho
+TITLE_BOOST = 3
+
+KIND_LABELS = {
+    KIND_ESPECIALIDADE: 'Especialidade',
+    KIND_MEDICO: 'Médico',
+    KIND_EXAME: 'Exame',
+    KIND_CONVENIO: 'Convênio',
+    KIND_CLINICA: 'Clínica',
+}
+
+
+class Chunk(NamedTuple):
+    """Trecho recuperável do catálogo"""
+    kind: str
+    object_id: int
+    title: str
+    text: str
+
+
+def analyze(text: str) -> List[str]:
+    """Termos usados no índice: sem acentos, sem palavras de ligação e com radical simplificado"""
+    return [stem(term) for term in query_terms(text)]
+
+
+def chunk_document(document: SearchDocument, max_words: int = CHUNK_WORDS) -> List[Chunk]:
+    """
+    Divide um documento do catálogo em trechos de até max_words palavras
+
+    Parágrafos são agrupados enquanto couberem; cada trecho repete o título para
+    continuar compreensível isoladamente no prompt.
+
+    Args:
+        document: Documento do catálogo (ver rag_agent.search_index.document_for)
+        max_words: Tamanho máximo do trecho
+
+    Returns:
+        Lista de trechos (ao menos um, com o título)
+    """
+    chunks: List[Chunk] = []
+    current: List[str] = []
+    current_words = 0
+
+    def flush():
+        chunks.append(Chunk(document.kind, document.object_id, document.title, ' '.join(current)))
+
+    for paragraph in (document.body or '').split('\n'):
+        words = paragraph.split()
+        while words:
+            room = max_words - current_words
+            if room <= 0:
+                flush()
+                current, current_words = [], 0
+                room = max_words
+            piece, words = words[:room], words[room:]
+            current.append(' '.join(piece))
+            current_words += len(piece)
+
+    if current or not chunks:
+        flush()
+    return chunks
+
+
+def format_chunk(chunk: Chunk) -> str:
+    """Linha do trecho para o prompt ("• Médico: Dr. Fulano — texto")"""
+    label = KIND_LABELS.get(chunk.kind, chunk.kind.capitalize())
+    if chunk.text:
+        return f"• {label}: {chunk.title} — {chunk.text}"
+    return f"• {label}: {chunk.title}"
+
+
+class RetrievalIndex(CatalogIndex):
+    """
+    Índice BM25 sobre os trechos do catálogo
+    """
+
+    def __init__(self, ttl: Optional[float] = None, alias: Optional[str] = None):
+        super().__init__(ttl)
+        self.alias = alias
+        self._chunks: List[Chunk] = []
+        # termo -> (índices dos trechos, frequências) — arrays NumPy ou listas
+        self._postings: Dict[str, Tuple[Sequence[int], Sequence[float]]] = {}
+        self._lengths: Sequence[float] = []
+        self._average_length = 1.0
+
+    @property
+    def backend_name(self) -> str:
+        return 'numpy' if NUMPY_AVAILABLE else 'python'
+
+    # ── Construção ─────────────────────────────────────────────────────────
+
+    def _load(self):
+        self.build(collect_documents(self.alias))
+
+    def build(self, documents: Iterable[SearchDocument], max_words: int = CHUNK_WORDS) -> int:
+        """
+        (Re)constrói o índice
+
+        Args:
+            documents: Documentos do catálogo
+            max_words: Tamanho máximo dos trechos
+
+        Returns:
+            Número de trechos indexados
+        """
+        chunks: List[Chunk] = []
+        postings: Dict[str, Tuple[List[int], List[float]]] = {}
+        lengths: List[float] = []
+
+        for document in documents:
+            title_terms = analyze(document.title)
+            for chunk in chunk_document(document, max_words):
+                position = len(chunks)
+                chunks.append(chunk)
+                counts: Dict[str, float] = {}
+                for term in analyze(chunk.text):
+                    counts[term] = counts.get(term, 0.0) + 1.0
+                for term in title_terms:
+                    counts[term] = counts.get(term, 0.0) + TITLE_BOOST
+                for term, frequency in counts.items():
+                    indexes, frequencies = postings.setdefault(term, ([], []))
+                    indexes.append(position)
+                    frequencies.append(frequency)
+                lengths.append(float(sum(counts.values())) or 1.0)
+
+        if NUMPY_AVAILABLE:
+            self._postings = {
+                term: (np.asarray(indexes, dtype=np.int32), np.asarray(frequencies, dtype=np.float32))
+                for term, (indexes, frequencies) in postings.items()
+            }
+            self._lengths = np.asarray(lengths, dtype=np.float32)
+        else:
+            self._postings = postings
+            self._lengths = lengths
+
+        self._chunks = chunks
+        self._average_length = (sum(lengths) / len(lengths)) if lengths else 1.0
+        self._mark_built()
+        logger.info(f"📚 Índice de recuperação construído ({self.backend_name}): {len(chunks)} trechos, {len(postings)} termos")
+        return len(chunks)
+
+    # ── Consulta ───────────────────────────────────────────────────────────
+
+    def _idf(self, document_frequency: int) -> float:
+        total = len(self._chunks)
+        return math.log(1.0 + (total - document_frequency + 0.5) / (document_frequency + 0.5))
+
+    def _score_numpy(self, terms: Sequence[str]):
+        scores = np.zeros(len(self._chunks), dtype=np.float32)
+        for term in terms:
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            indexes, frequencies = posting
+            norm = BM25_K1 * (1.0 - BM25_B + BM25_B * self._lengths[indexes] / self._average_length)
+            # Índices de uma mesma lista são únicos: soma vetorizada é segura
+            scores[indexes] += self._idf(len(indexes)) * frequencies * (BM25_K1 + 1.0) / (frequencies + norm)
+        return scores
+
+    def _score_python(self, terms: Sequence[str]) -> Dict[int, float]:
+        scores: Dict[int, float] = {}
+        lengths = self._lengths
+        for term in terms:
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            indexes, frequencies = posting
+            idf = self._idf(len(indexes))
+            for position, frequency in zip(indexes, frequencies):
+                norm = BM25_K1 * (1.0 - BM25_B + BM25_B * lengths[position] / self._average_length)
+                scores[position] = scores.get(position, 0.0) + idf * frequency * (BM25_K1 + 1.0) / (frequency + norm)
+        return scores
+
+    def search(self, query: str, k: int = DEFAULT_TOP_K,
+               kinds: Optional[Sequence[str]] = None) -> List[Tuple[Chunk, float]]:
+        """
+        Trechos mais relevantes para a consulta
+
+        Args:
+            query: Mensagem do paciente (ou consulta montada a partir do contexto)
+            k: Máximo de trechos
+            kinds: Restringe aos tipos informados (ex.: ['medico', 'especialidade'])
+
+        Returns:
+            Lista de (trecho, score) em ordem decrescente de relevância
+        """
+        self._ensure_built()
+        # Termos repetidos na consulta não devem pesar mais
+        terms = list(dict.fromkeys(analyze(query)))
+        if not terms or not self._chunks or k <= 0:
+            return []
+
+        chunks = self._chunks
+        if NUMPY_AVAILABLE:
+            scores = self._score_numpy(terms)
+            candidates = np.flatnonzero(scores > 0)
+            if kinds:
+                allowed = set(kinds)
+                candidates = np.asarray([position for position in candidates if chunks[position].kind in allowed],
+                                        dtype=np.int64)
+            if len(candidates) > k:
+                candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+            ranked = sorted(((int(position), float(scores[position])) for position in candidates),
+                            key=lambda item: (-item[1], item[0]))
+        else:
+            scores = self._score_python(terms)
+            items: Iterable[Tuple[int, float]] = scores.items()
+            if kinds:
+                allowed = set(kinds)
+                items = [(position, score) for position, score in items if chunks[position].kind in allowed]
+            ranked = heapq.nsmallest(k, items, key=lambda item: (-item[1], item[0]))
+
+        return [(chunks[position], round(score, 4)) for position, score in ranked[:k]]
+
+    def chunk_count(self) -> int:
+        self._ensure_built()
+        return len(self._chunks)
+
+
+# Instância global do índice
+retrieval_index = RetrievalIndex()
@@ -0,0 +1,456 @@
+"""
+Busca textual no catálogo (especialidades, médicos, exames, convênios e clínica)
+
+Responsável por:
+- Indexar todos os campos de texto do catálogo (nome, bio, descrição, preparo do exame...)
+- Buscar com ranking e trechos destacados
+- Usar SQLite FTS5 quando disponível (tabela criada na migração 0007) e um índice
+  invertido em memória como alternativa (outros bancos / SQLite sem FTS5)
+- Manter o índice atualizado pelos sinais do catálogo (rag_agent/signals.py)
+
+Uso:
+    from rag_agent.search_index import search_index
+
+    search_index.search('preparo polissonografia', limit=10)
+    search_index.rebuild()   # ou: python manage.py rebuild_search_index
+"""
+
+import logging
+import math
+import re
+from bisect import bisect_left
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence
+
+from django.db import DatabaseError, connections, router
+
+from .catalog_index import CatalogIndex
+from .text import fold_accents
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'rag_agent_search'
+HIGHLIGHT_START = '<mark>'
+HIGHLIGHT_END = '</mark>'
+SNIPPET_WORDS = 16
+DEFAULT_LIMIT = 20
+# Peso do título em relação ao corpo no ranking (bm25 do FTS5 e fallback)
+TITLE_WEIGHT = 5.0
+
+# Palavras ignoradas na consulta
+SEARCH_STOPWORDS = frozenset({
+    'a', 'o', 'as', 'os', 'de', 'da', 'do', 'das', 'dos', 'e', 'em', 'no', 'na', 'nos', 'nas',
+    'um', 'uma', 'para', 'pra', 'com', 'por', 'que', 'qual', 'quais', 'como', 'se', 'ao',
+})
+
+KIND_ESPECIALIDADE = 'especialidade'
+KIND_MEDICO = 'medico'
+KIND_EXAME = 'exame'
+KIND_CONVENIO = 'convenio'
+KIND_CLINICA = 'clinica'
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+class SearchDocument(NamedTuple):
+    """Documento indexado"""
+    kind: str
+    object_id: int
+    title: str
+    body: str
+
+
+def query_terms(query: str) -> List[str]:
+    """Termos normalizados da consulta (sem acentos e sem palavras de ligação)"""
+    return [term for term in _WORD_RE.findall(fold_accents(query or '')) if term not in SEARCH_STOPWORDS]
+
+
+def _join(*parts: Optional[str]) -> str:
+    return '\n'.join(part.strip() for part in parts if part and part.strip())
+
+
+# ── Documentos do catálogo ─────────────────────────────────────────────────
+
+def document_for(instance) -> Optional[SearchDocument]:
+    """
+    Documento de busca de uma instância do catálogo
+
+    Args:
+        instance: Especialidade, Medico, Exame, Convenio ou ClinicaInfo
+
+    Returns:
+        SearchDocument ou None se a instância não deve ser indexada (ex.: especialidade inativa)
+    """
+    from .models import ClinicaInfo, Convenio, Especialidade, Exame, Medico
+
+    if isinstance(instance, Especialidade):
+        if not instance.ativa:
+            return None
+        return SearchDocument(KIND_ESPECIALIDADE, instance.pk, instance.nome,
+                              _join(instance.descricao, instance.sinonimos))
+    if isinstance(instance, Medico):
+        especialidades = instance.get_especialidades_display()
+        return SearchDocument(KIND_MEDICO, instance.pk, instance.nome,
+                              _join(especialidades, instance.bio, instance.formas_pagamento, instance.retorno_info))
+    if isinstance(instance, Exame):
+        return SearchDocument(KIND_EXAME, instance.pk, instance.nome,
+                              _join(instance.o_que_e, instance.como_funciona, instance.preparacao, instance.vantagem))
+    if isinstance(instance, Convenio):
+        return SearchDocument(KIND_CONVENIO, instance.pk, instance.nome, _join(instance.descricao))
+    if isinstance(instance, ClinicaInfo):
+        return SearchDocument(KIND_CLINICA, instance.pk, instance.nome,
+                              _join(instance.objetivo_geral, instance.endereco, instance.referencia_localizacao,
+                                    instance.politica_agendamento))
+    return None
+
+
+def collect_documents(using: Optional[str] = None) -> Iterator[SearchDocument]:
+    """
+    Todos os documentos do catálogo
+
+    Args:
+        using: Alias do banco (padrão: definido pelo roteador)
+    """
+    from .models import ClinicaInfo, Convenio, Especialidade, Exame, Medico
+
+    querysets = [
+        Especialidade.objects.filter(ativa=True),
+        Medico.objects.for_resumo(),
+        Exame.objects.all(),
+        Convenio.objects.all(),
+        ClinicaInfo.objects.all(),
+    ]
+    for queryset in querysets:
+        if using:
+            queryset = queryset.using(using)
+        for instance in queryset.iterator(chunk_size=2000):
+            document = document_for(instance)
+            if document:
+                yield document
+
+
+# ── Destaque de trechos (usado pelo fallback em memória) ───────────────────
+
+def _matches(word: str, terms: Sequence[str]) -> bool:
+    folded = fold_accents(word)
+    return any(folded.startswith(term) for term in terms)
+
+
+def highlight(text: str, terms: Sequence[str]) -> str:
+    """Marca as palavras que começam por algum termo da consulta"""
+    return _WORD_RE.sub(
+        lambda match: f"{HIGHLIGHT_START}{match.group(0)}{HIGHLIGHT_END}" if _matches(match.group(0), terms) else match.group(0),
+        text or '',
+    )
+
+
+def snippet(text: str, terms: Sequence[str], words: int = SNIPPET_WORDS) -> str:
+    """Trecho de até `words` palavras em torno da primeira ocorrência, com destaque"""
+    tokens = (text or '').split()
+    if not tokens:
+        return ''
+    first = next((index for index, token in enumerate(tokens)
+                  if any(_matches(word, terms) for word in _WORD_RE.findall(token))), 0)
+    start = max(0, first - words // 3)
+    end = min(len(tokens), start + words)
+    excerpt = highlight(' '.join(tokens[start:end]), terms)
+    return ('…' if start > 0 else '') + excerpt + ('…' if end < len(tokens) else '')
+
+
+# ── Backends ───────────────────────────────────────────────────────────────
+
+class FtsSearchBackend:
+    """Índice FTS5 no mesmo banco do catálogo"""
+
+    def __init__(self, alias: Optional[str] = None):
+        self.alias = alias
+        self._available: Dict[str, bool] = {}
+
+    def _read_alias(self) -> str:
+        from .models import Medico
+        return self.alias or router.db_for_read(Medico) or 'default'
+
+    def _write_alias(self) -> str:
+        from .models import Medico
+        return self.alias or router.db_for_write(Medico) or 'default'
+
+    def is_available(self) -> bool:
+        """Tabela FTS5 existe no banco do catálogo"""
+        alias = self._read_alias()
+        if alias not in self._available:
+            connection = connections[alias]
+            available = False
+            if connection.vendor == 'sqlite':
+                try:
+                    with connection.cursor() as cursor:
+                        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+                        available = cursor.fetchone() is not None
+                except DatabaseError:
+                    available = False
+            self._available[alias] = available
+        return self._available[alias]
+
+    def reset_availability(self):
+        self._available.clear()
+
+    def rebuild(self, documents: Iterable[SearchDocument]) -> int:
+        """Substitui todo o conteúdo do índice"""
+        connection = connections[self._write_alias()]
+        rows = [(document.kind, document.object_id, document.title, document.body) for document in documents]
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (kind, object_id, title, body) VALUES (%s, %s, %s, %s)', rows
+            )
+        return len(rows)
+
+    def remove(self, kind: str, object_id: int):
+        with connections[self._write_alias()].cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE kind = %s AND object_id = %s', [kind, object_id])
+
+    def upsert(self, document: SearchDocument):
+        self.remove(document.kind, document.object_id)
+        with connections[self._write_alias()].cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (kind, object_id, title, body) VALUES (%s, %s, %s, %s)',
+                [document.kind, document.object_id, document.title, document.body],
+            )
+
+    def search(self, terms: Sequence[str], kinds: Optional[Sequence[str]], limit: int) -> List[Dict[str, Any]]:
+        # Cada termo vira busca por prefixo entre aspas (sem operadores vindos do usuário)
+        match_expression = ' '.join(f'"{term}"*' for term in terms)
+        sql = (
+            f"SELECT kind, object_id, "
+            f"highlight({FTS_TABLE}, 2, %s, %s), "
+            f"snippet({FTS_TABLE}, 3, %s, %s, '…', {SNIPPET_WORDS}), "
+            f"bm25({FTS_TABLE}, 0, 0, {TITLE_WEIGHT}, 1.0) AS rank "
+            f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s"
+        )
+        params: List[Any] = [HIGHLIGHT_START, HIGHLIGHT_END, HIGHLIGHT_START, HIGHLIGHT_END, match_expression]
+        if kinds:
+            sql += f" AND kind IN ({', '.join(['%s'] * len(kinds))})"
+            params.extend(kinds)
+        sql += ' ORDER BY rank LIMIT %s'
+        params.append(limit)
+
+        with connections[self._read_alias()].cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        # bm25 do SQLite é negativo (menor = melhor): expor como score positivo
+        return [
+            {'tipo': kind, 'id': int(object_id), 'titulo': title, 'trecho': excerpt, 'score': round(-rank, 4)}
+            for kind, object_id, title, excerpt, rank in rows
+        ]
+
+
+class MemorySearchBackend(CatalogIndex):
+    """Índice invertido em memória com ranking BM25 (alternativa ao FTS5)"""
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, ttl: Optional[float] = None, alias: Optional[str] = None):
+        super().__init__(ttl)
+        self.alias = alias
+        self._documents: List[SearchDocument] = []
+        self._postings: Dict[str, Dict[int, float]] = {}
+        self._lengths: List[float] = []
+        self._average_length = 1.0
+        self._vocabulary: List[str] = []
+
+    def _load(self):
+        self.rebuild(collect_documents(self.alias))
+
+    def rebuild(self, documents: Iterable[SearchDocument]) -> int:
+        documents = list(documents)
+        postings: Dict[str, Dict[int, float]] = {}
+        lengths = []
+        for position, document in enumerate(documents):
+            title_terms = query_terms(document.title)
+            body_terms = query_terms(document.body)
+            counts = Counter(body_terms)
+            for term in title_terms:
+                counts[term] += TITLE_WEIGHT
+            for term, frequency in counts.items():
+                postings.setdefault(term, {})[position] = frequency
+            lengths.append(len(body_terms) + TITLE_WEIGHT * len(title_terms))
+
+        self._documents = documents
+        self._postings = postings
+        self._lengths = lengths
+        self._average_length = (sum(lengths) / len(lengths)) if lengths else 1.0
+        self._vocabulary = sorted(postings)
+        self._mark_built()
+        return len(documents)
+
+    def _expand(self, term: str) -> List[str]:
+        """Termos do vocabulário com o prefixo (mesma semântica de "termo"* no FTS5)"""
+        start = bisect_left(self._vocabulary, term)
+        expanded = []
+        for candidate in self._vocabulary[start:]:
+            if not candidate.startswith(term):
+                break
+            expanded.append(candidate)
+        return expanded
+
+    def search(self, terms: Sequence[str], kinds: Optional[Sequence[str]], limit: int) -> List[Dict[str, Any]]:
+        self._ensure_built()
+        total = len(self._documents)
+        scores: Optional[Dict[int, float]] = None
+
+        for term in terms:
+            term_scores: Dict[int, float] = {}
+            for candidate in self._expand(term):
+                postings = self._postings[candidate]
+                idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+                for position, frequency in postings.items():
+                    norm = self.K1 * (1 - self.B + self.B * self._lengths[position] / self._average_length)
+                    value = idf * frequency * (self.K1 + 1) / (frequency + norm)
+                    if value > term_scores.get(position, 0.0):
+                        term_scores[position] = value
+            # Todos os termos precisam aparecer (AND implícito, como no FTS5)
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {position: score + term_scores[position]
+                          for position, score in scores.items() if position in term_scores}
+            if not scores:
+                return []
+
+        ranked = sorted(
+            ((score, position) for position, score in (scores or {}).items()
+             if not kinds or self._documents[position].kind in kinds),
+            reverse=True,
+        )[:limit]
+        return [
+            {
+                'tipo': self._documents[position].kind,
+                'id': self._documents[position].object_id,
+                'titulo': highlight(self._documents[position].title, terms),
+                'trecho': snippet(self._documents[position].body, terms),
+                'score': round(score, 4),
+            }
+            for score, position in ranked
+        ]
+
+
+class CatalogSearchIndex:
+    """
+    Fachada da busca: FTS5 quando disponível, senão índice em memória
+    """
+
+    def __init__(self, alias: Optional[str] = None):
+        self.fts = FtsSearchBackend(alias)
+        self.memory = MemorySearchBackend(alias=alias)
+
+    def _backend(self):
+        return self.fts if self.fts.is_available() else self.memory
+
+    @property
+    def backend_name(self) -> str:
+        return 'fts5' if self.fts.is_available() else 'memory'
+
+    def search(self, query: str, kinds: Optional[Sequence[str]] = None, limit: int = DEFAULT_LIMIT) -> List[Dict[str, Any]]:
+        """
+        Busca ranqueada no catálogo
+
+        Args:
+            query: Texto livre
+            kinds: Restringe aos tipos (especialidade, medico, exame, convenio, clinica)
+            limit: Máximo de resultados
+
+        Returns:
+            Lista de {'tipo', 'id', 'titulo', 'trecho', 'score'} (trechos com <mark>...</mark>)
+        """
+        terms = query_terms(query)
+        if not terms:
+            return []
+        backend = self._backend()
+        try:
+            return backend.search(terms, kinds, limit)
+        except DatabaseError as e:
+            if backend is self.memory:
+                raise
+            logger.error(f"Erro na busca FTS5, usando índice em memória: {e}")
+            return self.memory.search(terms, kinds, limit)
+
+    def rebuild(self) -> int:
+        """Reindexa todo o catálogo; retorna o número de documentos"""
+        self.fts.reset_availability()
+        self.memory.invalidate()
+        if self.fts.is_available():
+            return self.fts.rebuild(collect_documents(self.fts.alias))
+        return self.memory.rebuild(collect_documents(self.memory.alias))
+
+    def update_instance(self, instance):
+        """Atualiza (ou remove, se não indexável) o documento da instância"""
+        document = document_for(instance)
+        self.memory.invalidate()
+        if not self.fts.is_available():
+            return
+        if document is None:
+            self.remove_instance(instance)
+        else:
+            self.fts.upsert(document)
+
+    def remove_instance(self, instance):
+        """Remove o documento da instância"""
+        kind = _KIND_BY_MODEL.get(type(instance).__name__)
+        self.memory.invalidate()
+        if kind and self.fts.is_available():
+            self.fts.remove(kind, instance.pk)
+
+
+_KIND_BY_MODEL = {
+    'Especialidade': KIND_ESPECIALIDADE,
+    'Medico': KIND_MEDICO,
+    'Exame': KIND_EXAME,
+    'Convenio': KIND_CONVENIO,
+    'ClinicaInfo': KIND_CLINICA,
+}
+
+
+def search_catalog(query: str, limit: int = DEFAULT_LIMIT) -> Dict[str, Any]:
+    """
+    Resultado completo da busca: hits ranqueados + objetos serializados por tipo
+
+    Usado pelo endpoint /api/search/ e por RAGService.search_info.
+
+    Args:
+        query: Texto livre
+        limit: Máximo de hits
+
+    Returns:
+        Dict com 'hits' e, quando houver, 'especialidades', 'medicos', 'exames',
+        'convenios' e 'clinica' (na ordem do ranking)
+    """
+    from .models import ClinicaInfo, Convenio, Especialidade, Exame, Medico
+    from .serializers import (ClinicaInfoSerializer, ConvenioSerializer,
+                              EspecialidadeSerializer, ExameSerializer,
+                              MedicoResumoSerializer)
+
+    hits = search_index.search(query, limit=limit)
+    results: Dict[str, Any] = {'hits': hits}
+
+    groups = [
+        (KIND_ESPECIALIDADE, 'especialidades', Especialidade.objects.all(), EspecialidadeSerializer),
+        (KIND_MEDICO, 'medicos', Medico.objects.for_resumo(), MedicoResumoSerializer),
+        (KIND_EXAME, 'exames', Exame.objects.all(), ExameSerializer),
+        (KIND_CONVENIO, 'convenios', Convenio.objects.all(), ConvenioSerializer),
+    ]
+    for kind, key, queryset, serializer_class in groups:
+        ids = [hit['id'] for hit in hits if hit['tipo'] == kind]
+        if ids:
+            objects = queryset.in_bulk(ids)
+            results[key] = serializer_class([objects[pk] for pk in ids if pk in objects], many=True).data
+
+    clinica_ids = [hit['id'] for hit in hits if hit['tipo'] == KIND_CLINICA]
+    if clinica_ids:
+        clinica = ClinicaInfo.objects.filter(pk=clinica_ids[0]).first()
+        if clinica:
+            results['clinica'] = ClinicaInfoSerializer(clinica).data
+    return results
+
+
+# Instância global da busca
+search_index = CatalogSearchIndex()
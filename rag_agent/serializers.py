@@ -2,6 +2,7 @@ from rest_framework import serializers
 
 from .models import (ClinicaInfo, Convenio, Especialidade, Exame,
                      HorarioTrabalho, Medico)
+from .sparse_fields import SparseFieldsetSerializerMixin
 
 # Converte especialidades para JSON
 class EspecialidadeSerializer(serializers.ModelSerializer):
@@ -22,8 +23,7 @@ class ClinicaInfoSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'nome', 'objetivo_geral', 'secretaria_nome',
             'telefone_contato', 'whatsapp_contato', 'email_contato', 'endereco',
-            'referencia_localizacao', 'politica_agendamento',
-            'google_calendar_id'
+            'referencia_localizacao', 'politica_agendamento'
         ]
 
 # Converte horários de trabalho para JSON
@@ -38,7 +38,7 @@ class HorarioTrabalhoSerializer(serializers.ModelSerializer):
         ]
 
 # Converte médicos para JSON
-class MedicoSerializer(serializers.ModelSerializer):
+class MedicoSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     especialidades = EspecialidadeSerializer(many=True, read_only=True)
     convenios = ConvenioSerializer(many=True, read_only=True)
     horarios_trabalho = HorarioTrabalhoSerializer(many=True, read_only=True)
@@ -53,7 +53,7 @@ class MedicoSerializer(serializers.ModelSerializer):
         ]
 
 # Converte médicos para JSON simplificado
-class MedicoResumoSerializer(serializers.ModelSerializer):
+class MedicoResumoSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Serializer simplificado para listagens"""
     especialidades_display = serializers.CharField(source='get_especialidades_display', read_only=True)
     
@@ -62,7 +62,8 @@ class MedicoResumoSerializer(serializers.ModelSerializer):
         fields = ['id', 'nome', 'crm', 'especialidades_display', 'preco_particular']
 
 # Converte exames para JSON com duração formatada
-class ExameSerializer(serializers.ModelSerializer):
+# (use ?fields= nas listagens para omitir os textos longos)
+class ExameSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     duracao_formatada = serializers.SerializerMethodField()
     
     class Meta:
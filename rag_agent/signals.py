@@ -0,0 +1,100 @@
+"""
+Sinais do catálogo: mantêm os índices (médicos, especialidades, busca textual, recuperação)
+e a versão do catálogo (ETag das APIs de leitura) em dia
+"""
+
+import logging
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .catalog_version import bump_catalog_version
+from .doctor_index import doctor_index
+from .models import (ClinicaInfo, Convenio, Especialidade, Exame,
+                     HorarioTrabalho, Medico)
+from .retrieval import retrieval_index
+from .search_index import search_index
+from .specialty_index import specialty_index
+
+logger = logging.getLogger(__name__)
+
+
+def _update_search(instance, removed: bool = False):
+    """Atualiza o documento de busca sem interromper o salvamento em caso de erro"""
+    # Trechos dos prompts vêm dos mesmos documentos: reconstruídos no próximo uso
+    retrieval_index.invalidate()
+    try:
+        if removed:
+            search_index.remove_instance(instance)
+        else:
+            search_index.update_instance(instance)
+    except Exception as e:
+        logger.error(f"Erro ao atualizar índice de busca para {instance!r}: {e}")
+
+
+@receiver(post_save, sender=Medico)
+@receiver(post_delete, sender=Medico)
+def invalidate_doctor_index(sender, instance, **kwargs):
+    """Médico criado, alterado ou removido"""
+    doctor_index.invalidate()
+    _update_search(instance, removed='created' not in kwargs)
+
+
+@receiver(post_save, sender=Especialidade)
+@receiver(post_delete, sender=Especialidade)
+def invalidate_catalog_indexes(sender, instance, **kwargs):
+    """Especialidade alterada: afeta os índices de nomes, especialidades e os médicos dela"""
+    doctor_index.invalidate()
+    specialty_index.invalidate()
+    _update_search(instance, removed='created' not in kwargs)
+    # O documento dos médicos inclui os nomes das especialidades
+    if 'created' in kwargs and not kwargs['created']:
+        for medico in instance.medicos.for_resumo():
+            _update_search(medico)
+
+
+@receiver(post_save, sender=Exame)
+@receiver(post_delete, sender=Exame)
+@receiver(post_save, sender=Convenio)
+@receiver(post_delete, sender=Convenio)
+@receiver(post_save, sender=ClinicaInfo)
+@receiver(post_delete, sender=ClinicaInfo)
+def update_search_document(sender, instance, **kwargs):
+    """Exames, convênios e dados da clínica só afetam a busca textual"""
+    _update_search(instance, removed='created' not in kwargs)
+
+
+@receiver(m2m_changed, sender=Medico.especialidades.through)
+def invalidate_on_specialties_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Médico ganhou/perdeu especialidades"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    doctor_index.invalidate()
+    # Recarrega os médicos: a instância pode ter especialidades pré-carregadas desatualizadas
+    medico_ids = pk_set if reverse else {instance.pk}
+    if medico_ids:
+        for medico in Medico.objects.filter(pk__in=medico_ids).for_resumo():
+            _update_search(medico)
+
+
+@receiver(post_save, sender=Especialidade)
+@receiver(post_delete, sender=Especialidade)
+@receiver(post_save, sender=Medico)
+@receiver(post_delete, sender=Medico)
+@receiver(post_save, sender=Exame)
+@receiver(post_delete, sender=Exame)
+@receiver(post_save, sender=Convenio)
+@receiver(post_delete, sender=Convenio)
+@receiver(post_save, sender=ClinicaInfo)
+@receiver(post_delete, sender=ClinicaInfo)
+@receiver(post_save, sender=HorarioTrabalho)
+@receiver(post_delete, sender=HorarioTrabalho)
+@receiver(m2m_changed, sender=Medico.especialidades.through)
+@receiver(m2m_changed, sender=Medico.convenios.through)
+def bump_version(sender, **kwargs):
+    """Qualquer alteração no catálogo invalida ETags e respostas em cache"""
+    if kwargs.get('action', 'post_').startswith('post_'):
+        # Só depois do commit: antes dele, leituras concorrentes ainda veem os dados antigos
+        # e os guardariam (corpo em cache, índices) sob a versão nova
+        transaction.on_commit(bump_catalog_version, using=kwargs.get('using'))
@@ -0,0 +1,101 @@
+"""
+Campos esparsos (?fields=) para as APIs do catálogo
+
+Responsável por:
+- Validar a lista de campos pedida pelo cliente (?fields=id,nome,preco)
+- Serializar apenas esses campos
+- Reduzir o SQL ao necessário: only() nas colunas usadas e sem pré-carregar
+  relações que nenhum campo pedido utiliza
+
+Uso:
+    class ExameListView(SparseFieldsetViewMixin, generics.ListAPIView):
+        serializer_class = ExameSerializer  # com SparseFieldsetSerializerMixin
+        sparse_field_dependencies = {'duracao_formatada': ('duracao_estimada',)}
+"""
+
+from typing import Dict, Iterable, List, Optional
+
+from rest_framework.exceptions import ValidationError
+from rest_framework.serializers import ListSerializer
+
+FIELDS_PARAM = 'fields'
+CONTEXT_KEY = 'sparse_fields'
+
+
+class SparseFieldsetSerializerMixin:
+    """Serializer que mantém apenas os campos em context['sparse_fields'] (somente no nível raiz)"""
+
+    def get_fields(self):
+        fields = super().get_fields()
+        requested = self.context.get(CONTEXT_KEY)
+        # Serializers aninhados (ex.: especialidades dentro do médico) mantêm todos os campos
+        is_root = self.parent is None or (self.parent is self.root and isinstance(self.parent, ListSerializer))
+        if not requested or not is_root:
+            return fields
+        return {name: field for name, field in fields.items() if name in requested}
+
+
+class SparseFieldsetViewMixin:
+    """
+    View DRF com suporte a ?fields=
+
+    Atributos:
+        sparse_field_dependencies: Colunas extras exigidas por campos calculados
+        sparse_relation_fields: Campos que dependem das relações pré-carregadas
+    """
+
+    sparse_field_dependencies: Dict[str, Iterable[str]] = {}
+    sparse_relation_fields: Iterable[str] = ()
+
+    def get_sparse_fields(self) -> Optional[List[str]]:
+        """
+        Campos pedidos pelo cliente
+
+        Returns:
+            Lista de campos (na ordem do serializer) ou None para todos
+
+        Raises:
+            ValidationError: Campo inexistente no serializer
+        """
+        if hasattr(self, '_sparse_fields'):
+            return self._sparse_fields
+
+        raw = self.request.query_params.get(FIELDS_PARAM, '') if self.request else ''
+        requested = {name.strip() for name in raw.split(',') if name.strip()}
+        if not requested:
+            self._sparse_fields = None
+            return None
+
+        available = list(self.get_serializer_class()().fields)
+        unknown = sorted(requested - set(available))
+        if unknown:
+            raise ValidationError({FIELDS_PARAM: f"Campos inválidos: {', '.join(unknown)}. "
+                                                 f"Disponíveis: {', '.join(available)}"})
+        self._sparse_fields = [name for name in available if name in requested]
+        return self._sparse_fields
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context[CONTEXT_KEY] = self.get_sparse_fields()
+        return context
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        sparse = self.get_sparse_fields()
+        serializer_fields = self.get_serializer_class()().fields
+        # Sem ?fields= as colunas ainda se limitam às do serializer (ex.: resumo sem a bio)
+        fields = sparse or list(serializer_fields)
+
+        model = queryset.model
+        concrete = {field.name for field in model._meta.concrete_fields}
+
+        columns = {model._meta.pk.name}
+        for name in fields:
+            source = serializer_fields[name].source
+            if source and source != '*' and source.split('.')[0] in concrete:
+                columns.add(source.split('.')[0])
+            columns.update(self.sparse_field_dependencies.get(name, ()))
+
+        if sparse and not set(sparse) & set(self.sparse_relation_fields):
+            queryset = queryset.prefetch_related(None)
+        return queryset.only(*columns)
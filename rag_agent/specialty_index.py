@@ -0,0 +1,182 @@
+"""
+Índice em memória das especialidades (nomes, sinônimos e termos leigos)
+
+Responsável por:
+- Mapear termos normalizados (sem acentos, com radical simplificado) para especialidades:
+  nome oficial, palavras do nome e sinônimos cadastrados no admin (Especialidade.sinonimos)
+- Reconhecer menções em texto livre ("tô com falta de ar", "ronco muito") sem consultar o banco
+- Ser reconstruído quando o catálogo muda (ver rag_agent/catalog_index.py)
+
+Uso:
+    from rag_agent.specialty_index import specialty_index
+
+    specialty_index.resolve('pulmão')        # 'Pneumologia'
+    specialty_index.match('ronco e apneia')  # candidatos ranqueados
+"""
+
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .catalog_index import CatalogIndex
+from .text import fold_accents, tokenize_name
+
+logger = logging.getLogger(__name__)
+
+# Pesos por origem do termo
+NAME_WEIGHT = 1.0
+SYNONYM_WEIGHT = 0.8
+NAME_TOKEN_WEIGHT = 0.6
+PREFIX_WEIGHT = 0.5
+# Bônus por palavra adicional em termos compostos ("falta de ar" vence "ar")
+PHRASE_BONUS = 0.1
+
+# Palavras do nome que sozinhas não identificam a especialidade
+GENERIC_NAME_TOKENS = frozenset({'medicina', 'clinica', 'geral', 'cirurgia'})
+
+# Sufixos removidos para aproximar variações (pneumologia/pneumologista/pneumológico)
+_SUFFIXES = ('istas', 'ista', 'icas', 'icos', 'ica', 'ico', 'ias', 'ia', 'oes', 'aes', 'ao', 's')
+MIN_STEM_LENGTH = 4
+MIN_PREFIX_LENGTH = 4
+
+
+def stem(token: str) -> str:
+    """Radical simplificado de um token já normalizado"""
+    for suffix in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= MIN_STEM_LENGTH:
+            return token[:-len(suffix)]
+    return token
+
+
+def term_key(text: str) -> Tuple[str, ...]:
+    """Sequência de radicais usada como chave do índice"""
+    return tuple(stem(token) for token in tokenize_name(text))
+
+
+class SpecialtyIndex(CatalogIndex):
+    """
+    Índice invertido termo -> especialidades ativas
+    """
+
+    def __init__(self, ttl: Optional[float] = None):
+        super().__init__(ttl)
+        self._names: Dict[int, str] = {}
+        self._terms: Dict[Tuple[str, ...], Dict[int, float]] = {}
+        self._name_stems: Dict[str, set] = {}
+        self._max_term_length = 1
+
+    # ── Construção ─────────────────────────────────────────────────────────
+
+    def _load(self):
+        from .models import Especialidade
+        self.build(Especialidade.objects.filter(ativa=True).only('id', 'nome', 'sinonimos'))
+
+    def _add_term(self, key: Tuple[str, ...], specialty_id: int, weight: float):
+        if not key:
+            return
+        weights = self._terms.setdefault(key, {})
+        if weight > weights.get(specialty_id, 0.0):
+            weights[specialty_id] = weight
+        self._max_term_length = max(self._max_term_length, len(key))
+
+    def build(self, especialidades: Iterable):
+        """
+        (Re)constrói o índice
+
+        Args:
+            especialidades: Iterável de Especialidade (apenas ativas)
+        """
+        self._names, self._terms, self._name_stems = {}, {}, {}
+        self._max_term_length = 1
+
+        for especialidade in especialidades:
+            self._names[especialidade.id] = especialidade.nome
+            name_key = term_key(especialidade.nome)
+            self._add_term(name_key, especialidade.id, NAME_WEIGHT)
+            for token in name_key:
+                self._name_stems.setdefault(token, set()).add(especialidade.id)
+                if len(name_key) > 1 and token not in GENERIC_NAME_TOKENS:
+                    self._add_term((token,), especialidade.id, NAME_TOKEN_WEIGHT)
+            for sinonimo in especialidade.get_sinonimos_list():
+                self._add_term(term_key(sinonimo), especialidade.id, SYNONYM_WEIGHT)
+
+        self._mark_built()
+        logger.info(f"🏷️ Índice de especialidades construído: {len(self._names)} especialidades, {len(self._terms)} termos")
+
+    # ── Consulta ───────────────────────────────────────────────────────────
+
+    def match(self, text: str, limit: int = 3) -> List[Dict[str, Any]]:
+        """
+        Especialidades mencionadas no texto, ranqueadas
+
+        Termos mais longos têm prioridade: palavras já cobertas por um termo composto
+        não são reavaliadas isoladamente.
+
+        Args:
+            text: Nome da especialidade ou mensagem livre
+            limit: Máximo de candidatos
+
+        Returns:
+            Lista de {'id', 'nome', 'score', 'term'}
+        """
+        self._ensure_built()
+        tokens = [stem(token) for token in tokenize_name(text or '')]
+        if not tokens:
+            return []
+
+        best: Dict[int, Tuple[float, str]] = {}
+        covered = [False] * len(tokens)
+
+        def register(specialty_id: int, score: float, term: str):
+            if score > best.get(specialty_id, (0.0, ''))[0]:
+                best[specialty_id] = (score, term)
+
+        for size in range(min(self._max_term_length, len(tokens)), 0, -1):
+            for start in range(len(tokens) - size + 1):
+                if any(covered[start:start + size]):
+                    continue
+                key = tuple(tokens[start:start + size])
+                weights = self._terms.get(key)
+                if not weights:
+                    continue
+                for position in range(start, start + size):
+                    covered[position] = True
+                for specialty_id, weight in weights.items():
+                    register(specialty_id, weight + PHRASE_BONUS * (size - 1), ' '.join(key))
+
+        # Prefixo do nome oficial ("pneumo" -> Pneumologia) para palavras não reconhecidas
+        for position, token in enumerate(tokens):
+            if covered[position] or len(token) < MIN_PREFIX_LENGTH:
+                continue
+            for name_stem, specialty_ids in self._name_stems.items():
+                if name_stem.startswith(token) and name_stem not in GENERIC_NAME_TOKENS:
+                    for specialty_id in specialty_ids:
+                        register(specialty_id, PREFIX_WEIGHT, token)
+
+        candidates = [
+            {'id': specialty_id, 'nome': self._names[specialty_id], 'score': round(score, 4), 'term': term}
+            for specialty_id, (score, term) in best.items()
+        ]
+        candidates.sort(key=lambda candidate: (-candidate['score'], candidate['nome']))
+        return candidates[:limit]
+
+    def resolve(self, text: str) -> Optional[str]:
+        """
+        Nome oficial da especialidade mais provável para o texto
+
+        Args:
+            text: Nome, sinônimo ou termo leigo
+
+        Returns:
+            Nome da especialidade ou None
+        """
+        candidates = self.match(text, limit=1)
+        return candidates[0]['nome'] if candidates else None
+
+    def names(self) -> List[str]:
+        """Nomes das especialidades ativas"""
+        self._ensure_built()
+        return sorted(self._names.values(), key=fold_accents)
+
+
+# Instância global do índice
+specialty_index = SpecialtyIndex()
@@ -1,3 +1,558 @@
-from django.test import TestCase
+import importlib
+import time
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import OperationalError, router
+from django.test import TestCase, override_settings
+from django.utils.http import http_date
+
+from api_gateway.services.rag_service import RAGService
+
+from .catalog_index import CatalogIndex
+from .catalog_version import bump_catalog_version
+from .doctor_index import DoctorIndex, bounded_levenshtein, max_edits_for
+from .http_cache import CACHE_STATUS_HEADER
+from .models import Convenio, Especialidade, Exame, HorarioTrabalho, Medico
+from .retrieval import NUMPY_AVAILABLE, RetrievalIndex
+from .search_index import SearchDocument, search_index
+from .serializers import MedicoResumoSerializer
+from .specialty_index import SpecialtyIndex, specialty_index
+
+
+class CatalogQueryCountTests(TestCase):
+    """Serialização do catálogo com número de consultas independente da quantidade de médicos"""
+
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.pneumo = Especialidade.objects.create(nome='Pneumologia')
+        cls.sono = Especialidade.objects.create(nome='Medicina do Sono')
+        cls.inativa = Especialidade.objects.create(nome='Alergologia', ativa=False)
+
+    @property
+    def catalog_db(self):
+        return router.db_for_read(Medico)
+
+    def create_medicos(self, total, start=0):
+        # Commit simulado: a versão do catálogo (e o corpo em cache) só muda depois dele
+        with self.captureOnCommitCallbacks(execute=True):
+            for index in range(start, start + total):
+                medico = Medico.objects.create(
+                    nome=f'Dr. Teste {index}', crm=f'CRM-{index}', bio='Bio', formas_pagamento='Pix'
+                )
+                medico.especialidades.add(self.pneumo, self.sono, self.inativa)
+                HorarioTrabalho.objects.create(medico=medico, dia_da_semana=1, hora_inicio='08:00', hora_fim='12:00')
+
+    def assertConstantQueries(self, func, expected):
+        """Mesma contagem de consultas com 2 e com 20 médicos"""
+        self.create_medicos(2)
+        with self.assertNumQueries(expected, using=self.catalog_db):
+            func()
+        self.create_medicos(18, start=2)
+        with self.assertNumQueries(expected, using=self.catalog_db):
+            func()
+
+    def test_resumo_serializer_uses_prefetch(self):
+        self.assertConstantQueries(
+            lambda: MedicoResumoSerializer(Medico.objects.for_resumo(), many=True).data, 2
+        )
+
+    def test_especialidades_display_ignores_inactive(self):
+        self.create_medicos(1)
+        medico = Medico.objects.for_resumo().get()
+        with self.assertNumQueries(0, using=self.catalog_db):
+            self.assertEqual(medico.get_especialidades_display(), 'Medicina do Sono, Pneumologia')
+        # Sem pré-carregamento continua correto (uma consulta)
+        self.assertEqual(Medico.objects.get().get_especialidades_display(), 'Medicina do Sono, Pneumologia')
+
+    def test_rag_service_get_medicos(self):
+        self.assertConstantQueries(RAGService.get_medicos, 2)
+
+    def test_rag_service_medicos_por_especialidade(self):
+        # especialidade + médicos + especialidades ativas
+        self.assertConstantQueries(lambda: RAGService.get_medicos_por_especialidade(self.pneumo.id), 3)
+
+    def test_medicos_list_endpoint(self):
+        self.assertConstantQueries(lambda: self.client.get('/rag/api/medicos/'), 2)
+
+    def test_medicos_por_especialidade_endpoint(self):
+        self.assertConstantQueries(
+            lambda: self.client.get(f'/rag/api/especialidades/{self.pneumo.id}/medicos/'), 3
+        )
+
+    def test_medico_detail_endpoint(self):
+        self.create_medicos(1)
+        medico = Medico.objects.get()
+        # médico + especialidades + convênios + horários
+        with self.assertNumQueries(4, using=self.catalog_db):
+            response = self.client.get(f'/rag/api/medicos/{medico.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['especialidades_display'], 'Medicina do Sono, Pneumologia')
+        self.assertEqual(len(response.json()['horarios_trabalho']), 1)
+
+
+class CatalogHttpCacheTests(TestCase):
+    """ETag/Last-Modified pela versão do catálogo e corpo JSON em cache"""
+
+    databases = '__all__'
+    url = '/rag/api/convenios/'
+
+    def setUp(self):
+        cache.clear()
+        Convenio.objects.create(nome='Unimed')
+
+    @property
+    def catalog_db(self):
+        return router.db_for_read(Convenio)
+
+    def test_second_request_served_from_cache(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first[CACHE_STATUS_HEADER], 'MISS')
+        with self.assertNumQueries(0, using=self.catalog_db):
+            second = self.client.get(self.url)
+        self.assertEqual(second[CACHE_STATUS_HEADER], 'HIT')
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_conditional_get_returns_304(self):
+        first = self.client.get(self.url)
+        with self.assertNumQueries(0, using=self.catalog_db):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_catalog_change_invalidates_etag_and_body(self):
+        first = self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Convenio.objects.create(nome='Bradesco Saúde')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+        self.assertEqual(len(response.json()), 2)
+
+    def test_version_bumps_only_after_commit(self):
+        first = self.client.get(self.url)
+        with self.captureOnCommitCallbacks() as callbacks:
+            Convenio.objects.create(nome='Amil')
+            # Ainda dentro da transação: a versão (e o corpo em cache) continuam os antigos
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+            self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 2)
+
+    def test_last_modified_only_after_the_second_ends(self):
+        # Relógio à frente das versões já criadas por outros testes
+        base = int(time.time()) + 100
+        with mock.patch('time.time', return_value=base + 0.2):
+            bump_catalog_version()
+            self.assertNotIn('Last-Modified', self.client.get(self.url))
+        with mock.patch('time.time', return_value=base + 0.7):
+            with self.captureOnCommitCallbacks(execute=True):
+                Convenio.objects.create(nome='Amil')
+            self.assertNotIn('Last-Modified', self.client.get(self.url))
+        with mock.patch('time.time', return_value=base + 1.1):
+            first = self.client.get(self.url)
+            self.assertEqual(first['Last-Modified'], http_date(base))
+            response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+            self.assertEqual(response.status_code, 304)
+        with mock.patch('time.time', return_value=base + 1.3):
+            with self.captureOnCommitCallbacks(execute=True):
+                Convenio.objects.create(nome='Bradesco Saúde')
+            response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()), 3)
+
+    @override_settings(ALLOWED_HOSTS=['a.example', 'b.example'])
+    def test_cached_body_is_per_host(self):
+        for index in range(2):
+            Exame.objects.create(nome=f'Exame {index}', o_que_e='Texto', como_funciona='Texto', preco=100)
+        url = '/rag/api/exames/?page_size=1'
+        first = self.client.get(url, HTTP_HOST='a.example')
+        self.assertTrue(first.json()['next'].startswith('http://a.example/'))
+        self.assertEqual(self.client.get(url, HTTP_HOST='a.example')[CACHE_STATUS_HEADER], 'HIT')
+        other = self.client.get(url, HTTP_HOST='b.example')
+        self.assertEqual(other[CACHE_STATUS_HEADER], 'MISS')
+        self.assertTrue(other.json()['next'].startswith('http://b.example/'))
+
+
+class CatalogListParamsTests(TestCase):
+    """Paginação por cursor (opcional) e ?fields= nas listagens"""
+
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        for index in range(5):
+            Exame.objects.create(nome=f'Exame {index}', o_que_e='Texto longo', como_funciona='Texto longo', preco=100)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_list_without_params_is_not_paginated(self):
+        response = self.client.get('/rag/api/exames/')
+        self.assertIsInstance(response.json(), list)
+        self.assertEqual(len(response.json()), 5)
+
+    def test_cursor_pagination_walks_all_rows(self):
+        names, url = [], '/rag/api/exames/?page_size=2'
+        while url:
+            page = self.client.get(url).json()
+            names.extend(exame['nome'] for exame in page['results'])
+            url = page['next']
+        self.assertEqual(names, [f'Exame {index}' for index in range(5)])
+
+    def test_sparse_fields(self):
+        response = self.client.get('/rag/api/exames/?fields=nome,preco')
+        self.assertEqual(response.json()[0], {'nome': 'Exame 0', 'preco': '100.00'})
+        response = self.client.get('/rag/api/exames/?fields=nome,inexistente')
+        self.assertEqual(response.status_code, 400)
+
+
+class DoctorIndexTests(TestCase):
+    """Índice de médicos: nome exato, prefixo na trie, erros de digitação e regra de todos os tokens"""
+
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        pneumo = Especialidade.objects.create(nome='Pneumologia')
+        sono = Especialidade.objects.create(nome='Medicina do Sono')
+        for index, (nome, especialidade) in enumerate([('Dr. Gustavo Magno', pneumo), ('Dr. Gustavo Lima', sono),
+                                                       ('Dra. Renata Alves', sono), ('Dra. Ana Souza', pneumo)]):
+            medico = Medico.objects.create(nome=nome, crm=f'CRM-{index}', bio='Bio', formas_pagamento='Pix')
+            medico.especialidades.add(especialidade)
+
+    def setUp(self):
+        self.index = DoctorIndex(ttl=300)
+
+    def names(self, reference, **kwargs):
+        return [candidate['doctor']['nome'] for candidate in self.index.match(reference, **kwargs)]
+
+    def test_exact_name(self):
+        candidates = self.index.match('dra renata alves')
+        self.assertEqual((candidates[0]['doctor']['nome'], candidates[0]['match'], candidates[0]['score']),
+                         ('Dra. Renata Alves', 'exact', 1.0))
+
+    def test_prefix_lookup(self):
+        self.assertEqual(self.names('gust'), ['Dr. Gustavo Lima', 'Dr. Gustavo Magno'])
+        self.assertEqual(self.index.resolve('Dr. Gust', specialty='Pneumologia')['nome'], 'Dr. Gustavo Magno')
+        self.assertEqual(self.names('dr gustavo mag'), ['Dr. Gustavo Magno'])
+        # Prefixo de uma letra não basta
+        self.assertEqual(self.names('g'), [])
+
+    def test_typo_tolerance_grows_with_token_length(self):
+        self.assertEqual(bounded_levenshtein('renata', 'renatta', 2), 1)
+        self.assertEqual(bounded_levenshtein('kitten', 'sitting', 2), 3)
+        self.assertEqual([max_edits_for(token) for token in ('ana', 'magno', 'gustavo')], [0, 1, 2])
+
+        self.assertEqual(self.index.resolve('renatta')['nome'], 'Dra. Renata Alves')
+        self.assertEqual(self.index.resolve('Dr. Gustaavo Magnu')['nome'], 'Dr. Gustavo Magno')
+        # Tolerância pelo tamanho do token digitado: 3 letras exigem grafia exata
+        self.assertEqual(self.index.resolve('anna')['nome'], 'Dra. Ana Souza')
+        self.assertIsNone(self.index.resolve('ama'))
+
+    def test_all_tokens_rule(self):
+        # Um token do nome e um token desconhecido: não é o médico
+        self.assertEqual(self.names('gustavo ferreira'), [])
+        # Todos os tokens do nome na referência, mesmo com palavras a mais
+        self.assertEqual(self.names('quero o dr gustavo magno pneumologista'), ['Dr. Gustavo Magno'])
+
+    def test_specialty_filter(self):
+        self.assertEqual(self.names('gustavo', specialty='medicina do sono'), ['Dr. Gustavo Lima'])
+
+
+class CatalogIndexRebuildTests(TestCase):
+    """Índices do catálogo reconstruídos por TTL, invalidação e mudança de versão"""
+
+    class CountingIndex(CatalogIndex):
+        def __init__(self, ttl=None, on_load=None):
+            super().__init__(ttl)
+            self.loads = 0
+            self.on_load = on_load
+
+        def _load(self):
+            self.loads += 1
+            if self.on_load:
+                self.on_load()
+            self._mark_built()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_built_once_while_fresh(self):
+        index = self.CountingIndex(ttl=300)
+        for _ in range(3):
+            index.warm()
+        self.assertEqual(index.loads, 1)
+
+        index.invalidate()
+        index.warm()
+        self.assertEqual(index.loads, 2)
+
+    def test_ttl_expiry(self):
+        index = self.CountingIndex(ttl=0)
+        index.warm()
+        index.warm()
+        self.assertEqual(index.loads, 2)
+
+    def test_catalog_version_change(self):
+        index = self.CountingIndex(ttl=300)
+        index.warm()
+        bump_catalog_version()
+        index.warm()
+        index.warm()
+        self.assertEqual(index.loads, 2)
+
+    def test_change_during_load_forces_rebuild(self):
+        index = self.CountingIndex(ttl=300)
+        index.on_load = lambda: (bump_catalog_version(), setattr(index, 'on_load', None))
+        index.warm()
+        index.warm()
+        self.assertEqual(index.loads, 2)
+
+
+class SpecialtyIndexTests(TestCase):
+    """Especialidades por nome, sinônimos cadastrados e termos leigos"""
+
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        Especialidade.objects.create(nome='Pneumologia', sinonimos='pulmão, falta de ar, asma, tosse')
+        Especialidade.objects.create(nome='Medicina do Sono', sinonimos='ronco, apneia\ninsônia')
+        Especialidade.objects.create(nome='Cardiologia', sinonimos='coração; pressão alta', ativa=False)
+
+    def setUp(self):
+        self.index = SpecialtyIndex(ttl=300)
+
+    def test_lay_terms_resolve_through_sinonimos(self):
+        self.assertEqual(self.index.resolve('pulmão'), 'Pneumologia')
+        self.assertEqual(self.index.resolve('Pulmoes'), 'Pneumologia')
+        self.assertEqual(self.index.resolve('ronco muito à noite'), 'Medicina do Sono')
+        self.assertEqual(self.index.resolve('acho que tenho apneia'), 'Medicina do Sono')
+        self.assertEqual(self.index.resolve('insonia'), 'Medicina do Sono')
+
+    def test_names_and_variations(self):
+        self.assertEqual(self.index.resolve('pneumologista'), 'Pneumologia')
+        self.assertEqual(self.index.resolve('pneumo'), 'Pneumologia')
+        self.assertEqual(self.index.resolve('sono'), 'Medicina do Sono')
+        # "medicina" sozinha é genérica demais
+        self.assertIsNone(self.index.resolve('medicina'))
+
+    def test_longer_terms_win(self):
+        match = self.index.match('tô com falta de ar')[0]
+        self.assertEqual((match['nome'], match['term']), ('Pneumologia', 'falta ar'))
+
+    def test_inactive_specialties_are_ignored(self):
+        self.assertIsNone(self.index.resolve('pressão alta'))
+        self.assertEqual(self.index.names(), ['Medicina do Sono', 'Pneumologia'])
+
+    def test_admin_edit_reaches_global_index(self):
+        self.assertIsNone(specialty_index.resolve('chiado no peito'))
+        especialidade = Especialidade.objects.get(nome='Pneumologia')
+        especialidade.sinonimos += ', chiado no peito'
+        especialidade.save()
+        self.assertEqual(specialty_index.resolve('chiado no peito'), 'Pneumologia')
+
+
+class CatalogSearchFtsTests(TestCase):
+    """Busca textual no FTS5 e reindexação pelos sinais do catálogo"""
+
+    databases = '__all__'
+    backend = 'fts5'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.pneumo = Especialidade.objects.create(nome='Pneumologia', sinonimos='pulmão, falta de ar')
+        cls.exame = Exame.objects.create(
+            nome='Polissonografia', o_que_e='Exame do sono feito durante a noite',
+            como_funciona='Sensores registram a respiração', preparacao='Evitar cafeína no dia do exame',
+            vantagem='Complementa a espirometria', preco=500,
+        )
+        cls.espirometria = Exame.objects.create(
+            nome='Espirometria', o_que_e='Avalia a função do pulmão',
+            como_funciona='Sopro em aparelho após noite de sono tranquila', preco=150,
+        )
+        cls.medico = Medico.objects.create(nome='Dr. Carlos Lima', crm='SRCH-1', bio='Atende asma e bronquite',
+                                           formas_pagamento='PIX')
+        cls.medico.especialidades.add(cls.pneumo)
+
+    def setUp(self):
+        search_index.fts.reset_availability()
+        search_index.memory.invalidate()
+        patcher = None
+        if self.backend == 'memory':
+            patcher = mock.patch.object(search_index.fts, 'is_available', return_value=False)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.assertEqual(search_index.backend_name, self.backend)
+
+    def hits(self, query, kinds=None):
+        return [(hit['tipo'], hit['id']) for hit in search_index.search(query, kinds=kinds)]
+
+    def test_prefix_and_accent_folding(self):
+        self.assertIn(('exame', self.exame.pk), self.hits('polisso'))
+        self.assertIn(('exame', self.exame.pk), self.hits('cafeina'))
+        self.assertIn(('especialidade', self.pneumo.pk), self.hits('PULMAO'))
+
+    def test_all_terms_required(self):
+        self.assertEqual(self.hits('cafeína respiração'), [('exame', self.exame.pk)])
+        self.assertEqual(self.hits('cafeína bronquite'), [])
+        self.assertEqual(self.hits('de para com'), [])
+
+    def test_title_outranks_body(self):
+        # "espirometria" está no título de um exame e só no corpo do outro
+        self.assertEqual(self.hits('espirometria'),
+                         [('exame', self.espirometria.pk), ('exame', self.exame.pk)])
+        self.assertEqual(set(self.hits('sono', kinds=['exame'])),
+                         {('exame', self.exame.pk), ('exame', self.espirometria.pk)})
+
+    def test_kinds_filter_and_highlight(self):
+        self.assertEqual(self.hits('pulmão', kinds=['especialidade']), [('especialidade', self.pneumo.pk)])
+        hit = search_index.search('cafeína', kinds=['exame'])[0]
+        self.assertIn('<mark>cafeína</mark>', hit['trecho'])
+        self.assertGreater(hit['score'], 0)
+
+    def test_doctor_edit_is_reindexed(self):
+        self.medico.bio = 'Atende apneia do sono'
+        self.medico.save()
+        self.assertIn(('medico', self.medico.pk), self.hits('apneia'))
+        self.assertNotIn(('medico', self.medico.pk), self.hits('bronquite'))
+
+    def test_specialty_rename_reindexes_its_doctors(self):
+        self.assertIn(('medico', self.medico.pk), self.hits('pneumologia', kinds=['medico']))
+        self.pneumo.nome = 'Pneumologia Clínica'
+        self.pneumo.save()
+        self.assertIn(('medico', self.medico.pk), self.hits('clinica', kinds=['medico']))
+
+    def test_m2m_change_reindexes_doctor(self):
+        sono = Especialidade.objects.create(nome='Medicina do Sono')
+        self.assertEqual(self.hits('medicina', kinds=['medico']), [])
+        self.medico.especialidades.add(sono)
+        self.assertEqual(self.hits('medicina', kinds=['medico']), [('medico', self.medico.pk)])
+
+    def test_delete_and_deactivate_remove_documents(self):
+        exame_pk = self.espirometria.pk
+        self.espirometria.delete()
+        self.assertNotIn(('exame', exame_pk), self.hits('espirometria'))
+        self.pneumo.ativa = False
+        self.pneumo.save()
+        self.assertNotIn(('especialidade', self.pneumo.pk), self.hits('pulmão'))
+
+    def test_rebuild_counts_documents(self):
+        # 1 especialidade + 1 médico + 2 exames
+        self.assertEqual(search_index.rebuild(), 4)
+        self.assertIn(('exame', self.exame.pk), self.hits('polissonografia'))
+
+
+class CatalogSearchMemoryTests(CatalogSearchFtsTests):
+    """Mesmos cenários no índice BM25 em memória (bancos sem FTS5)"""
+
+    backend = 'memory'
+
+    def test_backends_rank_alike(self):
+        for query in ('sono', 'pulmão', 'exame noite', 'pneumologia', 'espirometria'):
+            memory_hits = self.hits(query)
+            with mock.patch.object(search_index.fts, 'is_available', return_value=True):
+                fts_hits = self.hits(query)
+            self.assertEqual(memory_hits, fts_hits, query)
+
+
+class SearchIndexMigrationTests(TestCase):
+    """Migração do FTS5: só a falta do módulo é tolerada; falhas na carga interrompem a migração"""
+
+    def setUp(self):
+        self.migration = importlib.import_module('rag_agent.migrations.0007_search_index')
+        self.schema_editor = mock.MagicMock()
+        self.schema_editor.connection.vendor = 'sqlite'
+        self.cursor = self.schema_editor.connection.cursor.return_value.__enter__.return_value
+
+    def test_missing_fts5_is_skipped(self):
+        self.cursor.execute.side_effect = OperationalError('no such module: fts5')
+        self.migration.create_search_index(None, self.schema_editor)
+        self.cursor.execute.assert_called_once_with(self.migration.CREATE_TABLE)
+
+    def test_populate_failure_fails_the_migration(self):
+        self.cursor.execute.side_effect = [None, OperationalError('database is locked')]
+        with self.assertRaises(OperationalError):
+            self.migration.create_search_index(None, self.schema_editor)
+
+
+def retrieval_documents():
+    return [
+        SearchDocument('especialidade', 1, 'Pneumologia', 'Doenças do pulmão\nfalta de ar, asma, tosse'),
+        SearchDocument('especialidade', 2, 'Medicina do Sono', 'Ronco e apneia durante o sono'),
+        SearchDocument('medico', 10, 'Dr. Carlos Lima', 'Pneumologia\nAtende asma grave e tosse crônica'),
+        SearchDocument('medico', 11, 'Dra. Ana Souza', 'Medicina do Sono\nTrata apneia e ronco'),
+        SearchDocument('exame', 20, 'Polissonografia', 'Exame do sono com sensores de respiração'),
+        SearchDocument('exame', 21, 'Espirometria', 'Avalia o pulmão ' + 'sopro ' * 70),
+        SearchDocument('convenio', 30, 'Unimed', ''),
+    ]
+
+
+class RetrievalIndexTests(TestCase):
+    """Ranking top-k do índice BM25 de trechos e paridade NumPy / Python puro"""
+
+    def build(self, numpy_enabled):
+        index = RetrievalIndex(ttl=300)
+        with mock.patch('rag_agent.retrieval.NUMPY_AVAILABLE', numpy_enabled):
+            index.build(retrieval_documents(), max_words=30)
+        return index
+
+    def search(self, index, numpy_enabled, *args, **kwargs):
+        with mock.patch('rag_agent.retrieval.NUMPY_AVAILABLE', numpy_enabled):
+            return [(chunk.kind, chunk.object_id, score) for chunk, score in index.search(*args, **kwargs)]
+
+    def test_chunking_keeps_title_and_splits_long_text(self):
+        index = self.build(False)
+        espirometria = [chunk for chunk in index._chunks if chunk.object_id == 21]
+        self.assertEqual(len(espirometria), 3)
+        self.assertTrue(all(chunk.title == 'Espirometria' for chunk in espirometria))
+        self.assertEqual([chunk.text for chunk in index._chunks if chunk.object_id == 30], [''])
+
+    def test_top_k_is_prefix_of_full_ranking(self):
+        index = self.build(False)
+        full = self.search(index, False, 'apneia ronco sono', k=100)
+        self.assertEqual([item[:2] for item in full[:2]], [('especialidade', 2), ('medico', 11)])
+        scores = [score for _, _, score in full]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        for k in range(1, len(full) + 1):
+            self.assertEqual(self.search(index, False, 'apneia ronco sono', k=k), full[:k])
+
+    def test_title_and_stem_matching(self):
+        index = self.build(False)
+        self.assertEqual(self.search(index, False, 'pulmões', k=1)[0][:2], ('especialidade', 1))
+        self.assertEqual([item[:2] for item in self.search(index, False, 'Carlos')], [('medico', 10)])
+
+    def test_ties_keep_catalog_order(self):
+        index = RetrievalIndex(ttl=300)
+        with mock.patch('rag_agent.retrieval.NUMPY_AVAILABLE', False):
+            index.build([SearchDocument('convenio', pk, 'Plano', 'cobertura nacional') for pk in (3, 1, 2)])
+        self.assertEqual([item[1] for item in self.search(index, False, 'cobertura', k=2)], [3, 1])
+
+    def test_kinds_filter_repeated_terms_and_empty_queries(self):
+        index = self.build(False)
+        self.assertEqual([item[:2] for item in self.search(index, False, 'asma tosse', kinds=['medico'])],
+                         [('medico', 10)])
+        self.assertEqual(self.search(index, False, 'asma asma asma'), self.search(index, False, 'asma'))
+        self.assertEqual(self.search(index, False, 'de para com'), [])
+        self.assertEqual(self.search(index, False, 'asma', k=0), [])
+        self.assertEqual(self.search(index, False, 'cardiologia'), [])
+
+    @skipUnless(NUMPY_AVAILABLE, 'numpy não instalado')
+    def test_numpy_and_python_paths_agree(self):
+        python_index = self.build(False)
+        numpy_index = self.build(True)
+        queries = ['apneia ronco sono', 'asma tosse', 'pulmão', 'exame sono respiração', 'sopro', 'unimed']
+        for query in queries:
+            for k in (1, 3, 100):
+                for kinds in (None, ['medico', 'especialidade']):
+                    expected = self.search(python_index, False, query, k=k, kinds=kinds)
+                    got = self.search(numpy_index, True, query, k=k, kinds=kinds)
+                    self.assertEqual([item[:2] for item in got], [item[:2] for item in expected], query)
+                    for (_, _, a), (_, _, b) in zip(got, expected):
+                        self.assertAlmostEqual(a, b, places=3)
@@ -0,0 +1,73 @@
+"""
+Normalização de texto para buscas no catálogo
+
+Responsável por:
+- Remover acentos e padronizar caixa ("Médico" -> "medico")
+- Remover títulos de médicos ("Dr.", "Dra.", "Doutor", "Doutora")
+- Quebrar nomes em tokens sem palavras de ligação ("da", "de", "com"...)
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+from typing import List
+
+# Títulos removidos de referências a médicos
+DOCTOR_TITLES = frozenset({'dr', 'dra', 'doutor', 'doutora', 'doc'})
+
+# Palavras de ligação ignoradas na comparação de nomes
+NAME_STOPWORDS = frozenset({'com', 'o', 'a', 'de', 'da', 'do', 'das', 'dos', 'e'})
+
+_TITLE_PREFIX_RE = re.compile(r'^(?:(?:com|o|a)\s+)?(?:dr|dra|doutor|doutora)\b\.?\s*', re.IGNORECASE)
+_NON_WORD_RE = re.compile(r'[^0-9a-z]+')
+
+
+@lru_cache(maxsize=4096)
+def fold_accents(text: str) -> str:
+    """
+    Remove acentos e converte para minúsculas
+
+    Args:
+        text: Texto original
+
+    Returns:
+        Texto sem acentos, em minúsculas
+    """
+    if not text:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).lower()
+
+
+def strip_doctor_title(text: str) -> str:
+    """
+    Remove o título do início da referência ("com o Dr. João" -> "João")
+
+    Args:
+        text: Referência ao médico
+
+    Returns:
+        Referência sem título (espaços das pontas removidos)
+    """
+    if not text:
+        return ''
+    return _TITLE_PREFIX_RE.sub('', text.strip(), count=1).strip()
+
+
+def tokenize_name(text: str) -> List[str]:
+    """
+    Tokens normalizados de um nome (sem acentos, títulos e palavras de ligação)
+
+    Args:
+        text: Nome ou referência
+
+    Returns:
+        Lista de tokens na ordem original
+    """
+    words = _NON_WORD_RE.split(fold_accents(text or ''))
+    return [word for word in words if word and word not in DOCTOR_TITLES and word not in NAME_STOPWORDS]
+
+
+def normalize_name(text: str) -> str:
+    """Forma canônica de um nome para comparação exata"""
+    return ' '.join(tokenize_name(text))
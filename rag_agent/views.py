@@ -3,15 +3,19 @@ from rest_framework import generics, status, viewsets
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
+from .http_cache import CatalogCacheMixin
 from .models import (ClinicaInfo, Convenio, Especialidade, Exame,
                      HorarioTrabalho, Medico)
+from .pagination import CatalogCursorPagination
+from .search_index import DEFAULT_LIMIT, search_catalog
 from .serializers import (ClinicaInfoSerializer, ConvenioSerializer,
                           EspecialidadeSerializer, ExameSerializer,
                           HorarioTrabalhoSerializer, MedicoResumoSerializer,
                           MedicoSerializer)
+from .sparse_fields import SparseFieldsetViewMixin
 
 # 1 classe = 1 endpoint (list)
-class EspecialidadeListView(generics.ListAPIView):
+class EspecialidadeListView(CatalogCacheMixin, generics.ListAPIView):
     """Lista especialidades ativas"""
     queryset = Especialidade.objects.filter(ativa=True)
     serializer_class = EspecialidadeSerializer
@@ -19,7 +23,7 @@ class EspecialidadeListView(generics.ListAPIView):
 # GET /especialidades/   → Lista especialidades
 
 # 1 classe = 1 endpoint (detail)
-class ClinicaInfoView(generics.RetrieveAPIView):
+class ClinicaInfoView(CatalogCacheMixin, generics.RetrieveAPIView):
     """Retorna informações da clínica"""
     serializer_class = ClinicaInfoSerializer
     
@@ -30,7 +34,7 @@ class ClinicaInfoView(generics.RetrieveAPIView):
 
 
 # 1 classe = 1 endpoint (list)
-class ConvenioListView(generics.ListAPIView):
+class ConvenioListView(CatalogCacheMixin, generics.ListAPIView):
     """Lista convênios disponíveis"""
     queryset = Convenio.objects.all()
     serializer_class = ConvenioSerializer
@@ -39,9 +43,17 @@ class ConvenioListView(generics.ListAPIView):
 
 
 # 1 classe = 2 endpoints (list e detail)
-class MedicoViewSet(viewsets.ReadOnlyModelViewSet):
-    """ViewSet para médicos"""
-    queryset = Medico.objects.prefetch_related('especialidades', 'convenios', 'horarios_trabalho')
+class MedicoViewSet(CatalogCacheMixin, SparseFieldsetViewMixin, viewsets.ReadOnlyModelViewSet):
+    """ViewSet para médicos (listagem com ?page_size=/?cursor= e ?fields=)"""
+    queryset = Medico.objects.all()
+    pagination_class = CatalogCursorPagination
+    sparse_relation_fields = ('especialidades', 'especialidades_display', 'convenios', 'horarios_trabalho')
+    
+    def get_queryset(self):
+        # Pré-carrega apenas o que o serializer da ação usa (consultas constantes)
+        if self.action == 'list':
+            return Medico.objects.for_resumo()
+        return Medico.objects.for_detalhe()
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -52,10 +64,12 @@ class MedicoViewSet(viewsets.ReadOnlyModelViewSet):
 # GET /medicos/{id}/     → Detalhes de um médico
 
 # 1 classe = 1 endpoint (list)
-class ExameListView(generics.ListAPIView):
-    """Lista exames disponíveis"""
+class ExameListView(CatalogCacheMixin, SparseFieldsetViewMixin, generics.ListAPIView):
+    """Lista exames disponíveis (com ?page_size=/?cursor= e ?fields=)"""
     queryset = Exame.objects.all()
     serializer_class = ExameSerializer
+    pagination_class = CatalogCursorPagination
+    sparse_field_dependencies = {'duracao_formatada': ('duracao_estimada',)}
 
 
 @api_view(['GET'])
@@ -63,7 +77,7 @@ def medicos_por_especialidade(request, especialidade_id):
     """Retorna médicos de uma especialidade específica"""
     try:
         especialidade = Especialidade.objects.get(id=especialidade_id, ativa=True)
-        medicos = Medico.objects.filter(especialidades=especialidade)
+        medicos = Medico.objects.filter(especialidades=especialidade).for_resumo()
         serializer = MedicoResumoSerializer(medicos, many=True)
         
         return Response({
@@ -82,34 +96,19 @@ def search_info(request):
     """
     Endpoint para busca de informações gerais
     Útil para o chatbot buscar respostas
+    
+    Busca textual ranqueada em todo o catálogo (nomes, bio dos médicos, descrição
+    e preparo dos exames...). Retorna 'hits' com trechos destacados e os objetos
+    encontrados agrupados por tipo.
     """
-    query = request.GET.get('q', '').lower()
+    query = request.GET.get('q', '').strip()
     
     if not query:
         return Response({'error': 'Parâmetro q (query) é obrigatório'})
     
-    results = {}
-    
-    # Buscar na clínica info
-    clinica = ClinicaInfo.objects.first()
-    if clinica:
-        results['clinica'] = ClinicaInfoSerializer(clinica).data
-    
-    # Buscar especialidades
-    especialidades = Especialidade.objects.filter(
-        nome__icontains=query, ativa=True
-    )
-    if especialidades.exists():
-        results['especialidades'] = EspecialidadeSerializer(especialidades, many=True).data
-    
-    # Buscar médicos
-    medicos = Medico.objects.filter(nome__icontains=query)
-    if medicos.exists():
-        results['medicos'] = MedicoResumoSerializer(medicos, many=True).data
-    
-    # Buscar exames
-    exames = Exame.objects.filter(nome__icontains=query)
-    if exames.exists():
-        results['exames'] = ExameSerializer(exames, many=True).data
+    try:
+        limit = min(max(int(request.GET.get('limit', DEFAULT_LIMIT)), 1), 100)
+    except ValueError:
+        limit = DEFAULT_LIMIT
     
-    return Response(results)
+    return Response(search_catalog(query, limit=limit))